@@ -1,132 +1,139 @@
+import argparse
 import json
 import sys
-from collections import Counter
 from datetime import datetime
 
-def analyze_stock_sentiment(json_file):
-    """Analyze Reddit sentiment and generate stock perception report."""
-    
-    # Load the data
-    with open(json_file, 'r') as f:
-        data = json.load(f)
-    
+import warehouse
+from comment_tree import CommentTree, thread_stats
+from run_metrics import RunMetrics, timed
+from sentiment_table import (GROUP_COLUMNS, aggregate_sentiment, build_tables, find_summarized_files,
+                             load_document_columns, load_tables, summary_records, ticker_counts)
+from ticker_extraction import TickerExtractor, default_extractor, load_ticker_dictionary
+
+def describe_tickers(symbols, extractor):
+    """Display label such as 'Alphabet (GOOGL)' for the report subject."""
+    return " / ".join(f"{extractor.name(symbol)} ({symbol})" for symbol in symbols)
+
+def compute_report_stats(posts, comments, subject=None):
+    """
+    Compute every number the perception report prints, vectorized over the comments table.
+
+    `subject` lists the tickers the report is about; related posts are the posts
+    mentioning one of them (or any ticker when there is no subject).
+    """
+    related_posts = 0
+    if not posts.empty:
+        wanted = set(subject or [])
+        related_posts = int(posts['tickers'].map(
+            lambda tickers: bool(wanted.intersection(tickers)) if wanted else bool(tickers)).sum())
+    stats = {
+        'posts_analyzed': len(posts),
+        'related_posts': related_posts,
+        'total_comments': len(comments)
+    }
+    if comments.empty:
+        return stats
+
+    def ordered_counts(column):
+        # Most common first; ties keep first-seen order like Counter.most_common
+        counts = comments[column].astype(str).value_counts(sort=False)
+        return counts.sort_values(ascending=False, kind='stable')
+
+    stats['sentiment_counts'] = ordered_counts('sentiment')
+    stats['action_counts'] = ordered_counts('stock_action')
+    weights = comments['score'].clip(lower=1)
+    total_weight = weights.sum()
+    stats['weighted_sentiment'] = {
+        sentiment: (weights[comments['sentiment'] == sentiment].sum() / total_weight) * 100 if total_weight > 0 else 0
+        for sentiment in ['positive', 'neutral', 'negative']
+    }
+    stats['unique_opinions'] = int(comments['cluster_id'].nunique())
+    stats['top_comments'] = comments.sort_values('score', ascending=False, kind='stable').head(3)
+    stats['ticker_counts'] = ticker_counts(comments).head(5)
+    return stats
+
+def print_report(stats, search_term, search_date, subject_name=None):
+    """Print the perception report from compute_report_stats output."""
+    title = f"{subject_name} STOCK" if subject_name else search_term
     print("=" * 80)
-    print("📊 GOOGLE/ALPHABET STOCK - REDDIT PUBLIC PERCEPTION REPORT")
+    print(f"📊 {title.upper()} - REDDIT PUBLIC PERCEPTION REPORT")
     print("=" * 80)
-    
-    # Extract search info
-    search_term = data.get('search_parameters', {}).get('search_term', 'Unknown')
-    search_date = data.get('metadata', {}).get('search_executed_at_readable', 'Unknown')
-    
+
     print(f"\n🔍 Search Query: {search_term}")
     print(f"📅 Analysis Date: {search_date}")
-    print(f"📈 Posts Analyzed: {len(data.get('posts', []))}")
-    
-    # Collect all comments with sentiment data
-    all_comments = []
-    google_related_posts = 0
-    
-    for post in data.get('posts', []):
-        # Check if post is actually about Google/Alphabet stock
-        title = post.get('title', '').lower()
-        selftext = post.get('selftext', '').lower()
-        
-        is_google_related = any(keyword in title + ' ' + selftext for keyword in 
-                               ['google', 'alphabet', 'googl', 'goog', 'gemini'])
-        
-        if is_google_related:
-            google_related_posts += 1
-        
-        # Collect comments
-        for comment in post.get('comments', []):
-            if comment.get('sentiment') and comment.get('stock_action'):
-                comment_data = {
-                    'sentiment': comment.get('sentiment'),
-                    'stock_action': comment.get('stock_action'),
-                    'score': comment.get('score', 0),
-                    'summary': comment.get('summary', ''),
-                    'post_title': post.get('title', ''),
-                    'is_google_related': is_google_related
-                }
-                all_comments.append(comment_data)
-    
-    print(f"🎯 Google-Related Posts: {google_related_posts}")
-    print(f"💬 Total Comments Analyzed: {len(all_comments)}")
-    
-    if not all_comments:
+    print(f"📈 Posts Analyzed: {stats['posts_analyzed']}")
+
+    related_posts = stats['related_posts']
+    if subject_name:
+        print(f"🎯 {subject_name}-Related Posts: {related_posts}")
+    else:
+        print(f"🎯 Posts Mentioning Tickers: {related_posts}")
+    print(f"💬 Total Comments Analyzed: {stats['total_comments']}")
+
+    if not stats['total_comments']:
         print("\n❌ No sentiment data found in comments!")
         return
-    
+    if stats['unique_opinions'] < stats['total_comments']:
+        duplicates = stats['total_comments'] - stats['unique_opinions']
+        print(f"🧬 Unique Opinions: {stats['unique_opinions']} ({duplicates} near-duplicate comments)")
+
     # Sentiment Analysis
     print("\n" + "="*50)
     print("📈 SENTIMENT ANALYSIS")
     print("="*50)
-    
-    sentiments = [c['sentiment'] for c in all_comments]
-    sentiment_counts = Counter(sentiments)
-    
-    total_comments = len(all_comments)
-    for sentiment, count in sentiment_counts.most_common():
+
+    sentiment_counts = stats['sentiment_counts']
+    total_comments = stats['total_comments']
+    for sentiment, count in sentiment_counts.items():
         percentage = (count / total_comments) * 100
         print(f"{sentiment.upper():>10}: {count:>3} comments ({percentage:>5.1f}%)")
-    
+
     # Stock Action Analysis
     print("\n" + "="*50)
     print("📊 STOCK ACTION INDICATORS")
     print("="*50)
-    
-    actions = [c['stock_action'] for c in all_comments]
-    action_counts = Counter(actions)
-    
-    for action, count in action_counts.most_common():
+
+    action_counts = stats['action_counts']
+    for action, count in action_counts.items():
         percentage = (count / total_comments) * 100
         action_display = action.upper() if action != 'na' else 'NO ACTION'
         print(f"{action_display:>10}: {count:>3} comments ({percentage:>5.1f}%)")
-    
+
     # Weighted Sentiment (by comment score)
     print("\n" + "="*50)
     print("⚖️  WEIGHTED SENTIMENT (by upvotes)")
     print("="*50)
-    
-    weighted_sentiment = {'positive': 0, 'neutral': 0, 'negative': 0}
-    total_weight = 0
-    
-    for comment in all_comments:
-        score = max(comment['score'], 1)  # Minimum weight of 1
-        weighted_sentiment[comment['sentiment']] += score
-        total_weight += score
-    
-    for sentiment, weight in weighted_sentiment.items():
-        percentage = (weight / total_weight) * 100 if total_weight > 0 else 0
+
+    for sentiment, percentage in stats['weighted_sentiment'].items():
         print(f"{sentiment.upper():>10}: {percentage:>5.1f}% (weighted by upvotes)")
-    
+
     # Overall Assessment
     print("\n" + "="*50)
     print("🎯 OVERALL MARKET SENTIMENT ASSESSMENT")
     print("="*50)
-    
+
     positive_pct = (sentiment_counts.get('positive', 0) / total_comments) * 100
     negative_pct = (sentiment_counts.get('negative', 0) / total_comments) * 100
     neutral_pct = (sentiment_counts.get('neutral', 0) / total_comments) * 100
-    
+
     buy_pct = (action_counts.get('buy', 0) / total_comments) * 100
     sell_pct = (action_counts.get('sell', 0) / total_comments) * 100
     hold_pct = (action_counts.get('hold', 0) / total_comments) * 100
-    
+
     print(f"\n📊 Sentiment Breakdown:")
     print(f"   • Positive: {positive_pct:.1f}%")
-    print(f"   • Neutral:  {neutral_pct:.1f}%") 
+    print(f"   • Neutral:  {neutral_pct:.1f}%")
     print(f"   • Negative: {negative_pct:.1f}%")
-    
+
     print(f"\n💰 Investment Intent:")
     print(f"   • Buy signals:  {buy_pct:.1f}%")
     print(f"   • Hold signals: {hold_pct:.1f}%")
     print(f"   • Sell signals: {sell_pct:.1f}%")
-    
+
     # Market Mood Assessment
     print(f"\n🔮 MARKET MOOD:")
     if positive_pct > negative_pct + 20:
-        mood = "🚀 BULLISH - Strong positive sentiment toward Google/Alphabet stock"
+        mood = f"🚀 BULLISH - Strong positive sentiment toward {subject_name or search_term} stock"
     elif negative_pct > positive_pct + 20:
         mood = "🐻 BEARISH - Negative sentiment prevails"
     elif positive_pct > negative_pct:
@@ -135,50 +142,270 @@ def analyze_stock_sentiment(json_file):
         mood = "📉 CAUTIOUS - Slight negative bias"
     else:
         mood = "😐 NEUTRAL - Mixed opinions, no clear direction"
-    
+
     print(f"   {mood}")
-    
+
     # Key Insights
     print(f"\n💡 KEY INSIGHTS:")
-    
-    if google_related_posts == 0:
-        print("   • ⚠️  No posts directly discussing Google/Alphabet stock performance")
-        print("   • 📝 Comments mostly relate to Google products/services rather than investment")
-    else:
-        print(f"   • 🎯 {google_related_posts} out of {len(data.get('posts', []))} posts directly mention Google/Alphabet")
-    
+
+    if subject_name and related_posts == 0:
+        print(f"   • ⚠️  No posts directly discussing {subject_name} stock performance")
+        print(f"   • 📝 Comments mostly relate to {subject_name} products/services rather than investment")
+    elif subject_name:
+        print(f"   • 🎯 {related_posts} out of {stats['posts_analyzed']} posts directly mention {subject_name}")
+
     if buy_pct > sell_pct:
         print(f"   • 💚 More buy signals ({buy_pct:.1f}%) than sell signals ({sell_pct:.1f}%)")
     elif sell_pct > buy_pct:
         print(f"   • 🔴 More sell signals ({sell_pct:.1f}%) than buy signals ({buy_pct:.1f}%)")
-    
+
     if neutral_pct > 60:
         print("   • 😐 Majority of comments are neutral - limited strong opinions")
-    
+
+    if len(stats['ticker_counts']):
+        mentioned = ", ".join(f"{symbol} ({count})" for symbol, count in stats['ticker_counts'].items())
+        print(f"   • 🏷️  Most discussed tickers: {mentioned}")
+
     # Most upvoted comments
     print(f"\n🔥 TOP UPVOTED COMMENTS:")
-    top_comments = sorted(all_comments, key=lambda x: x['score'], reverse=True)[:3]
-    
-    for i, comment in enumerate(top_comments, 1):
+
+    for i, comment in enumerate(stats['top_comments'].to_dict('records'), 1):
         print(f"\n   {i}. Score: {comment['score']} | {comment['sentiment'].upper()} | {comment['stock_action'].upper()}")
         print(f"      Post: {comment['post_title'][:60]}...")
         print(f"      Summary: {comment['summary'][:80]}...")
-    
+
     print("\n" + "="*80)
     print("📋 DISCLAIMER: This analysis is based on a small sample of Reddit comments")
     print("and should not be used as the sole basis for investment decisions.")
     print("="*80)
 
+def print_ticker_reports(posts, comments, search_term, search_date, extractor, min_mentions=5, top_tickers=10):
+    """Print one perception report per ticker mentioned in at least `min_mentions` comments."""
+    counts = ticker_counts(comments)
+    selected = counts[counts >= min_mentions].head(top_tickers)
+    if selected.empty:
+        print(f"❌ No ticker is mentioned in at least {min_mentions} comments")
+        return
+
+    for symbol in selected.index:
+        ticker_comments = comments[comments['tickers'].map(lambda tickers: symbol in tickers)]
+        ticker_posts = posts[posts['post_id'].isin(ticker_comments['post_id'].astype(str))
+                             | posts['tickers'].map(lambda tickers: symbol in tickers)]
+        stats = compute_report_stats(ticker_posts, ticker_comments, [symbol])
+        print_report(stats, search_term, search_date, describe_tickers([symbol], extractor))
+        print()
+
+def print_thread_reports(comments, top_threads=5):
+    """Biggest reply threads of every post with their reply-weighted sentiment and controversy."""
+    print(f"\n🧵 TOP THREADS BY REPLIES:")
+    if comments['parent_id'].isna().all():
+        print("   • No parent ids in these results; crawl again to get reply threads")
+        return
+    for post_id, post_comments in comments.groupby('post_id', observed=True, sort=False):
+        records = post_comments[['comment_id', 'parent_id', 'body', 'score', 'sentiment']].to_dict('records')
+        # Only classified comments are in the table; replies to unclassified ones start their own thread
+        tree = CommentTree.from_comments({'id': record['comment_id'], 'parent_id': record['parent_id'],
+                                          'body': record['body'], 'score': record['score']} for record in records)
+        threads = [thread for thread in thread_stats(tree, [record['sentiment'] for record in records], top_threads)
+                   if thread['replies']]
+        if not threads:
+            continue
+        print(f"\n   Post: {post_comments['post_title'].iloc[0][:60]}...")
+        for i, thread in enumerate(threads, 1):
+            weighted = thread['reply_weighted_sentiment']
+            print(f"   {i}. {thread['replies']} replies | score {thread['thread_score']} | "
+                  f"reply-weighted sentiment {weighted if weighted is not None else 'n/a'} | "
+                  f"+{thread['positive']} -{thread['negative']} | controversy {thread['controversy']}")
+            print(f"      {thread['body'][:80]}...")
+
+def print_reports(posts, comments, search_term, search_date, extractor, by_ticker=False, min_mentions=5, top_tickers=10):
+    """Print the report for the searched ticker(s), or one report per mentioned ticker."""
+    if by_ticker:
+        print_ticker_reports(posts, comments, search_term, search_date, extractor, min_mentions, top_tickers)
+        return
+    # A search for "Google stock" is a report about GOOGL; daily threads have no single subject
+    subject = extractor.extract(search_term)
+    subject_name = describe_tickers(subject, extractor) if subject else None
+    print_report(compute_report_stats(posts, comments, subject), search_term, search_date, subject_name)
+
+def analyze_stock_sentiment(json_file, tickers=None, by_ticker=False, min_mentions=5, top_tickers=10, threads=0,
+                            metrics=None):
+    """Analyze Reddit sentiment and generate stock perception report."""
+    extractor = TickerExtractor(tickers) if tickers else default_extractor()
+
+    # Load the data (.json document, streamed .jsonl or columnar .cols)
+    with timed(metrics, 'load'):
+        data, columns = load_document_columns(json_file, extractor)
+        posts, comments = build_tables([columns])
+    if metrics is not None:
+        metrics.set('posts', len(posts))
+        metrics.set('comments', len(comments))
+
+    # Extract search info
+    search_term = data.get('search_parameters', {}).get('search_term', 'Unknown')
+    search_date = data.get('metadata', {}).get('search_executed_at_readable', 'Unknown')
+
+    with timed(metrics, 'report'):
+        print_reports(posts, comments, search_term, search_date, extractor, by_ticker, min_mentions, top_tickers)
+        if threads and not comments.empty:
+            print_thread_reports(comments, threads)
+
+def analyze_results(paths, group_by=('day',), json_out=None, workers=None, tickers=None,
+                    by_ticker=False, min_mentions=5, top_tickers=10, threads=0, metrics=None):
+    """Aggregate many result files: combined report, per-group table and optional JSON summary."""
+    extractor = TickerExtractor(tickers) if tickers else default_extractor()
+    with timed(metrics, 'load'):
+        posts, comments = load_tables(paths, workers=workers, tickers=tickers)
+    if metrics is not None:
+        metrics.set('files', len(paths))
+        metrics.set('posts', len(posts))
+        metrics.set('comments', len(comments))
+    if posts.empty:
+        print("❌ No result files loaded")
+        return None
+
+    print(f"📂 Files Analyzed: {len(paths)}")
+    return report_tables(posts, comments, paths, group_by, json_out, extractor, by_ticker, min_mentions, top_tickers,
+                         metrics, threads)
+
+def report_tables(posts, comments, sources, group_by=('day',), json_out=None, extractor=None,
+                  by_ticker=False, min_mentions=5, top_tickers=10, metrics=None, threads=0):
+    """Combined report, per-group table and optional JSON summary for already loaded posts/comments tables."""
+    extractor = extractor or default_extractor()
+    search_terms = sorted(posts['search_term'].dropna().unique())
+    dates = sorted(posts['date'].dropna().unique())
+    search_term = ", ".join(search_terms) if len(search_terms) <= 3 else f"{len(search_terms)} different searches"
+    search_date = f"{dates[0]} to {dates[-1]}" if dates else 'Unknown'
+    with timed(metrics, 'report'):
+        print_reports(posts, comments, search_term, search_date, extractor, by_ticker, min_mentions, top_tickers)
+        if threads and not comments.empty:
+            print_thread_reports(comments, threads)
+    if comments.empty:
+        return None
+
+    with timed(metrics, 'aggregate'):
+        grouped = aggregate_sentiment(comments, by=group_by)
+        overall = summary_records(aggregate_sentiment(comments, by=()))[0]
+    return report_breakdown(grouped, overall, sources, group_by, json_out, metrics)
+
+def report_breakdown(grouped, overall, sources, group_by=('day',), json_out=None, metrics=None):
+    """Print the per-group table and build (and optionally save) the JSON summary."""
+    print(f"\n📅 BREAKDOWN BY {' / '.join(key.upper() for key in group_by)}")
+    print("="*80)
+    for record in grouped.to_dict('records'):
+        label = " | ".join(str(record[GROUP_COLUMNS[key]])[:40] for key in group_by)
+        print(f"{label}: {record['comments']:>5} comments ({record['unique_opinions']:>5} unique) | "
+              f"+{record['positive_pct']:>5.1f}% ={record['neutral_pct']:>5.1f}% -{record['negative_pct']:>5.1f}% | "
+              f"weighted +{record['weighted_positive_pct']:>5.1f}% | "
+              f"buy {record['buy_pct']:>5.1f}% hold {record['hold_pct']:>5.1f}% sell {record['sell_pct']:>5.1f}%")
+
+    summary = {
+        'generated_at': datetime.now().isoformat(),
+        'files': list(sources),
+        'group_by': list(group_by),
+        'overall': overall,
+        'groups': summary_records(grouped),
+        'metrics': metrics.as_dict() if metrics is not None else None
+    }
+    if json_out:
+        with open(json_out, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        print(f"\n✅ Summary saved: {json_out}")
+    return summary
+
+def analyze_warehouse(url, group_by=('day',), json_out=None, since=None, until=None, tickers=None,
+                      by_ticker=False, min_mentions=5, top_tickers=10, threads=0, metrics=None):
+    """The aggregate report computed by the warehouse database instead of from loaded result files."""
+    extractor = TickerExtractor(tickers) if tickers else default_extractor()
+    engine = warehouse.create_warehouse_engine(url)
+    search_terms, dates, sources = warehouse.run_summary(engine, since, until)
+    if metrics is not None:
+        metrics.set('files', len(sources))
+    if not sources:
+        print("❌ No runs in the warehouse for this period")
+        return None
+    if threads:
+        print("⚠️  --threads needs the result files; it is ignored with --warehouse")
+
+    print(f"📂 Files Analyzed: {len(sources)}")
+    search_term = ", ".join(search_terms) if len(search_terms) <= 3 else f"{len(search_terms)} different searches"
+    search_date = f"{dates[0]} to {dates[-1]}" if dates else 'Unknown'
+    with timed(metrics, 'report'):
+        if by_ticker:
+            counts = warehouse.ticker_counts(engine, since, until)
+            selected = counts[counts >= min_mentions].head(top_tickers)
+            if selected.empty:
+                print(f"❌ No ticker is mentioned in at least {min_mentions} comments")
+            for symbol in selected.index:
+                stats = warehouse.report_stats(engine, [symbol], since, until, ticker=symbol)
+                print_report(stats, search_term, search_date, describe_tickers([symbol], extractor))
+                print()
+        else:
+            subject = extractor.extract(search_term)
+            subject_name = describe_tickers(subject, extractor) if subject else None
+            stats = warehouse.report_stats(engine, subject, since, until)
+            print_report(stats, search_term, search_date, subject_name)
+    with timed(metrics, 'aggregate'):
+        grouped = warehouse.aggregate_sentiment(engine, group_by, since, until)
+        overall = warehouse.aggregate_sentiment(engine, (), since, until)
+    if overall.empty:
+        return None
+    return report_breakdown(grouped, summary_records(overall)[0], sources, group_by, json_out, metrics)
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(description='Report Reddit sentiment from classified result files')
+    parser.add_argument('files', nargs='*', help='Classified result files (default: the Google sample)')
+    parser.add_argument('--aggregate', action='store_true',
+                        help='Aggregate several files (all *_summarized.json under --results-dir if none given)')
+    parser.add_argument('--results-dir', default='results', help='Folder searched in aggregate mode (default: results)')
+    parser.add_argument('--group-by', default='day',
+                        help=f"Comma-separated group keys: {', '.join(GROUP_COLUMNS)} (default: day)")
+    parser.add_argument('--json-out', help='Write the machine-readable summary to this file')
+    parser.add_argument('--workers', type=int, default=None, help='Processes used to load files (default: CPU count)')
+    parser.add_argument('--by-ticker', action='store_true',
+                        help='Print one report per ticker mentioned in the comments instead of one overall report')
+    parser.add_argument('--min-mentions', type=int, default=5,
+                        help='Minimum comments mentioning a ticker for its own report (default: 5)')
+    parser.add_argument('--top-tickers', type=int, default=10, help='Maximum number of per-ticker reports (default: 10)')
+    parser.add_argument('--tickers-file', help='JSON ticker dictionary merged over the built-in one')
+    parser.add_argument('--threads', type=int, default=0,
+                        help='Also list the N biggest reply threads per post with reply-weighted sentiment and '
+                             'controversy (needs results crawled with parent ids)')
+    parser.add_argument('--warehouse', metavar='URL',
+                        help='Aggregate in this warehouse database (see warehouse.py) instead of reading result files')
+    parser.add_argument('--since', help='With --warehouse: first result date to include (YYYY-MM-DD)')
+    parser.add_argument('--until', help='With --warehouse: last result date to include (YYYY-MM-DD)')
+    parser.add_argument('--metrics-out',
+                        help='Write stage timings and counts to this file (*.prom: Prometheus text format, otherwise JSON)')
+    return parser
+
 # Main execution
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        json_file = sys.argv[1]
-    else:
-        json_file = "results/google stock/reddit_google_stock_day_hot_summarized.json"
-    
+    args = create_argument_parser().parse_args()
+    metrics = RunMetrics('AI_analyzer')
+
     try:
-        analyze_stock_sentiment(json_file)
-    except FileNotFoundError:
-        print(f"❌ File not found: {json_file}")
+        tickers = load_ticker_dictionary(args.tickers_file) if args.tickers_file else None
+        ticker_options = dict(tickers=tickers, by_ticker=args.by_ticker, min_mentions=args.min_mentions,
+                              top_tickers=args.top_tickers, threads=args.threads, metrics=metrics)
+        if args.warehouse or args.aggregate or len(args.files) > 1:
+            group_by = tuple(key.strip() for key in args.group_by.split(',') if key.strip())
+            unknown = [key for key in group_by if key not in GROUP_COLUMNS]
+            if unknown:
+                print(f"❌ Unknown group key(s): {', '.join(unknown)}")
+                sys.exit(1)
+            if args.warehouse:
+                analyze_warehouse(args.warehouse, group_by, args.json_out, args.since, args.until, **ticker_options)
+            else:
+                paths = args.files or find_summarized_files(args.results_dir)
+                analyze_results(paths, group_by, args.json_out, args.workers, **ticker_options)
+        else:
+            json_file = args.files[0] if args.files else "results/google stock/reddit_google_stock_day_hot_summarized.json"
+            analyze_stock_sentiment(json_file, **ticker_options)
+    except FileNotFoundError as e:
+        print(f"❌ File not found: {e.filename}")
     except Exception as e:
         print(f"❌ Error: {e}")
+
+    if args.metrics_out:
+        print(f"\n📊 Metrics written to {metrics.write(args.metrics_out)}")
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Async OpenAI request pool with request-per-minute and token-per-minute limits.
+Runs many chat completions concurrently and retries 429/5xx responses with
+jittered exponential backoff.
+"""
+import asyncio
+import random
+import time
+
+import openai
+
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token) used to reserve TPM budget."""
+    return len(text) // 4 + 1
+
+
+class MinuteRateLimiter:
+    """Token bucket refilled continuously up to `per_minute` units."""
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self.capacity = float(per_minute)
+        self.available = float(per_minute)
+        self.updated = time.monotonic()
+        self.wait_seconds = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.per_minute / 60.0)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        """Wait until `amount` units are available and take them; returns the reservation for refund."""
+        # A single request larger than the bucket would never fit; let it drain the bucket instead
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.available >= amount:
+                    self.available -= amount
+                    return amount
+                delay = (amount - self.available) * 60.0 / self.per_minute
+                self.wait_seconds += delay
+                await asyncio.sleep(delay)
+
+    async def refund(self, amount, reservation=None):
+        """Give back units that were reserved but not used."""
+        if reservation is not None:
+            amount = min(amount, reservation)
+        if amount > 0:
+            self._refill()
+            self.available = min(self.capacity, self.available + amount)
+
+
+def _is_retryable(error):
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def _retry_after(error):
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class AsyncLLMPool:
+    """Bounded-concurrency chat completion pool sharing one RPM and one TPM limiter."""
+
+    def __init__(self, client, model="gpt-4o", temperature=0.3, concurrency=16,
+                 requests_per_minute=500, tokens_per_minute=150000, max_retries=6,
+                 base_backoff=1.0, max_backoff=60.0):
+        """
+        Args:
+            client: openai.AsyncOpenAI instance created with max_retries=0; the pool does the retrying,
+                and SDK retries on top would multiply attempts and bypass the rate limiters
+            model: Chat model name
+            temperature: Sampling temperature
+            concurrency: Maximum number of requests in flight
+            requests_per_minute: RPM limit of the API key
+            tokens_per_minute: TPM limit of the API key
+            max_retries: Retries after a 429 or 5xx before giving up
+            base_backoff: First backoff in seconds
+            max_backoff: Upper bound for a single backoff in seconds
+        """
+        self.client = client
+        self.model = model
+        self.temperature = temperature
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.request_limiter = MinuteRateLimiter(requests_per_minute)
+        self.token_limiter = MinuteRateLimiter(tokens_per_minute)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.calls = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    async def complete(self, prompt, max_tokens, response_format=None):
+        """
+        Send one single-message chat completion under the shared limits.
+
+        Args:
+            prompt: User message content
+            max_tokens: Completion token limit (also reserved against the TPM budget)
+            response_format: Optional response_format, e.g. {"type": "json_object"}
+
+        Returns:
+            Stripped content of the first choice
+        """
+        reserved = estimate_tokens(prompt) + max_tokens
+        attempt = 0
+        async with self._semaphore:
+            while True:
+                await self.request_limiter.acquire(1)
+                reservation = await self.token_limiter.acquire(reserved)
+                request = {
+                    'model': self.model,
+                    'messages': [{"role": "user", "content": prompt}],
+                    'temperature': self.temperature,
+                    'max_tokens': max_tokens
+                }
+                if response_format is not None:
+                    request['response_format'] = response_format
+                try:
+                    response = await self.client.chat.completions.create(**request)
+                except Exception as e:
+                    if not _is_retryable(e) or attempt >= self.max_retries:
+                        raise
+                    self.retries += 1
+                    delay = _retry_after(e)
+                    if delay is None:
+                        # Full jitter keeps many workers from retrying in lockstep
+                        delay = random.uniform(0, min(self.base_backoff * (2 ** attempt), self.max_backoff))
+                    attempt += 1
+                    await asyncio.sleep(delay)
+                    continue
+
+                self.calls += 1
+                usage = getattr(response, 'usage', None)
+                if usage is not None:
+                    self.prompt_tokens += usage.prompt_tokens
+                    self.completion_tokens += usage.completion_tokens
+                    await self.token_limiter.refund(reserved - usage.total_tokens, reservation)
+                return response.choices[0].message.content.strip()
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'retries': self.retries,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'rpm_wait_seconds': round(self.request_limiter.wait_seconds, 2),
+            'tpm_wait_seconds': round(self.token_limiter.wait_seconds, 2)
+        }
+
+
+async def run_bounded(items, worker, concurrency):
+    """
+    Run `await worker(item)` for every item with at most `concurrency` workers.
+
+    Exceptions from `worker` propagate; handle per-item errors inside it.
+    """
+    queue = asyncio.Queue()
+    for item in items:
+        queue.put_nowait(item)
+
+    async def consume():
+        while True:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await worker(item)
+
+    await asyncio.gather(*(consume() for _ in range(max(1, concurrency))))
@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+Sentiment-vs-price backtests.
+Joins per-ticker sentiment series built from classified results with local
+OHLC price CSVs, measures lagged correlations between sentiment and returns
+and sweeps simple threshold strategies over large parameter grids. Every
+grid is evaluated as NumPy arrays (combinations x holding periods x bars)
+instead of a Python loop per combination, and tickers run in parallel processes.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import dateutil.tz
+import numpy as np
+import pandas as pd
+
+from run_metrics import RunMetrics
+from sentiment_table import explode_tickers, find_summarized_files, load_tables
+from ticker_extraction import load_ticker_dictionary
+
+SENTIMENT_SCORES = {'positive': 1, 'neutral': 0, 'negative': -1}
+ACTION_SCORES = {'buy': 1, 'sell': -1}
+SIGNALS = ('net_sentiment', 'weighted_sentiment', 'net_action')
+DATE_COLUMNS = ('date', 'datetime', 'timestamp', 'time')
+CLOSE_COLUMNS = ('adj close', 'adj_close', 'adjclose', 'close')
+# Largest (combinations x holds x bars) block evaluated at once
+MAX_GRID_CELLS = 4_000_000
+
+
+# 📥 Inputs
+
+def find_price_files(prices_dir):
+    """{TICKER: path} for every <TICKER>.csv under `prices_dir`."""
+    return {os.path.splitext(os.path.basename(path))[0].upper(): path
+            for path in sorted(glob.glob(os.path.join(prices_dir, '*.csv')))}
+
+
+def load_prices(path, freq=None):
+    """
+    Read an OHLC CSV (Date/Datetime plus Close or Adj Close columns, any case) into bars.
+
+    Timestamps are bar starts; naive ones are taken as UTC, aware ones are
+    converted to UTC. `freq` (e.g. '1h', '1D') resamples finer bars first.
+
+    Returns:
+        DataFrame with open, high, low, close (and volume) on a sorted, naive-UTC DatetimeIndex
+    """
+    frame = pd.read_csv(path)
+    frame.columns = [column.strip().lower() for column in frame.columns]
+    date_column = next((column for column in DATE_COLUMNS if column in frame.columns), None)
+    close_column = next((column for column in CLOSE_COLUMNS if column in frame.columns), None)
+    if date_column is None or close_column is None:
+        raise ValueError(f"{path}: needs a date/datetime column and a close column, found {', '.join(frame.columns)}")
+
+    prices = pd.DataFrame({'close': pd.to_numeric(frame[close_column], errors='coerce')})
+    for column in ('open', 'high', 'low', 'volume'):
+        if column in frame.columns:
+            prices[column] = pd.to_numeric(frame[column], errors='coerce')
+    prices.index = pd.to_datetime(frame[date_column], utc=True).dt.tz_convert(None)
+    prices = prices[prices['close'] > 0]
+    prices = prices[~prices.index.duplicated(keep='last')].sort_index()
+    if freq:
+        rules = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}
+        prices = prices.resample(freq).agg({column: rules[column] for column in prices.columns}).dropna(subset=['close'])
+    return prices
+
+
+def comment_times(comments, tz=None):
+    """
+    Posting time of every comment as naive UTC, falling back to the result date for results without one.
+
+    The crawlers write created_utc as the crawl machine's local time without
+    an offset, so naive timestamps are read in `tz` (default: this machine's
+    zone) and converted; a wall-clock time that occurs twice is read as the
+    later one, which can only delay a comment's bar.
+    """
+    times = pd.to_datetime(comments['created_utc'], errors='coerce')
+    if times.dt.tz is None:
+        times = times.dt.tz_localize(tz or dateutil.tz.tzlocal(), ambiguous=False, nonexistent='shift_forward')
+    times = times.dt.tz_convert('UTC').dt.tz_localize(None)
+    fallback = pd.to_datetime(comments['date'].astype(object), errors='coerce')
+    return times.fillna(fallback)
+
+
+def bar_signals(comments, prices, tz=None):
+    """
+    Sentiment of one ticker's comments per price bar.
+
+    Every comment counts for the bar it was posted in (the last bar starting at
+    or before it), so weekend and after-hours comments belong to the previous
+    session; strategies trade a bar's signal after that bar closes. `tz` is
+    the zone the result files were written in (see comment_times).
+
+    Returns:
+        DataFrame on the price index with comments and the SIGNALS columns (NaN without comments)
+    """
+    bars = prices.index.to_numpy()
+    times = comment_times(comments, tz).to_numpy()
+    rows = np.searchsorted(bars, times, side='right') - 1
+    keep = (rows >= 0) & ~pd.isna(times)
+    rows = rows[keep]
+    weights = comments['score'].clip(lower=1).to_numpy(dtype=float)[keep]
+    sentiment = comments['sentiment'].astype(object).map(SENTIMENT_SCORES).fillna(0).to_numpy(dtype=float)[keep]
+    action = comments['stock_action'].astype(object).map(ACTION_SCORES).fillna(0).to_numpy(dtype=float)[keep]
+
+    size = len(bars)
+    counts = np.bincount(rows, minlength=size).astype(float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        signals = pd.DataFrame({
+            'comments': counts.astype(np.int64),
+            'net_sentiment': np.bincount(rows, sentiment, size) / counts,
+            'weighted_sentiment': np.bincount(rows, weights * sentiment, size) / np.bincount(rows, weights, size),
+            'net_action': np.bincount(rows, action, size) / counts
+        }, index=prices.index)
+    return signals
+
+
+# 📐 Vectorized evaluation
+
+def _take(values, index):
+    """values[index] with NaN wherever `index` falls outside the array."""
+    inside = (index >= 0) & (index < len(values))
+    return np.where(inside, values[np.clip(index, 0, len(values) - 1)], np.nan)
+
+
+def lagged_correlations(signal, log_close, lags):
+    """
+    Pearson correlation of signal[t] with the return of bar t + lag, for every lag at once.
+
+    Positive lags ask whether sentiment leads price, negative ones whether it follows it.
+
+    Returns:
+        DataFrame with lag, correlation and observations
+    """
+    lags = np.asarray(lags)
+    returns = np.diff(log_close, prepend=np.nan)
+    shifted = _take(returns, np.arange(len(signal))[None, :] + lags[:, None])
+    x = np.broadcast_to(signal, shifted.shape)
+    mask = ~np.isnan(x) & ~np.isnan(shifted)
+    n = mask.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.where(mask, x, 0).sum(axis=1) / n
+        mean_y = np.where(mask, shifted, 0).sum(axis=1) / n
+        dx = np.where(mask, x - mean_x[:, None], 0)
+        dy = np.where(mask, shifted - mean_y[:, None], 0)
+        correlation = (dx * dy).sum(axis=1) / np.sqrt((dx ** 2).sum(axis=1) * (dy ** 2).sum(axis=1))
+    return pd.DataFrame({'lag': lags, 'correlation': np.where(n > 2, correlation, np.nan), 'observations': n})
+
+
+def threshold_grid(signal, counts, log_close, long_thresholds, short_thresholds, holds, min_comments, delay=1,
+                   bars_per_year=252):
+    """
+    Evaluate every threshold strategy of a parameter grid on one signal.
+
+    A bar whose signal is above the long threshold (below the short threshold)
+    with at least min_comments comments opens a long (short) trade at the
+    close `delay` bars later, closed `hold` bars after that. Trades may overlap;
+    each is one unit of capital.
+
+    Args:
+        signal, counts: Per-bar signal (NaN without comments) and comment counts
+        log_close: Per-bar log close prices
+        long_thresholds, short_thresholds: Candidate thresholds (-inf in short_thresholds means long only)
+        holds: Holding periods in bars
+        min_comments: Candidate minimum comment counts per signal bar
+        delay: Bars between the signal bar and the entry close (1 = trade the next close)
+        bars_per_year: Annualization of the Sharpe ratio
+
+    Returns:
+        DataFrame with one row per (long, short, min_comments, hold) and its trades,
+        hit_rate, mean_return, sum_return and sharpe
+    """
+    long_grid, short_grid, min_grid = (np.asarray(values, dtype=float) for values in
+                                       np.meshgrid(long_thresholds, short_thresholds, min_comments, indexing='ij'))
+    valid = short_grid < long_grid
+    long_grid, short_grid, min_grid = long_grid[valid], short_grid[valid], min_grid[valid]
+    holds = np.asarray(holds)
+
+    entry = np.arange(len(signal)) + delay
+    forward = _take(log_close, entry[None, :] + holds[:, None]) - _take(log_close, entry)[None, :]
+    simple = np.expm1(forward)
+
+    columns = {name: [] for name in ('trades', 'hit_rate', 'mean_return', 'sum_return', 'sharpe')}
+    chunk = max(1, MAX_GRID_CELLS // max(1, len(holds) * len(signal)))
+    for start in range(0, len(long_grid), chunk):
+        stop = start + chunk
+        enough = counts[None, :] >= min_grid[start:stop, None]
+        with np.errstate(invalid='ignore'):
+            direction = ((signal[None, :] > long_grid[start:stop, None]) & enough).astype(np.int8) \
+                - ((signal[None, :] < short_grid[start:stop, None]) & enough).astype(np.int8)
+        returns = direction[:, None, :] * simple[None, :, :]
+        traded = (direction[:, None, :] != 0) & ~np.isnan(simple)[None, :, :]
+        returns = np.where(traded, returns, 0.0)
+        trades = traded.sum(axis=2)
+        total = returns.sum(axis=2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / trades
+            std = np.sqrt(np.maximum((returns ** 2).sum(axis=2) / trades - mean ** 2, 0) * trades / (trades - 1))
+            sharpe = mean / std * np.sqrt(bars_per_year / holds[None, :])
+        columns['trades'].append(trades)
+        columns['hit_rate'].append(((returns > 0) & traded).sum(axis=2) / np.maximum(trades, 1))
+        columns['mean_return'].append(mean)
+        columns['sum_return'].append(total)
+        columns['sharpe'].append(np.where(trades > 1, sharpe, np.nan))
+
+    combos = len(long_grid)
+    result = pd.DataFrame({
+        'long_threshold': np.repeat(long_grid, len(holds)),
+        'short_threshold': np.repeat(np.where(np.isinf(short_grid), np.nan, short_grid), len(holds)),
+        'min_comments': np.repeat(min_grid, len(holds)).astype(np.int64),
+        'hold': np.tile(holds, combos)
+    })
+    for name, blocks in columns.items():
+        result[name] = np.concatenate(blocks).reshape(-1) if blocks else np.array([])
+    return result
+
+
+def bars_per_year(index):
+    """Bars per trading year of a price index: 252 sessions times the bars per session."""
+    if len(index) < 2:
+        return 252
+    return 252 * len(index) / max(1, index.normalize().nunique())
+
+
+def backtest_ticker(task):
+    """
+    Correlations and strategy grid for one ticker (ProcessPoolExecutor entry point).
+
+    Args:
+        task: Dictionary with ticker, comments (that ticker's rows), prices and the grid settings
+
+    Returns:
+        Dictionary with ticker, bars, signal_bars, buy_and_hold, correlations and grid DataFrames
+    """
+    prices = task['prices']
+    signals = bar_signals(task['comments'], prices, task.get('results_tz'))
+    log_close = np.log(prices['close'].to_numpy(dtype=float))
+    annualization = bars_per_year(prices.index)
+    counts = signals['comments'].to_numpy()
+
+    correlations, grids = [], []
+    for name in task['signals']:
+        signal = signals[name].to_numpy(dtype=float)
+        correlations.append(lagged_correlations(signal, log_close, task['lags']).assign(signal=name))
+        grids.append(threshold_grid(signal, counts, log_close, task['long_thresholds'], task['short_thresholds'],
+                                    task['holds'], task['min_comments'], task['delay'], annualization)
+                     .assign(signal=name))
+    grid = pd.concat(grids, ignore_index=True)
+    grid.insert(0, 'ticker', task['ticker'])
+    correlation = pd.concat(correlations, ignore_index=True)
+    correlation.insert(0, 'ticker', task['ticker'])
+    return {
+        'ticker': task['ticker'],
+        'bars': len(prices),
+        'signal_bars': int((counts > 0).sum()),
+        'buy_and_hold': float(np.expm1(log_close[-1] - log_close[0])) if len(log_close) else None,
+        'correlations': correlation,
+        'grid': grid
+    }
+
+
+def run_backtests(comments, price_files, settings, freq=None, workers=None):
+    """
+    Backtest every ticker that has comments and a price file.
+
+    Args:
+        comments: Comments DataFrame from sentiment_table.load_tables
+        price_files: {TICKER: csv path}
+        settings: Grid settings (signals, lags, long_thresholds, short_thresholds, holds, min_comments, delay)
+            and results_tz, the zone comment timestamps were written in (None: this machine's)
+        freq: Resample prices to this bar size first
+        workers: Processes across tickers (default: one per CPU; 1 runs in-process)
+
+    Returns:
+        List of backtest_ticker results, most commented ticker first
+    """
+    exploded = explode_tickers(comments)
+    mentions = exploded['ticker'].value_counts()
+    tasks = []
+    for ticker in [ticker for ticker in mentions.index if ticker in price_files]:
+        prices = load_prices(price_files[ticker], freq)
+        if len(prices) < 2:
+            continue
+        tasks.append(dict(settings, ticker=ticker, prices=prices,
+                          comments=exploded[exploded['ticker'] == ticker].reset_index(drop=True)))
+    if workers == 1 or len(tasks) <= 1:
+        return [backtest_ticker(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(backtest_ticker, tasks))
+
+
+# 🖨️ Reporting
+
+def parse_grid(text):
+    """
+    '0:0.5:0.05,0.8' -> array of values; start:stop:step ranges include stop.
+    'none' stands for -inf (no short side).
+    """
+    values = []
+    for part in text.split(','):
+        part = part.strip().lower()
+        if not part:
+            continue
+        if part == 'none':
+            values.append(-np.inf)
+        elif ':' in part:
+            start, stop, step = (float(value) for value in part.split(':'))
+            values.extend(np.round(np.arange(start, stop + step / 2, step), 10))
+        else:
+            values.append(float(part))
+    # + 0.0 turns the -0.0 of rounded ranges into 0.0
+    return np.unique(np.asarray(values, dtype=float)) + 0.0
+
+
+def best_strategies(grid, top=5, min_trades=10):
+    """Highest Sharpe strategies with at least `min_trades` trades."""
+    eligible = grid[(grid['trades'] >= min_trades) & grid['sharpe'].notna()]
+    return eligible.sort_values('sharpe', ascending=False, kind='stable').head(top)
+
+
+def print_backtest(result, top=5, min_trades=10):
+    print("=" * 80)
+    buy_and_hold = result['buy_and_hold']
+    print(f"📈 {result['ticker']}: {result['bars']} bars, {result['signal_bars']} with comments | "
+          f"buy & hold {buy_and_hold * 100:+.1f}%")
+    print("=" * 80)
+    print("\n🔗 CORRELATION WITH THE RETURN `lag` BARS LATER:")
+    table = result['correlations'].pivot(index='lag', columns='signal', values='correlation')
+    print("   lag  " + "  ".join(f"{name:>18}" for name in table.columns))
+    for lag, row in table.iterrows():
+        print(f"   {lag:>3}  " + "  ".join(f"{value:>18.3f}" if pd.notna(value) else f"{'n/a':>18}" for value in row))
+
+    best = best_strategies(result['grid'], top, min_trades)
+    print(f"\n🏆 BEST OF {len(result['grid'])} THRESHOLD STRATEGIES (at least {min_trades} trades):")
+    if best.empty:
+        print("   • Not enough signal bars for any strategy")
+    for record in best.to_dict('records'):
+        short = f"< {record['short_threshold']:+.2f}" if pd.notna(record['short_threshold']) else "none"
+        print(f"   • {record['signal']}: long > {record['long_threshold']:+.2f}, short {short}, "
+              f"min {record['min_comments']} comments, hold {record['hold']} | {record['trades']} trades, "
+              f"hit {record['hit_rate'] * 100:.0f}%, mean {record['mean_return'] * 100:+.2f}%, "
+              f"Sharpe {record['sharpe']:.2f}")
+    print()
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(
+        description='Backtest Reddit sentiment against local price data',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Price files are <TICKER>.csv with a Date (or Datetime) column and Close or Adj Close,
+e.g. a Yahoo Finance export. Examples:
+  python backtest.py --prices-dir prices
+  python backtest.py --prices-dir prices/hourly --freq 1h --holds 1,2,4,8 --lags=-4:4:1
+  python backtest.py --prices-dir prices --long-thresholds 0:0.6:0.02 --short-thresholds none,-0.6:0:0.02 --csv-out grid.csv
+        """
+    )
+    parser.add_argument('files', nargs='*', help='Classified result files (default: every *_summarized result under --results-dir)')
+    parser.add_argument('--results-dir', default='results', help='Folder searched for results (default: results)')
+    parser.add_argument('--prices-dir', default='prices', help='Folder with <TICKER>.csv price files (default: prices)')
+    parser.add_argument('--tickers', help='Comma-separated tickers to test (default: every ticker with a price file)')
+    parser.add_argument('--freq', help='Resample prices to this bar size first, e.g. 1h or 1D (default: as in the files)')
+    parser.add_argument('--signals', default=','.join(SIGNALS), help=f"Signals to test (default: {','.join(SIGNALS)})")
+    parser.add_argument('--lags', default='-5:5:1', help='Correlation lags in bars; write --lags=-2:2:1 for ranges starting below zero (default: -5:5:1)')
+    parser.add_argument('--long-thresholds', default='-0.2:0.6:0.05', help='Long entry thresholds (default: -0.2:0.6:0.05)')
+    parser.add_argument('--short-thresholds', default='none,-0.6:0.2:0.05',
+                        help="Short entry thresholds, 'none' for long only (default: none,-0.6:0.2:0.05)")
+    parser.add_argument('--holds', default='1,2,3,5,10', help='Holding periods in bars (default: 1,2,3,5,10)')
+    parser.add_argument('--min-comments', default='1,5,10,25', help='Minimum comments per signal bar (default: 1,5,10,25)')
+    parser.add_argument('--delay', type=int, default=1,
+                        help='Bars between a signal bar and the entry close (default: 1; 0 trades on the same close)')
+    parser.add_argument('--min-trades', type=int, default=10, help='Minimum trades for a reported strategy (default: 10)')
+    parser.add_argument('--top', type=int, default=5, help='Strategies listed per ticker (default: 5)')
+    parser.add_argument('--results-tz',
+                        help="Time zone of the machine that crawled the results, e.g. America/New_York (default: this machine's)")
+    parser.add_argument('--workers', type=int, default=None, help='Processes across tickers and for loading (default: CPU count)')
+    parser.add_argument('--tickers-file', help='JSON ticker dictionary merged over the built-in one')
+    parser.add_argument('--json-out', help='Write correlations and best strategies per ticker to this file')
+    parser.add_argument('--csv-out', help='Write every evaluated strategy to this CSV file')
+    parser.add_argument('--metrics-out', help='Write run metrics to this file (*.prom: Prometheus text format, otherwise JSON)')
+    return parser
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    metrics = RunMetrics('backtest')
+    signals = [name.strip() for name in args.signals.split(',') if name.strip()]
+    unknown = [name for name in signals if name not in SIGNALS]
+    if unknown:
+        sys.exit(f"❌ Unknown signal(s): {', '.join(unknown)} (choose from {', '.join(SIGNALS)})")
+    if args.delay < 0:
+        sys.exit("❌ --delay cannot be negative")
+
+    price_files = find_price_files(args.prices_dir)
+    if args.tickers:
+        wanted = {ticker.strip().upper() for ticker in args.tickers.split(',') if ticker.strip()}
+        price_files = {ticker: path for ticker, path in price_files.items() if ticker in wanted}
+    if not price_files:
+        sys.exit(f"❌ No <TICKER>.csv price files in {args.prices_dir}")
+
+    paths = args.files or find_summarized_files(args.results_dir)
+    tickers = load_ticker_dictionary(args.tickers_file) if args.tickers_file else None
+    with metrics.stage('load'):
+        _, comments = load_tables(paths, workers=args.workers, tickers=tickers)
+    if comments.empty:
+        sys.exit("❌ No classified comments in the result files")
+    metrics.set('files', len(paths))
+    metrics.set('comments', len(comments))
+
+    settings = {
+        'signals': signals, 'lags': parse_grid(args.lags).astype(np.int64),
+        'long_thresholds': parse_grid(args.long_thresholds), 'short_thresholds': parse_grid(args.short_thresholds),
+        'holds': parse_grid(args.holds).astype(np.int64), 'min_comments': parse_grid(args.min_comments),
+        'delay': args.delay, 'results_tz': args.results_tz
+    }
+    with metrics.stage('backtest'):
+        results = run_backtests(comments, price_files, settings, args.freq, args.workers)
+    if not results:
+        sys.exit("❌ No ticker has both classified comments and a price file")
+    strategies = sum(len(result['grid']) for result in results)
+    metrics.set('tickers', len(results))
+    metrics.set('strategies', strategies)
+
+    print(f"📂 {len(paths)} result file(s), {len(comments)} comments | {len(results)} ticker(s) with prices | "
+          f"{strategies} strategies evaluated")
+    for result in results:
+        print_backtest(result, args.top, args.min_trades)
+
+    if args.csv_out:
+        pd.concat([result['grid'] for result in results], ignore_index=True).to_csv(args.csv_out, index=False)
+        print(f"✅ Strategy grid saved: {args.csv_out}")
+    if args.json_out:
+        summary = {
+            'generated_at': datetime.now().isoformat(),
+            'files': paths,
+            'settings': {key: [None if np.isinf(item) else item for item in value.tolist()]
+                         if isinstance(value, np.ndarray) else value for key, value in settings.items()},
+            'tickers': [{
+                'ticker': result['ticker'], 'bars': result['bars'], 'signal_bars': result['signal_bars'],
+                'buy_and_hold': result['buy_and_hold'],
+                'correlations': result['correlations'].astype(object).where(result['correlations'].notna(), None)
+                .to_dict('records'),
+                'best_strategies': best_strategies(result['grid'], args.top, args.min_trades).astype(object)
+                .where(lambda frame: frame.notna(), None).to_dict('records')
+            } for result in results],
+            'metrics': metrics.as_dict()
+        }
+        with open(args.json_out, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False, default=float)
+        print(f"✅ Summary saved: {args.json_out}")
+    metrics.print_report()
+    if args.metrics_out:
+        print(f"📊 Metrics written to {metrics.write(args.metrics_out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,876 @@
+#!/usr/bin/env python3
+"""
+Offline stand-ins for benchmarking the pipeline without network access.
+A synthetic comment thread generator, a local HTTP server answering the
+Reddit endpoints PRAW and the raw engine use, a fake OpenAI-compatible
+chat completions server with configurable latency and rate limits, a
+small in-memory Redis speaking the wire protocol, and a recorder/replayer
+that turns HTTP traffic into fixture files for tests. Servers
+run in a child process so their work does not show up in the measured
+wall time and memory of the stage under test.
+"""
+import gzip
+import json
+import multiprocessing
+import random
+import re
+import socketserver
+import threading
+import time
+import zlib
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import requests
+
+WORDS = (
+    "calls puts moon tendies yolo bagholder dip rally earnings guidance squeeze short long theta "
+    "market open close green red print bleed pump dump fed rates cpi inflation chart support "
+    "resistance breakout volume options expiry strike premium hedge rotate cash position"
+).split()
+TICKER_WORDS = ["$SPY", "SPY", "QQQ", "TSLA", "Tesla", "NVDA", "Nvidia", "AAPL", "GOOGL", "AMZN", "PLTR"]
+MEME_BODIES = ["🚀🚀🚀", "This is the way", "Sir, this is a Wendy's", "[deleted]", "lol", "🌈🐻"]
+
+SENTIMENTS = ("positive", "neutral", "negative")
+ACTIONS = ("buy", "sell", "hold", "NA")
+
+
+class SyntheticThread:
+    """One generated submission with a comment tree of configurable size and depth."""
+
+    def __init__(self, submission_id="bench1", num_comments=2000, max_depth=8, top_level_ratio=0.3,
+                 duplicate_ratio=0.1, title="Daily Discussion Thread for June 13, 2025", seed=0):
+        """
+        Args:
+            submission_id: Base36 id of the submission
+            num_comments: Total number of comments in the tree
+            max_depth: Deepest comment level (1 = only top-level comments)
+            top_level_ratio: Share of comments that reply to the submission itself
+            duplicate_ratio: Share of comments that copy an earlier body (spam, memes)
+            title: Submission title
+            seed: Random seed; the same arguments always give the same thread
+        """
+        rng = random.Random(f"{seed}:{submission_id}")
+        self.id = submission_id
+        self.title = title
+        self.created_utc = 1749820000.0
+        self.ids = [f"{submission_id}c{index:x}" for index in range(num_comments)]
+        self.parent = []
+        self.depth = []
+        self.children = {None: []}
+        self.bodies = []
+        self.scores = []
+
+        for index in range(num_comments):
+            parent = None
+            if index and rng.random() >= top_level_ratio:
+                parent = rng.randrange(index)
+                # Climb until the reply stays within max_depth
+                while parent is not None and self.depth[parent] >= max_depth:
+                    parent = self.parent[parent]
+            self.parent.append(parent)
+            self.depth.append(1 if parent is None else self.depth[parent] + 1)
+            self.children.setdefault(parent, []).append(index)
+            self.children[index] = []
+
+            if self.bodies and rng.random() < duplicate_ratio:
+                body = rng.choice(self.bodies[-200:])
+            elif rng.random() < 0.1:
+                body = rng.choice(MEME_BODIES)
+            else:
+                words = rng.choices(WORDS, k=rng.randint(4, 40))
+                words.insert(rng.randrange(len(words)), rng.choice(TICKER_WORDS))
+                body = " ".join(words)
+            self.bodies.append(body)
+            self.scores.append(int(rng.paretovariate(1.2)) - rng.randint(0, 3))
+
+        self.index = {comment_id: index for index, comment_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def submission_data(self, subreddit="wallstreetbets"):
+        """Raw t3 data of the submission."""
+        permalink = f"/r/{subreddit}/comments/{self.id}/{re.sub(r'[^a-z0-9]+', '_', self.title.lower())}/"
+        return {
+            'id': self.id,
+            'name': f"t3_{self.id}",
+            'title': self.title,
+            'author': "wsbapp",
+            'subreddit': subreddit,
+            'subreddit_name_prefixed': f"r/{subreddit}",
+            'score': 350,
+            'upvote_ratio': 0.85,
+            'num_comments': len(self),
+            'created_utc': self.created_utc,
+            'url': f"https://www.reddit.com{permalink}",
+            'permalink': permalink,
+            'selftext': "Your daily trading discussion thread. Please keep the shitposting to a minimum.",
+            'is_self': True,
+            'over_18': False,
+            'spoiler': False,
+            'locked': False,
+            'distinguished': None,
+            'stickied': True
+        }
+
+    def comment_data(self, index, replies="", subreddit="wallstreetbets"):
+        """Raw t1 data of comment `index`."""
+        comment_id = self.ids[index]
+        parent = self.parent[index]
+        return {
+            'id': comment_id,
+            'name': f"t1_{comment_id}",
+            'author': f"user{zlib.crc32(comment_id.encode()) % 5000}",
+            'body': self.bodies[index],
+            'score': self.scores[index],
+            'created_utc': self.created_utc + 5 * index,
+            'permalink': f"/r/{subreddit}/comments/{self.id}/_/{comment_id}/",
+            'is_submitter': False,
+            'distinguished': None,
+            'edited': False,
+            'parent_id': f"t3_{self.id}" if parent is None else f"t1_{self.ids[parent]}",
+            'link_id': f"t3_{self.id}",
+            'subreddit': subreddit,
+            'depth': self.depth[index] - 1,
+            'replies': replies
+        }
+
+    def descendant_count(self, index):
+        count, stack = 0, list(self.children[index])
+        while stack:
+            count += 1
+            stack.extend(self.children[stack.pop()])
+        return count
+
+
+def _listing(children):
+    return {'kind': 'Listing', 'data': {'after': None, 'before': None, 'dist': len(children), 'children': children}}
+
+
+class RedditStandIn:
+    """
+    Answers the Reddit endpoints used by a search plus a full comment crawl.
+
+    The first /comments/{id} page renders at most `listing_limit` comments and
+    `render_depth` levels like Reddit does; everything else is reachable only
+    through "more" objects of at most `more_fanout` ids, resolved with
+    /api/morechildren, and "continue this thread" links below `render_depth`.
+    """
+
+    def __init__(self, threads, subreddit="wallstreetbets", more_fanout=100, render_depth=10,
+                 requests_per_window=100000, window_seconds=600, latency=0.0, live_rate=0.0):
+        """
+        Args:
+            threads: SyntheticThread objects served by the stand-in
+            subreddit: Subreddit the threads belong to
+            more_fanout: Maximum child ids per "more" object
+            render_depth: Comment levels rendered before a "continue this thread" link
+            requests_per_window: Quota announced in the x-ratelimit-* headers (429 once spent)
+            window_seconds: Length of the rate-limit window
+            latency: Seconds added to every response
+            live_rate: Comments per second that "get posted" to /r/{sub}/comments after the
+                server starts (0: every comment is visible at once)
+        """
+        self.threads = {thread.id: thread for thread in threads}
+        self.subreddit = subreddit
+        self.more_fanout = more_fanout
+        self.render_depth = render_depth
+        self.requests_per_window = requests_per_window
+        self.window_seconds = window_seconds
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._window_start = time.time()
+        self._used = 0
+        self.calls = {}
+        self.bytes_sent = 0
+        self.throttled = 0
+        self.live_rate = live_rate
+        self._live_start = time.time()
+        # Threads interleaved in posting order, as the live comment stream sees them
+        self._live_order = sorted(((index, thread) for thread in threads for index in range(len(thread))),
+                                  key=lambda entry: entry[0])
+
+    # Rendering
+
+    def _more(self, thread, indices, parent):
+        things = []
+        parent_id = f"t3_{thread.id}" if parent is None else f"t1_{thread.ids[parent]}"
+        for start in range(0, len(indices), self.more_fanout):
+            chunk = indices[start:start + self.more_fanout]
+            things.append({'kind': 'more', 'data': {
+                'id': thread.ids[chunk[0]],
+                'name': f"t1_{thread.ids[chunk[0]]}",
+                'parent_id': parent_id,
+                'count': sum(1 + thread.descendant_count(index) for index in chunk),
+                'depth': 0 if parent is None else thread.depth[parent],
+                'children': [thread.ids[index] for index in chunk]
+            }})
+        return things
+
+    def _continue_thread(self, thread, parent):
+        return {'kind': 'more', 'data': {
+            'id': '_', 'name': 't1__', 'parent_id': f"t1_{thread.ids[parent]}",
+            'count': 0, 'depth': thread.depth[parent], 'children': []
+        }}
+
+    def _render(self, thread, indices, parent, level, budget):
+        """Render `indices` and their replies depth-first until the comment budget is spent."""
+        things, leftover = [], []
+        for index in indices:
+            if budget[0] <= 0:
+                leftover.append(index)
+                continue
+            budget[0] -= 1
+            replies = ""
+            children = thread.children[index]
+            if children and level + 1 >= self.render_depth:
+                replies = _listing([self._continue_thread(thread, index)])
+            elif children:
+                replies = _listing(self._render(thread, children, index, level + 1, budget))
+            things.append({'kind': 't1', 'data': thread.comment_data(index, replies, self.subreddit)})
+        return things + self._more(thread, leftover, parent)
+
+    # Endpoints
+
+    def search(self, params):
+        limit = int(params.get('limit', 25) or 25)
+        posts = [{'kind': 't3', 'data': thread.submission_data(self.subreddit)}
+                 for thread in list(self.threads.values())[:limit]]
+        return _listing(posts)
+
+    def comments(self, submission_id, params, focus=None):
+        thread = self.threads.get(submission_id)
+        if thread is None:
+            return None
+        budget = [int(params.get('limit') or 200)]
+        if focus is None:
+            comments = self._render(thread, thread.children[None], None, 0, budget)
+        else:
+            index = thread.index.get(focus)
+            if index is None:
+                return None
+            comments = self._render(thread, [index], thread.parent[index], 0, [max(budget[0], 1)])[:1]
+        return [_listing([{'kind': 't3', 'data': thread.submission_data(self.subreddit)}]), _listing(comments)]
+
+    def _live_visible(self):
+        if not self.live_rate:
+            return len(self._live_order)
+        return min(len(self._live_order), int((time.time() - self._live_start) * self.live_rate))
+
+    def comment_stream(self, params):
+        """Newest comments of the subreddit; with `before`, the ones posted right after it (oldest first page)."""
+        visible = self._live_visible()
+        limit = min(int(params.get('limit') or 25), 100)
+        start = max(visible - limit, 0)
+        before = params.get('before')
+        if before:
+            names = (f"t1_{thread.ids[index]}" for index, thread in self._live_order[:visible])
+            position = next((position for position, name in enumerate(names) if name == before), None)
+            if position is not None:
+                start = position + 1
+        things = []
+        for position in range(start, min(start + limit, visible)):
+            index, thread = self._live_order[position]
+            data = thread.comment_data(index, "", self.subreddit)
+            if self.live_rate:
+                data['created_utc'] = self._live_start + position / self.live_rate
+            data.update(link_title=thread.title, link_author="wsbapp",
+                        link_permalink=f"https://www.reddit.com/r/{self.subreddit}/comments/{thread.id}/")
+            things.append({'kind': 't1', 'data': data})
+        return _listing(list(reversed(things)))
+
+    def morechildren(self, params):
+        thread = self.threads.get(str(params.get('link_id', ''))[3:])
+        if thread is None:
+            return None
+        things = []
+        for comment_id in str(params.get('children', '')).split(','):
+            index = thread.index.get(comment_id)
+            if index is None:
+                continue
+            things.append({'kind': 't1', 'data': thread.comment_data(index, "", self.subreddit)})
+            things.extend(self._more(thread, thread.children[index], index))
+        return {'json': {'errors': [], 'data': {'things': things}}}
+
+    def access_token(self):
+        return {'access_token': 'bench-token', 'token_type': 'bearer', 'expires_in': 86400, 'scope': '*'}
+
+    # HTTP plumbing
+
+    def rate_limit(self, endpoint):
+        """Count one call and return (allowed, headers)."""
+        with self._lock:
+            now = time.time()
+            if now - self._window_start >= self.window_seconds:
+                self._window_start, self._used = now, 0
+            allowed = self._used < self.requests_per_window
+            if allowed:
+                self._used += 1
+                self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+            else:
+                self.throttled += 1
+            headers = {
+                'x-ratelimit-used': str(self._used),
+                'x-ratelimit-remaining': str(self.requests_per_window - self._used),
+                'x-ratelimit-reset': str(max(int(self._window_start + self.window_seconds - now), 1))
+            }
+        return allowed, headers
+
+    def route(self, method, path, params):
+        """Return (endpoint name, JSON payload or None for 404)."""
+        path = path.rstrip('/')
+        if path.endswith('.json'):
+            path = path[:-5]
+        if path == '/api/v1/access_token':
+            return 'access_token', self.access_token()
+        if path == '/api/morechildren':
+            return 'morechildren', self.morechildren(params)
+        if path.endswith('/search'):
+            return 'search', self.search(params)
+        if re.fullmatch(r'/r/\w+/comments', path):
+            return 'comment_stream', self.comment_stream(params)
+        if re.fullmatch(r'/r/\w+/new', path):
+            return 'submission_stream', self.search(params)
+        match = re.fullmatch(r'(?:/r/\w+)?/comments/(\w+)(?:/[^/]*)?(?:/(\w+))?', path)
+        if match:
+            endpoint = 'continue_thread' if match.group(2) else 'comments'
+            return endpoint, self.comments(match.group(1), params, match.group(2))
+        return 'unknown', None
+
+    def stats(self):
+        with self._lock:
+            return {'calls': dict(self.calls), 'total_calls': sum(self.calls.values()),
+                    'throttled': self.throttled, 'bytes_sent': self.bytes_sent}
+
+    def handle(self, method, path, params):
+        """Serve one request; returns (status, headers, body bytes)."""
+        if path == '/_bench/stats':
+            return 200, {}, json.dumps(self.stats()).encode()
+        if self.latency:
+            time.sleep(self.latency)
+        endpoint, payload = self.route(method, path, params)
+        allowed, headers = self.rate_limit(endpoint)
+        if not allowed:
+            headers['retry-after'] = headers['x-ratelimit-reset']
+            return 429, headers, b'{"message": "Too Many Requests", "error": 429}'
+        if payload is None:
+            return 404, headers, b'{"message": "Not Found", "error": 404}'
+        body = json.dumps(payload).encode()
+        with self._lock:
+            self.bytes_sent += len(body)
+        return 200, headers, body
+
+
+def fixture_key(method, path, params):
+    """Request identity used by RecordingStandIn / ReplayStandIn: method, path without .json, sorted params."""
+    path = path.rstrip('/')
+    if path.endswith('.json'):
+        path = path[:-5]
+    return f"{method} {path}?{urlencode(sorted((key, str(value)) for key, value in params.items()))}"
+
+
+class RecordingStandIn:
+    """Wraps another stand-in and keeps every successful response by fixture_key."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.responses = {}
+
+    def handle(self, method, path, params):
+        status, headers, body = self.inner.handle(method, path, params)
+        if status == 200 and path != '/_bench/stats':
+            self.responses[fixture_key(method, path, params)] = json.loads(body)
+        return status, headers, body
+
+    def save(self, path):
+        """Write the recorded responses as (gzipped, for a .gz path) JSON."""
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'wt', encoding='utf-8') as f:
+            json.dump(self.responses, f, sort_keys=True, separators=(',', ':'))
+
+
+class ReplayStandIn:
+    """
+    Serves responses recorded by RecordingStandIn.
+
+    A request that was not recorded gets a 404, so a client that starts
+    asking for something else fails loudly instead of silently diverging.
+    """
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = {}
+        self.missing = []
+        # Every request received, as (method, path, params)
+        self.requests = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path):
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def stats(self):
+        with self._lock:
+            return {'calls': dict(self.calls), 'total_calls': sum(self.calls.values()), 'throttled': 0,
+                    'missing': list(self.missing)}
+
+    def handle(self, method, path, params):
+        if path == '/_bench/stats':
+            return 200, {}, json.dumps(self.stats()).encode()
+        key = fixture_key(method, path, params)
+        payload = self.responses.get(key)
+        with self._lock:
+            self.requests.append((method, path, dict(params)))
+            if payload is None:
+                self.missing.append(key)
+            else:
+                self.calls[key.split('?')[0]] = self.calls.get(key.split('?')[0], 0) + 1
+        if payload is None:
+            return 404, {}, b'{"message": "Not Found", "error": 404}'
+        return 200, {}, json.dumps(payload).encode()
+
+
+class OpenAIStandIn:
+    """
+    Fake OpenAI-compatible /v1/chat/completions server.
+
+    Answers deterministically from a hash of the prompt: 3-line SUMMARY /
+    SENTIMENT / ACTION answers for single comments, {"results": [...]} JSON for
+    batch prompts and a short summary otherwise, each after `latency` seconds
+    (plus uniform `jitter`). Beyond `requests_per_minute` (or
+    `tokens_per_minute`) requests in a sliding minute it answers 429 with a
+    retry-after header, like the real API.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.0, requests_per_minute=0, tokens_per_minute=0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._requests = deque()
+        self._tokens = deque()
+        self.requests = 0
+        self.throttled = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @staticmethod
+    def _label(text):
+        digest = zlib.crc32(text.encode('utf-8'))
+        return SENTIMENTS[digest % 3], ACTIONS[(digest // 3) % 4]
+
+    def answer(self, prompt):
+        if "### COMMENTS:" in prompt:
+            comments_json = prompt.split("### COMMENTS:", 1)[1].split("\nRespond with", 1)[0]
+            results = []
+            for item in json.loads(comments_json):
+                sentiment, action = self._label(item['text'])
+                results.append({'id': item['id'], 'summary': f"Comment about {item['text'][:30]}",
+                                'sentiment': sentiment, 'action': action})
+            return json.dumps({'results': results})
+        if "### COMMENT:" in prompt:
+            comment = prompt.split("### COMMENT:", 1)[1].split("\nRemember:", 1)[0].strip()
+            sentiment, action = self._label(comment)
+            return f"SUMMARY: Comment about {comment[:30]}\nSENTIMENT: {sentiment}\nACTION: {action}"
+        return "The post is a daily discussion thread about market moves and positions."
+
+    def _admit(self, tokens):
+        """Record one request against the sliding-minute limits; False when it must be throttled."""
+        with self._lock:
+            now = time.time()
+            while self._requests and now - self._requests[0] >= 60:
+                self._requests.popleft()
+            while self._tokens and now - self._tokens[0][0] >= 60:
+                self._tokens.popleft()
+            over_rpm = self.requests_per_minute and len(self._requests) >= self.requests_per_minute
+            over_tpm = self.tokens_per_minute and sum(count for _, count in self._tokens) + tokens > self.tokens_per_minute
+            if over_rpm or over_tpm:
+                self.throttled += 1
+                oldest = self._requests[0] if over_rpm else self._tokens[0][0]
+                return False, max(oldest + 60 - now, 0.1)
+            self._requests.append(now)
+            self._tokens.append((now, tokens))
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return True, 0
+
+    def stats(self):
+        with self._lock:
+            return {'calls': {'chat_completions': self.requests}, 'total_calls': self.requests,
+                    'throttled': self.throttled, 'prompt_tokens': self.prompt_tokens,
+                    'completion_tokens': self.completion_tokens, 'max_in_flight': self.max_in_flight}
+
+    def handle(self, method, path, params):
+        if path == '/_bench/stats':
+            return 200, {}, json.dumps(self.stats()).encode()
+        if method != 'POST' or not path.rstrip('/').endswith('/chat/completions'):
+            return 404, {}, b'{"error": {"message": "Not Found", "type": "invalid_request_error"}}'
+
+        prompt = "\n".join(str(message.get('content', '')) for message in params.get('messages', []))
+        prompt_tokens = max(1, len(prompt) // 4)
+        admitted, retry_after = self._admit(prompt_tokens + int(params.get('max_tokens') or 0))
+        if not admitted:
+            error = {'error': {'message': 'Rate limit reached', 'type': 'requests', 'code': 'rate_limit_exceeded'}}
+            return 429, {'retry-after': f"{retry_after:.2f}"}, json.dumps(error).encode()
+
+        try:
+            with self._lock:
+                delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0)
+            time.sleep(delay)
+            content = self.answer(prompt)
+            completion_tokens = max(1, len(content) // 4)
+            with self._lock:
+                self.prompt_tokens += prompt_tokens
+                self.completion_tokens += completion_tokens
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+        body = {
+            'id': f"chatcmpl-bench{self.requests}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': params.get('model', 'gpt-4o'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens}
+        }
+        return 200, {}, json.dumps(body).encode()
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisStandIn:
+    """
+    In-memory Redis answering the RESP commands of redis_queue.py (strings,
+    hashes, lists, sorted sets, key expiry, MULTI/EXEC). Every command runs
+    under one lock, so each is atomic like on a real server.
+    """
+
+    scheme = "redis"
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.commands = 0
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.time():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def _get(self, key, kind):
+        value = self._live(key)
+        if value is None:
+            value = kind()
+            self.data[key] = value
+        elif not isinstance(value, kind):
+            raise RedisError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _incr(self, key, amount):
+        value = self._live(key)
+        value = int(value or 0) + amount
+        self.data[key] = str(value)
+        return value
+
+    def _zadd(self, args):
+        key, args = args[0], list(args[1:])
+        flags = set()
+        while args and args[0].upper() in ('NX', 'XX', 'GT', 'LT', 'CH'):
+            flags.add(args.pop(0).upper())
+        zset = self._get(key, dict)
+        added = changed = 0
+        for score, member in zip(args[0::2], args[1::2]):
+            score = float(score)
+            exists = member in zset
+            if ('NX' in flags and exists) or ('XX' in flags and not exists):
+                continue
+            if not exists:
+                added += 1
+            elif zset[member] != score:
+                changed += 1
+            zset[member] = score
+        return added + changed if 'CH' in flags else added
+
+    def execute(self, args):
+        """Run one command; returns its reply (bytes for strings, int, list, None, or an exception)."""
+        name = args[0].upper()
+        args = args[1:]
+        self.commands += 1
+        if name == 'PING':
+            return 'PONG'
+        if name in ('SELECT', 'CLIENT'):
+            return 'OK'
+        if name == 'EXISTS':
+            return sum(1 for key in args if self._live(key) is not None)
+        if name == 'DEL':
+            removed = sum(1 for key in args if self._live(key) is not None)
+            for key in args:
+                self.data.pop(key, None)
+                self.expires.pop(key, None)
+            return removed
+        if name == 'EXPIRE':
+            if self._live(args[0]) is None:
+                return 0
+            self.expires[args[0]] = time.time() + int(args[1])
+            return 1
+        if name == 'GET':
+            return self._live(args[0])
+        if name == 'MGET':
+            return [value if isinstance(value, str) else None for value in map(self._live, args)]
+        if name in ('INCRBY', 'DECRBY'):
+            return self._incr(args[0], int(args[1]) * (1 if name == 'INCRBY' else -1))
+        if name == 'HSET':
+            table = self._get(args[0], dict)
+            added = sum(1 for field in args[1::2] if field not in table)
+            table.update(zip(args[1::2], args[2::2]))
+            return added
+        if name == 'HSETNX':
+            table = self._get(args[0], dict)
+            if args[1] in table:
+                return 0
+            table[args[1]] = args[2]
+            return 1
+        if name == 'HGET':
+            return (self._live(args[0]) or {}).get(args[1])
+        if name == 'HMGET':
+            table = self._live(args[0]) or {}
+            return [table.get(field) for field in args[1:]]
+        if name == 'HGETALL':
+            return [item for pair in (self._live(args[0]) or {}).items() for item in pair]
+        if name == 'HEXISTS':
+            return int(args[1] in (self._live(args[0]) or {}))
+        if name == 'HLEN':
+            return len(self._live(args[0]) or {})
+        if name == 'HINCRBY':
+            table = self._get(args[0], dict)
+            table[args[1]] = str(int(table.get(args[1], 0)) + int(args[2]))
+            return int(table[args[1]])
+        if name == 'RPUSH':
+            items = self._get(args[0], deque)
+            items.extend(args[1:])
+            return len(items)
+        if name == 'LLEN':
+            return len(self._live(args[0]) or ())
+        if name == 'LRANGE':
+            items = list(self._live(args[0]) or ())
+            start, stop = int(args[1]), int(args[2])
+            return items[start:None if stop == -1 else stop + 1]
+        if name == 'LREM':
+            items = self._live(args[0])
+            if not items:
+                return 0
+            kept = [item for item in items if item != args[2]]
+            removed = len(items) - len(kept)
+            items.clear()
+            items.extend(kept)
+            return removed
+        if name == 'LMOVE':
+            source = self._live(args[0])
+            if not source:
+                return None
+            item = source.popleft() if args[2].upper() == 'LEFT' else source.pop()
+            target = self._get(args[1], deque)
+            target.append(item) if args[3].upper() == 'RIGHT' else target.appendleft(item)
+            return item
+        if name == 'ZADD':
+            return self._zadd(args)
+        if name == 'ZREM':
+            zset = self._live(args[0]) or {}
+            return sum(1 for member in args[1:] if zset.pop(member, None) is not None)
+        if name == 'ZSCORE':
+            score = (self._live(args[0]) or {}).get(args[1])
+            return None if score is None else repr(score)
+        if name == 'ZRANGEBYSCORE':
+            low = float(args[1]) if args[1] != '-inf' else float('-inf')
+            high = float(args[2]) if args[2] != '+inf' else float('inf')
+            members = sorted((score, member) for member, score in (self._live(args[0]) or {}).items())
+            return [member for score, member in members if low <= score <= high]
+        raise RedisError(f"ERR unknown command '{name.lower()}'")
+
+    def stats(self):
+        with self._lock:
+            return {'commands': self.commands, 'keys': len(self.data)}
+
+
+def _read_command(stream):
+    line = stream.readline()
+    if not line:
+        return None
+    if not line.startswith(b'*'):
+        return line.decode().split()
+    args = []
+    for _ in range(int(line[1:])):
+        length = int(stream.readline()[1:])
+        args.append(stream.read(length + 2)[:-2].decode('utf-8'))
+    return args
+
+
+def _encode_reply(reply):
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, Exception):
+        return f"-{reply}\r\n".encode()
+    if isinstance(reply, bool) or isinstance(reply, int):
+        return f":{int(reply)}\r\n".encode()
+    if isinstance(reply, list):
+        return f"*{len(reply)}\r\n".encode() + b''.join(_encode_reply(item) for item in reply)
+    data = reply.encode('utf-8')
+    return f"${len(data)}\r\n".encode() + data + b'\r\n'
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        stand_in = self.server.stand_in
+        transaction = None
+        while True:
+            args = _read_command(self.rfile)
+            if not args:
+                return
+            name = args[0].upper()
+            if name == 'MULTI':
+                transaction = []
+                reply = b'+OK\r\n'
+            elif name == 'EXEC' and transaction is not None:
+                with stand_in._lock:
+                    replies = []
+                    for queued in transaction:
+                        try:
+                            replies.append(stand_in.execute(queued))
+                        except RedisError as e:
+                            replies.append(e)
+                transaction = None
+                reply = _encode_reply(replies)
+            elif name == 'DISCARD':
+                transaction = None
+                reply = b'+OK\r\n'
+            elif transaction is not None:
+                transaction.append(args)
+                reply = b'+QUEUED\r\n'
+            else:
+                try:
+                    with stand_in._lock:
+                        result = stand_in.execute(args)
+                    reply = b'+' + result.encode() + b'\r\n' if result in ('OK', 'PONG') else _encode_reply(result)
+                except RedisError as e:
+                    reply = _encode_reply(e)
+            self.wfile.write(reply)
+
+
+class _RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 256
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; with Nagle every keep-alive response waits for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def _serve(self, method):
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if body:
+            if 'json' in (self.headers.get('Content-Type') or ''):
+                params.update(json.loads(body))
+            else:
+                params.update({key: values[-1] for key, values in parse_qs(body.decode()).items()})
+
+        status, headers, payload = self.server.stand_in.handle(method, url.path, params)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._serve('GET')
+
+    def do_POST(self):
+        self._serve('POST')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Concurrent LLM workers open many connections at once
+    request_queue_size = 256
+
+
+def serve(stand_in, host="127.0.0.1", port=0):
+    """Serve `stand_in` from a background thread; returns the server (see server_address)."""
+    if isinstance(stand_in, RedisStandIn):
+        server = _RespServer((host, port), _RespHandler)
+    else:
+        server = _StandInServer((host, port), _StandInHandler)
+    server.stand_in = stand_in
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _serve_child(factory, kwargs, ready):
+    stand_in = factory(**kwargs)
+    server = serve(stand_in)
+    ready.put(f"{getattr(stand_in, 'scheme', 'http')}://127.0.0.1:{server.server_address[1]}")
+    threading.Event().wait()
+
+
+class StandInProcess:
+    """
+    Run a stand-in built by `factory(**kwargs)` in a child process.
+
+    Use as a context manager; `url` is the server root and `stats()` reads its counters.
+    """
+
+    def __init__(self, factory, **kwargs):
+        self.factory = factory
+        self.kwargs = kwargs
+        self.process = None
+        self.url = None
+
+    def __enter__(self):
+        context = multiprocessing.get_context('spawn')
+        ready = context.Queue()
+        self.process = context.Process(target=_serve_child, args=(self.factory, self.kwargs, ready), daemon=True)
+        self.process.start()
+        self.url = ready.get(timeout=60)
+        return self
+
+    def stats(self):
+        return requests.get(self.url + '/_bench/stats', timeout=10).json()
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.join()
+
+
+def build_reddit_stand_in(num_posts=1, num_comments=2000, max_depth=8, duplicate_ratio=0.1, seed=0, **kwargs):
+    """Factory for StandInProcess: a RedditStandIn over `num_posts` generated threads."""
+    threads = [SyntheticThread(f"bench{post}", num_comments, max_depth, duplicate_ratio=duplicate_ratio,
+                               title=f"Daily Discussion Thread for June {post + 1}, 2025", seed=seed)
+               for post in range(num_posts)]
+    return RedditStandIn(threads, **kwargs)
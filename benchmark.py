@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the crawl, classification and report stages.
+Runs the real pipeline code against the local stand-ins in bench_standins.py
+(a synthetic Reddit thread and a fake OpenAI server), records wall time,
+throughput, API call counts and peak memory per stage, and appends the run to
+a history file so a slower or hungrier stage shows up against the previous run
+with the same configuration.
+"""
+import argparse
+import asyncio
+import contextlib
+import copy
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import praw
+
+from AI_analyzer import analyze_results
+from bench_standins import OpenAIStandIn, StandInProcess, build_reddit_stand_in
+from rate_limiter import RateLimitGovernor
+from reddit_search import build_summary, search_reddit_posts
+
+DEFAULT_HISTORY_PATH = os.path.join(".benchmarks", "history.jsonl")
+STAGES = ("crawl_praw", "crawl_raw", "summarize", "analyze")
+SEARCH_TERM = "Daily Discussion Thread"
+# Metrics where a higher value than the previous run is a regression
+REGRESSION_METRICS = ("wall_seconds", "peak_memory_mb", "api_calls")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def reddit_client(url):
+    """Read-only PRAW instance talking to the Reddit stand-in at `url`."""
+    return praw.Reddit(client_id="benchmark", client_secret="benchmark", user_agent="benchmark.py offline stand-in",
+                       oauth_url=url, reddit_url=url, check_for_updates=False)
+
+
+def _call_delta(before, after):
+    calls = {endpoint: count - before['calls'].get(endpoint, 0) for endpoint, count in after['calls'].items()}
+    return {endpoint: count for endpoint, count in calls.items() if count}
+
+
+def measure(func, servers=(), trace_memory=True):
+    """
+    Run `func()` once with its output suppressed and measure it.
+
+    Args:
+        func: Callable returning (items processed, dict of extra metrics)
+        servers: StandInProcess objects whose call counters are attributed to the stage
+        trace_memory: Record peak Python heap usage with tracemalloc (slows the stage down)
+
+    Returns:
+        Metrics dictionary
+    """
+    before = [server.stats() for server in servers]
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            items, extra = func()
+        wall_seconds = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    after = [server.stats() for server in servers]
+
+    calls = {}
+    for start, end in zip(before, after):
+        calls.update(_call_delta(start, end))
+    metrics = {
+        'wall_seconds': round(wall_seconds, 3),
+        'items': items,
+        'items_per_second': round(items / wall_seconds, 1) if wall_seconds else None,
+        'api_calls': sum(calls.values()),
+        'calls_by_endpoint': calls,
+        'throttled': sum(end['throttled'] - start['throttled'] for start, end in zip(before, after)),
+        'peak_memory_mb': round(peak / 2 ** 20, 2) if peak is not None else None
+    }
+    metrics.update(extra)
+    return metrics
+
+
+def crawl(url, limit, engine):
+    """Search and crawl every thread of the stand-in; returns (posts, governor)."""
+    reddit = reddit_client(url)
+    governor = RateLimitGovernor(reddit)
+    posts = search_reddit_posts(reddit, SEARCH_TERM, limit=limit, time_filter="all", sort="new",
+                                governor=governor, engine=engine)
+    return posts, governor
+
+
+def label_offline(posts):
+    """Give every comment the stand-in's deterministic label without any HTTP call."""
+    for post in posts:
+        post['post_summary'] = "Synthetic daily discussion thread."
+        for comment in post.get('comments', []):
+            sentiment, action = OpenAIStandIn._label(comment['body'])
+            comment.update(summary="", sentiment=sentiment, stock_action=action.lower())
+    return posts
+
+
+def run_benchmark(args):
+    """Run the selected stages; returns {stage: metrics}."""
+    results = {}
+    expected_comments = args.posts * args.comments
+    reddit_options = dict(num_posts=args.posts, num_comments=args.comments, max_depth=args.depth,
+                          duplicate_ratio=args.duplicate_ratio, seed=args.seed, more_fanout=args.more_fanout,
+                          render_depth=args.render_depth, requests_per_window=args.reddit_quota,
+                          latency=args.reddit_latency)
+
+    with StandInProcess(build_reddit_stand_in, **reddit_options) as reddit_server:
+        posts = None
+        for engine in ("praw", "raw"):
+            stage = f"crawl_{engine}"
+            if stage not in args.stages:
+                continue
+            state = {}
+
+            def run_crawl():
+                state['posts'], governor = crawl(reddit_server.url, args.posts, engine)
+                comments = sum(len(post['comments']) for post in state['posts'])
+                return comments, {'expected_comments': expected_comments,
+                                  'rate_limit_wait_seconds': round(governor.wait_seconds, 2)}
+
+            results[stage] = measure(run_crawl, [reddit_server], args.memory)
+            posts = state['posts']
+            print_stage(stage, results[stage])
+
+        if posts is None and ("summarize" in args.stages or "analyze" in args.stages):
+            with contextlib.redirect_stdout(io.StringIO()):
+                posts, _ = crawl(reddit_server.url, args.posts, "raw")
+
+    summarized = None
+    if "summarize" in args.stages:
+        results['summarize'] = run_summarize(args, posts)
+        summarized = results['summarize'].pop('posts', None)
+        print_stage('summarize', results['summarize'])
+
+    if "analyze" in args.stages:
+        if summarized is None:
+            summarized = label_offline(copy.deepcopy(posts))
+        results['analyze'] = run_analyze(args, summarized)
+        print_stage('analyze', results['analyze'])
+    return results
+
+
+def run_summarize(args, posts):
+    """Classify every comment with comment_summerizer's async path against the fake OpenAI server."""
+    try:
+        import comment_summerizer
+    except ImportError as e:
+        # comment_summerizer reads its key from a local config.py that is not committed
+        print(f"⏭️  summarize skipped: {e}")
+        return {'skipped': str(e)}
+
+    data = {'posts': copy.deepcopy(posts)}
+    llm_options = dict(latency=args.llm_latency, jitter=args.llm_jitter, requests_per_minute=args.llm_rpm,
+                       tokens_per_minute=args.llm_tpm, seed=args.seed)
+    with StandInProcess(OpenAIStandIn, **llm_options) as llm_server:
+        os.environ['OPENAI_BASE_URL'] = llm_server.url + "/v1"
+
+        def run():
+            # The client-side limits are lifted so the server's limits are the ones exercised
+            asyncio.run(comment_summerizer.process_posts_async(
+                data, 0, args.concurrency, args.client_rpm, args.client_tpm, args.batch_tokens,
+                triage=args.triage, dedup=args.dedup))
+            labeled = sum(1 for post in data['posts'] for comment in post['comments'] if 'sentiment' in comment)
+            errors = sum(1 for post in data['posts'] for comment in post['comments'] if 'error' in comment)
+            return labeled, {'errors': errors}
+
+        metrics = measure(run, [llm_server], args.memory)
+        server_stats = llm_server.stats()
+    metrics.update(prompt_tokens=server_stats['prompt_tokens'], completion_tokens=server_stats['completion_tokens'],
+                   max_in_flight=server_stats['max_in_flight'], posts=data['posts'])
+    return metrics
+
+
+def run_analyze(args, posts):
+    """Write the classified posts to a temporary result file and run the aggregate report over it."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "benchmark_summarized.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(build_summary(posts, os.path.basename(path), SEARCH_TERM, args.posts, "all", "new"), f)
+
+        def run():
+            analyze_results([path], group_by=("day", "ticker"), workers=1)
+            return sum(len(post['comments']) for post in posts), {}
+
+        return measure(run, (), args.memory)
+
+
+def config_of(args):
+    """The arguments that change what is measured; runs are only compared when these match."""
+    return {
+        'stages': list(args.stages), 'posts': args.posts, 'comments': args.comments, 'depth': args.depth,
+        'more_fanout': args.more_fanout, 'render_depth': args.render_depth,
+        'duplicate_ratio': args.duplicate_ratio, 'reddit_quota': args.reddit_quota,
+        'reddit_latency': args.reddit_latency, 'llm_latency': args.llm_latency, 'llm_jitter': args.llm_jitter,
+        'llm_rpm': args.llm_rpm, 'llm_tpm': args.llm_tpm, 'concurrency': args.concurrency,
+        'batch_tokens': args.batch_tokens, 'triage': args.triage, 'dedup': args.dedup,
+        'memory': args.memory, 'seed': args.seed
+    }
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def previous_run(history, config):
+    """Most recent run recorded with the same configuration."""
+    for record in reversed(history):
+        if record.get('config') == config:
+            return record
+    return None
+
+
+def find_regressions(previous, stages, threshold=0.2):
+    """
+    Compare stage metrics with an earlier run.
+
+    Returns:
+        List of (stage, metric, previous value, current value) that grew by more than `threshold`
+    """
+    regressions = []
+    for stage, metrics in stages.items():
+        before = previous['stages'].get(stage, {})
+        for metric in REGRESSION_METRICS:
+            old, new = before.get(metric), metrics.get(metric)
+            if old and new is not None and (new - old) / old > threshold:
+                regressions.append((stage, metric, old, new))
+    return regressions
+
+
+def print_stage(stage, metrics):
+    if 'skipped' in metrics:
+        return
+    memory = f"{metrics['peak_memory_mb']:>8.1f} MB" if metrics['peak_memory_mb'] is not None else "       n/a"
+    missing = metrics.get('expected_comments', metrics['items']) - metrics['items']
+    print(f"{stage:<12} {metrics['wall_seconds']:>8.2f} s {metrics['items']:>8} items "
+          f"{metrics['items_per_second'] or 0:>10.1f}/s {metrics['api_calls']:>6} calls {memory}"
+          + (f"  {metrics['throttled']} throttled" if metrics['throttled'] else "")
+          + (f"  ⚠️  {missing} comments missing" if missing > 0 else ""))
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline offline against local stand-ins')
+    parser.add_argument('--stages', default=",".join(STAGES),
+                        help=f'Comma-separated stages to run (default: {",".join(STAGES)})')
+    parser.add_argument('--posts', type=int, default=1, help='Synthetic threads to crawl (default: 1)')
+    parser.add_argument('--comments', type=int, default=2000, help='Comments per thread (default: 2000)')
+    parser.add_argument('--depth', type=int, default=8, help='Deepest comment level (default: 8)')
+    parser.add_argument('--more-fanout', type=int, default=100,
+                        help='Maximum child ids per MoreComments object (default: 100)')
+    parser.add_argument('--render-depth', type=int, default=10,
+                        help='Levels rendered before "continue this thread" (default: 10)')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.1,
+                        help='Share of comments copying an earlier body (default: 0.1)')
+    parser.add_argument('--reddit-quota', type=int, default=100000,
+                        help='Requests per 10-minute window announced by the Reddit stand-in (default: 100000)')
+    parser.add_argument('--reddit-latency', type=float, default=0.0,
+                        help='Seconds added to every Reddit response (default: 0)')
+    parser.add_argument('--llm-latency', type=float, default=0.05,
+                        help='Seconds per chat completion (default: 0.05)')
+    parser.add_argument('--llm-jitter', type=float, default=0.0,
+                        help='Extra uniform random latency per completion (default: 0)')
+    parser.add_argument('--llm-rpm', type=int, default=0, help='Server-side requests per minute, 0 for none')
+    parser.add_argument('--llm-tpm', type=int, default=0, help='Server-side tokens per minute, 0 for none')
+    parser.add_argument('--client-rpm', type=int, default=1000000,
+                        help='Client-side request limit of the summarizer (default: effectively none)')
+    parser.add_argument('--client-tpm', type=int, default=10 ** 9,
+                        help='Client-side token limit of the summarizer (default: effectively none)')
+    parser.add_argument('--concurrency', type=int, default=32, help='Summarizer requests in flight (default: 32)')
+    parser.add_argument('--batch-tokens', type=int, default=0, help='Summarizer --batch-tokens (default: 0)')
+    parser.add_argument('--triage', action='store_true', help='Summarize with --triage')
+    parser.add_argument('--dedup', action='store_true', help='Summarize with --dedup')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic threads (default: 0)')
+    parser.add_argument('--no-memory', dest='memory', action='store_false',
+                        help='Skip tracemalloc; faster and closer to real timings, but no peak memory')
+    parser.add_argument('--history', default=DEFAULT_HISTORY_PATH,
+                        help=f'JSON Lines file runs are appended to (default: {DEFAULT_HISTORY_PATH})')
+    parser.add_argument('--no-save', action='store_true', help='Do not append this run to the history')
+    parser.add_argument('--label', help='Free-form note stored with the run')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Relative growth reported as a regression (default: 0.2)')
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help='Exit with status 1 when a regression is found')
+    return parser
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    args.stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = [stage for stage in args.stages if stage not in STAGES]
+    if unknown:
+        print(f"❌ Unknown stage(s): {', '.join(unknown)}")
+        sys.exit(1)
+
+    config = config_of(args)
+    print(f"⏱️  Benchmark: {args.posts} thread(s) x {args.comments} comments, depth {args.depth}, "
+          f"fan-out {args.more_fanout}")
+    stages = run_benchmark(args)
+
+    record = {
+        'run_at': datetime.now().isoformat(),
+        'commit': git_commit(),
+        'label': args.label,
+        'python': platform.python_version(),
+        'config': config,
+        'stages': stages
+    }
+    previous = previous_run(load_history(args.history), config)
+    regressions = []
+    if previous is None:
+        print("\nNo earlier run with this configuration to compare against")
+    else:
+        regressions = find_regressions(previous, stages, args.threshold)
+        print(f"\nCompared with {previous['run_at']} ({previous.get('commit') or 'unknown commit'}):")
+        for stage, metrics in stages.items():
+            before = previous['stages'].get(stage, {})
+            if before.get('wall_seconds') and 'wall_seconds' in metrics:
+                change = (metrics['wall_seconds'] - before['wall_seconds']) / before['wall_seconds'] * 100
+                print(f"  {stage:<12} {before['wall_seconds']:>8.2f} s -> {metrics['wall_seconds']:>8.2f} s "
+                      f"({change:+.1f}%)")
+        for stage, metric, old, new in regressions:
+            print(f"  ⚠️  {stage} {metric}: {old} -> {new}")
+        if not regressions:
+            print("  ✅ No regressions")
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(args.history) or ".", exist_ok=True)
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        print(f"\n✅ Run saved: {args.history}")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Append-only checkpoint journal for comment_summerizer runs.
+Every paid-for post summary and comment label is appended to a JSONL sidecar
+so an interrupted run can resume without calling the LLM again.
+"""
+import json
+import os
+import time
+
+
+class ClassificationJournal:
+    """Buffered JSONL journal of post summaries and comment results."""
+
+    def __init__(self, path, resume=False, overwrite=False, flush_every=50, flush_seconds=2.0):
+        """
+        Args:
+            path: Journal file
+            resume: Load and keep appending to an existing journal instead of starting over
+            overwrite: Start over even if a non-empty journal of an earlier run exists
+            flush_every: Flush after this many records
+            flush_seconds: Flush at least this often while records are written
+
+        Raises:
+            FileExistsError: If a non-empty journal exists and neither resume nor overwrite is set
+        """
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+        self.summaries = {}
+        self.results = {}
+        if resume:
+            self._load()
+            self._repair_tail()
+        elif not overwrite and os.path.exists(path) and os.path.getsize(path) > 0:
+            # The journal holds paid-for results of an interrupted run; never wipe it implicitly
+            raise FileExistsError(f"{path} holds results of an interrupted run")
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A run killed mid-write leaves at most one partial line
+                    continue
+                if 'post_summary' in record:
+                    self.summaries[record['post']] = record['post_summary']
+                elif 'result' in record:
+                    self.results[record['comment']] = record['result']
+
+    def _repair_tail(self):
+        """Make sure appended records start on a fresh line after a run killed mid-write."""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        with open(self.path, 'rb+') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) == b'\n':
+                return
+            f.seek(0)
+            data = f.read()
+            start = data.rfind(b'\n') + 1
+            try:
+                json.loads(data[start:])
+            except ValueError:
+                # Partial record: it was skipped by _load, so drop it
+                f.truncate(start)
+                return
+            # Complete record that only misses its newline
+            f.write(b'\n')
+
+    def _append(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._pending += 1
+        now = time.monotonic()
+        if self._pending >= self.flush_every or now - self._last_flush >= self.flush_seconds:
+            self._file.flush()
+            self._pending = 0
+            self._last_flush = now
+
+    def record_summary(self, post_key, summary):
+        self.summaries[post_key] = summary
+        self._append({'post': post_key, 'post_summary': summary})
+
+    def record_result(self, comment_key, result):
+        self.results[comment_key] = result
+        self._append({'comment': comment_key, 'result': result})
+
+    def close(self):
+        if not self._file.closed:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+    def discard(self):
+        """Remove the journal once its results are in the compacted output file."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
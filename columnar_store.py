@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Columnar storage for crawl and classification results.
+A result is stored as a directory (<name>.cols) with one file per column of
+its posts and comments tables: numbers and flags as .npy arrays that are
+memory-mapped on read, repetitive strings (authors, sentiment, stock action)
+dictionary-encoded as integer codes, and free text as zlib-compressed blocks.
+Readers only touch the columns they ask for.
+"""
+import argparse
+import glob
+import json
+import mmap
+import os
+import shutil
+import sys
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+COLUMNAR_SUFFIX = '.cols'
+MANIFEST_NAME = 'manifest.json'
+FORMAT_VERSION = 1
+
+# Always dictionary-encoded, whatever their cardinality
+DICTIONARY_COLUMNS = {'author', 'subreddit', 'distinguished', 'sentiment', 'stock_action', 'triage'}
+NUMPY_DTYPES = {'int': np.int64, 'float': np.float64, 'bool': np.bool_}
+# Row index of a comment's post in the posts table
+POST_ROW_COLUMN = '_post'
+_MISSING = object()
+
+
+def is_columnar(path):
+    """True when `path` names a columnar result directory."""
+    return path.rstrip('/\\').endswith(COLUMNAR_SUFFIX)
+
+
+def _column_kind(name, values):
+    present = [value for value in values if value is not None]
+    complete = len(present) == len(values)
+    if complete and present and all(isinstance(value, bool) for value in present):
+        return 'bool'
+    if complete and present and all(isinstance(value, int) and not isinstance(value, bool) for value in present):
+        return 'int'
+    if complete and present and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+        return 'float'
+    if all(isinstance(value, str) for value in present):
+        if name in DICTIONARY_COLUMNS or len(set(present)) * 2 <= len(present):
+            return 'dict'
+        return 'text'
+    return 'json'
+
+
+def _write_column(directory, name, values, block_rows):
+    base = os.path.join(directory, name)
+    present = [value is not _MISSING for value in values]
+    values = [None if value is _MISSING else value for value in values]
+    kind = _column_kind(name, values)
+
+    if kind in NUMPY_DTYPES:
+        np.save(base + '.npy', np.asarray(values, dtype=NUMPY_DTYPES[kind]))
+    elif kind == 'dict':
+        dictionary = list(dict.fromkeys(value for value in values if value is not None))
+        lookup = {value: code for code, value in enumerate(dictionary)}
+        codes = np.fromiter((-1 if value is None else lookup[value] for value in values),
+                            dtype=np.int32, count=len(values))
+        np.save(base + '.npy', codes)
+        with open(base + '.dict.json', 'w', encoding='utf-8') as f:
+            json.dump(dictionary, f, ensure_ascii=False)
+    else:
+        # Text and mixed values: JSON arrays of `block_rows` values, each compressed on its own
+        offsets = [0]
+        with open(base + '.blocks', 'wb') as f:
+            for start in range(0, len(values), block_rows):
+                block = json.dumps(values[start:start + block_rows], ensure_ascii=False).encode('utf-8')
+                f.write(zlib.compress(block, 6))
+                offsets.append(f.tell())
+        np.save(base + '.offsets.npy', np.asarray(offsets, dtype=np.int64))
+
+    spec = {'name': name, 'kind': kind}
+    if not all(present):
+        # Only rows that actually had the key get it back when the document is rebuilt
+        np.save(base + '.present.npy', np.asarray(present, dtype=np.bool_))
+        spec['sparse'] = True
+    return spec
+
+
+def _write_table(directory, rows, extra_columns=None, block_rows=4096):
+    os.makedirs(directory)
+    names = list(dict.fromkeys(key for row in rows for key in row))
+    columns = []
+    for name in names:
+        if name == 'comments':
+            # Placeholder that keeps the key order of posts; comments live in their own table
+            columns.append({'name': name, 'kind': 'children'})
+            continue
+        columns.append(_write_column(directory, name, [row.get(name, _MISSING) for row in rows], block_rows))
+    for name, values in (extra_columns or {}).items():
+        np.save(os.path.join(directory, name + '.npy'), values)
+        columns.append({'name': name, 'kind': 'int'})
+    return {'rows': len(rows), 'columns': columns}
+
+
+def write_columnar(path, data, block_rows=4096):
+    """
+    Write a result document (metadata, search_parameters, results_summary, posts)
+    as a columnar directory, replacing any previous one at `path`.
+
+    Returns:
+        The path written
+    """
+    path = path.rstrip('/\\')
+    posts = data.get('posts', [])
+    comments = [comment for post in posts for comment in post.get('comments', [])]
+    post_rows = np.repeat(np.arange(len(posts), dtype=np.int32),
+                          [len(post.get('comments', [])) for post in posts]) if posts else np.zeros(0, np.int32)
+
+    staging = path + '.tmp'
+    if os.path.exists(staging):
+        shutil.rmtree(staging)
+    os.makedirs(staging)
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'document': {key: value for key, value in data.items() if key != 'posts'},
+        'tables': {
+            'posts': _write_table(os.path.join(staging, 'posts'), posts, block_rows=block_rows),
+            'comments': _write_table(os.path.join(staging, 'comments'), comments,
+                                     {POST_ROW_COLUMN: post_rows}, block_rows=block_rows)
+        }
+    }
+    with open(os.path.join(staging, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.rename(staging, path)
+    return path
+
+
+class ColumnarResult:
+    """Read access to a columnar result directory, one column at a time."""
+
+    def __init__(self, path):
+        self.path = path.rstrip('/\\')
+        with open(os.path.join(self.path, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar format version in {self.path}")
+        self._specs = {
+            table: {spec['name']: spec for spec in info['columns']}
+            for table, info in self.manifest['tables'].items()
+        }
+
+    @property
+    def document(self):
+        """Top-level fields of the result (metadata, search_parameters, results_summary) without posts."""
+        return self.manifest['document']
+
+    def rows(self, table):
+        return self.manifest['tables'][table]['rows']
+
+    def has_column(self, table, name):
+        return name in self._specs[table]
+
+    def column_names(self, table):
+        return [name for name, spec in self._specs[table].items() if spec['kind'] != 'children']
+
+    def _base(self, table, name):
+        return os.path.join(self.path, table, name)
+
+    def column(self, table, name):
+        """
+        Read one column.
+
+        Returns:
+            A read-only memory-mapped NumPy array for numbers and flags, a pandas
+            Categorical for dictionary-encoded strings, and a list for text
+        """
+        spec = self._specs[table][name]
+        base = self._base(table, name)
+        if spec['kind'] in NUMPY_DTYPES:
+            return np.load(base + '.npy', mmap_mode='r')
+        if spec['kind'] == 'dict':
+            codes = np.load(base + '.npy', mmap_mode='r')
+            with open(base + '.dict.json', 'r', encoding='utf-8') as f:
+                dictionary = json.load(f)
+            return pd.Categorical.from_codes(codes, categories=pd.Index(dictionary, dtype=object))
+        return self._read_blocks(base)
+
+    def values(self, table, name):
+        """Read one column as a list of plain Python values (None where a value is missing)."""
+        spec = self._specs[table][name]
+        if spec['kind'] in NUMPY_DTYPES:
+            return self.column(table, name).tolist()
+        if spec['kind'] == 'dict':
+            base = self._base(table, name)
+            codes = np.load(base + '.npy', mmap_mode='r')
+            with open(base + '.dict.json', 'r', encoding='utf-8') as f:
+                dictionary = json.load(f)
+            return [dictionary[code] if code >= 0 else None for code in codes.tolist()]
+        return self.column(table, name)
+
+    def _read_blocks(self, base):
+        offsets = np.load(base + '.offsets.npy')
+        if offsets[-1] == 0:
+            return []
+        values = []
+        with open(base + '.blocks', 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as blob:
+            for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist()):
+                values.extend(json.loads(zlib.decompress(blob[start:end])))
+        return values
+
+    def frame(self, table, columns=None):
+        """DataFrame of the requested columns (all columns when None)."""
+        names = columns or self.column_names(table)
+        return pd.DataFrame({name: self.column(table, name) for name in names}, index=pd.RangeIndex(self.rows(table)))
+
+    def _records(self, table):
+        specs = [spec for spec in self.manifest['tables'][table]['columns']]
+        rows = self.rows(table)
+        records = [{} for _ in range(rows)]
+        for spec in specs:
+            name = spec['name']
+            if spec['kind'] == 'children' or name == POST_ROW_COLUMN:
+                continue
+            values = self.values(table, name)
+            if spec.get('sparse'):
+                present = np.load(self._base(table, name) + '.present.npy').tolist()
+                for record, value, has_key in zip(records, values, present):
+                    if has_key:
+                        record[name] = value
+            else:
+                for record, value in zip(records, values):
+                    record[name] = value
+        return records
+
+    def to_result(self):
+        """Rebuild the full result document with nested posts and comments."""
+        comments = self._records('comments')
+        post_rows = self.column('comments', POST_ROW_COLUMN).tolist() if comments else []
+        grouped = [[] for _ in range(self.rows('posts'))]
+        for post_row, comment in zip(post_rows, comments):
+            grouped[post_row].append(comment)
+
+        post_names = [spec['name'] for spec in self.manifest['tables']['posts']['columns']]
+        posts = []
+        for record, post_comments in zip(self._records('posts'), grouped):
+            if 'comments' in post_names:
+                # Restore the original key order around the comments list
+                ordered = {}
+                for name in post_names:
+                    if name == 'comments':
+                        ordered['comments'] = post_comments
+                    elif name in record:
+                        ordered[name] = record[name]
+                record = ordered
+            posts.append(record)
+
+        data = dict(self.document)
+        data['posts'] = posts
+        return data
+
+
+def load_columnar_result(path):
+    """Load a columnar result directory as a regular result document."""
+    return ColumnarResult(path).to_result()
+
+
+def _directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def export_file(json_path, remove_source=False):
+    """Convert one .json/.jsonl result into a .cols directory next to it and report the savings."""
+    # Imported here so result_stream can import this module for loading .cols paths
+    from result_stream import load_result
+
+    start = time.perf_counter()
+    data = load_result(json_path)
+    json_seconds = time.perf_counter() - start
+    if not isinstance(data, dict) or 'posts' not in data:
+        raise ValueError("not a crawl result")
+    output = os.path.splitext(json_path)[0] + COLUMNAR_SUFFIX
+    write_columnar(output, data)
+
+    start = time.perf_counter()
+    load_columnar_result(output)
+    cols_seconds = time.perf_counter() - start
+    json_size = os.path.getsize(json_path)
+    cols_size = _directory_size(output)
+    print(f"✅ {output}: {json_size / 1024:.0f} KB -> {cols_size / 1024:.0f} KB "
+          f"({json_size / max(cols_size, 1):.1f}x smaller), full load {json_seconds:.2f}s -> {cols_seconds:.2f}s")
+    if remove_source:
+        os.remove(json_path)
+    return output
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(description='Convert results between JSON and the columnar format')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='Write .cols directories for JSON results')
+    export_parser.add_argument('files', nargs='*', help='Result files to convert')
+    export_parser.add_argument('--all', action='store_true', help='Convert every .json result under --results-dir')
+    export_parser.add_argument('--results-dir', default='results', help='Folder searched with --all (default: results)')
+    export_parser.add_argument('--remove-json', action='store_true', help='Delete each JSON file after converting it')
+
+    import_parser = subparsers.add_parser('import', help='Write a JSON document from a .cols directory')
+    import_parser.add_argument('path', help='Columnar result directory')
+    import_parser.add_argument('-o', '--output', help='Output JSON file (default: next to the directory)')
+    return parser
+
+
+def main():
+    args = create_argument_parser().parse_args()
+
+    if args.command == 'export':
+        files = list(args.files)
+        if args.all:
+            files += sorted(glob.glob(os.path.join(args.results_dir, '**', '*.json'), recursive=True))
+        if not files:
+            print("❌ No result files given")
+            sys.exit(1)
+        for path in files:
+            try:
+                export_file(path, args.remove_json)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"❌ Skipped {path}: {e}")
+    else:
+        output = args.output or args.path.rstrip('/\\')[:-len(COLUMNAR_SUFFIX)] + '.json'
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(load_columnar_result(args.path), f, indent=2, ensure_ascii=False)
+        print(f"✅ Saved: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate detection for comment bodies.
+MinHash signatures over word-bigram shingles plus banded locality-sensitive
+hashing group copy-pasted and lightly edited comments (rocket spam, bot
+replies, repeated memes) in time linear in the number of comments, so only
+one representative per cluster has to be classified.
+"""
+import re
+import zlib
+
+import numpy as np
+
+# Largest prime below 2**32: a * x + b stays inside uint64 for 32-bit a, b and x
+MERSENNE_PRIME = np.uint64(4294967291)
+MAX_HASH = np.uint64(4294967295)
+# Shingles hashed per vectorized chunk, bounds the (num_perm x shingles) scratch matrix
+CHUNK_SHINGLES = 32768
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def normalize(text):
+    """Lower-case, drop links and squeeze character runs so 🚀🚀🚀🚀 and 🚀🚀🚀 look alike."""
+    text = re.sub(r'https?://\S+', ' ', (text or '').lower())
+    return re.sub(r'(.)\1{2,}', r'\1\1\1', text)
+
+
+def shingle_hashes(text):
+    """32-bit hashes of the word bigrams of `text` (the single token for one-word comments)."""
+    tokens = TOKEN_PATTERN.findall(normalize(text))
+    if len(tokens) < 2:
+        shingles = set(tokens)
+    else:
+        shingles = {f"{first} {second}" for first, second in zip(tokens, tokens[1:])}
+    return np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+                       dtype=np.uint64, count=len(shingles))
+
+
+class MinHasher:
+    """Fixed family of `num_perm` universal hash functions h(x) = (a * x + b) mod p."""
+
+    def __init__(self, num_perm=128, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)[:, None]
+        self.b = rng.integers(0, int(MERSENNE_PRIME), size=num_perm, dtype=np.uint64)[:, None]
+
+    def signatures(self, texts):
+        """
+        MinHash signature of every text.
+
+        Returns:
+            (len(texts), num_perm) uint64 array; texts without tokens get MAX_HASH everywhere
+        """
+        shingle_sets = [shingle_hashes(text) for text in texts]
+        result = np.full((len(shingle_sets), self.num_perm), MAX_HASH, dtype=np.uint64)
+
+        start = 0
+        while start < len(shingle_sets):
+            # Grow the chunk until it holds CHUNK_SHINGLES shingles
+            end, total = start, 0
+            while end < len(shingle_sets) and (total == 0 or total + len(shingle_sets[end]) <= CHUNK_SHINGLES):
+                total += len(shingle_sets[end])
+                end += 1
+            rows = [row for row in range(start, end) if len(shingle_sets[row])]
+            if rows:
+                flat = np.concatenate([shingle_sets[row] for row in rows])
+                lengths = np.array([len(shingle_sets[row]) for row in rows])
+                offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+                hashed = (self.a * flat[None, :] + self.b) % MERSENNE_PRIME
+                result[rows] = np.minimum.reduceat(hashed, offsets, axis=1).T
+            start = end
+        return result
+
+
+def _find(parents, index):
+    root = index
+    while parents[root] != root:
+        root = parents[root]
+    while parents[index] != root:
+        parents[index], index = root, parents[index]
+    return root
+
+
+def cluster_near_duplicates(texts, threshold=0.8, num_perm=128, bands=16, seed=1):
+    """
+    Group near-duplicate texts.
+
+    Each band of the signature is hashed into a bucket; a text joins the cluster
+    of the first text in a shared bucket when their estimated Jaccard similarity
+    is at least `threshold`, so every text is compared a bounded number of times.
+
+    Args:
+        texts: Comment bodies
+        threshold: Minimum estimated Jaccard similarity of word-bigram sets
+        num_perm: MinHash signature length (must be divisible by `bands`)
+        bands: LSH bands; more bands find lower-similarity candidates
+
+    Returns:
+        List where entry i is the index of the representative (first member) of
+        text i's cluster; i itself when the text has no near-duplicate
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    rows_per_band = num_perm // bands
+    signatures = MinHasher(num_perm, seed).signatures(texts)
+    parents = list(range(len(texts)))
+
+    for band in range(bands):
+        band_values = np.ascontiguousarray(signatures[:, band * rows_per_band:(band + 1) * rows_per_band])
+        buckets = {}
+        for index in range(len(texts)):
+            key = band_values[index].tobytes()
+            first = buckets.setdefault(key, index)
+            if first == index:
+                continue
+            root, other = _find(parents, index), _find(parents, first)
+            if root == other:
+                continue
+            if np.count_nonzero(signatures[index] == signatures[first]) >= threshold * num_perm:
+                # The earliest comment stays the representative
+                parents[max(root, other)] = min(root, other)
+
+    return [_find(parents, index) for index in range(len(texts))]
+
+
+def cluster_summary(labels):
+    """Counts of texts, clusters and duplicates for a cluster_near_duplicates result."""
+    clusters = len(set(labels))
+    sizes = np.bincount(labels) if labels else np.zeros(0, dtype=np.int64)
+    return {
+        'comments': len(labels),
+        'clusters': clusters,
+        'duplicates': len(labels) - clusters,
+        'largest_cluster': int(sizes.max()) if len(sizes) else 0
+    }
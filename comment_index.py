@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Persistent seen-comment index for incremental crawls.
+Keeps last-seen score/edited state per (result file, submission, comment) and a
+per-submission high-water mark in SQLite, so repeat crawls only emit new or changed comments.
+"""
+import glob
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from result_stream import load_result
+
+DEFAULT_INDEX_PATH = os.path.join("results", "comment_index.sqlite")
+# Scores keep moving without new comments, so an unchanged thread is still re-crawled after this long
+DEFAULT_MAX_AGE_HOURS = 6
+
+
+class CommentIndex:
+    """
+    SQLite-backed record of every comment already emitted, keyed by scope, submission and comment id.
+
+    The scope is the result file the comments are merged into, so two searches that
+    hit the same thread each keep their own seen set. New state is staged by
+    `stage` and only written by `commit`, once the result holding the delta is saved.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, max_age_hours=DEFAULT_MAX_AGE_HOURS, scope=''):
+        """
+        Args:
+            path: SQLite file holding the index
+            max_age_hours: Re-crawl a thread whose last crawl is older than this even when its
+                comment count is unchanged (None: only the comment count decides)
+            scope: Output filename the crawled comments are merged into
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.scope = scope
+        self.max_age = timedelta(hours=max_age_hours) if max_age_hours is not None else None
+        self._lock = threading.Lock()
+        self._staged = []
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS submissions (
+                    scope TEXT NOT NULL,
+                    submission_id TEXT NOT NULL,
+                    num_comments INTEGER,
+                    high_water_utc TEXT,
+                    last_crawled_at TEXT,
+                    PRIMARY KEY (scope, submission_id)
+                );
+                CREATE TABLE IF NOT EXISTS comments (
+                    scope TEXT NOT NULL,
+                    submission_id TEXT NOT NULL,
+                    comment_id TEXT NOT NULL,
+                    score INTEGER,
+                    edited TEXT,
+                    created_utc TEXT,
+                    PRIMARY KEY (scope, submission_id, comment_id)
+                );
+            """)
+
+    def close(self):
+        """Close the database; staged but uncommitted state is dropped."""
+        self._staged = []
+        self.conn.close()
+
+    def submission_state(self, submission_id):
+        """Return {'num_comments', 'high_water_utc', 'last_crawled_at'} or None if never crawled."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT num_comments, high_water_utc, last_crawled_at FROM submissions "
+                "WHERE scope = ? AND submission_id = ?",
+                (self.scope, submission_id)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'num_comments': row[0], 'high_water_utc': row[1], 'last_crawled_at': row[2]}
+
+    def is_unchanged(self, submission_id, num_comments, now=None):
+        """
+        True if the submission can be skipped: it was crawled before, Reddit reports the same
+        comment count and the last crawl is not older than `max_age`.
+
+        The comment count misses score changes and edits, which is what `max_age` bounds.
+        """
+        state = self.submission_state(submission_id)
+        if state is None or state['num_comments'] != num_comments:
+            return False
+        if self.max_age is None:
+            return True
+        if not state['last_crawled_at']:
+            return False
+        last_crawled = datetime.fromisoformat(state['last_crawled_at'])
+        return (now or datetime.now()) - last_crawled <= self.max_age
+
+    def stage(self, submission_id, num_comments, comments):
+        """
+        Return the new or changed comments and stage their state for the next `commit`.
+
+        Args:
+            submission_id: Submission the comments belong to
+            num_comments: Comment count Reddit reported for the submission
+            comments: Comment dicts in the extract_comments format
+
+        Returns:
+            List of comment dicts that were not indexed yet or whose score/edited state changed
+        """
+        with self._lock:
+            known = {
+                row[0]: (row[1], row[2])
+                for row in self.conn.execute(
+                    "SELECT comment_id, score, edited FROM comments WHERE scope = ? AND submission_id = ?",
+                    (self.scope, submission_id)
+                )
+            }
+            delta = []
+            rows = []
+            high_water = None
+            for comment in comments:
+                edited = str(comment.get('edited'))
+                if known.get(comment['id']) != (comment.get('score'), edited):
+                    delta.append(comment)
+                rows.append((self.scope, submission_id, comment['id'], comment.get('score'), edited,
+                             comment.get('created_utc')))
+                if high_water is None or comment.get('created_utc', '') > high_water:
+                    high_water = comment.get('created_utc')
+            self._staged.append((rows, (self.scope, submission_id, num_comments, high_water,
+                                        datetime.now().isoformat())))
+        return delta
+
+    def commit(self):
+        """Write everything staged since the last commit in one transaction."""
+        with self._lock:
+            staged, self._staged = self._staged, []
+            with self.conn:
+                for rows, submission in staged:
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO comments (scope, submission_id, comment_id, score, edited, created_utc) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        rows
+                    )
+                    self.conn.execute(
+                        """INSERT INTO submissions (scope, submission_id, num_comments, high_water_utc, last_crawled_at)
+                           VALUES (?, ?, ?, ?, ?)
+                           ON CONFLICT(scope, submission_id) DO UPDATE SET
+                               num_comments = excluded.num_comments,
+                               high_water_utc = MAX(COALESCE(submissions.high_water_utc, ''),
+                                                    COALESCE(excluded.high_water_utc, '')),
+                               last_crawled_at = excluded.last_crawled_at""",
+                        submission
+                    )
+
+    def record(self, submission_id, num_comments, comments):
+        """`stage` and `commit` at once; returns the new or changed comments."""
+        delta = self.stage(submission_id, num_comments, comments)
+        self.commit()
+        return delta
+
+
+def find_previous_result(filename, results_root="results"):
+    """Return the newest results/<date>/<filename> document, or None if there is none."""
+    candidates = glob.glob(os.path.join(results_root, "*", filename))
+    if not candidates:
+        return None
+    latest = max(candidates, key=os.path.getmtime)
+    try:
+        return load_result(latest)
+    except (OSError, ValueError) as e:
+        print(f"Could not read previous result {latest}: {e}")
+        return None
+
+
+def merge_posts(previous_posts, delta_posts):
+    """
+    Merge freshly crawled new/changed comments into the posts of a previous result.
+
+    Changed comments replace their old version in place, new comments are appended,
+    and post-level fields are taken from the fresh crawl.
+
+    Returns:
+        List of merged post dictionaries
+    """
+    merged = {post['id']: post for post in previous_posts}
+    for post in delta_posts:
+        base = merged.get(post['id'])
+        if base is None:
+            merged[post['id']] = post
+            continue
+        comments = base.get('comments', [])
+        positions = {comment['id']: i for i, comment in enumerate(comments)}
+        for comment in post.get('comments', []):
+            if comment['id'] in positions:
+                comments[positions[comment['id']]] = comment
+            else:
+                positions[comment['id']] = len(comments)
+                comments.append(comment)
+        updated = dict(post, comments=comments, comments_count=len(comments))
+        merged[post['id']] = updated
+    return list(merged.values())
@@ -1,16 +1,75 @@
+import argparse
+import asyncio
 import json
-from openai import OpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
 import time
 import sys
 import os
 from config import OPENAI_API_KEY
+from async_llm import AsyncLLMPool, estimate_tokens, run_bounded
+from classification_journal import ClassificationJournal
+from columnar_store import COLUMNAR_SUFFIX, is_columnar, write_columnar
+from comment_dedup import cluster_near_duplicates
+from comment_triage import agreement_report, sample_for_agreement, triage_comments, triage_result
+from llm_cache import DEFAULT_CACHE_PATH, LLMCache
+from result_stream import load_result
+from run_metrics import RunMetrics, httpx_event_hooks, timed
+
+MODEL = "gpt-4o"
+TEMPERATURE = 0.3
+SUMMARY_MAX_TOKENS = 150
+ANALYSIS_MAX_TOKENS = 200
+BATCH_ITEM_MAX_TOKENS = 60
+VALID_SENTIMENTS = {"positive", "neutral", "negative"}
+VALID_ACTIONS = {"buy", "sell", "hold", "na"}
+# Bump when a prompt or the parsing changes so cached results are not reused
+PROMPT_VERSION = "2"
+# Cache kinds of comment labels: the one-comment prompt and the batched JSON prompt can answer differently
+SINGLE_PROMPT = "comment"
+BATCH_PROMPT = "comment_batch"
 
 # 🔑 Initialize OpenAI client
 client = OpenAI(api_key=OPENAI_API_KEY)
 
+# 💾 Response cache, opened by main() unless --no-cache is given
+response_cache = None
+# 📓 Checkpoint journal of paid-for results, opened by main()
+journal = None
+# 📊 Stage timings and call/token counters, created by main()
+metrics = None
+
+def cache_lookup(kind, *inputs):
+    if response_cache is None:
+        return None
+    return response_cache.get(LLMCache.make_key(MODEL, TEMPERATURE, PROMPT_VERSION, kind, *inputs))
+
+def cache_store(kind, value, *inputs):
+    if response_cache is not None:
+        response_cache.put(LLMCache.make_key(MODEL, TEMPERATURE, PROMPT_VERSION, kind, *inputs), value)
+
+def cached_label(post_summary, comment_body, batched=False):
+    # Batched runs fall back to the one-comment prompt themselves, so they accept its labels too
+    if response_cache is None:
+        return None
+    kinds = (BATCH_PROMPT, SINGLE_PROMPT) if batched else (SINGLE_PROMPT,)
+    keys = [LLMCache.make_key(MODEL, TEMPERATURE, PROMPT_VERSION, kind, post_summary, comment_body) for kind in kinds]
+    return response_cache.get_any(keys)
+
+def record_usage(response):
+    if metrics is not None:
+        metrics.add("llm_calls")
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            metrics.add("llm_prompt_tokens", usage.prompt_tokens)
+            metrics.add("llm_completion_tokens", usage.completion_tokens)
+
+def count_metric(name, value=1):
+    if metrics is not None:
+        metrics.add(name, value)
+
 # 🧠 1. Summarize the post content
-def summarize_post(title, selftext):
-    prompt = f"""
+def build_post_prompt(title, selftext):
+    return f"""
 You are a financial summarizer. Given the title and selftext of a Reddit post, summarize its core message in 1-3 sentences.
 
 ### TITLE:
@@ -21,17 +80,25 @@ You are a financial summarizer. Given the title and selftext of a Reddit post, s
 
 Respond with just the summary text.
 """
+
+def summarize_post(title, selftext):
+    cached = cache_lookup("post", title, selftext)
+    if cached is not None:
+        return cached
     response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.3,
-        max_tokens=150
+        model=MODEL,
+        messages=[{"role": "user", "content": build_post_prompt(title, selftext)}],
+        temperature=TEMPERATURE,
+        max_tokens=SUMMARY_MAX_TOKENS
     )
-    return response.choices[0].message.content.strip()
+    record_usage(response)
+    summary = response.choices[0].message.content.strip()
+    cache_store("post", summary, title, selftext)
+    return summary
 
 # 🧠 2. Analyze comment with post summary
-def analyze_comment(comment_body, post_summary):
-    prompt = f"""
+def build_comment_prompt(comment_body, post_summary):
+    return f"""
 You are a financial assistant. Given a Reddit comment and the post summary it is replying to, analyze it and respond with exactly 3 lines:
 
 SUMMARY: [1-sentence summary of the comment]
@@ -46,20 +113,12 @@ ACTION: [buy/sell/hold/NA]
 
 Remember: Respond with exactly 3 lines starting with SUMMARY:, SENTIMENT:, and ACTION:
 """
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.3,
-        max_tokens=200
-    )
-    
-    raw_content = response.choices[0].message.content.strip()
-    print(f"    📝 Raw response: {raw_content}")
-    
+
+def parse_comment_analysis(raw_content):
     # Parse the 3 lines
     lines = raw_content.split('\n')
     result = {}
-    
+
     for line in lines:
         line = line.strip()
         if line.startswith('SUMMARY:'):
@@ -68,69 +127,603 @@ Remember: Respond with exactly 3 lines starting with SUMMARY:, SENTIMENT:, and A
             result['sentiment'] = line[10:].strip().lower()
         elif line.startswith('ACTION:'):
             result['stock_action'] = line[7:].strip().lower()
-    
+
     # Set defaults if missing
     result['summary'] = result.get('summary', 'No summary available')
     result['sentiment'] = result.get('sentiment', 'neutral')
     result['stock_action'] = result.get('stock_action', 'na')
-    
+
     return result
 
-# Get input file from command line or use default
-if len(sys.argv) > 1:
-    input_file = sys.argv[1]
-else:
-    input_file = "results/google stock/reddit_google_stock_day_hot.json"
+def analyze_comment(comment_body, post_summary):
+    # Always an API call; callers check cached_label first
+    response = client.chat.completions.create(
+        model=MODEL,
+        messages=[{"role": "user", "content": build_comment_prompt(comment_body, post_summary)}],
+        temperature=TEMPERATURE,
+        max_tokens=ANALYSIS_MAX_TOKENS
+    )
+    record_usage(response)
+
+    raw_content = response.choices[0].message.content.strip()
+    print(f"    📝 Raw response: {raw_content}")
+
+    result = parse_comment_analysis(raw_content)
+    cache_store(SINGLE_PROMPT, result, post_summary, comment_body)
+    return result
+
+# 🧠 3. Analyze several comments of the same post in one request
+def build_batch_prompt(items, post_summary):
+    comments = json.dumps([{"id": key, "text": comment["body"]} for key, comment in items], ensure_ascii=False)
+    return f"""
+You are a financial assistant. Given the summary of a Reddit post and a JSON list of comments replying to it, analyze every comment.
+
+### POST SUMMARY:
+{post_summary}
+
+### COMMENTS:
+{comments}
+
+Respond with a JSON object only, in this form:
+{{"results": [{{"id": "<comment id>", "summary": "<1-sentence summary>", "sentiment": "positive|neutral|negative", "action": "buy|sell|hold|NA"}}]}}
+Include exactly one result for every comment id.
+"""
+
+def parse_batch_response(raw_content, expected_ids):
+    # Drop markdown fences some models wrap around JSON
+    text = raw_content.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.find("{"):]
+    entries = json.loads(text).get("results", [])
+
+    results = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        key = str(entry.get("id", ""))
+        sentiment = str(entry.get("sentiment", "")).strip().lower()
+        action = str(entry.get("action", "")).strip().lower()
+        if key not in expected_ids or sentiment not in VALID_SENTIMENTS or action not in VALID_ACTIONS:
+            continue
+        results[key] = {
+            "summary": str(entry.get("summary") or "No summary available").strip(),
+            "sentiment": sentiment,
+            "stock_action": action
+        }
+    return results
+
+def plan_batches(comments, token_budget=3000, max_batch_size=25):
+    """Group comments into batches whose estimated prompt size stays under token_budget."""
+    batches = []
+    current = []
+    current_tokens = 0
+    for position, comment in enumerate(comments):
+        key = str(comment.get("id") or f"i{position}")
+        tokens = estimate_tokens(comment.get("body", "")) + 10
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append((key, comment))
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+# 🧾 Write results back into the comment dicts
+def apply_result(comment, result):
+    comment["summary"] = result["summary"]
+    comment["sentiment"] = result["sentiment"]
+    comment["stock_action"] = result["stock_action"]
+
+def apply_error(comment, e):
+    comment["summary"] = ""
+    if isinstance(e, json.JSONDecodeError):
+        comment["sentiment"] = "json_error"
+        comment["error"] = f"JSON parsing error: {str(e)}"
+    else:
+        comment["sentiment"] = "error"
+        comment["error"] = str(e)
+    comment["stock_action"] = "NA"
+
+def selected_comments(post, max_comments):
+    comments = post.get("comments", [])
+    comments = comments[:max_comments] if max_comments else comments
+    if journal is not None:
+        # Comments restored from the journal were already paid for
+        comments = [comment for comment in comments if comment_key(post, comment) not in journal.results]
+    return comments
+
+# 📓 Checkpointing
+def post_key(post):
+    return str(post.get("id") or post.get("title", ""))
 
-print(f"🔄 Processing: {input_file}")
+def comment_key(post, comment):
+    return f"{post_key(post)}/{comment.get('id', '')}"
 
-# Load Reddit data
-with open(input_file, "r") as f:
-    reddit_data = json.load(f)
+def record_summary(post):
+    if journal is not None:
+        journal.record_summary(post_key(post), post["post_summary"])
 
-# Process each post
-for post in reddit_data["posts"]:
+def record_result(post, comment):
+    if journal is not None:
+        result = {
+            "summary": comment["summary"],
+            "sentiment": comment["sentiment"],
+            "stock_action": comment["stock_action"]
+        }
+        if "cluster_id" in comment:
+            result["cluster_id"] = comment["cluster_id"]
+        journal.record_result(comment_key(post, comment), result)
+
+def restore_from_journal(reddit_data):
+    """Apply journaled summaries and results to reddit_data; returns the number of comments restored."""
+    restored = 0
+    for post in reddit_data["posts"]:
+        if post_key(post) in journal.summaries:
+            post["post_summary"] = journal.summaries[post_key(post)]
+        for comment in post.get("comments", []):
+            result = journal.results.get(comment_key(post, comment))
+            if result is not None:
+                apply_result(comment, result)
+                if "cluster_id" in result:
+                    comment["cluster_id"] = result["cluster_id"]
+                restored += 1
+    return restored
+
+# 🧹 Local triage: label trivial comments without calling the LLM
+def triage_items(items, sample_size=20):
+    reasons = triage_comments(comment.get("body", "") for _, comment in items)
+    triaged = [i for i, reason in enumerate(reasons) if reason]
+    sampled = sample_for_agreement(triaged, sample_size)
+    to_classify = []
+    checks = []
+    for i, (item, reason) in enumerate(zip(items, reasons)):
+        if reason is None:
+            to_classify.append(item)
+        elif i in sampled:
+            # Still sent to the LLM so the local label can be compared with it
+            checks.append((item[1], triage_result(reason)))
+            to_classify.append(item)
+        else:
+            apply_result(item[1], triage_result(reason))
+            item[1]["triage"] = reason
+    count_metric("triage_labelled", len(triaged) - len(sampled))
+    print(f"🧹 Triage: {len(triaged)}/{len(items)} comments labelled locally, {len(sampled)} sampled for agreement")
+    return to_classify, checks
+
+def report_triage(checks):
+    pairs = [(local, comment) for comment, local in checks if comment.get("sentiment") not in ("error", "json_error")]
+    report = agreement_report(pairs)
+    if report["sampled"]:
+        print(f"🧹 Triage agreement on {report['sampled']} sampled comments: "
+              f"sentiment {report['sentiment_agreement'] * 100:.0f}%, "
+              f"action {report['action_agreement'] * 100:.0f}%, both {report['full_agreement'] * 100:.0f}%")
+    return report
+
+# 🧬 Near-duplicate clustering: classify one representative per cluster
+def dedup_items(items, threshold=0.8):
+    """Returns (representatives, clusters) where clusters lists (post, representative, duplicates)."""
+    by_post = {}
+    for index, (post, _) in enumerate(items):
+        by_post.setdefault(id(post), []).append(index)
+
+    representatives = []
+    clusters = []
+    # Clustered per post so a copied label was judged against the same post summary
+    for indices in by_post.values():
+        labels = cluster_near_duplicates([items[i][1].get("body", "") for i in indices], threshold)
+        members = {}
+        for position, label in enumerate(labels):
+            members.setdefault(label, []).append(indices[position])
+        for group in members.values():
+            post, representative = items[group[0]]
+            representatives.append(items[group[0]])
+            if len(group) > 1:
+                for i in group:
+                    items[i][1]["cluster_id"] = representative.get("id", "")
+                clusters.append((post, representative, [items[i][1] for i in group[1:]]))
+    count_metric("dedup_skipped", len(items) - len(representatives))
+    print(f"🧬 Dedup: {len(items)} comments in {len(representatives)} clusters, "
+          f"{len(items) - len(representatives)} near-duplicates skipped")
+    return representatives, clusters
+
+def spread_cluster_labels(clusters):
+    """Copy each representative's label to its near-duplicates; returns the number of comments labelled."""
+    labelled = 0
+    for post, representative, duplicates in clusters:
+        for comment in duplicates:
+            for field in ("summary", "sentiment", "stock_action", "error"):
+                if field in representative:
+                    comment[field] = representative[field]
+            if "error" not in representative:
+                record_result(post, comment)
+            labelled += 1
+    return labelled
+
+# 🐢 Sequential mode: one request at a time
+def process_posts(reddit_data, max_comments=10, triage=False, triage_sample=20, dedup=False, dedup_threshold=0.8):
+    checks = []
+    for post in reddit_data["posts"]:
+        try:
+            if journal is not None and post_key(post) in journal.summaries:
+                post_summary = journal.summaries[post_key(post)]
+                post["post_summary"] = post_summary
+            else:
+                with timed(metrics, "summarize_posts"):
+                    post_summary = summarize_post(post["title"], post.get("selftext", ""))
+                post["post_summary"] = post_summary
+                record_summary(post)
+            print(f"\nPOST: {post['title'][:80]}...")
+            print(f"SUMMARY: {post_summary}")
+
+            comments = selected_comments(post, max_comments)
+            if triage:
+                with timed(metrics, "triage"):
+                    to_classify, post_checks = triage_items([(post, c) for c in comments], triage_sample)
+                comments = [comment for _, comment in to_classify]
+                checks.extend(post_checks)
+            clusters = []
+            if dedup:
+                with timed(metrics, "dedup"):
+                    representatives, clusters = dedup_items([(post, c) for c in comments], dedup_threshold)
+                comments = [comment for _, comment in representatives]
+
+            with timed(metrics, "classify_comments"):
+                for comment in comments:
+                    cached = cached_label(post_summary, comment["body"])
+                    if cached is not None:
+                        apply_result(comment, cached)
+                        record_result(post, comment)
+                        print(f"  💾 {cached['sentiment']}/{cached['stock_action']} (cached)")
+                        continue
+                    try:
+                        print(f"  🔄 Processing comment: {comment['body'][:50]}...")
+                        result = analyze_comment(comment["body"], post_summary)
+                        apply_result(comment, result)
+                        record_result(post, comment)
+                        print(f"  ✓ {result['sentiment']}/{result['stock_action']}")
+                    except json.JSONDecodeError as e:
+                        apply_error(comment, e)
+                        print(f"  ✗ JSON Error: {str(e)}")
+                        print(f"  Raw response might not be valid JSON")
+                    except Exception as e:
+                        apply_error(comment, e)
+                        print(f"  ✗ Comment error: {str(e)}")
+                        print(f"  Comment length: {len(comment['body'])} chars")
+                    # Only requests that reached the API count against the rate limit
+                    time.sleep(0.5)
+                    count_metric("rate_limit_sleep_seconds", 0.5)
+                spread_cluster_labels(clusters)
+        except Exception as e:
+            post["post_summary"] = ""
+            post["error"] = str(e)
+            print(f"  ✗ Post error")
+            continue
+
+    if triage:
+        report_triage(checks)
+
+# 🌊 Streaming callers (pipeline.py, live_sentiment.py): one post's comments on a shared pool
+async def summarize_post_async(pool, title, selftext):
+    summary = cache_lookup("post", title, selftext)
+    if summary is None:
+        summary = await pool.complete(build_post_prompt(title, selftext), SUMMARY_MAX_TOKENS)
+        cache_store("post", summary, title, selftext)
+    return summary
+
+async def classify_post_comments(pool, post_summary, comments, max_batch_size=25):
+    """Label comments replying to one post: cached results first, then batched prompts of up to max_batch_size."""
+    pending = []
+    for comment in comments:
+        cached = cached_label(post_summary, comment["body"], batched=max_batch_size > 1)
+        if cached is not None:
+            apply_result(comment, cached)
+        else:
+            pending.append(comment)
+
+    async def classify_one(comment):
+        try:
+            raw_content = await pool.complete(build_comment_prompt(comment["body"], post_summary), ANALYSIS_MAX_TOKENS)
+            result = parse_comment_analysis(raw_content)
+            apply_result(comment, result)
+            cache_store(SINGLE_PROMPT, result, post_summary, comment["body"])
+        except Exception as e:
+            apply_error(comment, e)
+
+    async def classify_batch(batch):
+        if len(batch) == 1:
+            await classify_one(batch[0])
+            return
+        items = [(str(comment.get("id") or f"i{position}"), comment) for position, comment in enumerate(batch)]
+        try:
+            raw_content = await pool.complete(
+                build_batch_prompt(items, post_summary),
+                BATCH_ITEM_MAX_TOKENS * len(items) + 50,
+                response_format={"type": "json_object"})
+        except Exception as e:
+            for comment in batch:
+                apply_error(comment, e)
+            return
+        try:
+            results = parse_batch_response(raw_content, {key for key, _ in items})
+        except (ValueError, AttributeError):
+            results = {}
+        missing = []
+        for key, comment in items:
+            if key in results:
+                apply_result(comment, results[key])
+                cache_store(BATCH_PROMPT, results[key], post_summary, comment["body"])
+            else:
+                missing.append(comment)
+        # Whatever the batch answer left out is retried one comment at a time
+        await asyncio.gather(*(classify_one(comment) for comment in missing))
+
+    size = max(1, max_batch_size)
+    await asyncio.gather(*(classify_batch(pending[start:start + size]) for start in range(0, len(pending), size)))
+
+# ⚡ Async mode: bounded worker pool under RPM/TPM limits
+async def process_posts_async(reddit_data, max_comments=0, concurrency=16, requests_per_minute=500,
+                              tokens_per_minute=150000, batch_tokens=0, max_batch_size=25, triage=False,
+                              triage_sample=20, dedup=False, dedup_threshold=0.8):
+    http_client = None
+    if metrics is not None:
+        http_client = DefaultAsyncHttpxClient(event_hooks=httpx_event_hooks(metrics, "llm", asynchronous=True))
+    pool = AsyncLLMPool(
+        AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=http_client, max_retries=0),
+        model=MODEL,
+        temperature=TEMPERATURE,
+        concurrency=concurrency,
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute
+    )
+    posts = reddit_data["posts"]
+
+    async def summarize(post):
+        title, selftext = post["title"], post.get("selftext", "")
+        if journal is not None and post_key(post) in journal.summaries:
+            return
+        try:
+            summary = cache_lookup("post", title, selftext)
+            if summary is None:
+                summary = await pool.complete(build_post_prompt(title, selftext), SUMMARY_MAX_TOKENS)
+                cache_store("post", summary, title, selftext)
+            post["post_summary"] = summary
+            record_summary(post)
+            print(f"\nPOST: {post['title'][:80]}...")
+            print(f"SUMMARY: {post['post_summary']}")
+        except Exception as e:
+            post["post_summary"] = ""
+            post["error"] = str(e)
+            print(f"  ✗ Post error: {str(e)}")
+
+    with timed(metrics, "summarize_posts"):
+        await asyncio.gather(*(summarize(post) for post in posts))
+
+    items = [(post, comment) for post in posts if post.get("post_summary")
+             for comment in selected_comments(post, max_comments)]
+    print(f"\n🔄 Classifying {len(items)} comments with {concurrency} workers...")
+    done = 0
+
+    checks = []
+    candidates = items
+    if triage:
+        with timed(metrics, "triage"):
+            candidates, checks = triage_items(items, triage_sample)
+        done = len(items) - len(candidates)
+    clusters = []
+    if dedup:
+        with timed(metrics, "dedup"):
+            candidates, clusters = dedup_items(candidates, dedup_threshold)
+
+    # Cached results are applied up front so only uncached comments reach the API
+    pending = []
+    for post, comment in candidates:
+        cached = cached_label(post["post_summary"], comment["body"], batched=bool(batch_tokens))
+        if cached is not None:
+            apply_result(comment, cached)
+            done += 1
+        else:
+            pending.append((post, comment))
+    cache_hits = len(candidates) - len(pending)
+    if cache_hits:
+        print(f"💾 {cache_hits} comments answered from cache")
+
+    def report(count):
+        nonlocal done
+        previous = done
+        done += count
+        if done // 100 > previous // 100 or done == len(items):
+            print(f"  ✓ {done}/{len(items)} comments classified")
+
+    async def classify(item):
+        post, comment = item
+        try:
+            raw_content = await pool.complete(
+                build_comment_prompt(comment["body"], post["post_summary"]), ANALYSIS_MAX_TOKENS)
+            result = parse_comment_analysis(raw_content)
+            apply_result(comment, result)
+            record_result(post, comment)
+            cache_store(SINGLE_PROMPT, result, post["post_summary"], comment["body"])
+        except Exception as e:
+            apply_error(comment, e)
+        report(1)
+
+    async def classify_batch(item):
+        post, batch = item
+        if len(batch) == 1:
+            await classify((post, batch[0][1]))
+            return
+        try:
+            raw_content = await pool.complete(
+                build_batch_prompt(batch, post["post_summary"]),
+                BATCH_ITEM_MAX_TOKENS * len(batch) + 50,
+                response_format={"type": "json_object"})
+        except Exception as e:
+            for _, comment in batch:
+                apply_error(comment, e)
+            report(len(batch))
+            return
+        try:
+            results = parse_batch_response(raw_content, {key for key, _ in batch})
+        except (ValueError, AttributeError):
+            results = {}
+
+        missing = []
+        for key, comment in batch:
+            if key in results:
+                apply_result(comment, results[key])
+                record_result(post, comment)
+                cache_store(BATCH_PROMPT, results[key], post["post_summary"], comment["body"])
+            else:
+                missing.append((key, comment))
+        report(len(batch) - len(missing))
+
+        # Split whatever came back missing or malformed and try again in smaller batches
+        if missing:
+            half = (len(missing) + 1) // 2
+            await asyncio.gather(*(classify_batch((post, part)) for part in (missing[:half], missing[half:]) if part))
+
+    if batch_tokens:
+        by_post = {}
+        for post, comment in pending:
+            by_post.setdefault(id(post), (post, []))[1].append(comment)
+        work = [(post, batch) for post, comments in by_post.values()
+                for batch in plan_batches(comments, batch_tokens, max_batch_size)]
+        print(f"📦 Packed into {len(work)} batched requests (budget {batch_tokens} tokens)")
+        worker = classify_batch
+    else:
+        work = pending
+        worker = classify
+
+    started = time.time()
+    with timed(metrics, "classify_comments"):
+        await run_bounded(work, worker, concurrency)
+        if clusters:
+            report(spread_cluster_labels(clusters))
+    if triage:
+        report_triage(checks)
+    stats = pool.stats()
+    if metrics is not None:
+        metrics.update("llm", stats)
+    print(f"\n⏱️  {done} comments in {time.time() - started:.1f}s | {stats['calls']} calls, "
+          f"{stats['retries']} retries, {stats['prompt_tokens'] + stats['completion_tokens']} tokens")
+    return stats
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(description='Summarize Reddit posts and classify comment sentiment with an LLM')
+    parser.add_argument('input_file', nargs='?', default="results/google stock/reddit_google_stock_day_hot.json",
+                        help='Result file from reddit_search.py (.json or .jsonl)')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='Classify concurrently with the async client (default: sequential)')
+    parser.add_argument('--max-comments', type=int, default=None,
+                        help='Comments per post to classify, 0 for all (default: 10 sequential, all async)')
+    parser.add_argument('--concurrency', type=int, default=16, help='Async requests in flight (default: 16)')
+    parser.add_argument('--rpm', type=int, default=500, help='Requests per minute limit (default: 500)')
+    parser.add_argument('--tpm', type=int, default=150000, help='Tokens per minute limit (default: 150000)')
+    parser.add_argument('--batch-tokens', type=int, default=0,
+                        help='Pack comments of a post into one request up to this many prompt tokens (default: 0, off)')
+    parser.add_argument('--max-batch-size', type=int, default=25, help='Comments per batched request (default: 25)')
+    parser.add_argument('--triage', action='store_true',
+                        help='Label deleted, emoji-only and trivial comments locally instead of with the LLM')
+    parser.add_argument('--triage-sample', type=int, default=20,
+                        help='Locally labelled comments also sent to the LLM to measure agreement (default: 20)')
+    parser.add_argument('--dedup', action='store_true',
+                        help='Classify one representative per cluster of near-duplicate comments and copy its label')
+    parser.add_argument('--dedup-threshold', type=float, default=0.8,
+                        help='Minimum estimated Jaccard similarity for near-duplicates (default: 0.8)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue an interrupted run from its checkpoint journal instead of starting over')
+    parser.add_argument('--overwrite', action='store_true',
+                        help='Discard the checkpoint journal of an interrupted run and start over')
+    parser.add_argument('--cache-path', default=DEFAULT_CACHE_PATH,
+                        help=f'On-disk LLM result cache (default: {DEFAULT_CACHE_PATH})')
+    parser.add_argument('--cache-max-mb', type=int, default=500, help='Evict entries beyond this size (default: 500)')
+    parser.add_argument('--cache-max-age-days', type=int, default=30,
+                        help='Drop entries older than this, 0 to keep forever (default: 30)')
+    parser.add_argument('--cache-bypass', action='store_true',
+                        help='Ignore cached results but store fresh ones')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the result cache entirely')
+    parser.add_argument('--metrics-out',
+                        help='Also write run metrics (stage timings, LLM calls, tokens, bytes, retries) to this file '
+                             '(*.prom: Prometheus text format, otherwise JSON)')
+    return parser
+
+def main():
+    global client, response_cache, journal, metrics
+    parser = create_argument_parser()
+    args = parser.parse_args()
+    if args.resume and args.overwrite:
+        parser.error("--resume and --overwrite cannot be combined")
+    input_file = args.input_file
+    metrics = RunMetrics("comment_summerizer")
+    client = OpenAI(api_key=OPENAI_API_KEY, http_client=DefaultHttpxClient(event_hooks=httpx_event_hooks(metrics, "llm")))
+
+    # Save to same folder as input
+    input_dir = os.path.dirname(input_file)
+    input_name = os.path.splitext(os.path.basename(input_file))[0]
+    # Columnar input gets columnar output so downstream reads stay column-selective
+    output_suffix = COLUMNAR_SUFFIX if is_columnar(input_file) else '.json'
+    output_file = os.path.join(input_dir, f"{input_name}_summarized{output_suffix}")
+
+    if not args.no_cache:
+        response_cache = LLMCache(args.cache_path, args.cache_max_mb * 1024 * 1024,
+                                  args.cache_max_age_days, bypass=args.cache_bypass)
+
+    print(f"🔄 Processing: {input_file}")
+
+    # Load Reddit data (.json document or streamed .jsonl)
+    with metrics.stage("load"):
+        reddit_data = load_result(input_file)
+    metrics.set("comments", sum(len(post.get("comments", [])) for post in reddit_data["posts"]))
+
+    # 📓 Every paid-for result is journaled so an interrupted run can be resumed
     try:
-        post_summary = summarize_post(post["title"], post.get("selftext", ""))
-        post["post_summary"] = post_summary
-        print(f"\nPOST: {post['title'][:80]}...")
-        print(f"SUMMARY: {post_summary}")
-        
-        for comment in post.get("comments", [])[:10]:  # Max 10 comments
-            try:
-                print(f"  🔄 Processing comment: {comment['body'][:50]}...")
-                result = analyze_comment(comment["body"], post_summary)
-                comment["summary"] = result["summary"]
-                comment["sentiment"] = result["sentiment"]
-                comment["stock_action"] = result["stock_action"]
-                print(f"  ✓ {result['sentiment']}/{result['stock_action']}")
-            except json.JSONDecodeError as e:
-                comment["summary"] = ""
-                comment["sentiment"] = "json_error"
-                comment["stock_action"] = "NA"
-                comment["error"] = f"JSON parsing error: {str(e)}"
-                print(f"  ✗ JSON Error: {str(e)}")
-                print(f"  Raw response might not be valid JSON")
-            except Exception as e:
-                comment["summary"] = ""
-                comment["sentiment"] = "error"
-                comment["stock_action"] = "NA"
-                comment["error"] = str(e)
-                print(f"  ✗ Comment error: {str(e)}")
-                print(f"  Comment length: {len(comment['body'])} chars")
-            time.sleep(0.5)
-    except Exception as e:
-        post["post_summary"] = ""
-        post["error"] = str(e)
-        print(f"  ✗ Post error")
-        continue
-
-# Save to same folder as input
-input_dir = os.path.dirname(input_file)
-input_name = os.path.splitext(os.path.basename(input_file))[0]
-output_file = os.path.join(input_dir, f"{input_name}_summarized.json")
-
-with open(output_file, "w") as f:
-    json.dump(reddit_data, f, indent=2)
-
-print(f"\n✅ Saved: {output_file}")
+        journal = ClassificationJournal(f"{output_file}.journal", resume=args.resume, overwrite=args.overwrite)
+    except FileExistsError as e:
+        sys.exit(f"📓 {e}: re-run with --resume to continue it or --overwrite to start over")
+    if args.resume:
+        restored = restore_from_journal(reddit_data)
+        metrics.set("comments_restored", restored)
+        print(f"📓 Resumed {restored} comments and {len(journal.summaries)} post summaries from {journal.path}")
+
+    try:
+        if args.use_async or args.batch_tokens:
+            # Batched prompts go through the async driver; without --async only one request is in flight
+            max_comments = args.max_comments if args.max_comments is not None else (0 if args.use_async else 10)
+            concurrency = args.concurrency if args.use_async else 1
+            asyncio.run(process_posts_async(reddit_data, max_comments, concurrency, args.rpm, args.tpm,
+                                            args.batch_tokens, args.max_batch_size, args.triage, args.triage_sample,
+                                            args.dedup, args.dedup_threshold))
+        else:
+            max_comments = args.max_comments if args.max_comments is not None else 10
+            process_posts(reddit_data, max_comments, args.triage, args.triage_sample, args.dedup, args.dedup_threshold)
+    except KeyboardInterrupt:
+        print(f"\n⏸️  Interrupted, progress kept in {journal.path}. Re-run with --resume to continue.")
+        sys.exit(130)
+    finally:
+        journal.close()
+        if response_cache is not None:
+            stats = response_cache.stats()
+            response_cache.close()
+            metrics.update("cache", stats)
+            print(f"💾 Cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate'] * 100:.1f}% hit rate)")
+
+    # Compaction: the output file now holds everything, so the journal can go
+    reddit_data.setdefault("metadata", {})["classification_metrics"] = metrics.as_dict()
+    with metrics.stage("save"):
+        if is_columnar(output_file):
+            write_columnar(output_file, reddit_data)
+        else:
+            with open(output_file, "w") as f:
+                json.dump(reddit_data, f, indent=2)
+    journal.discard()
+
+    print(f"\n✅ Saved: {output_file}")
+    metrics.print_report()
+    if args.metrics_out:
+        print(f"📊 Metrics written to {metrics.write(args.metrics_out)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Compact comment trees.
+One thread's comments are kept as parallel arrays (parent row, score,
+timestamps, flags) plus interned author, distinguished and permalink-prefix
+tables instead of one dict per comment, with the reply structure preserved.
+Subtree sums run level by level over the arrays, which is what thread-aware
+numbers such as reply-weighted sentiment or the controversy of each top-level
+comment need; comments can still be emitted in the extract_comments dict
+format.
+"""
+import sys
+from array import array
+from datetime import datetime
+
+import numpy as np
+
+# parent row of a top-level comment, and of a comment whose parent is not in the tree (yet)
+NO_PARENT = -1
+MISSING_PARENT = -2
+IS_SUBMITTER = 1
+VERBATIM_PERMALINK = 2
+SENTIMENT_VALUES = {'positive': 1, 'neutral': 0, 'negative': -1}
+
+
+class _Interned:
+    """Distinct values stored once, referenced by small integer codes."""
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def _timestamp(value):
+    # extract_comments stores local-time ISO strings; raw JSON has epoch seconds
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value).timestamp()
+
+
+class CommentTree:
+    """
+    Array-backed comments of one submission.
+
+    Rows are numbered in the order comments are appended. A comment may
+    arrive before its parent (morechildren batches, "continue this thread");
+    it is linked as soon as the parent is appended, and a parent that never
+    arrives leaves it as an extra root.
+    """
+
+    def __init__(self, link_id=None):
+        """
+        Args:
+            link_id: Fullname of the submission (t3_...); parents equal to it mark top-level comments
+        """
+        self.link_id = link_id
+        self.ids = []
+        self.bodies = []
+        self.parent = array('i')
+        self.score = array('i')
+        self.created = array('d')
+        self.edited = array('d')
+        self.author = array('I')
+        self.distinguished = array('B')
+        self.permalink = array('I')
+        self.flags = array('B')
+        self.authors = _Interned()
+        self.distinctions = _Interned()
+        self.permalink_prefixes = _Interned()
+        self._rows = {}
+        self._waiting = {}
+        # Rows whose parent has not arrived: its fullname, and Reddit's depth for the row when known
+        self._unresolved = {}
+        self._depth_hints = {}
+        self._derived = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, comment_id):
+        return comment_id in self._rows
+
+    def row(self, comment_id):
+        return self._rows[comment_id]
+
+    @classmethod
+    def from_comments(cls, comments, link_id=None):
+        """Build a tree from extract_comments dicts carrying `parent_id`; without it every comment is a root."""
+        tree = cls(link_id)
+        for comment in comments:
+            tree.append(comment)
+        return tree
+
+    def append(self, comment, parent_id=None):
+        """
+        Add one comment in the extract_comments dict format.
+
+        Args:
+            comment: Comment dict; created_utc may be an ISO string or epoch seconds, and
+                only `id` is required (e.g. for trees built from a report table)
+            parent_id: Fullname of the parent (t1_... or t3_...), default comment['parent_id']
+
+        Returns:
+            Row of the comment (the existing row when its id was added before)
+        """
+        comment_id = comment['id']
+        if comment_id in self._rows:
+            return self._rows[comment_id]
+        row = len(self.ids)
+        # Interned so the id shared with children's parent references is stored once
+        comment_id = sys.intern(comment_id)
+        self._rows[comment_id] = row
+        self.ids.append(comment_id)
+        self.bodies.append(comment.get('body', ''))
+
+        parent_id = parent_id or comment.get('parent_id')
+        if not isinstance(parent_id, str):
+            parent_id = ''
+        if parent_id.startswith('t1_'):
+            parent_row = self._rows.get(parent_id[3:], MISSING_PARENT)
+            if parent_row == MISSING_PARENT:
+                self._waiting.setdefault(sys.intern(parent_id[3:]), []).append(row)
+                self._unresolved[row] = parent_id
+                if comment.get('depth') is not None:
+                    self._depth_hints[row] = comment['depth']
+        else:
+            parent_row = NO_PARENT
+            if self.link_id is None and parent_id.startswith('t3_'):
+                self.link_id = parent_id
+        self.parent.append(parent_row)
+        for child in self._waiting.pop(comment_id, ()):
+            self.parent[child] = row
+            del self._unresolved[child]
+            self._depth_hints.pop(child, None)
+
+        self.score.append(int(comment.get('score') or 0))
+        self.created.append(_timestamp(comment['created_utc']) if comment.get('created_utc') else 0.0)
+        edited = comment.get('edited')
+        self.edited.append(float(edited) if edited and not isinstance(edited, bool) else (-1.0 if edited else 0.0))
+        self.author.append(self.authors.code(comment.get('author') or '[deleted]'))
+        self.distinguished.append(self.distinctions.code(comment.get('distinguished')))
+
+        flags = IS_SUBMITTER if comment.get('is_submitter') else 0
+        permalink = comment.get('permalink', '')
+        suffix = f"{comment_id}/"
+        if permalink.endswith(suffix):
+            self.permalink.append(self.permalink_prefixes.code(permalink[:-len(suffix)]))
+        else:
+            self.permalink.append(self.permalink_prefixes.code(permalink))
+            flags |= VERBATIM_PERMALINK
+        self.flags.append(flags)
+        self._derived.clear()
+        return row
+
+    # Structure
+
+    def parents(self):
+        """Parent row per comment as a NumPy view; NO_PARENT for roots and comments whose parent is missing."""
+        if 'parents' not in self._derived:
+            parents = np.array(self.parent, dtype=np.int32)
+            parents[parents == MISSING_PARENT] = NO_PARENT
+            self._derived['parents'] = parents
+        return self._derived['parents']
+
+    def depths(self):
+        """Depth per comment (0 = top level), from the parent links."""
+        if 'depths' not in self._derived:
+            parents = self.parents()
+            depths = np.zeros(len(self), np.int32)
+            frontier = np.flatnonzero(parents == NO_PARENT)
+            level = 0
+            child_order = self._child_order()
+            # Breadth-first over levels: every pass labels the children of the previous level
+            while frontier.size:
+                depths[frontier] = level
+                frontier = self._children_of(frontier, child_order)
+                level += 1
+            if self._depth_hints:
+                # Subtrees cut off from their parent start at the depth Reddit reported
+                offsets = np.zeros(len(self), np.int32)
+                offsets[list(self._depth_hints)] = list(self._depth_hints.values())
+                depths += offsets[self.roots()]
+            self._derived['depths'] = depths
+        return self._derived['depths']
+
+    def _child_order(self):
+        if 'child_order' not in self._derived:
+            parents = self.parents()
+            # Rows grouped by parent (stable, so siblings keep their arrival order)
+            order = np.argsort(parents, kind='stable')
+            starts = np.searchsorted(parents[order], np.arange(len(self) + 1))
+            self._derived['child_order'] = (order, starts)
+        return self._derived['child_order']
+
+    def _children_of(self, rows, child_order):
+        """Children of all `rows`, concatenated, without a Python loop over the rows."""
+        order, starts = child_order
+        counts = starts[rows + 1] - starts[rows]
+        offsets = np.repeat(starts[rows] - np.cumsum(counts) + counts, counts)
+        return order[offsets + np.arange(counts.sum())]
+
+    def children(self, row):
+        order, starts = self._child_order()
+        return order[starts[row]:starts[row + 1]]
+
+    def reply_counts(self):
+        """Direct replies per comment (extract_comments' num_replies)."""
+        if 'reply_counts' not in self._derived:
+            parents = self.parents()
+            self._derived['reply_counts'] = np.bincount(parents[parents >= 0], minlength=len(self))
+        return self._derived['reply_counts']
+
+    def roots(self):
+        """Top-level ancestor row of every comment."""
+        if 'roots' not in self._derived:
+            parents = self.parents()
+            roots = np.where(parents == NO_PARENT, np.arange(len(self)), parents)
+            # Pointer jumping: log2(depth) passes instead of one walk per comment
+            while True:
+                jumped = roots[roots]
+                if np.array_equal(jumped, roots):
+                    break
+                roots = jumped
+            self._derived['roots'] = roots
+        return self._derived['roots']
+
+    def subtree_sum(self, values):
+        """Sum of `values` over each comment and all of its descendants."""
+        totals = np.array(values, dtype=np.float64, copy=True)
+        parents = self.parents()
+        depths = self.depths()
+        # Deepest level first, so each child's total is complete before it is added to its parent
+        for level in range(int(depths.max(initial=0)), 0, -1):
+            rows = np.flatnonzero(depths == level)
+            # Orphans keep Reddit's depth but have no parent row to add into
+            rows = rows[parents[rows] >= 0]
+            np.add.at(totals, parents[rows], totals[rows])
+        return totals
+
+    def subtree_sizes(self):
+        """Comments in each subtree, the comment itself included."""
+        return self.subtree_sum(np.ones(len(self))).astype(np.int64)
+
+    def breadth_first(self):
+        """Rows in CommentForest.list() order: top-level comments, then each level below; orphans last."""
+        if not len(self):
+            return []
+        parents = np.array(self.parent, dtype=np.int32)
+        child_order = self._child_order()
+        # Each comment whose parent never arrived heads its own subtree after the real tree,
+        # like the comments whose parent was skipped in the raw engine
+        groups = [np.flatnonzero(parents == NO_PARENT)]
+        groups.extend(np.array([row]) for row in np.flatnonzero(parents == MISSING_PARENT).tolist())
+        ordered = []
+        for frontier in groups:
+            while frontier.size:
+                ordered.extend(frontier.tolist())
+                frontier = self._children_of(frontier, child_order)
+        return ordered
+
+    # Dict format
+
+    def comment(self, row):
+        """Comment `row` in the extract_comments dict format, plus parent_id and depth."""
+        return self._comment(row, self.reply_counts(), self.depths())
+
+    def _comment(self, row, reply_counts, depths):
+        edited = self.edited[row]
+        flags = self.flags[row]
+        prefix = self.permalink_prefixes.values[self.permalink[row]]
+        parent_row = self.parent[row]
+        if parent_row >= 0:
+            parent_id = f"t1_{self.ids[parent_row]}"
+        else:
+            parent_id = self.link_id if parent_row == NO_PARENT else self._unresolved[row]
+        return {
+            'id': self.ids[row],
+            'author': self.authors.values[self.author[row]],
+            'body': self.bodies[row],
+            'score': self.score[row],
+            'created_utc': datetime.fromtimestamp(self.created[row]).isoformat(),
+            'permalink': prefix if flags & VERBATIM_PERMALINK else f"{prefix}{self.ids[row]}/",
+            'is_submitter': bool(flags & IS_SUBMITTER),
+            'distinguished': self.distinctions.values[self.distinguished[row]],
+            'edited': edited if edited > 0 else bool(edited),
+            'num_replies': int(reply_counts[row]),
+            'parent_id': parent_id,
+            'depth': int(depths[row])
+        }
+
+    def iter_comments(self, rows=None):
+        """Yield comment dicts for `rows` (default: breadth-first order) one at a time."""
+        # Plain lists: indexing NumPy arrays per row would return NumPy scalars and cost more
+        reply_counts = self.reply_counts().tolist()
+        depths = self.depths().tolist()
+        for row in (self.breadth_first() if rows is None else rows):
+            yield self._comment(row, reply_counts, depths)
+
+    def to_comments(self):
+        return list(self.iter_comments())
+
+
+def thread_stats(tree, sentiments, top=None):
+    """
+    Per top-level comment: size, score and sentiment of the whole reply subtree.
+
+    Args:
+        tree: CommentTree of one post
+        sentiments: Label per row ('positive' / 'neutral' / 'negative'; anything else is unlabelled)
+        top: Keep only the `top` biggest threads
+
+    Returns:
+        List of dicts, biggest thread first, with
+        - replies: descendants of the top-level comment
+        - reply_weighted_sentiment: mean of +1/0/-1 over the thread, each comment
+          weighted by 1 + its direct replies (comments that drew replies count more)
+        - controversy: Reddit's (positive + negative) ** (minority / majority);
+          0 for one-sided threads, large for big evenly split ones
+    """
+    if not len(tree):
+        return []
+    values = np.array([SENTIMENT_VALUES.get(label, 0) for label in sentiments], dtype=np.float64)
+    labelled = np.array([label in SENTIMENT_VALUES for label in sentiments], dtype=np.float64)
+    weights = (1 + tree.reply_counts()) * labelled
+    sizes = tree.subtree_sizes()
+    weighted = tree.subtree_sum(values * weights)
+    weight_totals = tree.subtree_sum(weights)
+    positive = tree.subtree_sum(values > 0)
+    negative = tree.subtree_sum(values < 0)
+    scores = tree.subtree_sum(np.array(tree.score, dtype=np.float64))
+
+    stats = []
+    for row in np.flatnonzero(tree.parents() == NO_PARENT).tolist():
+        majority = max(positive[row], negative[row])
+        minority = min(positive[row], negative[row])
+        stats.append({
+            'id': tree.ids[row],
+            'author': tree.authors.values[tree.author[row]],
+            'body': tree.bodies[row],
+            'score': tree.score[row],
+            'sentiment': sentiments[row],
+            'replies': int(sizes[row] - 1),
+            'thread_score': int(scores[row]),
+            'positive': int(positive[row]),
+            'negative': int(negative[row]),
+            'reply_weighted_sentiment': round(float(weighted[row] / weight_totals[row]), 3) if weight_totals[row] else None,
+            'controversy': round(float((positive[row] + negative[row]) ** (minority / majority)), 2) if minority else 0.0
+        })
+    stats.sort(key=lambda thread: -thread['replies'])
+    return stats[:top] if top else stats
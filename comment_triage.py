@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Cheap local pre-classification of comments.
+Labels obviously trivial comments (deleted, emoji-only, one-word reactions)
+as neutral / NA with vectorized string checks over all bodies at once, so
+only comments that might carry a market opinion are sent to the LLM.
+"""
+import random
+
+import numpy as np
+import pandas as pd
+
+from ticker_extraction import default_extractor
+
+# Word stems matched with their inflections (buying, sells, shorted, loaded up, ...)
+FINANCE_LEXICON = [
+    'buy\\w*', 'bought', 'sell\\w*', 'sold', 'hold\\w*', 'hodl\\w*', 'short\\w*', 'long(?:s|ed|ing)?', 'load\\w*',
+    'call\\w*', 'puts?', 'options?', 'strikes?', 'expir\\w*', 'leaps', 'bull\\w*', 'bear\\w*', 'moon\\w*', 'tendies',
+    'yolo\\w*', 'earnings', 'dip\\w*', 'averag\\w*', 'trim\\w*', 'rall(?:y|ies|ied|ying)', 'crash\\w*', 'dump\\w*',
+    'pump\\w*', 'squeez\\w*', 'rip\\w*', 'tank\\w*', 'drill\\w*', 'print\\w*', 'stocks?', 'shares?', 'market\\w*',
+    'fed', 'cpi', 'rates?', 'inflation', 'recession', 'spy', 'qqq', 'portfolio', 'positions?', 'gains?', 'loss\\w*',
+    'profit\\w*', 'price\\w*', 'targets?', 'green', 'red', 'up', 'down', 'rocket\\w*', 'guh', 'bagholder\\w*', 'bags?'
+]
+
+# Cashtags ($TSLA), including symbols missing from the ticker dictionary
+CASHTAG_PATTERN = r'\$[A-Za-z]{1,5}\b'
+
+REACTIONS = r'^(?:lo+l|lmf?a+o+|rofl|ha(?:ha)+h?|kek|bruh|bro|wow|nice|same|this|based|f|rip|ok(?:ay)?|yes|no|yep|nope|true|facts|wtf|omg|damn|sheesh)[\s!?.]*$'
+
+REMOVED_BODIES = {'[deleted]', '[removed]', ''}
+
+TRIAGE_SUMMARIES = {
+    'removed': 'Comment was deleted or removed',
+    'no_text': 'Comment contains only emoji, links or symbols',
+    'reaction': 'Short reaction with no market opinion',
+    'trivial': 'Very short comment with no financial content'
+}
+
+
+def triage_comments(bodies, max_trivial_words=3, extractor=None):
+    """
+    Decide which comments can be labelled locally.
+
+    Args:
+        bodies: Iterable of comment bodies
+        max_trivial_words: Comments with at most this many words and no finance or
+            ticker terms are labelled locally
+        extractor: TickerExtractor recognizing symbols and company names (default: the built-in one)
+
+    Returns:
+        List with a reason string ('removed', 'no_text', 'reaction', 'trivial') for
+        comments labelled locally and None for comments that need the LLM
+    """
+    text = pd.Series(list(bodies), dtype=object).fillna('').astype(str)
+    if text.empty:
+        return []
+    stripped = text.str.strip()
+    lowered = stripped.str.lower()
+
+    removed = stripped.isin(REMOVED_BODIES).to_numpy()
+    # Strip URLs before checking for letters so a bare link counts as no text
+    without_links = lowered.str.replace(r'https?://\S+', ' ', regex=True)
+    no_text = ~without_links.str.contains(r'[a-z0-9]', regex=True).to_numpy()
+    reaction = lowered.str.match(REACTIONS).to_numpy()
+
+    words = without_links.str.count(r'[a-z0-9\']+').to_numpy()
+    finance = lowered.str.contains(r'\b(?:' + '|'.join(FINANCE_LEXICON) + r')\b', regex=True).to_numpy()
+    extractor = extractor or default_extractor()
+    tickers = stripped.str.contains(CASHTAG_PATTERN, regex=True).to_numpy() \
+        | np.fromiter((bool(extractor.extract(body)) for body in stripped), dtype=bool, count=len(stripped))
+    trivial = (words <= max_trivial_words) & ~finance & ~tickers
+
+    reasons = np.select(
+        [removed, no_text, reaction & ~tickers, trivial],
+        ['removed', 'no_text', 'reaction', 'trivial'],
+        default=''
+    )
+    return [reason or None for reason in reasons.tolist()]
+
+
+def triage_result(reason):
+    """Label used for a locally triaged comment, in analyze_comment's result format."""
+    return {'summary': TRIAGE_SUMMARIES[reason], 'sentiment': 'neutral', 'stock_action': 'na'}
+
+
+def sample_for_agreement(indices, sample_size, seed=0):
+    """Pick up to `sample_size` triaged comment indices to double-check with the LLM."""
+    if sample_size <= 0 or not indices:
+        return set()
+    return set(random.Random(seed).sample(list(indices), min(sample_size, len(indices))))
+
+
+def agreement_report(pairs):
+    """
+    Compare local labels with LLM labels.
+
+    Args:
+        pairs: List of (triage_result, llm_result) dicts
+
+    Returns:
+        Dictionary with sample size and sentiment/action/both agreement rates
+    """
+    if not pairs:
+        return {'sampled': 0, 'sentiment_agreement': None, 'action_agreement': None, 'full_agreement': None}
+    sentiment = sum(local['sentiment'] == llm['sentiment'] for local, llm in pairs)
+    action = sum(local['stock_action'] == llm['stock_action'] for local, llm in pairs)
+    both = sum(local['sentiment'] == llm['sentiment'] and local['stock_action'] == llm['stock_action']
+               for local, llm in pairs)
+    return {
+        'sampled': len(pairs),
+        'sentiment_agreement': round(sentiment / len(pairs), 3),
+        'action_agreement': round(action / len(pairs), 3),
+        'full_agreement': round(both / len(pairs), 3)
+    }
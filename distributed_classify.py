@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Comment classification spread over many worker processes and hosts.
+
+`produce` splits a result file into shards of comments on a Redis work queue,
+`work` (run as many times as there are API keys and machines) claims,
+classifies and acknowledges shards, and `collect` reassembles the
+`_summarized.json` that comment_summerizer.py would have written. Workers
+sharing an API key share its RPM/TPM budget through Redis; a shard whose
+worker dies is handed to another one after its visibility timeout.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from run_metrics import RunMetrics
+
+DEFAULT_REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+DEFAULT_QUEUE = 'comment_classification'
+# Rate-limit keys are per API key, not per queue: every job on the key shares its budget
+RATE_LIMIT_PREFIX = 'llm_rate_limit'
+
+
+def connect(url):
+    import redis.asyncio
+    return redis.asyncio.Redis.from_url(url, decode_responses=True)
+
+
+async def open_queue(args, redis):
+    """The queue named by --queue, with the visibility timeout and attempts the producer chose."""
+    from redis_queue import RedisWorkQueue
+    queue = RedisWorkQueue(redis, args.queue)
+    meta = await queue.get_meta()
+    queue.visibility_timeout = meta.get('visibility_timeout', queue.visibility_timeout)
+    queue.max_attempts = meta.get('max_attempts', queue.max_attempts)
+    return queue, meta
+
+
+def summarized_path(input_file):
+    """Output file comment_summerizer.py uses for `input_file`."""
+    from columnar_store import COLUMNAR_SUFFIX, is_columnar
+    input_name = os.path.splitext(os.path.basename(input_file.rstrip(os.sep)))[0]
+    suffix = COLUMNAR_SUFFIX if is_columnar(input_file) else '.json'
+    return os.path.join(os.path.dirname(input_file), f"{input_name}_summarized{suffix}")
+
+
+def shard_posts(posts, shard_size, max_comments=0):
+    """
+    Split posts into (shard id, payload) work items of at most `shard_size` comments.
+
+    Every post gets at least one shard, so comment-less posts are still summarized.
+    """
+    shards = []
+    for position, post in enumerate(posts):
+        key = str(post.get('id') or f"p{position}")
+        comments = post.get('comments', [])
+        comments = comments[:max_comments] if max_comments else comments
+        for index, start in enumerate(range(0, max(len(comments), 1), shard_size)):
+            shards.append((f"{key}#{index}", {
+                'post': key, 'title': post.get('title', ''), 'selftext': post.get('selftext', ''),
+                'comments': comments[start:start + shard_size]
+            }))
+    return shards
+
+
+async def produce(args):
+    from redis_queue import RedisWorkQueue
+    from result_stream import load_result
+
+    data = load_result(args.input_file)
+    if args.max_comments:
+        # Comments beyond the limit stay in the document unlabelled, like comment_summerizer.py --max-comments
+        skipped = {str(post.get('id') or f"p{position}"): post.get('comments', [])[args.max_comments:]
+                   for position, post in enumerate(data['posts'])}
+    else:
+        skipped = {}
+    shards = shard_posts(data['posts'], args.shard_size, args.max_comments)
+    skeleton = dict(data, posts=[{key: value for key, value in post.items() if key != 'comments'}
+                                 for post in data['posts']])
+
+    redis = connect(args.redis_url)
+    try:
+        queue = RedisWorkQueue(redis, args.queue, args.visibility_timeout, args.max_attempts)
+        if await queue.exists():
+            if not args.reset:
+                sys.exit(f"Queue '{args.queue}' already holds work; collect it first or pass --reset")
+            await queue.delete()
+        await queue.set_meta(document=skeleton, skipped=skipped, source=args.input_file,
+                             output=args.output or summarized_path(args.input_file), shard_size=args.shard_size,
+                             visibility_timeout=args.visibility_timeout, max_attempts=args.max_attempts,
+                             created_at=datetime.now().isoformat())
+        await queue.enqueue(shards)
+    finally:
+        await redis.close()
+    comments = sum(len(payload['comments']) for _, payload in shards)
+    print(f"📦 Queued {comments} comments of {len(data['posts'])} posts as {len(shards)} shards on '{args.queue}'")
+
+
+def load_summarizer():
+    """Import comment_summerizer (openai and config.py) off the event loop."""
+    import comment_summerizer
+    return comment_summerizer
+
+
+class ShardWorker:
+    """Claims shards from a RedisWorkQueue and classifies them on one AsyncLLMPool."""
+
+    def __init__(self, queue, pool, summarizer, batch_size=25, shards_in_flight=4, poll_seconds=1.0, metrics=None):
+        """
+        Args:
+            queue: RedisWorkQueue to work on
+            pool: AsyncLLMPool whose limiters are shared through Redis
+            summarizer: The comment_summerizer module (prompts, parsing and cache helpers)
+            batch_size: Comments per classification request
+            shards_in_flight: Shards claimed at the same time
+            poll_seconds: Wait between claims while nothing is pending
+            metrics: RunMetrics receiving shard, comment and failure counts
+        """
+        self.queue = queue
+        self.pool = pool
+        self.summarizer = summarizer
+        self.batch_size = batch_size
+        self.shards_in_flight = shards_in_flight
+        self.poll_seconds = poll_seconds
+        self.metrics = metrics
+
+    def _count(self, name, value=1):
+        if self.metrics is not None:
+            self.metrics.add(name, value)
+
+    async def classify(self, payload):
+        """Labels for the shard's comments, in order; raises when nothing could be classified."""
+        summary = await self.queue.shared_value(
+            payload['post'], lambda: self.summarizer.summarize_post_async(self.pool, payload['title'], payload['selftext']))
+        comments = [{'id': comment.get('id'), 'body': comment.get('body', '')} for comment in payload['comments']]
+        # Like comment_summerizer.py, comments of a post without a summary stay unlabelled
+        if summary and comments:
+            await self.summarizer.classify_post_comments(self.pool, summary, comments, self.batch_size)
+            errors = [comment['error'] for comment in comments if comment.get('sentiment') == 'error']
+            if len(errors) == len(comments):
+                # Nothing got through (API down, key revoked): worth another attempt, maybe elsewhere
+                raise RuntimeError(errors[0])
+        return [{key: comment[key] for key in ('summary', 'sentiment', 'stock_action', 'error') if key in comment}
+                for comment in comments]
+
+    async def _heartbeat(self, item_id):
+        while True:
+            await asyncio.sleep(self.queue.visibility_timeout / 3)
+            if not await self.queue.extend(item_id):
+                return
+
+    async def process(self, item_id, payload, attempt):
+        heartbeat = asyncio.create_task(self._heartbeat(item_id))
+        try:
+            result = await self.classify(payload)
+        except Exception as e:
+            target = await self.queue.release(item_id, str(e))
+            self._count('shard_failures')
+            print(f"  ✗ Shard {item_id} (attempt {attempt}) failed, {'dead-lettered' if target == 'dead' else 'requeued'}: {e}")
+            return
+        finally:
+            heartbeat.cancel()
+        await self.queue.ack(item_id, result)
+        self._count('shards')
+        self._count('comments', len(result))
+        print(f"  ✓ Shard {item_id}: {len(result)} comments")
+
+    async def _reap(self):
+        while True:
+            requeued, dead = await self.queue.requeue_expired()
+            if requeued or dead:
+                print(f"⏰ {requeued} expired shards requeued, {dead} dead-lettered")
+                self._count('requeued', requeued)
+                self._count('dead_lettered', dead)
+            await asyncio.sleep(min(self.queue.visibility_timeout / 4, 15))
+
+    async def _claim_loop(self):
+        while True:
+            item = await self.queue.claim()
+            if item is None:
+                if await self.queue.finished():
+                    return
+                # Other workers still hold shards; theirs come back here if their leases run out
+                await asyncio.sleep(self.poll_seconds)
+                continue
+            await self.process(*item)
+
+    async def run(self):
+        """Work until every shard is done or dead-lettered."""
+        reaper = asyncio.create_task(self._reap())
+        try:
+            await asyncio.gather(*(self._claim_loop() for _ in range(max(1, self.shards_in_flight))))
+        finally:
+            reaper.cancel()
+
+
+async def work(args, metrics):
+    from redis_queue import RedisMinuteRateLimiter
+
+    with metrics.stage('import_classifier'):
+        summarizer = await asyncio.to_thread(load_summarizer)
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+        from async_llm import AsyncLLMPool
+        from llm_cache import LLMCache
+        from run_metrics import httpx_event_hooks
+
+    api_key = os.environ[args.api_key_env] if args.api_key_env else summarizer.OPENAI_API_KEY
+    if not args.no_cache:
+        summarizer.response_cache = LLMCache()
+    redis = connect(args.redis_url)
+    try:
+        queue, _ = await open_queue(args, redis)
+        if not await queue.exists():
+            sys.exit(f"Queue '{args.queue}' is empty; run the produce command first")
+
+        pool = AsyncLLMPool(
+            AsyncOpenAI(api_key=api_key, max_retries=0,
+                        http_client=DefaultAsyncHttpxClient(event_hooks=httpx_event_hooks(metrics, 'llm', asynchronous=True))),
+            model=summarizer.MODEL, temperature=summarizer.TEMPERATURE, concurrency=args.concurrency,
+            requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+        # Every worker on this API key draws from the same RPM/TPM budget
+        key_id = hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+        pool.request_limiter = RedisMinuteRateLimiter(redis, f"{RATE_LIMIT_PREFIX}:{key_id}:requests", args.rpm)
+        pool.token_limiter = RedisMinuteRateLimiter(redis, f"{RATE_LIMIT_PREFIX}:{key_id}:tokens", args.tpm)
+
+        worker = ShardWorker(queue, pool, summarizer, args.batch_size, args.shards, metrics=metrics)
+        with metrics.stage('classify'):
+            await worker.run()
+        metrics.update('llm', pool.stats())
+    finally:
+        await redis.close()
+        if summarizer.response_cache is not None:
+            metrics.update('cache', summarizer.response_cache.stats())
+            summarizer.response_cache.close()
+
+
+def assemble(meta, payloads, results, errors, dead):
+    """
+    Rebuild the classified document from the producer's skeleton and the shard results.
+
+    Args:
+        meta: Queue metadata written by produce
+        payloads, results: Shard id -> payload / label list, with shard ids in enqueue order
+        errors: Shard id -> last error
+        dead: Dead-lettered shard ids
+
+    Returns:
+        The classified document
+    """
+    document = meta['document']
+    posts = {str(post.get('id') or f"p{position}"): post for position, post in enumerate(document['posts'])}
+    for post in posts.values():
+        post['comments'] = []
+    for shard_id, payload in payloads.items():
+        comments = payload['comments']
+        for comment, labels in zip(comments, results.get(shard_id) or []):
+            comment.update(labels)
+        posts[payload['post']]['comments'].extend(comments)
+    for key, post in posts.items():
+        post['comments'].extend(meta.get('skipped', {}).get(key, []))
+    document.setdefault('metadata', {})['distributed_classification'] = {
+        'shards': len(payloads),
+        'shards_classified': sum(1 for shard_id in payloads if shard_id in results),
+        'dead_letters': [{'shard': shard_id, 'error': errors.get(shard_id)} for shard_id in sorted(dead)]
+    }
+    return document
+
+
+async def collect(args, metrics):
+    from columnar_store import is_columnar, write_columnar
+
+    redis = connect(args.redis_url)
+    try:
+        queue, meta = await open_queue(args, redis)
+        if not await queue.exists():
+            sys.exit(f"Queue '{args.queue}' is empty; nothing to collect")
+
+        with metrics.stage('wait'):
+            last_report = 0
+            while not await queue.finished():
+                if args.no_wait:
+                    print("⚠️  Shards still pending or in progress stay unlabelled")
+                    break
+                # Shards of workers that died come back (or go to the dead letters) without a live worker too
+                await queue.requeue_expired()
+                if time.monotonic() - last_report >= 10:
+                    counts = await queue.counts()
+                    print(f"⏳ {counts['done']}/{counts['total']} shards done, {counts['processing']} in progress, "
+                          f"{counts['pending']} pending, {counts['dead']} dead")
+                    last_report = time.monotonic()
+                await asyncio.sleep(args.poll_seconds)
+
+        with metrics.stage('load'):
+            ids = await redis.lrange(queue.key('order'), 0, -1)
+            payloads = dict(zip(ids, (json.loads(payload) for payload in await redis.hmget(queue.key('items'), ids))))
+            results = {shard_id: json.loads(result) for shard_id, result in (await redis.hgetall(queue.key('results'))).items()}
+            errors = await redis.hgetall(queue.key('errors'))
+            dead = set(await redis.lrange(queue.key('dead'), 0, -1)) - set(results)
+            summaries = await redis.hgetall(queue.key('summaries'))
+
+        document = assemble(meta, payloads, results, errors, dead)
+        for position, post in enumerate(document['posts']):
+            post['post_summary'] = summaries.get(str(post.get('id') or f"p{position}"), "")
+
+        output_file = args.output or meta['output']
+        document['metadata']['classification_metrics'] = metrics.as_dict()
+        with metrics.stage('save'):
+            if is_columnar(output_file):
+                write_columnar(output_file, document)
+            else:
+                with open(output_file, 'w') as f:
+                    json.dump(document, f, indent=2)
+        metrics.set('shards', len(payloads))
+        metrics.set('dead_letters', len(dead))
+
+        for shard_id in sorted(dead):
+            print(f"  ☠️  {shard_id}: {errors.get(shard_id)}")
+        print(f"\n✅ Saved: {output_file} ({len(results)}/{len(payloads)} shards classified, {len(dead)} dead-lettered)")
+        if not args.keep_queue:
+            await queue.delete()
+    finally:
+        await redis.close()
+
+
+async def status(args):
+    redis = connect(args.redis_url)
+    try:
+        queue, meta = await open_queue(args, redis)
+        counts = await queue.counts()
+    finally:
+        await redis.close()
+    print(f"Queue '{args.queue}' ({meta.get('source', 'empty')}): {counts['done']}/{counts['total']} shards done, "
+          f"{counts['processing']} in progress, {counts['pending']} pending, {counts['dead']} dead")
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(
+        description='Classify a result file with worker processes on several hosts sharing a Redis work queue',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python distributed_classify.py produce results/06-16-2025/reddit_daily_discussion_thread_week_relevance.json
+  OPENAI_API_KEY_2=sk-... python distributed_classify.py work --api-key-env OPENAI_API_KEY_2 --rpm 500 --tpm 150000
+  python distributed_classify.py collect
+        """
+    )
+    parser.add_argument('--redis-url', default=DEFAULT_REDIS_URL, help=f'Redis server (default: $REDIS_URL or {DEFAULT_REDIS_URL})')
+    parser.add_argument('--queue', default=DEFAULT_QUEUE, help=f'Queue name, the Redis key prefix (default: {DEFAULT_QUEUE})')
+    parser.add_argument('--metrics-out', help='Write run metrics to this file (*.prom: Prometheus text format, otherwise JSON)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    produce_parser = subparsers.add_parser('produce', help='Queue the comments of a result file in shards')
+    produce_parser.add_argument('input_file', help='Result file from reddit_search.py (.json, .jsonl or .cols)')
+    produce_parser.add_argument('--shard-size', type=int, default=100, help='Comments per shard (default: 100)')
+    produce_parser.add_argument('--max-comments', type=int, default=0,
+                                help='Comments per post to classify, 0 for all (default: 0)')
+    produce_parser.add_argument('--visibility-timeout', type=int, default=300,
+                                help='Seconds before a shard whose worker went quiet is handed out again (default: 300)')
+    produce_parser.add_argument('--max-attempts', type=int, default=3,
+                                help='Attempts before a shard is dead-lettered (default: 3)')
+    produce_parser.add_argument('-o', '--output', help='Classified output file (default: <input>_summarized.json)')
+    produce_parser.add_argument('--reset', action='store_true', help='Replace a queue that still holds work')
+
+    work_parser = subparsers.add_parser('work', help='Claim and classify shards until the queue is finished')
+    work_parser.add_argument('--api-key-env', help='Environment variable holding this worker\'s OpenAI key '
+                                                   '(default: OPENAI_API_KEY from config.py)')
+    work_parser.add_argument('--rpm', type=int, default=500,
+                             help='Requests per minute of the API key, shared by all its workers (default: 500)')
+    work_parser.add_argument('--tpm', type=int, default=150000,
+                             help='Tokens per minute of the API key, shared by all its workers (default: 150000)')
+    work_parser.add_argument('--concurrency', type=int, default=16, help='LLM requests in flight (default: 16)')
+    work_parser.add_argument('--shards', type=int, default=4, help='Shards claimed at the same time (default: 4)')
+    work_parser.add_argument('--batch-size', type=int, default=25, help='Comments per classification request (default: 25)')
+    work_parser.add_argument('--no-cache', action='store_true', help='Do not use the on-disk LLM result cache')
+
+    collect_parser = subparsers.add_parser('collect', help='Wait for the workers and write the classified file')
+    collect_parser.add_argument('-o', '--output', help='Output file (default: the one chosen by produce)')
+    collect_parser.add_argument('--no-wait', action='store_true', help='Write now; unfinished shards stay unlabelled')
+    collect_parser.add_argument('--poll-seconds', type=float, default=2.0, help='Progress check interval (default: 2)')
+    collect_parser.add_argument('--keep-queue', action='store_true', help='Keep the queue in Redis after collecting')
+
+    subparsers.add_parser('status', help='Show shard counts')
+    return parser
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    metrics = RunMetrics(f"distributed_classify_{args.command}")
+
+    if args.command == 'produce':
+        with metrics.stage('produce'):
+            asyncio.run(produce(args))
+    elif args.command == 'work':
+        try:
+            asyncio.run(work(args, metrics))
+        except KeyboardInterrupt:
+            print("\n⏸️  Stopped; shards in progress are handed out again after their visibility timeout")
+            sys.exit(130)
+    elif args.command == 'collect':
+        asyncio.run(collect(args, metrics))
+    else:
+        asyncio.run(status(args))
+        return
+
+    metrics.print_report()
+    if args.metrics_out:
+        print(f"📊 Metrics written to {metrics.write(args.metrics_out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+"""
+Real-time sentiment daemon.
+Follows new comments (and submissions) of one or more subreddits with PRAW's
+streams instead of re-crawling whole threads, pushes them through a bounded
+queue into batching LLM classifier workers and keeps rolling per-ticker
+sentiment windows (e.g. 5m / 1h) that are updated per comment and snapshotted
+to disk every few seconds.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+from dotenv import load_dotenv
+from prawcore.exceptions import PrawcoreException
+
+from async_llm import AsyncLLMPool
+from comment_triage import triage_comments, triage_result
+from result_stream import JsonlResultWriter
+from run_metrics import RunMetrics
+from ticker_extraction import TickerExtractor, default_extractor, load_ticker_dictionary
+
+DEFAULT_SNAPSHOT_PATH = os.path.join("results", "live", "sentiment_snapshot.json")
+SENTIMENT_SCORES = {"positive": 1, "neutral": 0, "negative": -1}
+# Pseudo-ticker holding every classified comment, mentioned or not
+ALL_TICKERS = "ALL"
+# Longest pause between polls of a quiet stream, as in PRAW's own stream backoff
+MAX_IDLE_WAIT = 16
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_duration(text):
+    """'90s', '5m', '1h' or plain seconds -> seconds."""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*', str(text))
+    if not match:
+        raise ValueError(f"Invalid duration: {text!r}")
+    return float(match.group(1)) * DURATION_UNITS.get(match.group(2) or 's')
+
+
+def format_duration(seconds):
+    for unit in ('d', 'h', 'm'):
+        if seconds >= DURATION_UNITS[unit] and seconds % DURATION_UNITS[unit] == 0:
+            return f"{int(seconds // DURATION_UNITS[unit])}{unit}"
+    return f"{seconds:g}s"
+
+
+class RollingSentiment:
+    """
+    Per-ticker sentiment and action counts over sliding time windows.
+
+    Every window keeps its events in a deque and running counts per ticker;
+    adding a comment and expiring old ones only touch the tickers involved,
+    so an update costs O(tickers mentioned) however many comments are in
+    the window.
+    """
+
+    def __init__(self, windows=(300, 3600)):
+        """
+        Args:
+            windows: Window lengths in seconds
+        """
+        self.windows = sorted(windows)
+        self._events = {window: deque() for window in self.windows}
+        self._counts = {window: {} for window in self.windows}
+
+    def add(self, timestamp, tickers, sentiment, action):
+        """Count one classified comment posted at `timestamp` for each ticker in `tickers`."""
+        event = (timestamp, tuple(tickers) + (ALL_TICKERS,), sentiment, action)
+        for window in self.windows:
+            self._events[window].append(event)
+            self._apply(window, event, 1)
+
+    def expire(self, now=None):
+        """Drop events that have left their window."""
+        now = time.time() if now is None else now
+        for window in self.windows:
+            events = self._events[window]
+            # Workers finish slightly out of order; a late older event is dropped on a later call
+            while events and events[0][0] <= now - window:
+                self._apply(window, events.popleft(), -1)
+
+    def _apply(self, window, event, sign):
+        _, tickers, sentiment, action = event
+        counts = self._counts[window]
+        for ticker in tickers:
+            ticker_counts = counts.setdefault(ticker, Counter())
+            ticker_counts['mentions'] += sign
+            ticker_counts[sentiment] += sign
+            ticker_counts[action] += sign
+            ticker_counts['score'] += sign * SENTIMENT_SCORES.get(sentiment, 0)
+            if ticker_counts['mentions'] <= 0:
+                del counts[ticker]
+
+    def snapshot(self, now=None, min_mentions=1):
+        """
+        Current windows as {window label: {ticker: stats}}, busiest tickers first.
+
+        Stats hold mentions, positive/neutral/negative counts, net_sentiment
+        (mean of +1/0/-1 per comment) and buy/sell/hold shares in percent.
+        """
+        self.expire(now)
+        result = {}
+        for window in self.windows:
+            tickers = {}
+            ranked = sorted(self._counts[window].items(), key=lambda item: -item[1]['mentions'])
+            for ticker, counts in ranked:
+                mentions = counts['mentions']
+                if mentions < min_mentions and ticker != ALL_TICKERS:
+                    continue
+                tickers[ticker] = {
+                    'mentions': mentions,
+                    'positive': counts['positive'],
+                    'neutral': counts['neutral'],
+                    'negative': counts['negative'],
+                    'net_sentiment': round(counts['score'] / mentions, 3),
+                    'buy_pct': round(counts['buy'] / mentions * 100, 1),
+                    'sell_pct': round(counts['sell'] / mentions * 100, 1),
+                    'hold_pct': round(counts['hold'] / mentions * 100, 1)
+                }
+            result[format_duration(window)] = tickers
+        return result
+
+
+def comment_record(comment):
+    """PRAW comment from a subreddit stream -> extract_comments dict plus post fields and the raw timestamp."""
+    return {
+        'id': comment.id,
+        'author': str(comment.author) if comment.author else '[deleted]',
+        'body': comment.body,
+        'score': comment.score,
+        'created_utc': datetime.fromtimestamp(comment.created_utc).isoformat(),
+        'permalink': f"https://reddit.com{comment.permalink}",
+        'is_submitter': comment.is_submitter,
+        'distinguished': comment.distinguished,
+        'edited': comment.edited if comment.edited else False,
+        'num_replies': 0,
+        'post_id': comment.link_id[3:],
+        'post_title': getattr(comment, 'link_title', ''),
+        'subreddit': str(comment.subreddit),
+        'created_timestamp': comment.created_utc
+    }
+
+
+def submission_record(submission):
+    return {
+        'id': submission.id,
+        'title': submission.title,
+        'author': str(submission.author) if submission.author else '[deleted]',
+        'subreddit': str(submission.subreddit),
+        'score': submission.score,
+        'num_comments': submission.num_comments,
+        'created_utc': datetime.fromtimestamp(submission.created_utc).isoformat(),
+        'url': submission.url,
+        'permalink': f"https://reddit.com{submission.permalink}",
+        'selftext': submission.selftext
+    }
+
+
+class LLMCommentClassifier:
+    """Labels a batch of live comments: trivial ones locally, the rest in batched prompts per post."""
+
+    def __init__(self, pool, max_batch_size=25):
+        # Deferred: comment_summerizer reads the API key from config.py at import time
+        import comment_summerizer
+        self.prompts = comment_summerizer
+        self.pool = pool
+        self.max_batch_size = max_batch_size
+        self.triaged = 0
+
+    async def classify(self, comments):
+        """Set summary / sentiment / stock_action on every comment dict in `comments`."""
+        reasons = triage_comments(comment['body'] for comment in comments)
+        by_post = {}
+        for comment, reason in zip(comments, reasons):
+            if reason:
+                self.prompts.apply_result(comment, triage_result(reason))
+                comment['triage'] = reason
+                self.triaged += 1
+            else:
+                by_post.setdefault(comment['post_id'], []).append(comment)
+        # The stream carries the post title, not a summary; it is what the comments reply to
+        await asyncio.gather(*(
+            self.prompts.classify_post_comments(self.pool, f"Post title: {post_comments[0].get('post_title', '')}",
+                                                post_comments, self.max_batch_size)
+            for post_comments in by_post.values()))
+
+
+class LiveSentimentDaemon:
+    """
+    Stream -> bounded queue -> batching classifier workers -> rolling windows.
+
+    A producer thread follows the PRAW streams and blocks while the queue is
+    full (backpressure: Reddit is simply polled later, nothing is dropped
+    while the backlog fits in the listing). Workers take up to `batch_size`
+    comments, waiting at most `batch_wait` seconds for a batch to fill.
+    """
+
+    def __init__(self, reddit, subreddits, classifier, extractor=None, windows=(300, 3600), queue_size=1000,
+                 batch_size=20, batch_wait=2.0, workers=4, snapshot_path=DEFAULT_SNAPSHOT_PATH,
+                 snapshot_interval=10.0, output_path=None, include_submissions=True, min_mentions=1,
+                 drain_timeout=30.0, metrics=None):
+        """
+        Args:
+            reddit: PRAW Reddit instance
+            subreddits: Subreddit names to follow
+            classifier: Object with `async classify(comments)`, e.g. LLMCommentClassifier
+            extractor: TickerExtractor (default: the built-in dictionary)
+            windows: Rolling window lengths in seconds
+            queue_size: Comments buffered between the stream and the workers
+            batch_size: Comments per classification batch
+            batch_wait: Seconds a worker waits for a batch to fill
+            workers: Concurrent classification workers
+            snapshot_path: JSON file rewritten with the current windows every `snapshot_interval` seconds
+            output_path: Optional .jsonl file receiving every classified comment (reddit_search format)
+            include_submissions: Also follow new submissions (recorded as posts, their tickers are inherited)
+            min_mentions: Tickers with fewer mentions in a window are left out of snapshots
+            drain_timeout: Seconds allowed on shutdown for classifying what is still queued
+            metrics: RunMetrics receiving ingest/classify counters and latencies
+        """
+        self.reddit = reddit
+        self.subreddits = list(subreddits)
+        self.classifier = classifier
+        self.extractor = extractor or default_extractor()
+        self.rolling = RollingSentiment(windows)
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.workers = workers
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.output_path = output_path
+        self.include_submissions = include_submissions
+        self.min_mentions = min_mentions
+        self.drain_timeout = drain_timeout
+        self.metrics = metrics or RunMetrics('live_sentiment')
+        self.latencies = deque(maxlen=2000)
+        self.post_tickers = {}
+        self._written_posts = set()
+        self._writer = None
+        self._queue = None
+        self._stop = threading.Event()
+
+    # Producer
+
+    def _follow_streams(self, loop):
+        """Producer thread: interleave the comment and submission streams, retrying on API errors."""
+        subreddit = self.reddit.subreddit("+".join(self.subreddits))
+        backoff = 1
+        while not self._stop.is_set():
+            try:
+                streams = [('comment', subreddit.stream.comments(skip_existing=True, pause_after=-1))]
+                if self.include_submissions:
+                    streams.append(('post', subreddit.stream.submissions(skip_existing=True, pause_after=-1)))
+                idle_wait = 1
+                while not self._stop.is_set():
+                    received = False
+                    for kind, stream in streams:
+                        # pause_after=-1 makes each stream yield None after every poll, so they take turns
+                        for item in stream:
+                            if item is None or self._stop.is_set():
+                                break
+                            self._enqueue(loop, kind, item)
+                            received = True
+                    backoff = 1
+                    # PRAW skips its own sleep when pausing, so quiet subreddits are polled less often here
+                    idle_wait = 1 if received else min(idle_wait * 2, MAX_IDLE_WAIT)
+                    self._stop.wait(0 if received else idle_wait)
+            except PrawcoreException as e:
+                print(f"⚠️  Stream error: {e}; reconnecting in {backoff}s")
+                self.metrics.add('stream_errors')
+                self._stop.wait(backoff + random.uniform(0, backoff / 2))
+                backoff = min(backoff * 2, 60)
+
+    def _enqueue(self, loop, kind, item):
+        record = comment_record(item) if kind == 'comment' else submission_record(item)
+        self.metrics.add('ingested_comments' if kind == 'comment' else 'ingested_posts')
+        started = time.perf_counter()
+        # Blocks this thread (and therefore polling) while the queue is full
+        asyncio.run_coroutine_threadsafe(self._queue.put((kind, record)), loop).result()
+        waited = time.perf_counter() - started
+        if waited > 0.01:
+            self.metrics.add('backpressure_seconds', waited)
+
+    # Consumers
+
+    async def _next_batch(self):
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.batch_wait
+        while len(batch) < self.batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _worker(self):
+        while True:
+            batch = await self._next_batch()
+            comments = []
+            for kind, record in batch:
+                if kind == 'post':
+                    self._record_post(record)
+                else:
+                    comments.append(record)
+            if comments:
+                with self.metrics.stage('classify'):
+                    await self.classifier.classify(comments)
+                for comment in comments:
+                    self._apply(comment)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _record_post(self, post):
+        self.post_tickers[post['id']] = self.extractor.extract(f"{post['title']}\n{post.get('selftext', '')}")
+        self._write_post(post)
+
+    def _write_post(self, post):
+        if self._writer is not None and post['id'] not in self._written_posts:
+            self._writer.write_post(post)
+            self._written_posts.add(post['id'])
+
+    def _apply(self, comment):
+        """Fold one classified comment into the rolling windows and the output file."""
+        sentiment = comment.get('sentiment')
+        if sentiment not in SENTIMENT_SCORES:
+            self.metrics.add('classification_errors')
+            return
+        post_id = comment['post_id']
+        if post_id not in self.post_tickers:
+            self.post_tickers[post_id] = self.extractor.extract(comment.get('post_title', ''))
+        # Like the batch reports, a comment without a mention is about its post's tickers
+        tickers = self.extractor.extract(comment['body']) or self.post_tickers[post_id]
+        self.rolling.add(comment['created_timestamp'], tickers, sentiment, str(comment.get('stock_action', 'na')).lower())
+        self.latencies.append(time.time() - comment['created_timestamp'])
+        self.metrics.add('classified_comments')
+
+        if self._writer is not None:
+            self._write_post({'id': post_id, 'title': comment.get('post_title', ''),
+                              'subreddit': comment.get('subreddit', '')})
+            record = {key: value for key, value in comment.items()
+                      if key not in ('post_id', 'post_title', 'created_timestamp')}
+            record['tickers'] = list(tickers)
+            self._writer.write_comment(post_id, record)
+
+    # Snapshots
+
+    def latency_stats(self):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return {
+            'p50': round(ordered[len(ordered) // 2], 2),
+            'p95': round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)], 2),
+            'max': round(ordered[-1], 2)
+        }
+
+    def snapshot(self):
+        self.metrics.set('queue_depth', self._queue.qsize() if self._queue is not None else 0)
+        pool = getattr(self.classifier, 'pool', None)
+        if pool is not None:
+            self.metrics.update('llm', pool.stats())
+        if hasattr(self.classifier, 'triaged'):
+            self.metrics.set('triage_labelled', self.classifier.triaged)
+        return {
+            'generated_at': datetime.now().isoformat(),
+            'subreddits': self.subreddits,
+            'windows': self.rolling.snapshot(min_mentions=self.min_mentions),
+            'latency_seconds': self.latency_stats(),
+            'queue': {'depth': self._queue.qsize() if self._queue is not None else 0, 'capacity': self.queue_size},
+            'metrics': self.metrics.as_dict()
+        }
+
+    def write_snapshot(self):
+        snapshot = self.snapshot()
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.snapshot_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, indent=2, ensure_ascii=False)
+        # Readers (dashboards) never see a half-written snapshot
+        os.replace(temp_path, self.snapshot_path)
+        return snapshot
+
+    async def _snapshots(self, on_snapshot=None):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            snapshot = self.write_snapshot()
+            if on_snapshot is not None:
+                on_snapshot(snapshot)
+
+    # Lifecycle
+
+    async def run(self, duration=None, on_snapshot=None):
+        """
+        Run until cancelled (Ctrl+C) or for `duration` seconds.
+
+        The final snapshot is written and the output file closed on the way out.
+        """
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        if self.output_path:
+            directory = os.path.dirname(self.output_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._writer = JsonlResultWriter(self.output_path, flush_every=20)
+            self._writer.write_header(
+                {'search_executed_at': datetime.now().isoformat(), 'script_version': 'live_sentiment.py v1.0',
+                 'reddit_api_version': 'PRAW stream'},
+                {'search_term': 'live stream', 'search_scope': ", ".join(f"r/{name}" for name in self.subreddits),
+                 'include_comments': True, 'comment_sort': 'new'})
+
+        producer = threading.Thread(target=self._follow_streams, args=(loop,), daemon=True)
+        producer.start()
+        tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        tasks.append(asyncio.create_task(self._snapshots(on_snapshot)))
+        try:
+            if duration is None:
+                await asyncio.gather(*tasks)
+            else:
+                await asyncio.sleep(duration)
+        finally:
+            # Stop polling, let the workers finish what is queued, then stop them
+            self._stop.set()
+            await loop.run_in_executor(None, producer.join, self.drain_timeout)
+            try:
+                await asyncio.wait_for(self._queue.join(), self.drain_timeout)
+            except asyncio.TimeoutError:
+                print(f"⚠️  {self._queue.qsize()} queued comments dropped on shutdown")
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.write_snapshot()
+            if self._writer is not None:
+                self._writer.write_footer({'posts_found': len(self._written_posts),
+                                           'total_comments_extracted': self.metrics.counters.get('classified_comments', 0)},
+                                          {'metrics': self.metrics.as_dict()})
+                self._writer.close()
+
+
+def print_snapshot(snapshot, top=5):
+    latency = snapshot['latency_seconds'] or {}
+    print(f"\n📡 {snapshot['generated_at'][11:19]} | queue {snapshot['queue']['depth']}/{snapshot['queue']['capacity']} | "
+          f"latency p50 {latency.get('p50', '-')}s p95 {latency.get('p95', '-')}s")
+    for label, tickers in snapshot['windows'].items():
+        overall = tickers.get(ALL_TICKERS)
+        head = f"  [{label}] {overall['mentions']} comments, net {overall['net_sentiment']:+.2f}" if overall else f"  [{label}] no comments"
+        ranked = [(ticker, stats) for ticker, stats in tickers.items() if ticker != ALL_TICKERS][:top]
+        print(head + (" | " if ranked else "") + ", ".join(
+            f"{ticker} {stats['mentions']} ({stats['net_sentiment']:+.2f})" for ticker, stats in ranked))
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(description='Follow subreddits live and keep rolling per-ticker sentiment')
+    parser.add_argument('-r', '--subreddits', default='wallstreetbets',
+                        help='Comma-separated subreddits to follow (default: wallstreetbets)')
+    parser.add_argument('--windows', default='5m,1h', help='Rolling window lengths (default: 5m,1h)')
+    parser.add_argument('--queue-size', type=int, default=1000,
+                        help='Comments buffered before the stream is paused (default: 1000)')
+    parser.add_argument('--batch-size', type=int, default=20, help='Comments per classification batch (default: 20)')
+    parser.add_argument('--batch-wait', type=float, default=2.0,
+                        help='Seconds a worker waits for a batch to fill (default: 2)')
+    parser.add_argument('--workers', type=int, default=4, help='Classification workers (default: 4)')
+    parser.add_argument('--concurrency', type=int, default=8, help='LLM requests in flight (default: 8)')
+    parser.add_argument('--rpm', type=int, default=500, help='Requests per minute limit (default: 500)')
+    parser.add_argument('--tpm', type=int, default=150000, help='Tokens per minute limit (default: 150000)')
+    parser.add_argument('--snapshot-path', default=DEFAULT_SNAPSHOT_PATH,
+                        help=f'Snapshot file rewritten every --snapshot-interval (default: {DEFAULT_SNAPSHOT_PATH})')
+    parser.add_argument('--snapshot-interval', type=float, default=10.0, help='Seconds between snapshots (default: 10)')
+    parser.add_argument('--output', help='Append every classified comment to this .jsonl result file')
+    parser.add_argument('--no-submissions', action='store_true', help='Only follow comments, not new submissions')
+    parser.add_argument('--min-mentions', type=int, default=1,
+                        help='Leave tickers with fewer mentions in a window out of snapshots (default: 1)')
+    parser.add_argument('--duration', type=parse_duration, help='Stop after this long, e.g. 30m (default: run until Ctrl+C)')
+    parser.add_argument('--tickers-file', help='JSON ticker dictionary merged over the built-in one')
+    parser.add_argument('--metrics-out', help='Write run metrics on exit (*.prom: Prometheus text format, otherwise JSON)')
+    return parser
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    load_dotenv()
+    # Imported here so --help works without the Reddit and OpenAI stacks configured
+    from openai import AsyncOpenAI
+    from reddit_search import create_reddit_instance, load_credentials
+    import comment_summerizer
+
+    tickers = load_ticker_dictionary(args.tickers_file) if args.tickers_file else None
+    extractor = TickerExtractor(tickers) if tickers else default_extractor()
+    pool = AsyncLLMPool(AsyncOpenAI(api_key=comment_summerizer.OPENAI_API_KEY, max_retries=0),
+                        model=comment_summerizer.MODEL, temperature=comment_summerizer.TEMPERATURE,
+                        concurrency=args.concurrency, requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+    subreddits = [name.strip() for name in args.subreddits.split(',') if name.strip()]
+    windows = [parse_duration(window) for window in args.windows.split(',') if window.strip()]
+
+    daemon = LiveSentimentDaemon(
+        create_reddit_instance(load_credentials()), subreddits, LLMCommentClassifier(pool, args.batch_size),
+        extractor=extractor, windows=windows, queue_size=args.queue_size, batch_size=args.batch_size,
+        batch_wait=args.batch_wait, workers=args.workers, snapshot_path=args.snapshot_path,
+        snapshot_interval=args.snapshot_interval, output_path=args.output,
+        include_submissions=not args.no_submissions, min_mentions=args.min_mentions)
+
+    print(f"📡 Following r/{'+'.join(subreddits)} | windows {', '.join(format_duration(w) for w in windows)} | "
+          f"snapshots every {args.snapshot_interval:g}s to {args.snapshot_path}")
+    try:
+        asyncio.run(daemon.run(args.duration, on_snapshot=print_snapshot))
+    except KeyboardInterrupt:
+        print("\n⏹️  Stopped")
+    print_snapshot(daemon.snapshot())
+    if args.metrics_out:
+        print(f"📊 Metrics written to {daemon.metrics.write(args.metrics_out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Content-addressed on-disk cache for LLM results.
+Entries are keyed by a hash of model, temperature, prompt template version, prompt
+variant and input text, stored in SQLite and evicted by age and total size.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(".llm_cache", "responses.sqlite")
+
+
+class LLMCache:
+    """Persistent key/value cache with hit/miss counters and size/age-based eviction."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=500 * 1024 * 1024, max_age_days=30,
+                 bypass=False, commit_every=100, evict_every=1000):
+        """
+        Args:
+            path: SQLite file holding the cache
+            max_bytes: Evict least recently used entries once stored values exceed this size
+            max_age_days: Entries older than this are dropped (0 keeps them forever)
+            bypass: Ignore existing entries but still store fresh results
+            commit_every: Commit after this many writes
+            evict_every: Enforce max_bytes / max_age_days again after this many stored values, so a
+                long run cannot grow the cache far past its cap
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.bypass = bypass
+        self.commit_every = commit_every
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evicted = 0
+        self._uncommitted = 0
+        self._puts_since_evict = 0
+        self.conn = sqlite3.connect(path)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self.evict()
+
+    @staticmethod
+    def make_key(model, temperature, template_version, kind, *inputs):
+        """Hash everything that determines an LLM result into a cache key."""
+        payload = json.dumps([model, temperature, template_version, kind, *inputs], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the cached value for `key`, or None on a miss."""
+        return self.get_any([key])
+
+    def get_any(self, keys):
+        """Return the value of the first of `keys` that is cached, or None; counts as one lookup."""
+        if self.bypass:
+            self.misses += 1
+            return None
+        for key in keys:
+            row = self.conn.execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or self._expired(row[1]):
+                continue
+            self.hits += 1
+            self.conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._maybe_commit()
+            return json.loads(row[0])
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """Store a JSON-serializable value under `key`."""
+        encoded = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, encoded, len(encoded), now, now)
+        )
+        self.writes += 1
+        self._maybe_commit()
+        self._puts_since_evict += 1
+        if self.evict_every and self._puts_since_evict >= self.evict_every:
+            self.evict()
+
+    def _expired(self, created_at):
+        return self.max_age_days > 0 and created_at < time.time() - self.max_age_days * 86400
+
+    def _maybe_commit(self):
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self.conn.commit()
+            self._uncommitted = 0
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until the cache fits in max_bytes."""
+        self._puts_since_evict = 0
+        # Leaving the block commits pending writes as well
+        self._uncommitted = 0
+        with self.conn:
+            if self.max_age_days > 0:
+                cursor = self.conn.execute(
+                    "DELETE FROM entries WHERE created_at < ?", (time.time() - self.max_age_days * 86400,))
+                self.evicted += cursor.rowcount
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            # Trim to 90% so eviction does not run again on the next few writes
+            excess = total - int(self.max_bytes * 0.9)
+            doomed = []
+            for key, size in self.conn.execute("SELECT key, size FROM entries ORDER BY last_access"):
+                if excess <= 0:
+                    break
+                doomed.append((key,))
+                excess -= size
+            self.conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+            self.evicted += len(doomed)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'writes': self.writes,
+            'evicted': self.evicted
+        }
+
+    def close(self):
+        self.conn.commit()
+        self.evict()
+        self.conn.close()
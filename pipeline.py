@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+End-to-end run in one process: crawl -> classify -> aggregate.
+Replaces `reddit_search.py` -> JSON -> `comment_summerizer.py` -> JSON ->
+`AI_analyzer.py` with connected stages. The crawl runs in a thread and hands
+every post and comment over a bounded queue; classification starts on the
+first comments while the crawl continues, and each post is tagged for the
+report as soon as its last comment is labelled. PRAW, OpenAI and pandas are
+imported by the stage that needs them, and intermediate files are only
+written when asked for.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime
+
+from run_metrics import RunMetrics
+
+DEFAULT_QUEUE_SIZE = 2000
+# sentiment_table.GROUP_COLUMNS, repeated so argument checking does not load pandas
+GROUP_KEYS = ('day', 'search_term', 'post', 'file', 'ticker', 'subreddit')
+
+
+class CrawlAborted(BaseException):
+    """Raised in the crawl thread once classification has stopped; not an Exception so per-post handlers pass it on."""
+
+
+class CrawlFeed:
+    """
+    JsonlResultWriter stand-in passed to search_reddit_posts as `writer`.
+
+    Runs in the crawl thread and forwards every post and comment to the
+    classifier's asyncio queue, blocking while it is full so the crawl never
+    runs more than `queue_size` comments ahead. With `tee`, records are also
+    written to a real JsonlResultWriter. Posts may be crawled from several
+    threads at once.
+    """
+
+    def __init__(self, loop, queue, tee=None):
+        self.loop = loop
+        self.queue = queue
+        self.tee = tee
+        self.blocked_seconds = 0.0
+        self._post_comments = {}
+        self._lock = threading.Lock()
+        self._aborted = threading.Event()
+
+    def _put(self, event):
+        started = time.perf_counter()
+        future = asyncio.run_coroutine_threadsafe(self.queue.put(event), self.loop)
+        while True:
+            try:
+                future.result(timeout=1)
+                break
+            except FutureTimeoutError:
+                if self._aborted.is_set():
+                    future.cancel()
+                    raise CrawlAborted()
+        with self._lock:
+            self.blocked_seconds += time.perf_counter() - started
+
+    def abort(self):
+        """Stop the crawl at its next record (the consumer is gone)."""
+        self._aborted.set()
+
+    def write_post(self, post):
+        if self.tee is not None:
+            self.tee.write_post(post)
+        with self._lock:
+            self._post_comments[post['id']] = 0
+        # search_reddit_posts fills in the same dict later; the classifier gets its own copy
+        self._put(('post', dict(post)))
+
+    def write_comment(self, post_id, comment):
+        if self.tee is not None:
+            self.tee.write_comment(post_id, comment)
+        with self._lock:
+            self._post_comments[post_id] = self._post_comments.get(post_id, 0) + 1
+        self._put(('comment', post_id, comment))
+
+    def end_post(self, post_id):
+        if self.tee is not None:
+            self.tee.end_post(post_id)
+        self._put(('end', post_id))
+        with self._lock:
+            return self._post_comments.pop(post_id, 0)
+
+    def close(self):
+        """Tell the classifier the crawl is over."""
+        if not self._aborted.is_set():
+            self._put(None)
+
+
+class StreamingClassifier:
+    """
+    Consumes CrawlFeed events: summarizes each post as soon as it arrives and
+    classifies its comments in batches of `batch_size` while the crawl goes on.
+    At most `max_pending` batches are queued for the LLM pool; beyond that the
+    consumer (and through the bounded queue, the crawl) waits.
+    """
+
+    def __init__(self, pool, summarizer, batch_size=20, triage=False, max_pending=32, on_post_done=None):
+        """
+        Args:
+            pool: AsyncLLMPool shared by all requests
+            summarizer: The comment_summerizer module (prompts, parsing and cache helpers)
+            batch_size: Comments per classification request (1: one prompt per comment)
+            triage: Label deleted, emoji-only and trivial comments locally
+            max_pending: Batches waiting for or in the pool before the consumer pauses
+            on_post_done: Callable receiving each post dict, with post_summary and labelled comments
+        """
+        self.pool = pool
+        self.summarizer = summarizer
+        self.batch_size = batch_size
+        self.triage = triage
+        self.on_post_done = on_post_done
+        if triage:
+            from comment_triage import triage_comments, triage_result
+            self._triage = (triage_comments, triage_result)
+        self.posts = []
+        self.classified = 0
+        self.triaged = 0
+        self._slots = asyncio.Semaphore(max_pending)
+        self._states = {}
+        self._failure = None
+
+    def _watch(self, task):
+        """Remember the first failed batch or post so consume stops instead of draining the whole crawl."""
+        def done(task):
+            if self._failure is None and not task.cancelled() and task.exception() is not None:
+                self._failure = task.exception()
+        task.add_done_callback(done)
+        return task
+
+    async def consume(self, queue):
+        """
+        Process events until the feed is closed; returns the posts in crawl order.
+
+        Raises the first error of a classification batch or of on_post_done as soon as
+        it happens; the caller then aborts the feed.
+        """
+        finishing = []
+        while True:
+            if self._failure is not None:
+                raise self._failure
+            event = await queue.get()
+            if event is None:
+                break
+            if event[0] == 'post':
+                post = event[1]
+                post['comments'] = []
+                self.posts.append(post)
+                self._states[post['id']] = {
+                    'post': post, 'buffer': [], 'batches': [],
+                    'summary': asyncio.create_task(self._summarize(post))
+                }
+            elif event[0] == 'comment':
+                state = self._states[event[1]]
+                state['post']['comments'].append(event[2])
+                state['buffer'].append(event[2])
+                if len(state['buffer']) >= self.batch_size:
+                    await self._flush(state)
+            else:
+                state = self._states.pop(event[1])
+                await self._flush(state)
+                finishing.append(self._watch(asyncio.create_task(self._finish(state))))
+        await asyncio.gather(*finishing)
+        return self.posts
+
+    async def _summarize(self, post):
+        try:
+            return await self.summarizer.summarize_post_async(self.pool, post['title'], post.get('selftext', ''))
+        except Exception as e:
+            post['error'] = str(e)
+            print(f"  ✗ Post error: {str(e)}")
+            return ""
+
+    async def _flush(self, state):
+        if not state['buffer']:
+            return
+        batch, state['buffer'] = state['buffer'], []
+        await self._slots.acquire()
+        state['batches'].append(self._watch(asyncio.create_task(self._classify(state, batch))))
+
+    async def _classify(self, state, batch):
+        try:
+            if self.triage:
+                triage_comments, triage_result = self._triage
+                reasons = triage_comments(comment.get('body', '') for comment in batch)
+                for comment, reason in zip(batch, reasons):
+                    if reason:
+                        self.summarizer.apply_result(comment, triage_result(reason))
+                        comment['triage'] = reason
+                self.triaged += sum(1 for reason in reasons if reason)
+                batch = [comment for comment, reason in zip(batch, reasons) if not reason]
+            post_summary = await state['summary']
+            # Like comment_summerizer.py, comments of a post that could not be summarized stay unlabelled
+            if post_summary and batch:
+                await self.summarizer.classify_post_comments(self.pool, post_summary, batch, self.batch_size)
+                self.classified += len(batch)
+        finally:
+            self._slots.release()
+
+    async def _finish(self, state):
+        post = state['post']
+        post['post_summary'] = await state['summary']
+        await asyncio.gather(*state['batches'])
+        post['comments_count'] = len(post['comments'])
+        print(f"  ✓ {post['comments_count']} comments classified for '{post['title'][:50]}'")
+        if self.on_post_done is not None:
+            self.on_post_done(post)
+
+
+class PostAggregator:
+    """Flattens each finished post into report columns right away, so only the final tables remain at the end."""
+
+    def __init__(self, document, source, extractor):
+        self.document = document
+        self.source = source
+        self.extractor = extractor
+        self.columns = []
+
+    def add(self, post):
+        # Deferred: sentiment_table pulls in pandas
+        from sentiment_table import result_columns
+        self.columns.append(result_columns(self.source, dict(self.document, posts=[post]), self.extractor))
+
+    def tables(self):
+        from sentiment_table import build_tables
+        return build_tables(self.columns)
+
+
+def load_summarizer():
+    """Import comment_summerizer (openai and config.py) off the event loop."""
+    import comment_summerizer
+    return comment_summerizer
+
+
+def crawl(args, targets, feed, governor_holder, metrics):
+    """Crawl thread: search and stream every post and comment into `feed`."""
+    try:
+        with metrics.stage('crawl'):
+            import requests
+            from rate_limiter import RateLimitGovernor
+            from reddit_search import create_reddit_instance, load_credentials, resolve_search_targets, search_reddit_posts
+            from run_metrics import instrument_session
+
+            reddit = create_reddit_instance(load_credentials(), instrument_session(requests.Session(), metrics, 'reddit'))
+            governor = RateLimitGovernor(reddit)
+            governor_holder.append(governor)
+            targets[:] = resolve_search_targets(reddit, targets)
+            return search_reddit_posts(reddit, search_term=args.search_term, limit=args.limit,
+                                       time_filter=args.time_filter, sort=args.sort, governor=governor,
+                                       engine=args.engine, writer=feed, metrics=metrics,
+                                       subreddits=targets, workers=args.workers)
+    finally:
+        feed.close()
+
+
+async def run_pipeline(args, metrics):
+    """Run the connected stages; returns (document, report summary)."""
+    from result_stream import JsonlResultWriter
+    from reddit_search import build_output_filename, build_summary, get_results_path
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=args.queue_size)
+    executed_at = datetime.now()
+    subreddits = [entry.strip() for entry in args.subreddits.split(',') if entry.strip()]
+    filename = build_output_filename(args.search_term, args.time_filter, args.sort, subreddits)
+    document = build_summary([], filename, args.search_term, args.limit, args.time_filter, args.sort,
+                             executed_at=executed_at)
+
+    tee = None
+    if args.save_raw:
+        tee = JsonlResultWriter(get_results_path(os.path.splitext(filename)[0] + '.jsonl'))
+        tee.write_header(document['metadata'], document['search_parameters'])
+    feed = CrawlFeed(loop, queue, tee)
+    governor_holder = []
+    # The crawl thread resolves multireddits in place, for search_scope
+    targets = list(subreddits)
+    crawl_task = loop.run_in_executor(None, crawl, args, targets, feed, governor_holder, metrics)
+
+    # The OpenAI stack is imported while the crawl thread is already talking to Reddit
+    with metrics.stage('import_classifier'):
+        summarizer = await asyncio.to_thread(load_summarizer)
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+        from async_llm import AsyncLLMPool
+        from llm_cache import LLMCache
+        from run_metrics import httpx_event_hooks
+        from ticker_extraction import TickerExtractor, default_extractor, load_ticker_dictionary
+
+    if not args.no_cache:
+        summarizer.response_cache = LLMCache()
+    pool = AsyncLLMPool(
+        AsyncOpenAI(api_key=summarizer.OPENAI_API_KEY, max_retries=0,
+                    http_client=DefaultAsyncHttpxClient(event_hooks=httpx_event_hooks(metrics, 'llm', asynchronous=True))),
+        model=summarizer.MODEL, temperature=summarizer.TEMPERATURE, concurrency=args.concurrency,
+        requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+
+    tickers = load_ticker_dictionary(args.tickers_file) if args.tickers_file else None
+    extractor = TickerExtractor(tickers) if tickers else default_extractor()
+    classified_path = get_results_path(os.path.splitext(filename)[0] + '_summarized.json')
+    aggregator = PostAggregator(document, classified_path if args.save_classified else filename, extractor)
+
+    def on_post_done(post):
+        with metrics.stage('aggregate_posts'):
+            aggregator.add(post)
+
+    classifier = StreamingClassifier(pool, summarizer, args.batch_size, args.triage,
+                                     max_pending=args.concurrency * 2, on_post_done=on_post_done)
+    try:
+        with metrics.stage('classify'):
+            posts = await classifier.consume(queue)
+        crawled = await crawl_task
+    finally:
+        if not crawl_task.done():
+            feed.abort()
+        if summarizer.response_cache is not None:
+            metrics.update('cache', summarizer.response_cache.stats())
+            summarizer.response_cache.close()
+
+    metrics.set('crawl_blocked_seconds', feed.blocked_seconds)
+    metrics.set('comments_classified', classifier.classified)
+    metrics.set('comments_triaged', classifier.triaged)
+    metrics.update('llm', pool.stats())
+    governor = governor_holder[0] if governor_holder else None
+    if governor is not None:
+        metrics.update('rate_limit', governor.stats())
+    if crawled:
+        # search_reddit_posts' own dicts carry the fields it set after streaming (comments_count)
+        counts = {post['id']: post.get('comments_count', 0) for post in crawled}
+        for post in posts:
+            post['comments_count'] = counts.get(post['id'], post['comments_count'])
+
+    document = build_summary(posts, filename, args.search_term, args.limit, args.time_filter, args.sort,
+                             governor=governor, executed_at=executed_at, metrics=metrics,
+                             targets=targets)
+    with metrics.stage('save'):
+        if tee is not None:
+            tee.write_footer(document['results_summary'], document['metadata'], document['search_parameters'])
+            tee.close()
+            print(f"💾 Crawl saved: {tee.path}")
+        if args.save_classified:
+            document['metadata']['classification_metrics'] = metrics.as_dict()
+            with open(classified_path, 'w', encoding='utf-8') as f:
+                json.dump(document, f, indent=2, ensure_ascii=False)
+            print(f"💾 Classified result saved: {classified_path}")
+
+    if not posts:
+        print("No posts found matching the search criteria.")
+        return document, None
+
+    import AI_analyzer
+    posts_table, comments_table = aggregator.tables()
+    group_by = tuple(key.strip() for key in args.group_by.split(',') if key.strip())
+    summary = AI_analyzer.report_tables(posts_table, comments_table, [aggregator.source], group_by, args.json_out,
+                                        extractor, args.by_ticker, args.min_mentions, args.top_tickers, metrics)
+    return document, summary
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(
+        description='Crawl, classify and report Reddit sentiment in one process with overlapping stages')
+    parser.add_argument('-s', '--search-term', default='Google stock', help='Search term (default: "Google stock")')
+    parser.add_argument('-l', '--limit', type=int, default=2, help='Number of posts to retrieve (default: 2)')
+    parser.add_argument('-t', '--time-filter', default='week', choices=['day', 'week', 'month', 'year', 'all'],
+                        help='Time filter for posts (default: week)')
+    parser.add_argument('-o', '--sort', default='relevance', choices=['relevance', 'hot', 'top', 'new', 'comments'],
+                        help='Sort method for posts (default: relevance)')
+    parser.add_argument('-r', '--subreddits', default='wallstreetbets',
+                        help='Comma-separated subreddits, "a+b" combined searches or "u/<user>/m/<name>" multireddits '
+                             '(default: wallstreetbets)')
+    parser.add_argument('-w', '--workers', type=int, default=4,
+                        help='Concurrent searches and comment crawls (default: 4)')
+    parser.add_argument('-e', '--engine', default='raw', choices=['praw', 'raw'],
+                        help='Comment fetch engine (default: raw)')
+    parser.add_argument('--batch-size', type=int, default=20,
+                        help='Comments per classification request, 1 for one prompt per comment (default: 20)')
+    parser.add_argument('--concurrency', type=int, default=16, help='LLM requests in flight (default: 16)')
+    parser.add_argument('--rpm', type=int, default=500, help='Requests per minute limit (default: 500)')
+    parser.add_argument('--tpm', type=int, default=150000, help='Tokens per minute limit (default: 150000)')
+    parser.add_argument('--triage', action='store_true',
+                        help='Label deleted, emoji-only and trivial comments locally instead of with the LLM')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help=f'Comments the crawl may run ahead of classification (default: {DEFAULT_QUEUE_SIZE})')
+    parser.add_argument('--no-cache', action='store_true', help='Do not use the on-disk LLM result cache')
+    parser.add_argument('--save-raw', action='store_true',
+                        help='Also stream the crawl to results/<date>/<name>.jsonl as reddit_search.py --format jsonl does')
+    parser.add_argument('--save-classified', action='store_true',
+                        help='Also write results/<date>/<name>_summarized.json for later AI_analyzer.py runs')
+    parser.add_argument('--group-by', default='post',
+                        help=f"Comma-separated report group keys: {', '.join(GROUP_KEYS)} (default: post)")
+    parser.add_argument('--json-out', help='Write the machine-readable report summary to this file')
+    parser.add_argument('--by-ticker', action='store_true',
+                        help='Print one report per ticker mentioned in the comments instead of one overall report')
+    parser.add_argument('--min-mentions', type=int, default=5,
+                        help='Minimum comments mentioning a ticker for its own report (default: 5)')
+    parser.add_argument('--top-tickers', type=int, default=10, help='Maximum number of per-ticker reports (default: 10)')
+    parser.add_argument('--tickers-file', help='JSON ticker dictionary merged over the built-in one')
+    parser.add_argument('--metrics-out', help='Write run metrics to this file (*.prom: Prometheus text format, otherwise JSON)')
+    return parser
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    unknown = [key for key in args.group_by.split(',') if key.strip() and key.strip() not in GROUP_KEYS]
+    if unknown:
+        print(f"❌ Unknown group key(s): {', '.join(unknown)}")
+        sys.exit(1)
+    metrics = RunMetrics('pipeline')
+    print(f"🚀 '{args.search_term}' ({args.limit} posts, {args.time_filter}, {args.sort}): crawl -> classify -> report")
+    try:
+        asyncio.run(run_pipeline(args, metrics))
+    except KeyboardInterrupt:
+        print("\n⏹️  Interrupted")
+        sys.exit(130)
+    metrics.print_report()
+    if args.metrics_out:
+        print(f"📊 Metrics written to {metrics.write(args.metrics_out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Shared rate-limit governor for Reddit API calls.
+Reads the quota that prawcore tracks from Reddit's x-ratelimit-* headers and
+only backs off when the budget is nearly spent or Reddit answers with a 429.
+"""
+import contextlib
+import random
+import threading
+import time
+
+from prawcore.exceptions import RequestException, ServerError, TooManyRequests
+
+
+class _SharedRateLimiter:
+    """
+    prawcore RateLimiter whose state is guarded by a lock.
+
+    prawcore's limiter is not thread-safe: concurrent update() calls can see
+    `remaining` set and `used` still None, and concurrent delay() calls all pass
+    the same pacing deadline. Pacing, the token refresh and the header update
+    run under the lock; the HTTP request itself does not.
+    """
+
+    def __init__(self, limiter):
+        self._limiter = limiter
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # remaining, reset_timestamp, next_request_timestamp, ... are read from the wrapped limiter
+        return getattr(self._limiter, name)
+
+    def call(self, request_function, set_header_callback, *args, **kwargs):
+        with self.lock:
+            self._limiter.delay()
+            kwargs["headers"] = set_header_callback()
+        response = request_function(*args, **kwargs)
+        with self.lock:
+            self._limiter.update(response.headers)
+        return response
+
+
+def share_rate_limiter(reddit):
+    """Make the rate limiters of a PRAW Reddit instance safe to use from several threads; returns `reddit`."""
+    for name in ('_core', '_authorized_core', '_read_only_core'):
+        core = getattr(reddit, name, None)
+        limiter = getattr(core, '_rate_limiter', None)
+        if limiter is not None and not isinstance(limiter, _SharedRateLimiter):
+            core._rate_limiter = _SharedRateLimiter(limiter)
+    return reddit
+
+
+class RateLimitGovernor:
+    """
+    Spend the available Reddit request budget as fast as allowed.
+
+    One governor can be shared by several crawls (and threads) that use the
+    same authenticated Reddit instance, so they all draw from one quota. The
+    instance's prawcore rate limiter is made thread-safe when it is attached.
+    """
+
+    def __init__(self, reddit=None, min_remaining=2, max_retries=5, base_backoff=2, max_backoff=120):
+        """
+        Args:
+            reddit: PRAW Reddit instance whose prawcore rate limiter is read
+            min_remaining: Back off until the window resets once this many requests or fewer remain
+            max_retries: Number of retries after a 429 or transient server error
+            base_backoff: First backoff in seconds when no Retry-After header is given
+            max_backoff: Upper bound for a single backoff in seconds
+        """
+        self.reddit = share_rate_limiter(reddit) if reddit is not None else None
+        self.min_remaining = min_remaining
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+        self.fetch_seconds = 0.0
+
+    def attach(self, reddit):
+        """Use the rate limiter of `reddit` if no instance was given yet."""
+        if self.reddit is None:
+            self.reddit = share_rate_limiter(reddit)
+        return self
+
+    def _limiter(self):
+        core = getattr(self.reddit, '_core', None)
+        return getattr(core, '_rate_limiter', None)
+
+    def quota(self):
+        """Return (remaining requests, seconds until reset), or (None, None) before the first response."""
+        limiter = self._limiter()
+        if limiter is None:
+            return None, None
+        # Both values are read under the limiter's lock so they belong to the same response
+        with getattr(limiter, 'lock', None) or contextlib.nullcontext():
+            remaining, reset_timestamp = limiter.remaining, limiter.reset_timestamp
+        if remaining is None or reset_timestamp is None:
+            return None, None
+        return remaining, max(reset_timestamp - time.time(), 0.0)
+
+    def _pending_delay(self):
+        """Seconds prawcore itself will sleep before sending the next request."""
+        limiter = self._limiter()
+        if limiter is None or limiter.next_request_timestamp is None:
+            return 0.0
+        return max(limiter.next_request_timestamp - time.time(), 0.0)
+
+    def _sleep(self, seconds):
+        if seconds <= 0:
+            return
+        time.sleep(seconds)
+        with self._lock:
+            self.wait_seconds += seconds
+
+    def wait(self):
+        """Sleep until the window resets, but only when the quota is close to empty."""
+        remaining, seconds_to_reset = self.quota()
+        if remaining is None or remaining > self.min_remaining:
+            return
+        self._sleep(seconds_to_reset)
+
+    def _backoff(self, error, attempt):
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        delay = min(self.base_backoff * (2 ** attempt), self.max_backoff)
+        return delay + random.uniform(0, delay / 2)
+
+    def call(self, func, *args, **kwargs):
+        """
+        Run `func(*args, **kwargs)` under the shared budget.
+
+        Retries on 429 and transient server/network errors with backoff; any
+        other exception is raised immediately.
+
+        Returns:
+            Whatever `func` returns
+        """
+        attempt = 0
+        while True:
+            self.wait()
+            started = time.time()
+            # prawcore paces requests inside the call; count that as waiting, not fetching
+            internal_wait = self._pending_delay()
+            try:
+                result = func(*args, **kwargs)
+            except (TooManyRequests, ServerError, RequestException) as e:
+                self._record(started, internal_wait)
+                if attempt >= self.max_retries:
+                    raise
+                with self._lock:
+                    self.retries += 1
+                    if isinstance(e, TooManyRequests):
+                        self.throttled += 1
+                self._sleep(self._backoff(e, attempt))
+                attempt += 1
+                continue
+            self._record(started, internal_wait)
+            return result
+
+    def _record(self, started, internal_wait):
+        elapsed = time.time() - started
+        internal_wait = min(internal_wait, elapsed)
+        with self._lock:
+            self.calls += 1
+            self.wait_seconds += internal_wait
+            self.fetch_seconds += elapsed - internal_wait
+
+    def stats(self):
+        """Return a JSON-serializable summary of time spent waiting vs. fetching."""
+        remaining, seconds_to_reset = self.quota()
+        with self._lock:
+            total = self.wait_seconds + self.fetch_seconds
+            return {
+                'calls': self.calls,
+                'retries': self.retries,
+                'throttled_responses': self.throttled,
+                'wait_seconds': round(self.wait_seconds, 2),
+                'fetch_seconds': round(self.fetch_seconds, 2),
+                'wait_share': round(self.wait_seconds / total, 3) if total > 0 else 0.0,
+                'quota_remaining': remaining,
+                'seconds_to_reset': round(seconds_to_reset, 1) if seconds_to_reset is not None else None
+            }
+
+    def print_report(self):
+        """Print the waiting vs. fetching breakdown."""
+        stats = self.stats()
+        print(f"Rate limit: {stats['calls']} calls, {stats['retries']} retries "
+              f"({stats['throttled_responses']} throttled)")
+        print(f"Time fetching: {stats['fetch_seconds']:.1f}s, waiting: {stats['wait_seconds']:.1f}s "
+              f"({stats['wait_share'] * 100:.1f}% waiting)")
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Raw-JSON comment fetch engine.
+Pulls /comments/{id} once and resolves every remaining child id through
+/api/morechildren in maximum-size batches, turning the raw JSON straight into
+the same comment dicts that reddit_search.extract_comments produces.
+"""
+from collections import deque
+from datetime import datetime
+
+import requests
+
+from comment_tree import CommentTree
+
+# Reddit rejects /api/morechildren calls with more than 100 ids
+MORECHILDREN_BATCH_SIZE = 100
+
+
+def praw_fetcher(reddit, governor=None):
+    """
+    Build a fetch function that reuses an authenticated PRAW session.
+
+    Args:
+        reddit: PRAW Reddit instance
+        governor: Optional RateLimitGovernor to run every request under
+
+    Returns:
+        Callable taking (path, params) and returning the decoded JSON
+    """
+    def fetch(path, params):
+        if governor is None:
+            return reddit.request(method='GET', path=path, params=params)
+        return governor.call(reddit.request, method='GET', path=path, params=params)
+    return fetch
+
+
+def http_fetcher(base_url, token=None, user_agent='reddit_search.py raw engine', session=None, timeout=30):
+    """
+    Build a fetch function that talks plain HTTP to `base_url`.
+
+    Useful against oauth.reddit.com with a bearer token, or against a local
+    stand-in serving recorded fixtures.
+
+    Args:
+        base_url: Server root, e.g. "https://oauth.reddit.com" or "http://127.0.0.1:8000"
+        token: Optional OAuth bearer token
+        user_agent: User-Agent header to send
+        session: Optional requests.Session to reuse
+        timeout: Per-request timeout in seconds
+
+    Returns:
+        Callable taking (path, params) and returning the decoded JSON
+    """
+    session = session or requests.Session()
+    session.headers['User-Agent'] = user_agent
+    if token:
+        session.headers['Authorization'] = f"bearer {token}"
+    base_url = base_url.rstrip('/')
+
+    def fetch(path, params):
+        response = session.get(base_url + path, params=params, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+    return fetch
+
+
+def comment_to_dict(data):
+    """Convert raw t1 data into the dict format used by extract_comments (num_replies filled in later)."""
+    return {
+        'id': data['id'],
+        'author': data.get('author') or '[deleted]',
+        'body': data.get('body', ''),
+        'score': data.get('score', 0),
+        'created_utc': datetime.fromtimestamp(data['created_utc']).isoformat(),
+        'permalink': f"https://reddit.com{data.get('permalink', '')}",
+        'is_submitter': data.get('is_submitter', False),
+        'distinguished': data.get('distinguished'),
+        'edited': data.get('edited') if data.get('edited') else False,
+        'num_replies': 0,
+        'parent_id': data.get('parent_id'),
+        'depth': data.get('depth')
+    }
+
+
+class _ThreadCollector:
+    """Accumulates comments in a CommentTree and the child ids still to be fetched for one submission."""
+
+    def __init__(self, submission_id, skip_ids=None):
+        self.link_id = f"t3_{submission_id}"
+        self.skip_ids = skip_ids or set()
+        self.comments = CommentTree(self.link_id)
+        self.pending_ids = deque()
+        self.continue_parents = deque()
+
+    def add_things(self, things):
+        """Walk a list of raw t1/more things, including nested reply listings."""
+        stack = list(reversed(things))
+        while stack:
+            thing = stack.pop()
+            kind = thing.get('kind')
+            data = thing.get('data', {})
+            if kind == 't1':
+                self._add_comment(data)
+                replies = data.get('replies')
+                if isinstance(replies, dict):
+                    stack.extend(reversed(replies.get('data', {}).get('children', [])))
+            elif kind == 'more':
+                if data.get('children'):
+                    self.pending_ids.extend(cid for cid in data['children'] if cid not in self.skip_ids)
+                elif data.get('parent_id', '').startswith('t1_'):
+                    # "Continue this thread": the subtree has to be loaded from its parent comment
+                    self.continue_parents.append(data['parent_id'][3:])
+
+    def _add_comment(self, data):
+        if data['id'] not in self.comments:
+            self.comments.append(comment_to_dict(data))
+
+    def flatten(self):
+        """Yield comments in breadth-first order with num_replies set, like CommentForest.list()."""
+        # Dicts are only built on the way out; the tree holds the thread in arrays meanwhile
+        return self.comments.iter_comments()
+
+
+def _listing_things(listing):
+    return listing.get('data', {}).get('children', [])
+
+
+def _morechildren_things(response):
+    # api_type=json wraps the things; the bare form returns them at the top level
+    if 'json' in response:
+        return response['json'].get('data', {}).get('things', [])
+    return response.get('things', [])
+
+
+def fetch_comments_raw(submission_id, fetch, sort='confidence', batch_size=MORECHILDREN_BATCH_SIZE,
+                       listing_limit=500, skip_ids=None, sink=None):
+    """
+    Fetch every comment of a submission using raw JSON endpoints.
+
+    Args:
+        submission_id: Base36 submission id (without the t3_ prefix)
+        fetch: Callable (path, params) -> decoded JSON, see praw_fetcher / http_fetcher
+        sort: Comment sort passed to Reddit ("confidence" is what PRAW calls "best")
+        batch_size: Child ids per /api/morechildren call (max 100)
+        listing_limit: Comments requested in the initial /comments/{id} call
+        skip_ids: Comment ids already known (e.g. from an incremental crawl); they are
+            not requested through /api/morechildren, so only new ids cost API calls
+        sink: Optional callable receiving each finished comment dict instead of returning them
+
+    Returns:
+        List of comment dictionaries in the extract_comments format (empty when `sink` is given)
+    """
+    batch_size = min(batch_size, MORECHILDREN_BATCH_SIZE)
+    collector = _ThreadCollector(submission_id, skip_ids)
+    total_comments_scraped = 0
+    last_milestone = 0
+
+    _, comment_listing = fetch(f"/comments/{submission_id}", {
+        'sort': sort, 'limit': listing_limit, 'raw_json': 1
+    })
+    collector.add_things(_listing_things(comment_listing))
+    # Only one decoded response is alive at a time; it is the bulk of the peak memory
+    comment_listing = None
+
+    while collector.pending_ids or collector.continue_parents:
+        if collector.pending_ids:
+            batch = [collector.pending_ids.popleft()
+                     for _ in range(min(batch_size, len(collector.pending_ids)))]
+            response = fetch('/api/morechildren', {
+                'link_id': collector.link_id,
+                'children': ','.join(batch),
+                'sort': sort,
+                'limit_children': 'false',
+                'api_type': 'json',
+                'raw_json': 1
+            })
+            collector.add_things(_morechildren_things(response))
+            response = None
+        else:
+            parent_id = collector.continue_parents.popleft()
+            _, comment_listing = fetch(f"/comments/{submission_id}/_/{parent_id}", {
+                'sort': sort, 'limit': listing_limit, 'raw_json': 1
+            })
+            collector.add_things(_listing_things(comment_listing))
+            comment_listing = None
+
+        total_comments_scraped = len(collector.comments)
+        if total_comments_scraped >= last_milestone + 1000:
+            print(f"Total comments scraped: {total_comments_scraped}")
+            last_milestone = (total_comments_scraped // 1000) * 1000
+
+    print(f"\nFinal comment count: {len(collector.comments)} comments scraped")
+    if sink is None:
+        return list(collector.flatten())
+    for comment in collector.flatten():
+        sink(comment)
+    return []
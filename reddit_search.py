@@ -7,9 +7,19 @@ import praw
 import json
 import os
 import argparse
+import re
+import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-import time
+
+from rate_limiter import RateLimitGovernor
+from raw_comments import fetch_comments_raw, praw_fetcher
+from comment_index import DEFAULT_INDEX_PATH, DEFAULT_MAX_AGE_HOURS, CommentIndex, find_previous_result, merge_posts
+from result_stream import JsonlResultWriter
+from columnar_store import COLUMNAR_SUFFIX, write_columnar
+from run_metrics import RunMetrics, instrument_session, timed
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -24,18 +34,19 @@ def load_credentials():
     }
 
 
-def create_reddit_instance(credentials):
-    """Create and return a Reddit instance."""
+def create_reddit_instance(credentials, session=None):
+    """Create and return a Reddit instance (optionally sending everything through `session`)."""
     return praw.Reddit(
         client_id=credentials['client_id'],
         client_secret=credentials['client_secret'],
         user_agent=credentials['user_agent'],
         username=credentials['username'],
-        password=credentials['password']
+        password=credentials['password'],
+        requestor_kwargs={'session': session} if session is not None else None
     )
 
 
-def extract_comments(comment_forest, max_depth=5, current_depth=0, batch_size=200, delay_seconds=30):
+def extract_comments(comment_forest, max_depth=5, current_depth=0, batch_size=200, governor=None, sink=None):
     """
     Recursively extract comments from a comment forest in batches.
     
@@ -43,11 +54,12 @@ def extract_comments(comment_forest, max_depth=5, current_depth=0, batch_size=20
         comment_forest: PRAW CommentForest or list of comments
         max_depth: Maximum recursion depth to prevent infinite loops
         current_depth: Current recursion depth
-        batch_size: Number of comments to process before taking a break (default: 200)
-        delay_seconds: Number of seconds to wait between batches (default: 30)
+        batch_size: Number of MoreComments to expand per replace_more call (default: 200)
+        governor: Shared RateLimitGovernor; one is created for the forest's Reddit instance if omitted
+        sink: Optional callable receiving each comment dict as it is extracted; nothing is accumulated when given
     
     Returns:
-        List of comment dictionaries
+        List of comment dictionaries (empty when `sink` is given)
     """
     if current_depth >= max_depth:
         return []
@@ -59,41 +71,22 @@ def extract_comments(comment_forest, max_depth=5, current_depth=0, batch_size=20
     
     # Replace MoreComments instances to get all comments
     if hasattr(comment_forest, 'replace_more'):
-        try:
-            # Process comments in batches
-            batch_count = 0
-            max_retries = 3
+        if governor is None:
+            submission = getattr(comment_forest, '_submission', None)
+            governor = RateLimitGovernor(getattr(submission, '_reddit', None))
+        
+        # Expand in batches; the governor only sleeps when the quota is nearly spent or on 429
+        while True:
+            try:
+                remaining = governor.call(comment_forest.replace_more, limit=batch_size)
+            except Exception as e:
+                print(f"Stopped expanding comments: {e}")
+                break
             
-            while True:
-                try:
-                    batch_count += 1
-                    remaining = None
-                    
-                    for retry in range(max_retries):
-                        try:
-                            remaining = comment_forest.replace_more(limit=batch_size)
-                            break
-                        except Exception as e:
-                            if retry < max_retries - 1:
-                                time.sleep(delay_seconds)
-                            break
-                    
-                    if remaining is None:
-                        break
-                        
-                    if not remaining:
-                        break
-                    
-                    total_comments_processed += batch_size
-                    
-                    if remaining:
-                        time.sleep(delay_seconds)
-                        
-                except Exception as e:
-                    break
-                    
-        except Exception as e:
-            pass
+            if not remaining:
+                break
+            
+            total_comments_processed += batch_size
     
     # Get all comments as a flat list
     try:
@@ -115,9 +108,14 @@ def extract_comments(comment_forest, max_depth=5, current_depth=0, batch_size=20
                         'is_submitter': comment.is_submitter,
                         'distinguished': comment.distinguished,
                         'edited': comment.edited if comment.edited else False,
-                        'num_replies': len(comment.replies) if hasattr(comment, 'replies') else 0
+                        'num_replies': len(comment.replies) if hasattr(comment, 'replies') else 0,
+                        'parent_id': comment.parent_id,
+                        'depth': getattr(comment, 'depth', None)
                     }
-                    comments_data.append(comment_data)
+                    if sink is not None:
+                        sink(comment_data)
+                    else:
+                        comments_data.append(comment_data)
                     total_comments_scraped += 1
                     
                     # Show progress every 1000 comments
@@ -135,93 +133,341 @@ def extract_comments(comment_forest, max_depth=5, current_depth=0, batch_size=20
     return comments_data
 
 
-def search_reddit_posts(reddit, search_term="Daily Discussion Thread", limit=1, time_filter="all", sort="new"):
+DEFAULT_SUBREDDITS = ("wallstreetbets",)
+MULTIREDDIT_PATTERN = re.compile(r'(?:/?u(?:ser)?/)?([\w-]+)/m/(\w+)/?$')
+
+
+def resolve_search_targets(reddit, subreddits=DEFAULT_SUBREDDITS):
+    """
+    Turn subreddit arguments into the searches to run.
+    
+    Args:
+        reddit: PRAW Reddit instance
+        subreddits: Names like "stocks", combined searches like "stocks+investing",
+            or multireddits as "u/<user>/m/<name>" (searched as one combined search of their subreddits);
+            (label, name) tuples from an earlier call are kept as they are
+    
+    Returns:
+        List of (label, subreddit name for reddit.subreddit()) tuples
+    """
+    targets = []
+    for entry in subreddits:
+        if isinstance(entry, tuple):
+            targets.append(entry)
+            continue
+        entry = entry.strip()
+        if entry.lower().startswith('r/'):
+            entry = entry[2:]
+        if not entry:
+            continue
+        match = MULTIREDDIT_PATTERN.match(entry)
+        if match:
+            multireddit = reddit.multireddit(redditor=match.group(1), name=match.group(2))
+            names = "+".join(str(subreddit) for subreddit in multireddit.subreddits)
+            targets.append((f"u/{match.group(1)}/m/{match.group(2)}", names))
+        else:
+            targets.append((f"r/{entry}", entry))
+    return targets
+
+
+def format_search_scope(targets):
+    """search_parameters.search_scope for the searches actually run, e.g. "r/wallstreetbets, r/stocks"."""
+    return ", ".join(label if name == label[2:] else f"{label} ({name})" for label, name in targets)
+
+
+def _normalize_url(url):
+    url = url.split('#', 1)[0].rstrip('/').lower()
+    for prefix in ('https://', 'http://', 'www.', 'old.', 'new.'):
+        if url.startswith(prefix):
+            url = url[len(prefix):]
+    return url
+
+
+def dedup_submissions(found):
+    """
+    Drop posts found more than once across searches.
+    
+    A post counts as a duplicate when it has the same id (overlapping searches),
+    is a crosspost of a post already found (or the other way round), or links to
+    the same URL. The original of a crosspost is kept in preference to the crosspost.
+    
+    Args:
+        found: (label, submission) pairs in search order
+    
+    Returns:
+        List of [label, submission, duplicates] entries, duplicates being (label, submission) pairs
+    """
+    entries = []
+    by_key = {}
+    for label, submission in found:
+        # Listing attributes only: reading a missing attribute would make PRAW fetch the post
+        attributes = vars(submission)
+        parent = attributes.get('crosspost_parent')
+        keys = [submission.id]
+        if parent:
+            keys.append(parent[3:])
+        if not attributes.get('is_self', True) and attributes.get('url'):
+            keys.append(_normalize_url(attributes['url']))
+        entry = next((by_key[key] for key in keys if key in by_key), None)
+        if entry is None:
+            entry = [label, submission, []]
+            entries.append(entry)
+        elif entry[1].id == submission.id:
+            continue
+        elif vars(entry[1]).get('crosspost_parent') == f"t3_{submission.id}":
+            # The crosspost came first; its original takes its place
+            entry[2].append((entry[0], entry[1]))
+            entry[0], entry[1] = label, submission
+        else:
+            entry[2].append((label, submission))
+        for key in keys:
+            by_key.setdefault(key, entry)
+    return entries
+
+
+def submission_to_dict(submission):
+    """Post fields saved for a submission."""
+    return {
+        'id': submission.id,
+        'title': submission.title,
+        'author': str(submission.author) if submission.author else '[deleted]',
+        'subreddit': str(submission.subreddit),
+        'score': submission.score,
+        'upvote_ratio': submission.upvote_ratio,
+        'num_comments': submission.num_comments,
+        'created_utc': datetime.fromtimestamp(submission.created_utc).isoformat(),
+        'url': submission.url,
+        'permalink': f"https://reddit.com{submission.permalink}",
+        'selftext': submission.selftext,
+        'is_self': submission.is_self,
+        'over_18': submission.over_18,
+        'spoiler': submission.spoiler,
+        'locked': submission.locked,
+        'distinguished': submission.distinguished,
+        'stickied': submission.stickied
+    }
+
+
+def crawl_submission(reddit, submission, governor, engine="praw", index=None, previous_posts=None, writer=None,
+                     metrics=None, tags=None):
+    """
+    Extract one post and its comments (see search_reddit_posts for the other arguments).
+    
+    Args:
+        tags: Extra fields added to the post record
+    
+    Returns:
+        Post dictionary with comments, or None when the post could not be processed
+    """
+    try:
+        print(f"Processing post: {submission.title[:50]}...")
+        
+        # Extract post data
+        post_data = submission_to_dict(submission)
+        post_data.update(tags or {})
+        
+        # Incremental crawls can reuse the previous result when nothing was added
+        previous_post = (previous_posts or {}).get(submission.id) if index is not None else None
+        known_ids = {c['id'] for c in previous_post.get('comments', [])} if previous_post else None
+        
+        # Streamed comments go straight to disk instead of into the post dict
+        sink = None
+        if writer is not None:
+            writer.write_post(post_data)
+            post_id = submission.id
+            sink = lambda comment: writer.write_comment(post_id, comment)
+        
+        # Extract comments
+        skipped = bool(previous_post) and index.is_unchanged(submission.id, submission.num_comments)
+        with timed(metrics, 'crawl_comments'):
+            if skipped:
+                print(f"No new comments for post {submission.id} since last crawl")
+                comments = []
+            elif engine == "raw":
+                print(f"Extracting comments for post {submission.id}...")
+                comments = fetch_comments_raw(submission.id, praw_fetcher(reddit, governor), skip_ids=known_ids, sink=sink)
+            else:
+                print(f"Extracting comments for post {submission.id}...")
+                submission.comment_sort = "best"  # Sort comments by best
+                comments = extract_comments(submission.comments, governor=governor, sink=sink)
+
+        # A skipped thread keeps its last crawl time, so it is re-crawled once that gets too old.
+        # The index is only committed once the result holding the delta is saved (see main)
+        if index is not None and not skipped:
+            delta = index.stage(submission.id, submission.num_comments, comments)
+            print(f"New or changed comments: {len(delta)}")
+            # Without a previous result to merge into, the full crawl has to be kept
+            if previous_post:
+                comments = delta
+        post_data['comments'] = comments
+        post_data['comments_count'] = writer.end_post(submission.id) if writer is not None else len(comments)
+        if metrics is not None:
+            metrics.add('posts')
+            metrics.add('comments', post_data['comments_count'])
+        return post_data
+        
+    except Exception as e:
+        print(f"Error processing submission {submission.id}: {e}")
+        return None
+
+
+def search_reddit_posts(reddit, search_term="Daily Discussion Thread", limit=1, time_filter="all", sort="new", governor=None, engine="praw", index=None, previous_posts=None, writer=None, metrics=None, subreddits=DEFAULT_SUBREDDITS, workers=1):
     """
     Search Reddit for posts matching the search term.
     
     Args:
         reddit: PRAW Reddit instance
         search_term: Search query
-        limit: Number of posts to retrieve
+        limit: Number of posts to retrieve per search target
         time_filter: Time filter (week, day, month, year, all)
         sort: Sort method (relevance, hot, top, new, comments)
+        governor: Shared RateLimitGovernor for all comment expansion
+        engine: Comment fetch engine ("praw" walks the CommentForest, "raw" uses batched morechildren JSON)
+        index: CommentIndex for incremental crawls; posts then only carry new or changed comments,
+            and the caller commits the index after saving them
+        previous_posts: Dict of post id -> post from the previous result that the delta will be merged into
+        writer: JsonlResultWriter; posts and comments are streamed to it and returned posts carry no comment lists
+        metrics: RunMetrics receiving "search" and "crawl_comments" stage times and post/comment counts
+        subreddits: Search targets, see resolve_search_targets (default: r/wallstreetbets)
+        workers: Searches and comment crawls run concurrently, all drawing from `governor`
     
     Returns:
-        List of post dictionaries with comments
+        List of post dictionaries with comments, in search order, each post found
+        by several searches (or crossposted) only once; `found_in` names the search
+        that found it and `crossposts` lists the duplicates that were dropped
     """
-    posts_data = []
+    if governor is None:
+        governor = RateLimitGovernor(reddit)
     
-    # Search only in r/wallstreetbets
     try:
-        # Use wallstreetbets subreddit instead of all
-        subreddit = reddit.subreddit("wallstreetbets")
+        targets = resolve_search_targets(reddit, subreddits)
         
-        # Search for posts, sorted by relevance (default)
-        search_results = subreddit.search(
-            search_term, 
-            sort=sort, 
-            time_filter=time_filter, 
-            limit=limit
-        )
+        def search(target):
+            label, name = target
+            # The listing is fetched here so it is timed on its own
+            with timed(metrics, 'search'):
+                results = list(reddit.subreddit(name).search(
+                    search_term, 
+                    sort=sort, 
+                    time_filter=time_filter, 
+                    limit=limit
+                ))
+            if len(targets) > 1:
+                print(f"{label}: {len(results)} posts")
+            return [(label, submission) for submission in results]
         
-        for submission in search_results:
-            try:
-                print(f"Processing post: {submission.title[:50]}...")
-                
-                # Extract post data
-                post_data = {
-                    'id': submission.id,
-                    'title': submission.title,
-                    'author': str(submission.author) if submission.author else '[deleted]',
-                    'subreddit': str(submission.subreddit),
-                    'score': submission.score,
-                    'upvote_ratio': submission.upvote_ratio,
-                    'num_comments': submission.num_comments,
-                    'created_utc': datetime.fromtimestamp(submission.created_utc).isoformat(),
-                    'url': submission.url,
-                    'permalink': f"https://reddit.com{submission.permalink}",
-                    'selftext': submission.selftext,
-                    'is_self': submission.is_self,
-                    'over_18': submission.over_18,
-                    'spoiler': submission.spoiler,
-                    'locked': submission.locked,
-                    'distinguished': submission.distinguished,
-                    'stickied': submission.stickied
-                }
-                
-                # Extract comments
-                print(f"Extracting comments for post {submission.id}...")
-                submission.comment_sort = "best"  # Sort comments by best
-                comments = extract_comments(submission.comments)
-                post_data['comments'] = comments
-                post_data['comments_count'] = len(comments)
-                
-                posts_data.append(post_data)
-                
-            except Exception as e:
-                print(f"Error processing submission {submission.id}: {e}")
-                continue
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            found = [item for items in executor.map(search, targets) for item in items]
     
     except Exception as e:
         print(f"Error during search: {e}")
         return []
     
+    entries = dedup_submissions(found)
+    if len(entries) < len(found):
+        print(f"Skipped {len(found) - len(entries)} duplicate posts and crossposts")
+        if metrics is not None:
+            metrics.add('duplicate_posts', len(found) - len(entries))
+    
+    def crawl(entry):
+        label, submission, duplicates = entry
+        tags = {
+            'found_in': label,
+            'crossposts': [{'id': duplicate.id, 'subreddit': str(duplicate.subreddit), 'found_in': found_label}
+                           for found_label, duplicate in duplicates]
+        }
+        return crawl_submission(reddit, submission, governor, engine, index, previous_posts, writer, metrics, tags)
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        posts_data = [post for post in executor.map(crawl, entries) if post is not None]
+    
     return posts_data
 
 
+def build_output_filename(search_term, time_filter, sort, subreddits=DEFAULT_SUBREDDITS):
+    """
+    Generate the result filename for a search, e.g. reddit_tesla_stock_day_hot.json.
+    
+    Searches of other subreddits than r/wallstreetbets get their own file,
+    e.g. reddit_tesla_stock_day_hot_stocks_investing.json.
+    """
+    safe_search_term = "".join(c for c in search_term if c.isalnum() or c in (' ', '-', '_')).rstrip()
+    safe_search_term = safe_search_term.replace(' ', '_').lower()
+    filename = f"reddit_{safe_search_term}_{time_filter}_{sort}"
+    if tuple(subreddits) != DEFAULT_SUBREDDITS:
+        scope = "_".join(re.sub(r'\W+', '_', entry.strip().lower()).strip('_') for entry in subreddits)
+        filename += f"_{scope}"
+    return filename + ".json"
+
+
+def build_summary(posts, filename, search_term, limit, time_filter, sort, governor=None, executed_at=None, metrics=None,
+                  targets=None):
+    """
+    Wrap extracted posts in the metadata / search_parameters / results_summary document.
+    
+    Args:
+        posts: List of post dictionaries from search_reddit_posts
+        filename: Output filename recorded in results_summary
+        search_term, limit, time_filter, sort: Search parameters that produced the posts
+        governor: RateLimitGovernor whose stats are recorded in the metadata
+        executed_at: Time the search ran (default: now)
+        metrics: RunMetrics of the run; its stage timings and counters are recorded in the metadata
+        targets: Searches that were run, from resolve_search_targets (default: r/wallstreetbets)
+    
+    Returns:
+        Summary dictionary ready for save_to_json
+    """
+    current_time = executed_at or datetime.now()
+    targets = targets or [("r/" + name, name) for name in DEFAULT_SUBREDDITS]
+    return {
+        'metadata': {
+            'search_executed_at': current_time.isoformat(),
+            'search_executed_at_readable': current_time.strftime('%Y-%m-%d %H:%M:%S %Z'),
+            'timezone': str(current_time.astimezone().tzinfo),
+            'script_version': 'reddit_search.py v2.0',
+            'reddit_api_version': 'PRAW',
+            'execution_seconds': round(metrics.total_seconds(), 2) if metrics else None,
+            'rate_limit': governor.stats() if governor else None,
+            'metrics': metrics.as_dict() if metrics else None
+        },
+        'search_parameters': {
+            'search_term': search_term,
+            'limit_requested': limit,
+            'time_filter': time_filter,
+            'sort_method': sort,
+            'search_scope': format_search_scope(targets),
+            'subreddits': sorted({name for _, search in targets for name in search.split('+')}, key=str.lower),
+            'include_comments': True,
+            'comment_sort': 'best'
+        },
+        'results_summary': {
+            'posts_found': len(posts),
+            'posts_requested': limit,
+            'search_successful': len(posts) > 0,
+            'total_comments_extracted': sum(post.get('comments_count', 0) for post in posts),
+            'filename': filename
+        },
+        'posts': posts
+    }
+
+
+def get_results_path(filename):
+    """Return results/<MM-DD-YYYY>/<filename> for today, creating the folder if needed."""
+    # Create date-based folder (MM-DD-YYYY format)
+    current_date = datetime.now()
+    date_folder = current_date.strftime("%m-%d-%Y")
+    results_folder = os.path.join("results", date_folder)
+    
+    # Create the directory if it doesn't exist
+    os.makedirs(results_folder, exist_ok=True)
+    
+    return os.path.join(results_folder, filename)
+
+
 def save_to_json(data, filename="reddit_google_stock_search.json"):
     """Save data to JSON file in date-organized folder structure."""
     try:
-        # Create date-based folder (MM-DD-YYYY format)
-        current_date = datetime.now()
-        date_folder = current_date.strftime("%m-%d-%Y")
-        results_folder = os.path.join("results", date_folder)
-        
-        # Create the directory if it doesn't exist
-        os.makedirs(results_folder, exist_ok=True)
-        
-        # Create the full file path
-        full_path = os.path.join(results_folder, filename)
+        full_path = get_results_path(filename)
         
         with open(full_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
@@ -277,6 +523,66 @@ Use --help to see all available options.
         help='Sort method for posts (default: relevance) # Options: relevance, hot, top, new, comments'
     )
     
+    parser.add_argument(
+        '-r', '--subreddits',
+        type=str,
+        default=",".join(DEFAULT_SUBREDDITS),
+        help='Comma-separated subreddits to search (default: wallstreetbets) # "stocks+investing" searches both at once, '
+             '"u/<user>/m/<name>" searches a multireddit; posts found more than once or crossposted are kept once'
+    )
+    
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=4,
+        help='Searches and comment crawls run concurrently, sharing one rate limit budget (default: 4)'
+    )
+    
+    parser.add_argument(
+        '-e', '--engine',
+        type=str,
+        default='praw',
+        choices=['praw', 'raw'],
+        help='Comment fetch engine (default: praw) # raw: batched /api/morechildren JSON, fewer round trips, faster on huge threads'
+    )
+    
+    parser.add_argument(
+        '-f', '--format',
+        type=str,
+        default='json',
+        choices=['json', 'jsonl', 'columnar'],
+        help='Output format (default: json) # jsonl: stream posts and comments to disk while they are extracted, '
+             'columnar: compressed .cols directory with memory-mapped columns'
+    )
+    
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Only fetch and emit new or changed comments and merge them into the previous result'
+    )
+    
+    parser.add_argument(
+        '--index-path',
+        type=str,
+        default=DEFAULT_INDEX_PATH,
+        help=f'SQLite seen-comment index used by --incremental (default: {DEFAULT_INDEX_PATH})'
+    )
+    
+    parser.add_argument(
+        '--index-max-age',
+        type=float,
+        default=DEFAULT_MAX_AGE_HOURS,
+        help=f'With --incremental, re-crawl threads last crawled more than this many hours ago even if '
+             f'their comment count is unchanged, to pick up score changes and edits (default: {DEFAULT_MAX_AGE_HOURS})'
+    )
+    
+    parser.add_argument(
+        '--metrics-out',
+        type=str,
+        help='Also write run metrics (stage timings, HTTP calls and bytes, retries, rate-limit waits) '
+             'to this file # *.prom: Prometheus text format, anything else: JSON'
+    )
+    
     return parser
 
 
@@ -285,6 +591,9 @@ def main():
     # Parse command line arguments
     parser = create_argument_parser()
     args = parser.parse_args()
+    subreddits = tuple(entry.strip() for entry in args.subreddits.split(',') if entry.strip())
+    if args.incremental and args.format == 'jsonl':
+        parser.error("--incremental merges into a JSON document and cannot be combined with --format jsonl")
     
     print("Reddit API - Configurable Search")
     print("=" * 40)
@@ -292,19 +601,51 @@ def main():
     print(f"Number of posts: {args.limit}")
     print(f"Time filter: {args.time_filter}")
     print(f"Sort by: {args.sort}")
+    print(f"Subreddits: {args.subreddits}")
+    print(f"Comment engine: {args.engine}")
+    print(f"Incremental: {args.incremental}")
+    print(f"Output format: {args.format}")
     print("=" * 40)
     
     # Load credentials
     credentials = load_credentials()
+    metrics = RunMetrics('reddit_search')
     
     try:
-        # Create Reddit instance
+        # Create Reddit instance; every HTTP request goes through the instrumented session
         print("Connecting to Reddit API...")
-        reddit = create_reddit_instance(credentials)
+        with metrics.stage('connect'):
+            reddit = create_reddit_instance(credentials, instrument_session(requests.Session(), metrics, 'reddit'))
+            
+            # Verify connection
+            print(f"Connected as: {reddit.user.me()}")
+            print(f"Read-only mode: {reddit.read_only}")
+        
+        # Generate filename based on search parameters
+        filename = build_output_filename(args.search_term, args.time_filter, args.sort, subreddits)
+        targets = resolve_search_targets(reddit, subreddits)
+        if args.format == 'columnar':
+            filename = os.path.splitext(filename)[0] + COLUMNAR_SUFFIX
+        
+        # Incremental mode merges into the newest earlier result with the same filename
+        index = None
+        previous_posts = {}
+        if args.incremental:
+            index = CommentIndex(args.index_path, max_age_hours=args.index_max_age, scope=filename)
+            previous_result = find_previous_result(filename)
+            if previous_result:
+                previous_posts = {post['id']: post for post in previous_result.get('posts', [])}
         
-        # Verify connection
-        print(f"Connected as: {reddit.user.me()}")
-        print(f"Read-only mode: {reddit.read_only}")
+        governor = RateLimitGovernor(reddit)
+        
+        # Streaming mode writes the header now and every record as soon as it is extracted
+        writer = None
+        if args.format == 'jsonl':
+            filename = os.path.splitext(filename)[0] + '.jsonl'
+            writer = JsonlResultWriter(get_results_path(filename))
+            header = build_summary([], filename, args.search_term, args.limit, args.time_filter, args.sort,
+                                   targets=targets)
+            writer.write_header(header['metadata'], header['search_parameters'])
         
         # Search for posts using provided parameters
         print(f"\nSearching for '{args.search_term}' posts...")
@@ -313,50 +654,68 @@ def main():
             search_term=args.search_term, 
             limit=args.limit, 
             time_filter=args.time_filter,
-            sort=args.sort
+            sort=args.sort,
+            governor=governor,
+            engine=args.engine,
+            index=index,
+            previous_posts=previous_posts,
+            writer=writer,
+            metrics=metrics,
+            subreddits=targets,
+            workers=args.workers
         )
+        governor.print_report()
+        metrics.update('rate_limit', governor.stats())
+        
+        new_comments = None
+        if args.incremental:
+            new_comments = sum(post.get('comments_count', 0) for post in posts)
+            posts = merge_posts(list(previous_posts.values()), posts)
         
         if not posts:
+            if index is not None:
+                index.close()
+            if writer is not None:
+                writer.close()
             print("No posts found matching the search criteria.")
+            if args.metrics_out:
+                metrics.write(args.metrics_out)
             return
         
-        # Generate filename based on search parameters
-        safe_search_term = "".join(c for c in args.search_term if c.isalnum() or c in (' ', '-', '_')).rstrip()
-        safe_search_term = safe_search_term.replace(' ', '_').lower()
-        filename = f"reddit_{safe_search_term}_{args.time_filter}_{args.sort}.json"
-        
         # Create summary data
         current_time = datetime.now()
-        summary = {
-            'metadata': {
-                'search_executed_at': current_time.isoformat(),
-                'search_executed_at_readable': current_time.strftime('%Y-%m-%d %H:%M:%S %Z'),
-                'timezone': str(current_time.astimezone().tzinfo),
-                'script_version': 'reddit_search.py v2.0',
-                'reddit_api_version': 'PRAW',
-                'execution_duration_note': 'Time taken depends on number of posts and comments'
-            },
-            'search_parameters': {
-                'search_term': args.search_term,
-                'limit_requested': args.limit,
-                'time_filter': args.time_filter,
-                'sort_method': args.sort,
-                'search_scope': 'r/wallstreetbets',
-                'include_comments': True,
-                'comment_sort': 'best'
-            },
-            'results_summary': {
-                'posts_found': len(posts),
-                'posts_requested': args.limit,
-                'search_successful': len(posts) > 0,
-                'total_comments_extracted': sum(post.get('comments_count', 0) for post in posts),
-                'filename': filename
-            },
-            'posts': posts
-        }
+        summary = build_summary(
+            posts, filename,
+            search_term=args.search_term,
+            limit=args.limit,
+            time_filter=args.time_filter,
+            sort=args.sort,
+            governor=governor,
+            executed_at=current_time,
+            metrics=metrics,
+            targets=targets
+        )
+        if new_comments is not None:
+            summary['results_summary']['new_or_changed_comments'] = new_comments
+        
+        # Save to JSON (a streamed file only still needs its footer)
+        with metrics.stage('save'):
+            if writer is not None:
+                writer.write_footer(summary['results_summary'], summary['metadata'])
+                writer.close()
+                saved_path = writer.path
+                print(f"Data streamed to {saved_path}")
+            elif args.format == 'columnar':
+                saved_path = write_columnar(get_results_path(filename), summary)
+                print(f"Data saved to {saved_path}")
+            else:
+                saved_path = save_to_json(summary, filename)
         
-        # Save to JSON
-        saved_path = save_to_json(summary, filename)
+        # Comments only count as seen once a saved result holds them
+        if index is not None:
+            if saved_path:
+                index.commit()
+            index.close()
         
         # Update the results summary with actual saved path
         if saved_path:
@@ -373,6 +732,9 @@ def main():
         
         print(f"\nData saved to {saved_path if saved_path else filename}")
         print(f"JSON includes: metadata, search parameters, results summary, and all post data")
+        metrics.print_report()
+        if args.metrics_out:
+            print(f"Metrics written to {metrics.write(args.metrics_out)}")
         
     except Exception as e:
         print(f"Error: {e}")
@@ -396,10 +758,17 @@ REDDIT SEARCH SCRIPT - COMPLETE USAGE GUIDE
 │ Limit       │ -l   │ --limit         │ Any positive integer             │ 2           │ Number of posts         │
 │ Time Filter │ -t   │ --time-filter   │ day, week, month, year, all      │ week        │ Time period to search   │
 │ Sort Method │ -o   │ --sort          │ relevance, hot, top, new, comments│ relevance   │ How to sort results     │
+│ Subreddits  │ -r   │ --subreddits    │ a,b / a+b / u/<user>/m/<name>    │ wallstreetbets│ Where to search       │
+│ Workers     │ -w   │ --workers       │ Any positive integer             │ 4           │ Concurrent crawls       │
+│ Engine      │ -e   │ --engine        │ praw, raw                        │ praw        │ Comment fetch engine    │
+│ Format      │ -f   │ --format        │ json, jsonl, columnar            │ json        │ Output file format      │
+│ Incremental │      │ --incremental   │ flag                             │ off         │ Only new/changed comments│
 └─────────────┴──────┴─────────────────┴──────────────────────────────────┴─────────────┴─────────────────────────┘
                 # Show help
 
  Examples:
 # python reddit_search.py -s "Tesla stock" -l 5 -t day -o hot
   python reddit_search.py -s "Daily Discussion Thread for June 13" -l 1 -o relevance
+  python reddit_search.py -s "Daily Discussion Thread for June 13" -l 1 -o relevance -e raw
+  python reddit_search.py -s "Tesla stock" -l 5 -t day -o hot -r wallstreetbets,stocks,investing
 """
\ No newline at end of file
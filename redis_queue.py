@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Redis-backed work queue with visibility timeouts and a dead-letter list, and
+a minute rate limiter shared by every process talking to the same Redis.
+Only plain commands and MULTI/EXEC are used (no Lua scripts).
+"""
+import asyncio
+import json
+import random
+import time
+
+# Seconds a rate-limit reservation counts: a minute, plus slack for the request
+# to reach the API after the reservation's one-second bucket has begun
+WINDOW_SECONDS = 62
+QUEUE_KEYS = ('items', 'order', 'pending', 'processing', 'leases', 'attempts', 'results', 'errors', 'dead',
+              'summaries', 'meta')
+
+
+class RedisWorkQueue:
+    """
+    At-least-once work queue on redis.asyncio.
+
+    Keys under `<name>:`:
+
+        items       hash  item id -> JSON payload
+        order       list  item ids in the order they were enqueued
+        pending     list  ids waiting to be claimed
+        processing  list  ids claimed by a worker
+        leases      zset  id -> time its lease runs out
+        attempts    hash  id -> number of claims
+        results     hash  id -> JSON result
+        errors      hash  id -> last error
+        dead        list  ids given up on after max_attempts claims
+        summaries   hash  shared per-post values (first writer wins)
+        meta        hash  producer settings
+
+    An item that is neither acknowledged nor released before its lease runs
+    out (the worker died or hung) is put back by requeue_expired; after
+    max_attempts claims it goes to the dead-letter list instead. Results are
+    keyed by item id, so an item that ends up processed twice is harmless and
+    a claim skips items that already have a result.
+    """
+
+    def __init__(self, redis, name, visibility_timeout=300, max_attempts=3):
+        """
+        Args:
+            redis: redis.asyncio.Redis client created with decode_responses=True
+            name: Key prefix of the queue
+            visibility_timeout: Seconds a claimed item stays invisible to other workers
+            max_attempts: Claims before an item is dead-lettered
+        """
+        self.redis = redis
+        self.name = name
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+
+    def key(self, part):
+        return f"{self.name}:{part}"
+
+    async def exists(self):
+        return bool(await self.redis.exists(self.key('order')))
+
+    async def delete(self):
+        await self.redis.delete(*(self.key(part) for part in QUEUE_KEYS))
+
+    async def set_meta(self, **values):
+        await self.redis.hset(self.key('meta'), mapping={key: json.dumps(value) for key, value in values.items()})
+
+    async def get_meta(self):
+        return {key: json.loads(value) for key, value in (await self.redis.hgetall(self.key('meta'))).items()}
+
+    async def enqueue(self, items, chunk_size=500):
+        """Add (item id, payload) pairs; ids must be unique within the queue."""
+        for start in range(0, len(items), chunk_size):
+            chunk = items[start:start + chunk_size]
+            ids = [item_id for item_id, _ in chunk]
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hset(self.key('items'), mapping={item_id: json.dumps(payload, ensure_ascii=False)
+                                                  for item_id, payload in chunk})
+            pipe.rpush(self.key('order'), *ids)
+            pipe.rpush(self.key('pending'), *ids)
+            await pipe.execute()
+
+    async def claim(self):
+        """
+        Lease the next pending item.
+
+        Returns:
+            (item id, payload, attempt number) or None when nothing is pending
+        """
+        while True:
+            item_id = await self.redis.lmove(self.key('pending'), self.key('processing'), 'LEFT', 'RIGHT')
+            if item_id is None:
+                return None
+            # A worker dying right here leaves the id in processing without a lease; requeue_expired adopts it
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.zadd(self.key('leases'), {item_id: time.time() + self.visibility_timeout})
+            pipe.hincrby(self.key('attempts'), item_id, 1)
+            pipe.hget(self.key('items'), item_id)
+            pipe.hexists(self.key('results'), item_id)
+            _, attempt, payload, done = await pipe.execute()
+            if done or payload is None:
+                # Finished by an earlier claim whose lease had run out, or the queue was deleted
+                await self._settle(item_id)
+                continue
+            return item_id, json.loads(payload), attempt
+
+    async def extend(self, item_id):
+        """Push the lease of a claimed item out by another visibility_timeout; False if it was lost."""
+        changed = await self.redis.zadd(self.key('leases'), {item_id: time.time() + self.visibility_timeout},
+                                        xx=True, ch=True)
+        return bool(changed)
+
+    async def _settle(self, item_id, target=None, error=None):
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.lrem(self.key('processing'), 0, item_id)
+        pipe.zrem(self.key('leases'), item_id)
+        if error is not None:
+            pipe.hset(self.key('errors'), item_id, error)
+        if target is not None:
+            pipe.rpush(self.key(target), item_id)
+        await pipe.execute()
+
+    async def ack(self, item_id, result):
+        """Store the result of a claimed item and remove it from processing."""
+        await self.redis.hset(self.key('results'), item_id, json.dumps(result, ensure_ascii=False))
+        await self._settle(item_id)
+
+    async def release(self, item_id, error):
+        """Give a claimed item back after a failure: retried, or dead-lettered after max_attempts claims."""
+        attempts = int(await self.redis.hget(self.key('attempts'), item_id) or 0)
+        target = 'dead' if attempts >= self.max_attempts else 'pending'
+        await self._settle(item_id, target, error)
+        return target
+
+    async def requeue_expired(self):
+        """
+        Put back items whose lease ran out; any worker may call this.
+
+        Returns:
+            (requeued, dead-lettered) counts
+        """
+        now = time.time()
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zrangebyscore(self.key('leases'), '-inf', now)
+        pipe.lrange(self.key('processing'), 0, -1)
+        expired, processing = await pipe.execute()
+
+        if processing:
+            pipe = self.redis.pipeline(transaction=False)
+            for item_id in processing:
+                pipe.zscore(self.key('leases'), item_id)
+            orphans = [item_id for item_id, score in zip(processing, await pipe.execute()) if score is None]
+            if orphans:
+                # Claimed by a worker that died before recording the lease: start one now
+                await self.redis.zadd(self.key('leases'), {item_id: now + self.visibility_timeout for item_id in orphans},
+                                      nx=True)
+
+        requeued = dead = 0
+        for item_id in expired:
+            # ZREM succeeds for exactly one caller, which then owns the expired item
+            if not await self.redis.zrem(self.key('leases'), item_id):
+                continue
+            if await self.redis.hexists(self.key('results'), item_id):
+                await self._settle(item_id)
+                continue
+            attempts = int(await self.redis.hget(self.key('attempts'), item_id) or 0)
+            if attempts >= self.max_attempts:
+                await self._settle(item_id, 'dead', f"visibility timeout expired after {attempts} attempts")
+                dead += 1
+            else:
+                await self._settle(item_id, 'pending')
+                requeued += 1
+        return requeued, dead
+
+    async def shared_value(self, field, compute):
+        """Value stored under `field` in the summaries hash, computing and storing it if no worker has yet."""
+        value = await self.redis.hget(self.key('summaries'), field)
+        if value is None:
+            await self.redis.hsetnx(self.key('summaries'), field, await compute())
+            # Two workers may compute at once; both continue with the one stored first
+            value = await self.redis.hget(self.key('summaries'), field)
+        return value
+
+    async def counts(self):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.llen(self.key('order'))
+        pipe.llen(self.key('pending'))
+        pipe.llen(self.key('processing'))
+        pipe.hlen(self.key('results'))
+        pipe.lrange(self.key('dead'), 0, -1)
+        total, pending, processing, done, dead = await pipe.execute()
+        if dead:
+            # An item can be dead-lettered by one worker and still finished by another
+            finished = await self.redis.hmget(self.key('results'), list(set(dead)))
+            dead = [item_id for item_id, result in zip(set(dead), finished) if result is None]
+        return {'total': total, 'pending': pending, 'processing': processing, 'done': done, 'dead': len(dead)}
+
+    async def finished(self):
+        """True once no item is pending or claimed; every item then has a result or is dead-lettered."""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.llen(self.key('pending'))
+        pipe.llen(self.key('processing'))
+        pending, processing = await pipe.execute()
+        return not pending and not processing
+
+
+class RedisMinuteRateLimiter:
+    """
+    async_llm.MinuteRateLimiter shared through Redis: all processes using the
+    same `key` draw from one budget of `per_minute` units per sliding minute.
+
+    Usage is counted in per-second buckets that stay in the window for
+    WINDOW_SECONDS, so a reservation is never forgotten before the API
+    forgets the request. A reservation is added first and taken back if the window is then
+    over the limit, so concurrent callers can only ever undershoot the limit.
+    acquire returns the reservation (bucket and amount), and refund gives the
+    unused part back to that bucket, so it expires when the request does.
+    """
+
+    def __init__(self, redis, key, per_minute):
+        self.redis = redis
+        self.key = key
+        self.per_minute = per_minute
+        self.capacity = float(per_minute)
+        self.wait_seconds = 0.0
+
+    def _bucket(self, second):
+        return f"{self.key}:{second}"
+
+    async def acquire(self, amount=1):
+        """
+        Wait until `amount` units fit into the shared minute and take them.
+
+        Returns:
+            The reservation, a (bucket second, amount) pair to pass to refund
+        """
+        amount = min(amount, self.per_minute)
+        while True:
+            second = int(time.time())
+            window = range(second - WINDOW_SECONDS + 1, second + 1)
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.incrby(self._bucket(second), amount)
+            pipe.expire(self._bucket(second), WINDOW_SECONDS + 1)
+            pipe.mget([self._bucket(bucket) for bucket in window])
+            _, _, counts = await pipe.execute()
+            counts = [int(count or 0) for count in counts]
+            excess = sum(counts) - self.per_minute
+            if excess <= 0:
+                return second, amount
+            await self.redis.decrby(self._bucket(second), amount)
+
+            # Wait until enough of the oldest buckets have left the window
+            freed = 0
+            delay = 60.0
+            for bucket, count in zip(window, counts):
+                freed += count
+                if freed >= excess:
+                    delay = bucket + WINDOW_SECONDS - time.time()
+                    break
+            # Jitter spreads out workers that were refused at the same moment
+            delay = max(delay, 0.05) + random.uniform(0, 0.05)
+            self.wait_seconds += delay
+            await asyncio.sleep(delay)
+
+    async def refund(self, amount, reservation=None):
+        """Give back `amount` unused units of `reservation` (at most what it reserved)."""
+        if reservation is None:
+            return
+        second, reserved = reservation
+        amount = min(amount, reserved)
+        if amount <= 0 or second <= time.time() - WINDOW_SECONDS:
+            # Nothing to give back, or the bucket has left the window already
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.decrby(self._bucket(second), amount)
+        # A bucket that expired in between is recreated; it is never read again but must not linger
+        pipe.expire(self._bucket(second), WINDOW_SECONDS + 1)
+        await pipe.execute()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Streaming JSONL result files.
+Posts and comments are written as one JSON record per line while they are
+extracted, framed by a header (metadata, search_parameters) and a footer
+(results_summary). A file cut short by a crash can still be loaded.
+"""
+import json
+import threading
+
+from columnar_store import is_columnar, load_columnar_result
+
+
+class JsonlResultWriter:
+    """
+    Write a crawl as JSONL records:
+
+        {"type": "header", "metadata": ..., "search_parameters": ...}
+        {"type": "post", ...post fields without comments...}
+        {"type": "comment", "post_id": ..., ...comment fields...}
+        {"type": "post_end", "post_id": ..., "comments_count": ...}
+        {"type": "footer", "metadata": ..., "results_summary": ...}
+
+    A footer may also carry search_parameters that were only known after the
+    crawl; they replace the header's. Posts may be crawled from several threads at once; their records then
+    interleave and are regrouped by post_id when the file is loaded.
+    """
+
+    def __init__(self, path, flush_every=100):
+        """
+        Args:
+            path: Output .jsonl file
+            flush_every: Flush to disk after this many records
+        """
+        self.path = path
+        self.flush_every = flush_every
+        self._file = open(path, 'w', encoding='utf-8')
+        self._pending = 0
+        self._post_comments = {}
+        self._lock = threading.Lock()
+
+    def _write(self, record):
+        # Callers hold self._lock
+        self._file.write(json.dumps(record, ensure_ascii=False))
+        self._file.write('\n')
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self._file.flush()
+            self._pending = 0
+
+    def write_header(self, metadata, search_parameters):
+        with self._lock:
+            self._write({'type': 'header', 'metadata': metadata, 'search_parameters': search_parameters})
+            self._file.flush()
+
+    def write_post(self, post):
+        record = {key: value for key, value in post.items() if key not in ('comments', 'comments_count')}
+        record['type'] = 'post'
+        with self._lock:
+            self._post_comments[post['id']] = 0
+            self._write(record)
+
+    def write_comment(self, post_id, comment):
+        record = dict(comment)
+        record['type'] = 'comment'
+        record['post_id'] = post_id
+        with self._lock:
+            self._post_comments[post_id] = self._post_comments.get(post_id, 0) + 1
+            self._write(record)
+
+    def end_post(self, post_id):
+        """Mark a post as complete and return how many comments were written for it."""
+        with self._lock:
+            count = self._post_comments.pop(post_id, 0)
+            self._write({'type': 'post_end', 'post_id': post_id, 'comments_count': count})
+            self._file.flush()
+        return count
+
+    def write_footer(self, results_summary, metadata=None, search_parameters=None):
+        record = {'type': 'footer', 'results_summary': results_summary}
+        if metadata is not None:
+            record['metadata'] = metadata
+        if search_parameters is not None:
+            record['search_parameters'] = search_parameters
+        with self._lock:
+            self._write(record)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def load_jsonl_result(path):
+    """
+    Rebuild the save_to_json document from a JSONL result file.
+
+    Truncated files are accepted: a half-written last line is ignored, and
+    results_summary is recomputed from the records present when the footer is missing.
+
+    Returns:
+        Dictionary with metadata, search_parameters, results_summary and posts
+    """
+    data = {'metadata': {}, 'search_parameters': {}, 'results_summary': None, 'posts': []}
+    posts = {}
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Only the final line of a crashed run can be incomplete
+                break
+            kind = record.pop('type', None)
+            if kind == 'header':
+                data['metadata'] = record.get('metadata', {})
+                data['search_parameters'] = record.get('search_parameters', {})
+            elif kind == 'post':
+                record['comments'] = []
+                record['comments_count'] = 0
+                posts[record['id']] = record
+                data['posts'].append(record)
+            elif kind == 'comment':
+                post = posts.get(record.pop('post_id'))
+                if post is not None:
+                    post['comments'].append(record)
+                    post['comments_count'] += 1
+            elif kind == 'footer':
+                data['results_summary'] = record.get('results_summary')
+                data['metadata'].update(record.get('metadata', {}))
+                data['search_parameters'].update(record.get('search_parameters', {}))
+
+    if data['results_summary'] is None:
+        data['results_summary'] = {
+            'posts_found': len(data['posts']),
+            'total_comments_extracted': sum(post['comments_count'] for post in data['posts']),
+            'complete': False
+        }
+    return data
+
+
+def load_result(path):
+    """Load a crawl result from a .json document, a .jsonl stream or a .cols directory."""
+    if is_columnar(path):
+        return load_columnar_result(path)
+    if path.endswith('.jsonl'):
+        return load_jsonl_result(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
@@ -1,7 +1,3 @@
 #!/bin/bash
-# Extract comments from Reddit posts from past week
-python reddit_search.py -s "Daily Discussion Thread for June 12" -l 1 -o relevance
-python reddit_search.py -s "Daily Discussion Thread for June 11" -l 1 -o relevance
-python reddit_search.py -s "Daily Discussion Thread for June 10" -l 1 -o relevance
-python reddit_search.py -s "Daily Discussion Thread for June 09" -l 1 -o relevance 
-python reddit_search.py -s "Daily Discussion Thread for June 08" -l 1 -o relevance
\ No newline at end of file
+# Extract comments from Reddit posts from past week (one process, one session, concurrent crawls)
+python run_batch.py --from-date 2025-06-08 --to-date 2025-06-12 -l 1 -o relevance
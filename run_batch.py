@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Run many Reddit searches in one process.
+Authenticates once, then crawls several jobs concurrently under one shared
+rate budget. Each job writes the same file reddit_search.py would write.
+"""
+import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import requests
+
+from rate_limiter import RateLimitGovernor
+from reddit_search import (DEFAULT_SUBREDDITS, build_output_filename, build_summary, create_reddit_instance,
+                           load_credentials, resolve_search_targets, save_to_json, search_reddit_posts)
+from run_metrics import RunMetrics, instrument_session
+
+JOB_CHOICES = {
+    'time_filter': ('day', 'week', 'month', 'year', 'all'),
+    'sort': ('relevance', 'hot', 'top', 'new', 'comments'),
+    'engine': ('praw', 'raw')
+}
+
+JOB_DEFAULTS = {
+    'limit': 1,
+    'time_filter': 'week',
+    'sort': 'relevance',
+    'engine': 'praw',
+    'subreddits': list(DEFAULT_SUBREDDITS)
+}
+
+
+def load_jobs(jobs_file):
+    """
+    Load jobs from a JSON file.
+
+    The file holds a list of objects with a required "search_term" and optional
+    "limit", "time_filter", "sort", "engine" and "subreddits" keys.
+
+    Returns:
+        List of job dictionaries with defaults filled in
+
+    Raises:
+        ValueError: If an entry is missing its search term or has an invalid option
+    """
+    with open(jobs_file, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError(f"{jobs_file}: expected a list of job objects")
+    return [validate_job(entry, f"{jobs_file} job {i + 1}") for i, entry in enumerate(entries)]
+
+
+def validate_job(entry, label='job'):
+    """
+    Fill in defaults and check one job entry before any worker thread sees it.
+
+    A "subreddits" string is split on commas like the -r option.
+
+    Returns:
+        Job dictionary with defaults filled in
+
+    Raises:
+        ValueError: If the entry is not an object, lacks a search term or has an invalid option
+    """
+    if not isinstance(entry, dict):
+        raise ValueError(f"{label}: expected an object, got {type(entry).__name__}")
+    job = dict(JOB_DEFAULTS, **entry)
+    if not isinstance(job.get('search_term'), str) or not job['search_term'].strip():
+        raise ValueError(f"{label}: missing \"search_term\"")
+    if isinstance(job['subreddits'], str):
+        job['subreddits'] = [name.strip() for name in job['subreddits'].split(',') if name.strip()]
+    if not job['subreddits'] or not all(isinstance(name, str) for name in job['subreddits']):
+        raise ValueError(f"{label}: \"subreddits\" must be a non-empty list of names")
+    if not isinstance(job['limit'], int) or isinstance(job['limit'], bool) or job['limit'] < 1:
+        raise ValueError(f"{label}: \"limit\" must be a positive integer")
+    for key, choices in JOB_CHOICES.items():
+        if job[key] not in choices:
+            raise ValueError(f"{label}: \"{key}\" must be one of {', '.join(choices)}")
+    return job
+
+
+def daily_thread_jobs(from_date, to_date, **options):
+    """
+    Expand a date range into "Daily Discussion Thread for <Month DD>" jobs, newest first.
+
+    Args:
+        from_date: First date (YYYY-MM-DD)
+        to_date: Last date (YYYY-MM-DD), inclusive
+        options: limit / time_filter / sort / engine / subreddits overrides for every job
+
+    Returns:
+        List of job dictionaries
+    """
+    start = datetime.strptime(from_date, "%Y-%m-%d")
+    end = datetime.strptime(to_date, "%Y-%m-%d")
+    jobs = []
+    day = end
+    while day >= start:
+        job = dict(JOB_DEFAULTS, **options)
+        job['search_term'] = f"Daily Discussion Thread for {day.strftime('%B %d')}"
+        jobs.append(job)
+        day -= timedelta(days=1)
+    return jobs
+
+
+def run_job(reddit, governor, job):
+    """Crawl one job and save it exactly like reddit_search.py does. Returns the saved path or None."""
+    executed_at = datetime.now()
+    # HTTP traffic and the rate budget are shared by jobs running at the same time, so they are only
+    # reported for the whole batch; jobs record their own stages
+    metrics = RunMetrics('run_batch_job')
+    targets = resolve_search_targets(reddit, job['subreddits'])
+    posts = search_reddit_posts(
+        reddit,
+        search_term=job['search_term'],
+        limit=job['limit'],
+        time_filter=job['time_filter'],
+        sort=job['sort'],
+        governor=governor,
+        engine=job['engine'],
+        metrics=metrics,
+        subreddits=targets
+    )
+    if not posts:
+        print(f"No posts found for '{job['search_term']}'")
+        return None
+
+    filename = build_output_filename(job['search_term'], job['time_filter'], job['sort'], job['subreddits'])
+    summary = build_summary(
+        posts, filename,
+        search_term=job['search_term'],
+        limit=job['limit'],
+        time_filter=job['time_filter'],
+        sort=job['sort'],
+        executed_at=executed_at,
+        metrics=metrics,
+        targets=targets
+    )
+    return save_to_json(summary, filename)
+
+
+def run_batch(jobs, workers=3, metrics=None):
+    """
+    Run all jobs with one authenticated Reddit session.
+
+    Args:
+        jobs: List of job dictionaries
+        workers: Number of threads crawling concurrently
+        metrics: RunMetrics for the whole batch (HTTP calls and bytes, rate-limit stats)
+
+    Returns:
+        List of (job, saved_path) tuples in job order; saved_path is None on failure
+    """
+    session = instrument_session(requests.Session(), metrics, 'reddit') if metrics is not None else None
+    reddit = create_reddit_instance(load_credentials(), session)
+    print(f"Connected as: {reddit.user.me()}")
+    governor = RateLimitGovernor(reddit)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_job, reddit, governor, job): i for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            job = jobs[futures[future]]
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                print(f"Error running job '{job['search_term']}': {e}")
+                results[futures[future]] = None
+
+    governor.print_report()
+    if metrics is not None:
+        metrics.update('rate_limit', governor.stats())
+        metrics.set('jobs', len(jobs))
+        metrics.set('jobs_saved', sum(1 for path in results.values() if path))
+    return [(job, results.get(i)) for i, job in enumerate(jobs)]
+
+
+def create_argument_parser():
+    """Create and configure the argument parser."""
+    parser = argparse.ArgumentParser(
+        description='Run several Reddit searches in one process with a shared rate budget',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python run_batch.py --jobs jobs.json -w 4
+  python run_batch.py --from-date 2025-06-08 --to-date 2025-06-12 -l 1 -o relevance
+
+Job file format:
+  [{"search_term": "Tesla stock", "limit": 5, "time_filter": "day", "sort": "hot", "subreddits": ["stocks", "investing"]}]
+        """
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('-j', '--jobs', type=str, help='JSON file with a list of search jobs')
+    source.add_argument('--from-date', type=str, help='First daily discussion thread date (YYYY-MM-DD)')
+    parser.add_argument('--to-date', type=str, help='Last daily discussion thread date (YYYY-MM-DD, default: --from-date)')
+    parser.add_argument('-l', '--limit', type=int, default=JOB_DEFAULTS['limit'],
+                        help='Posts per date-range job (default: 1)')
+    parser.add_argument('-t', '--time-filter', type=str, default=JOB_DEFAULTS['time_filter'],
+                        choices=JOB_CHOICES['time_filter'],
+                        help='Time filter for date-range jobs (default: week)')
+    parser.add_argument('-o', '--sort', type=str, default=JOB_DEFAULTS['sort'],
+                        choices=JOB_CHOICES['sort'],
+                        help='Sort method for date-range jobs (default: relevance)')
+    parser.add_argument('-e', '--engine', type=str, default=JOB_DEFAULTS['engine'], choices=JOB_CHOICES['engine'],
+                        help='Comment fetch engine for date-range jobs (default: praw)')
+    parser.add_argument('-r', '--subreddits', type=str, default=",".join(DEFAULT_SUBREDDITS),
+                        help='Comma-separated subreddits searched by date-range jobs (default: wallstreetbets)')
+    parser.add_argument('-w', '--workers', type=int, default=3,
+                        help='Number of threads crawled concurrently (default: 3)')
+    parser.add_argument('--metrics-out', type=str,
+                        help='Write batch metrics to this file (*.prom: Prometheus text format, otherwise JSON)')
+    return parser
+
+
+def main():
+    """Main function to run the batch."""
+    parser = create_argument_parser()
+    args = parser.parse_args()
+
+    if args.jobs:
+        try:
+            jobs = load_jobs(args.jobs)
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        jobs = daily_thread_jobs(
+            args.from_date, args.to_date or args.from_date,
+            limit=args.limit, time_filter=args.time_filter, sort=args.sort, engine=args.engine,
+            subreddits=[entry.strip() for entry in args.subreddits.split(',') if entry.strip()]
+        )
+
+    print(f"Running {len(jobs)} jobs with {args.workers} workers")
+    metrics = RunMetrics('run_batch')
+    with metrics.stage('batch'):
+        results = run_batch(jobs, workers=args.workers, metrics=metrics)
+    metrics.print_report()
+    if args.metrics_out:
+        print(f"Metrics written to {metrics.write(args.metrics_out)}")
+
+    print("\nBatch summary:")
+    for job, saved_path in results:
+        print(f"  {job['search_term']}: {saved_path if saved_path else 'no output'}")
+
+
+if __name__ == "__main__":
+    main()
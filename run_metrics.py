@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Lightweight run instrumentation shared by the crawler, summarizer and analyzer.
+Collects wall time per stage and named counters (HTTP and LLM calls, bytes,
+retries, rate-limit sleeps, tokens) for one run, and exports them as a dict for
+the output metadata, a JSON dump or a Prometheus text file that the
+node_exporter textfile collector can pick up.
+"""
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+PROMETHEUS_NAMESPACE = "reddit_pipeline"
+PROMETHEUS_SUFFIX = ".prom"
+
+
+class RunMetrics:
+    """Stage timers and counters of one run; safe to share between threads."""
+
+    def __init__(self, run):
+        """
+        Args:
+            run: Name of the script or job, used as the `run` label
+        """
+        self.run = run
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Time the body of the `with` block as one pass through stage `name`."""
+        started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add_stage_time(name, time.perf_counter() - started)
+
+    def add_stage_time(self, name, seconds, count=1):
+        with self._lock:
+            stage = self.stages.setdefault(name, {'seconds': 0.0, 'count': 0})
+            stage['seconds'] += seconds
+            stage['count'] += count
+
+    def add(self, name, value=1):
+        """Increase counter `name` by `value`."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name, value):
+        with self._lock:
+            self.counters[name] = value
+
+    def update(self, prefix, stats):
+        """Copy the numeric entries of a stats() dict (governor, LLM pool, cache) as `<prefix>_<key>`."""
+        for key, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.set(f"{prefix}_{key}", value)
+
+    def total_seconds(self):
+        return time.perf_counter() - self._started
+
+    def as_dict(self):
+        """JSON-serializable snapshot for result metadata."""
+        with self._lock:
+            stages = {name: {'seconds': round(stage['seconds'], 3), 'count': stage['count']}
+                      for name, stage in self.stages.items()}
+            counters = {name: round(value, 3) if isinstance(value, float) else value
+                        for name, value in sorted(self.counters.items())}
+        return {
+            'run': self.run,
+            'started_at': self.started_at.isoformat(),
+            'total_seconds': round(self.total_seconds(), 3),
+            'stages': stages,
+            'counters': counters
+        }
+
+    def print_report(self):
+        """Print total run time and the time spent per stage."""
+        with self._lock:
+            parts = ", ".join(f"{name} {stage['seconds']:.1f}s" for name, stage in self.stages.items())
+        print(f"Run time: {self.total_seconds():.1f}s" + (f" ({parts})" if parts else ""))
+
+    def to_prometheus(self, namespace=PROMETHEUS_NAMESPACE):
+        """Prometheus text exposition format, one gauge per counter and per stage."""
+        snapshot = self.as_dict()
+        run = _label_value(self.run)
+        lines = [
+            f"# TYPE {namespace}_run_seconds gauge",
+            f'{namespace}_run_seconds{{run="{run}"}} {snapshot["total_seconds"]}',
+            f"# TYPE {namespace}_run_started_timestamp_seconds gauge",
+            f'{namespace}_run_started_timestamp_seconds{{run="{run}"}} {self.started_at.timestamp():.3f}'
+        ]
+        if snapshot['stages']:
+            lines.append(f"# TYPE {namespace}_stage_seconds gauge")
+            for name, stage in snapshot['stages'].items():
+                lines.append(f'{namespace}_stage_seconds{{run="{run}",stage="{_label_value(name)}"}} {stage["seconds"]}')
+            lines.append(f"# TYPE {namespace}_stage_count gauge")
+            for name, stage in snapshot['stages'].items():
+                lines.append(f'{namespace}_stage_count{{run="{run}",stage="{_label_value(name)}"}} {stage["count"]}')
+        for name, value in snapshot['counters'].items():
+            metric = f"{namespace}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f'{metric}{{run="{run}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write a Prometheus text file for *.prom paths, a JSON dump otherwise."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Written next to the target and renamed so a scraping collector never sees half a file
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            if path.endswith(PROMETHEUS_SUFFIX):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.as_dict(), f, indent=2)
+        os.replace(temp_path, path)
+        return path
+
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def timed(metrics, name):
+    """metrics.stage(name), or a no-op context when no RunMetrics is given."""
+    return metrics.stage(name) if metrics is not None else nullcontext()
+
+
+def instrument_session(session, metrics, prefix):
+    """
+    Count requests, bytes and 429 responses of a requests.Session.
+
+    Works for the session PRAW sends everything through (pass it as
+    requestor_kwargs={'session': session}) as well as http_fetcher's.
+
+    Returns:
+        The same session
+    """
+    def on_response(response, *args, **kwargs):
+        body = response.request.body or b''
+        metrics.add(f"{prefix}_http_requests")
+        metrics.add(f"{prefix}_http_bytes_sent", len(body))
+        metrics.add(f"{prefix}_http_bytes_received", len(response.content))
+        if response.status_code == 429:
+            metrics.add(f"{prefix}_http_throttled")
+        return response
+
+    session.hooks['response'].append(on_response)
+    return session
+
+
+def httpx_event_hooks(metrics, prefix, asynchronous=False):
+    """
+    httpx event_hooks counting requests, bytes and 429 responses, e.g. for the
+    OpenAI clients' http_client.
+    """
+    def count(response):
+        metrics.add(f"{prefix}_http_requests")
+        metrics.add(f"{prefix}_http_bytes_sent", len(response.request.content))
+        metrics.add(f"{prefix}_http_bytes_received", len(response.content))
+        if response.status_code == 429:
+            metrics.add(f"{prefix}_http_throttled")
+
+    if asynchronous:
+        async def on_response(response):
+            await response.aread()
+            count(response)
+    else:
+        def on_response(response):
+            response.read()
+            count(response)
+    return {'response': [on_response]}
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Full-text search over every scraped post and comment.
+Indexes titles, selftext and comment bodies from result files into an SQLite
+FTS5 inverted index (postings carry comment id, timestamp and score), updates
+it incrementally as new crawl files arrive, and answers boolean/phrase queries
+with time, score and sentiment filters.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+from columnar_store import COLUMNAR_SUFFIX, MANIFEST_NAME, POST_ROW_COLUMN, ColumnarResult, is_columnar
+from result_stream import load_result
+
+DEFAULT_SEARCH_INDEX_PATH = os.path.join("results", "search_index.sqlite")
+RESULT_PATTERNS = ("*.json", "*.jsonl", "*" + COLUMNAR_SUFFIX)
+
+QUERY_TOKEN = re.compile(r'"[^"]*"|\(|\)|[^\s()"]+')
+OPERATORS = {'AND', 'OR', 'NOT'}
+ORDER_BY = {
+    'rank': 'rank',
+    'score': 'd.score DESC',
+    'new': 'd.created_utc DESC'
+}
+
+
+def find_result_files(results_dir="results"):
+    """Every crawl result (.json, .jsonl, .cols) under `results_dir`."""
+    found = set()
+    for pattern in RESULT_PATTERNS:
+        found.update(glob.glob(os.path.join(results_dir, "**", pattern), recursive=True))
+    # Skip the manifest and dictionaries inside .cols directories
+    return sorted(path for path in found if not any(is_columnar(part) for part in path.split(os.sep)[:-1]))
+
+
+def build_match_query(query):
+    """
+    Turn a user query into an FTS5 MATCH expression.
+
+    Words are implicitly ANDed, "quoted text" is a phrase, AND/OR/NOT (any case)
+    and parentheses combine terms, and a trailing * makes a prefix search.
+    Everything else is quoted so punctuation such as $SPY cannot break the query.
+    """
+    parts = []
+    for token in QUERY_TOKEN.findall(query):
+        if token in ('(', ')'):
+            parts.append(token)
+        elif token.upper() in OPERATORS:
+            parts.append(token.upper())
+        elif token.startswith('"'):
+            parts.append(token)
+        else:
+            word = token.rstrip('*').replace('"', '')
+            if word:
+                parts.append(f'"{word}"' + ('*' if token.endswith('*') else ''))
+    return ' '.join(parts)
+
+
+def _timestamp(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None
+
+
+def _file_signature(path):
+    # A columnar result is rewritten as a whole, so its manifest stands for the directory
+    target = os.path.join(path, MANIFEST_NAME) if is_columnar(path) else path
+    stat = os.stat(target)
+    return stat.st_mtime, stat.st_size
+
+
+def iter_documents(path):
+    """
+    Yield (kind, doc_id, post_id, created_utc, score, author, sentiment, permalink, text)
+    for every post and comment of a result file.
+    """
+    if is_columnar(path):
+        yield from _iter_columnar_documents(ColumnarResult(path))
+        return
+
+    data = load_result(path)
+    if not isinstance(data, dict):
+        return
+    for post in data.get('posts', []):
+        text = f"{post.get('title', '')}\n{post.get('selftext') or ''}"
+        yield ('post', post.get('id'), post.get('id'), _timestamp(post.get('created_utc')), post.get('score'),
+               post.get('author'), None, post.get('permalink'), text)
+        for comment in post.get('comments', []):
+            yield ('comment', comment.get('id'), post.get('id'), _timestamp(comment.get('created_utc')),
+                   comment.get('score'), comment.get('author'), comment.get('sentiment'),
+                   comment.get('permalink'), comment.get('body') or '')
+
+
+def _iter_columnar_documents(store):
+    def column(table, name, rows):
+        return store.values(table, name) if store.has_column(table, name) else [None] * rows
+
+    post_rows = store.rows('posts')
+    post_ids = column('posts', 'id', post_rows)
+    titles = column('posts', 'title', post_rows)
+    selftexts = column('posts', 'selftext', post_rows)
+    for post in zip(post_ids, column('posts', 'created_utc', post_rows), column('posts', 'score', post_rows),
+                    column('posts', 'author', post_rows), column('posts', 'permalink', post_rows), titles, selftexts):
+        post_id, created, score, author, permalink, title, selftext = post
+        yield ('post', post_id, post_id, _timestamp(created), score, author, None, permalink,
+               f"{title or ''}\n{selftext or ''}")
+
+    comment_rows = store.rows('comments')
+    if not comment_rows:
+        return
+    parents = store.column('comments', POST_ROW_COLUMN).tolist()
+    for comment in zip(column('comments', 'id', comment_rows), parents,
+                       column('comments', 'created_utc', comment_rows), column('comments', 'score', comment_rows),
+                       column('comments', 'author', comment_rows), column('comments', 'sentiment', comment_rows),
+                       column('comments', 'permalink', comment_rows), column('comments', 'body', comment_rows)):
+        comment_id, parent, created, score, author, sentiment, permalink, body = comment
+        yield ('comment', comment_id, post_ids[parent], _timestamp(created), score, author, sentiment,
+               permalink, body or '')
+
+
+class SearchIndex:
+    """SQLite FTS5 index of posts and comments, one row per Reddit id."""
+
+    def __init__(self, path=DEFAULT_SEARCH_INDEX_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    mtime REAL,
+                    size INTEGER,
+                    documents INTEGER,
+                    indexed_at TEXT
+                );
+                CREATE TABLE IF NOT EXISTS documents (
+                    id INTEGER PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    doc_id TEXT NOT NULL,
+                    post_id TEXT,
+                    created_utc REAL,
+                    score INTEGER,
+                    author TEXT,
+                    sentiment TEXT,
+                    permalink TEXT,
+                    file TEXT,
+                    body TEXT,
+                    UNIQUE (kind, doc_id)
+                );
+                CREATE TABLE IF NOT EXISTS file_documents (
+                    file TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    doc_id TEXT NOT NULL,
+                    PRIMARY KEY (file, kind, doc_id)
+                );
+                CREATE INDEX IF NOT EXISTS file_documents_doc ON file_documents (kind, doc_id);
+                CREATE INDEX IF NOT EXISTS documents_created ON documents (created_utc);
+                CREATE INDEX IF NOT EXISTS documents_score ON documents (score);
+                CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+                    body, content='documents', content_rowid='id', tokenize='unicode61 remove_diacritics 2',
+                    prefix='2 3'
+                );
+                CREATE TRIGGER IF NOT EXISTS documents_insert AFTER INSERT ON documents BEGIN
+                    INSERT INTO documents_fts (rowid, body) VALUES (new.id, new.body);
+                END;
+                CREATE TRIGGER IF NOT EXISTS documents_delete AFTER DELETE ON documents BEGIN
+                    INSERT INTO documents_fts (documents_fts, rowid, body) VALUES ('delete', old.id, old.body);
+                END;
+                CREATE TRIGGER IF NOT EXISTS documents_update AFTER UPDATE OF body ON documents
+                WHEN old.body IS NOT new.body BEGIN
+                    INSERT INTO documents_fts (documents_fts, rowid, body) VALUES ('delete', old.id, old.body);
+                    INSERT INTO documents_fts (rowid, body) VALUES (new.id, new.body);
+                END;
+            """)
+
+    def close(self):
+        self.conn.close()
+
+    def is_current(self, path):
+        """True when `path` was indexed and has not changed since."""
+        row = self.conn.execute("SELECT mtime, size FROM files WHERE path = ?", (path,)).fetchone()
+        return row is not None and tuple(row) == _file_signature(path)
+
+    def add_file(self, path):
+        """
+        Index (or re-index) every post and comment in one result file.
+
+        The same Reddit id seen in several files is stored once; later files
+        update its score and text, and a classified copy adds its sentiment.
+        Documents a re-indexed file no longer contains are dropped unless
+        another indexed file still has them.
+
+        Returns:
+            Number of documents written
+        """
+        mtime, size = _file_signature(path)
+        rows = [
+            (kind, doc_id, post_id, created, score, author, sentiment, permalink, path, text)
+            for kind, doc_id, post_id, created, score, author, sentiment, permalink, text in iter_documents(path)
+            if doc_id
+        ]
+        with self.conn:
+            self.conn.execute("DELETE FROM file_documents WHERE file = ?", (path,))
+            self.conn.executemany("""
+                INSERT INTO documents (kind, doc_id, post_id, created_utc, score, author, sentiment, permalink, file, body)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (kind, doc_id) DO UPDATE SET
+                    post_id = excluded.post_id,
+                    created_utc = COALESCE(excluded.created_utc, documents.created_utc),
+                    score = excluded.score,
+                    author = excluded.author,
+                    sentiment = COALESCE(excluded.sentiment, documents.sentiment),
+                    permalink = excluded.permalink,
+                    file = excluded.file,
+                    body = excluded.body
+            """, rows)
+            self.conn.executemany("INSERT OR IGNORE INTO file_documents (file, kind, doc_id) VALUES (?, ?, ?)",
+                                  [(path, row[0], row[1]) for row in rows])
+            self._release(path)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (path, mtime, size, documents, indexed_at) VALUES (?, ?, ?, ?, ?)",
+                (path, mtime, size, len(rows), datetime.now().isoformat())
+            )
+        return len(rows)
+
+    def remove_file(self, path):
+        """
+        Forget a result file that no longer exists.
+
+        Returns:
+            Number of documents dropped from the index
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM file_documents WHERE file = ?", (path,))
+            self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+            return self._release(path)
+
+    def _release(self, path):
+        # Documents last written by `path` that it no longer holds: hand them to another
+        # file that has them, or drop them when none does
+        self.conn.execute("""
+            UPDATE documents SET file = (
+                SELECT MAX(f.file) FROM file_documents f WHERE f.kind = documents.kind AND f.doc_id = documents.doc_id
+            )
+            WHERE file = ? AND NOT EXISTS (
+                SELECT 1 FROM file_documents f WHERE f.kind = documents.kind AND f.doc_id = documents.doc_id
+                AND f.file = ?
+            )
+        """, (path, path))
+        return self.conn.execute("DELETE FROM documents WHERE file IS NULL").rowcount
+
+    def update(self, paths):
+        """
+        Index new or changed result files, oldest first so newer crawls win,
+        and drop indexed files that have been deleted since.
+
+        Returns:
+            Dictionary with files indexed, skipped as unchanged, failed and removed, and documents written
+        """
+        stats = {'indexed': 0, 'unchanged': 0, 'failed': 0, 'removed': 0, 'documents': 0}
+        for (path,) in self.conn.execute("SELECT path FROM files").fetchall():
+            if not os.path.exists(path):
+                self.remove_file(path)
+                stats['removed'] += 1
+        for path in sorted(paths, key=lambda path: _file_signature(path)[0]):
+            if self.is_current(path):
+                stats['unchanged'] += 1
+                continue
+            try:
+                stats['documents'] += self.add_file(path)
+                stats['indexed'] += 1
+            except (OSError, ValueError, KeyError) as e:
+                print(f"❌ Skipped {path}: {e}")
+                stats['failed'] += 1
+        self.conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('optimize')")
+        self.conn.commit()
+        return stats
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def search(self, query, since=None, until=None, min_score=None, max_score=None, kind=None, sentiment=None,
+               limit=20, order='rank'):
+        """
+        Run a full-text query.
+
+        Args:
+            query: Query text, see build_match_query
+            since, until: Unix timestamps bounding created_utc
+            min_score, max_score: Score bounds
+            kind: 'post' or 'comment'
+            sentiment: Only comments classified with this sentiment
+            limit: Maximum number of hits
+            order: 'rank' (relevance), 'score' or 'new'
+
+        Returns:
+            List of hit dictionaries with a highlighted snippet
+        """
+        conditions = ["documents_fts MATCH ?"]
+        params = [build_match_query(query)]
+        for clause, value in (("d.created_utc >= ?", since), ("d.created_utc < ?", until),
+                              ("d.score >= ?", min_score), ("d.score <= ?", max_score),
+                              ("d.kind = ?", kind), ("d.sentiment = ?", sentiment)):
+            if value is not None:
+                conditions.append(clause)
+                params.append(value)
+        params.append(limit)
+
+        cursor = self.conn.execute(f"""
+            SELECT d.kind, d.doc_id, d.post_id, d.created_utc, d.score, d.author, d.sentiment, d.permalink, d.file,
+                   snippet(documents_fts, 0, '[', ']', ' … ', 16)
+            FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid
+            WHERE {' AND '.join(conditions)}
+            ORDER BY {ORDER_BY[order]}
+            LIMIT ?
+        """, params)
+        columns = ['kind', 'id', 'post_id', 'created_utc', 'score', 'author', 'sentiment', 'permalink', 'file', 'snippet']
+        return [dict(zip(columns, row)) for row in cursor]
+
+
+def _parse_day(value):
+    return datetime.strptime(value, "%Y-%m-%d").timestamp()
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(description='Build and query the full-text index of scraped comments')
+    parser.add_argument('--index-path', default=DEFAULT_SEARCH_INDEX_PATH,
+                        help=f'SQLite search index (default: {DEFAULT_SEARCH_INDEX_PATH})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Index new or changed result files')
+    build_parser.add_argument('files', nargs='*', help='Result files (default: everything under --results-dir)')
+    build_parser.add_argument('--results-dir', default='results', help='Folder to index (default: results)')
+
+    query_parser = subparsers.add_parser('query', help='Search the index')
+    query_parser.add_argument('query', help='Words, "phrases", AND/OR/NOT, parentheses and prefix* terms')
+    query_parser.add_argument('--since', help='Only results created on or after this day (YYYY-MM-DD)')
+    query_parser.add_argument('--until', help='Only results created before this day (YYYY-MM-DD)')
+    query_parser.add_argument('--days', type=int, help='Only results from the last N days')
+    query_parser.add_argument('--min-score', type=int, help='Minimum score')
+    query_parser.add_argument('--max-score', type=int, help='Maximum score')
+    query_parser.add_argument('--kind', choices=['post', 'comment'], help='Only posts or only comments')
+    query_parser.add_argument('--sentiment', choices=['positive', 'neutral', 'negative'],
+                              help='Only comments classified with this sentiment')
+    query_parser.add_argument('--order', choices=list(ORDER_BY), default='rank', help='Sort order (default: rank)')
+    query_parser.add_argument('-n', '--limit', type=int, default=20, help='Maximum hits (default: 20)')
+    query_parser.add_argument('--json', action='store_true', help='Print hits as JSON')
+    return parser
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    index = SearchIndex(args.index_path)
+
+    try:
+        if args.command == 'build':
+            start = time.perf_counter()
+            stats = index.update(args.files or find_result_files(args.results_dir))
+            print(f"✅ Indexed {stats['indexed']} files ({stats['documents']} documents), "
+                  f"{stats['unchanged']} unchanged, {stats['failed']} failed, {stats['removed']} removed in {time.perf_counter() - start:.1f}s; "
+                  f"{index.count()} documents in {index.path}")
+            return
+
+        since = _parse_day(args.since) if args.since else None
+        if args.days is not None:
+            since = (datetime.now() - timedelta(days=args.days)).timestamp()
+        until = _parse_day(args.until) if args.until else None
+
+        start = time.perf_counter()
+        try:
+            hits = index.search(args.query, since, until, args.min_score, args.max_score, args.kind,
+                                args.sentiment, args.limit, args.order)
+        except sqlite3.OperationalError as e:
+            print(f"❌ Invalid query: {e}")
+            sys.exit(1)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        if args.json:
+            print(json.dumps(hits, indent=2, ensure_ascii=False))
+            return
+        for hit in hits:
+            created = datetime.fromtimestamp(hit['created_utc']).strftime('%Y-%m-%d %H:%M') if hit['created_utc'] else '?'
+            label = f" | {hit['sentiment']}" if hit['sentiment'] else ''
+            print(f"{created} | {hit['score']:>5} | {hit['kind']:<7} | {hit['id']}{label}")
+            print(f"    {' '.join(hit['snippet'].split())}")
+            if hit['permalink']:
+                print(f"    {hit['permalink']}")
+        print(f"\n🔍 {len(hits)} hits in {elapsed_ms:.1f} ms")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+HTTP API over classified results.
+Serves per-ticker / per-day sentiment, buy/hold/sell shares and top comments
+from aggregates that are precomputed when a *_summarized result lands and
+updated file by file afterwards. Responses are serialized once per data
+version into an in-memory LRU and carry ETags, so dashboards polling every few
+seconds get cached bytes or a 304 without anything being recomputed.
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+
+import pandas as pd
+
+from run_metrics import RunMetrics
+from sentiment_table import (TOTAL_COLUMNS, build_tables, explode_tickers, find_summarized_files,
+                             load_document_columns, sentiment_indicators, sentiment_shares, summary_records)
+from ticker_extraction import TickerExtractor, load_ticker_dictionary
+
+# Pseudo-ticker holding every classified comment, mentioned or not (as in live_sentiment.py)
+ALL_TICKERS = "ALL"
+TOP_COMMENT_FIELDS = ['comment_id', 'post_id', 'post_title', 'score', 'sentiment', 'stock_action', 'summary', 'body']
+
+
+def file_contributions(path, tickers=None, top_comments=10):
+    """
+    Per (ticker, day) totals of one classified result file.
+
+    Returns:
+        Dictionary (ticker, date) -> {'totals': {TOTAL_COLUMNS + comments: sum},
+        'clusters': Counter of near-duplicate cluster ids, 'top': highest scored comments}
+    """
+    _, columns = load_document_columns(path, TickerExtractor(tickers) if tickers else None)
+    _, comments = build_tables([columns])
+    if comments.empty:
+        return {}
+    everything = comments.drop(columns='tickers').assign(ticker=ALL_TICKERS)
+    frame = sentiment_indicators(pd.concat([explode_tickers(comments), everything], ignore_index=True))
+    frame['date'] = frame['date'].astype(object)
+    frame = frame[frame['date'].notna()].copy()
+    frame['body'] = frame['body'].str.slice(0, 280)
+
+    keys = ['ticker', 'date']
+    grouped = frame.groupby(keys, sort=False)
+    totals = grouped[TOTAL_COLUMNS].sum()
+    totals['comments'] = grouped.size()
+    contributions = {key: {'totals': row, 'clusters': Counter(), 'top': []}
+                     for key, row in zip(totals.index, totals.to_dict('records'))}
+    for (ticker, date, cluster), count in frame.groupby(keys + ['cluster_id'], sort=False).size().items():
+        contributions[(ticker, date)]['clusters'][cluster] = int(count)
+    top = frame.sort_values('score', ascending=False, kind='stable').groupby(keys, sort=False).head(top_comments)
+    for record in top[keys + TOP_COMMENT_FIELDS].astype(object).where(top.notna(), None).to_dict('records'):
+        record['score'] = int(record['score'])
+        contributions[(record.pop('ticker'), record.pop('date'))]['top'].append(record)
+    return contributions
+
+
+def _shares(keys, totals, clusters):
+    """summary_records rows for parallel lists of (ticker, date) keys, totals dicts and cluster Counters."""
+    table = pd.DataFrame(totals, index=pd.MultiIndex.from_tuples(keys, names=['ticker', 'date']))
+    table['unique_opinions'] = [len(counter) for counter in clusters]
+    return summary_records(sentiment_shares(table).reset_index())
+
+
+class SentimentAggregates:
+    """
+    Per (ticker, day) sentiment totals over every classified result under a folder.
+
+    Each file's contribution is kept so a changed or deleted file is
+    subtracted and re-added; only the (ticker, day) groups it touches have
+    their shares and top comments recomputed. Every ticker has a version that
+    is bumped when one of its groups changes, which keys the response cache.
+    """
+
+    def __init__(self, results_dir="results", tickers=None, top_comments=10, workers=None):
+        """
+        Args:
+            results_dir: Folder searched for *_summarized results
+            tickers: Ticker dictionary used for tagging (default: the built-in one)
+            top_comments: Highest scored comments kept per ticker and day
+            workers: Processes used when many files change at once (default: one per CPU)
+        """
+        self.results_dir = results_dir
+        self.tickers = tickers
+        self.top_comments = top_comments
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.version = 0
+        self.versions = Counter()
+        self.updated_at = None
+        self._files = {}
+        self._groups = {}
+        self._records = {}
+        self._top = {}
+        self._days = {}
+
+    # Loading
+
+    def refresh(self):
+        """
+        Pick up new, changed and deleted result files.
+
+        Returns:
+            (files loaded, files removed)
+        """
+        seen = {}
+        for path in find_summarized_files(self.results_dir):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            seen[path] = (stat.st_mtime_ns, stat.st_size)
+        changed = [path for path, signature in seen.items()
+                   if path not in self._files or self._files[path][0] != signature]
+        removed = [path for path in self._files if path not in seen]
+
+        load = partial(file_contributions, tickers=self.tickers, top_comments=self.top_comments)
+        if len(changed) > 1 and self.workers != 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                loaded = list(executor.map(load, changed, chunksize=4))
+        else:
+            loaded = [load(path) for path in changed]
+        for path, contributions in zip(changed, loaded):
+            self.apply(path, seen[path], contributions)
+        for path in removed:
+            self.apply(path, None, {})
+        return len(changed), len(removed)
+
+    def apply(self, path, signature, contributions):
+        """Replace the contribution of `path` (`signature` None removes the file)."""
+        with self.lock:
+            previous = self._files.pop(path, (None, {}))[1]
+            if signature is not None:
+                self._files[path] = (signature, contributions)
+            for key, part in previous.items():
+                group = self._groups[key]
+                for column, value in part['totals'].items():
+                    group['totals'][column] -= value
+                group['clusters'] -= part['clusters']
+                group['files'].discard(path)
+            for key, part in contributions.items():
+                group = self._groups.setdefault(key, {'totals': dict.fromkeys(part['totals'], 0), 'clusters': Counter(),
+                                                      'files': set()})
+                for column, value in part['totals'].items():
+                    group['totals'][column] += value
+                group['clusters'] += part['clusters']
+                group['files'].add(path)
+
+            affected = set(previous) | set(contributions)
+            for key in [key for key in affected if not self._groups[key]['files']]:
+                del self._groups[key]
+                self._records.pop(key, None)
+                self._top.pop(key, None)
+            live = [key for key in affected if key in self._groups]
+            if live:
+                records = _shares(live, [self._groups[key]['totals'] for key in live],
+                                  [self._groups[key]['clusters'] for key in live])
+                for key, record in zip(live, records):
+                    self._records[key] = record
+                    top = [comment for source in self._groups[key]['files']
+                           for comment in self._files[source][1][key]['top']]
+                    self._top[key] = sorted(top, key=lambda comment: -comment['score'])[:self.top_comments]
+
+            for ticker in {ticker for ticker, _ in affected}:
+                days = sorted(date for group_ticker, date in self._groups if group_ticker == ticker)
+                if days:
+                    self._days[ticker] = days
+                else:
+                    self._days.pop(ticker, None)
+                self.versions[ticker] += 1
+            self.version += 1
+            self.updated_at = datetime.now().isoformat()
+
+    def watch(self, interval, stop):
+        """Refresh every `interval` seconds until the `stop` event is set."""
+        while not stop.wait(interval):
+            try:
+                loaded, removed = self.refresh()
+            except Exception as e:
+                print(f"⚠️  Refresh failed: {e}")
+                continue
+            if loaded or removed:
+                print(f"🔄 {loaded} result file(s) loaded, {removed} removed (version {self.version})")
+
+    # Queries (callers hold self.lock)
+
+    def __contains__(self, ticker):
+        return ticker in self._days
+
+    @property
+    def file_count(self):
+        return len(self._files)
+
+    @property
+    def ticker_count(self):
+        return len(self._days)
+
+    def _days_between(self, ticker, since=None, until=None):
+        return [date for date in self._days.get(ticker, []) if (not since or date >= since) and (not until or date <= until)]
+
+    def ticker_list(self, min_comments=1):
+        """Every ticker with its comment count and first/last day, most discussed first."""
+        result = []
+        for ticker, days in self._days.items():
+            count = sum(self._groups[(ticker, date)]['totals']['comments'] for date in days)
+            if count >= min_comments or ticker == ALL_TICKERS:
+                result.append({'ticker': ticker, 'comments': count, 'days': len(days),
+                               'first_day': days[0], 'last_day': days[-1]})
+        return sorted(result, key=lambda row: -row['comments'])
+
+    def daily(self, ticker, since=None, until=None):
+        """Precomputed per-day records of `ticker`, oldest first."""
+        return [self._records[(ticker, date)] for date in self._days_between(ticker, since, until)]
+
+    def summary(self, ticker, since=None, until=None):
+        """One record over every day of `ticker` in the range, or None without comments."""
+        days = self._days_between(ticker, since, until)
+        if not days:
+            return None
+        groups = [self._groups[(ticker, date)] for date in days]
+        totals = {column: sum(group['totals'][column] for group in groups) for column in groups[0]['totals']}
+        clusters = set().union(*(group['clusters'] for group in groups))
+        record = _shares([(ticker, None)], [totals], [clusters])[0]
+        del record['date']
+        record.update(first_day=days[0], last_day=days[-1], days=len(days))
+        return record
+
+    def day(self, ticker, date, limit=None):
+        """The record of `ticker` on `date` with its top comments, or None."""
+        record = self._records.get((ticker, date))
+        if record is None:
+            return None
+        return dict(record, top_comments=self._top[(ticker, date)][:limit])
+
+    def top(self, ticker, since=None, until=None, limit=None):
+        """Highest scored comments of `ticker` over the range."""
+        limit = limit or self.top_comments
+        comments = [dict(comment, date=date) for date in self._days_between(ticker, since, until)
+                    for comment in self._top[(ticker, date)]]
+        return sorted(comments, key=lambda comment: -comment['score'])[:limit]
+
+    def tickers_on(self, date, min_comments=1):
+        """Every ticker's record on `date`, most discussed first."""
+        records = [record for (ticker, record_date), record in self._records.items()
+                   if record_date == date and (record['comments'] >= min_comments or ticker == ALL_TICKERS)]
+        return sorted(records, key=lambda record: -record['comments'])
+
+
+class ResponseCache:
+    """
+    LRU of serialized responses.
+
+    Keys include the data version they were built from, so an update never
+    needs to invalidate anything: requests simply stop asking for the old
+    version and its entries fall off the end. The ETag is a hash of the body,
+    so a rebuilt response that did not change keeps its ETag.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """(etag, body) cached under `key`, serializing build() on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        body = json.dumps(build(), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        entry = (f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"', body)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def stats(self):
+        return {'entries': len(self._entries), 'max_entries': self.max_entries, 'hits': self.hits, 'misses': self.misses}
+
+
+def etag_matches(header, etag):
+    """True if an If-None-Match header value covers `etag` (weak comparison, as for GET)."""
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return any(candidate.strip().removeprefix('W/') == etag for candidate in header.split(','))
+
+
+def create_app(aggregates, cache=None, poll_interval=5.0):
+    """
+    FastAPI application over `aggregates`, refreshed every `poll_interval` seconds (0 disables it).
+
+    Endpoints (dates are YYYY-MM-DD, tickers are case-insensitive, ALL covers every comment):
+
+        GET /health
+        GET /tickers?min_comments=
+        GET /tickers/{ticker}?since=&until=           summary over the range
+        GET /tickers/{ticker}/daily?since=&until=     one record per day
+        GET /tickers/{ticker}/days/{date}?limit=      that day with its top comments
+        GET /tickers/{ticker}/top-comments?since=&until=&limit=
+        GET /days/{date}?min_comments=                every ticker on that day
+    """
+    # Imported here so the aggregates can be used without the web stack installed
+    from fastapi import FastAPI, HTTPException, Request
+    from fastapi.responses import Response
+
+    cache = cache or ResponseCache()
+    app = FastAPI(title='Reddit sentiment API')
+    stop = threading.Event()
+
+    def respond(request, key, build):
+        def locked_build():
+            with aggregates.lock:
+                result = build()
+            if result is None:
+                raise HTTPException(status_code=404, detail='No classified comments for this query')
+            return result
+
+        etag, body = cache.get(key + (request.url.query,), locked_build)
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag_matches(request.headers.get('if-none-match'), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type='application/json', headers=headers)
+
+    def ticker_key(path, ticker):
+        return path, ticker, aggregates.versions[ticker]
+
+    @app.on_event('startup')
+    def start_watcher():
+        if poll_interval:
+            threading.Thread(target=aggregates.watch, args=(poll_interval, stop), daemon=True).start()
+
+    @app.on_event('shutdown')
+    def stop_watcher():
+        stop.set()
+
+    @app.get('/health')
+    async def health():
+        return {'files': aggregates.file_count, 'version': aggregates.version, 'updated_at': aggregates.updated_at,
+                'cache': cache.stats()}
+
+    @app.get('/tickers')
+    async def tickers(request: Request, min_comments: int = 1):
+        return respond(request, ('tickers', aggregates.version), lambda: aggregates.ticker_list(min_comments))
+
+    @app.get('/tickers/{ticker}')
+    async def ticker_summary(request: Request, ticker: str, since: str = None, until: str = None):
+        ticker = ticker.upper()
+        return respond(request, ticker_key('summary', ticker), lambda: aggregates.summary(ticker, since, until))
+
+    @app.get('/tickers/{ticker}/daily')
+    async def ticker_daily(request: Request, ticker: str, since: str = None, until: str = None):
+        ticker = ticker.upper()
+        return respond(request, ticker_key('daily', ticker),
+                       lambda: {'ticker': ticker, 'days': aggregates.daily(ticker, since, until)}
+                       if ticker in aggregates else None)
+
+    @app.get('/tickers/{ticker}/days/{date}')
+    async def ticker_day(request: Request, ticker: str, date: str, limit: int = None):
+        ticker = ticker.upper()
+        return respond(request, ticker_key('day', ticker) + (date,), lambda: aggregates.day(ticker, date, limit))
+
+    @app.get('/tickers/{ticker}/top-comments')
+    async def ticker_top(request: Request, ticker: str, since: str = None, until: str = None, limit: int = None):
+        ticker = ticker.upper()
+        return respond(request, ticker_key('top', ticker),
+                       lambda: {'ticker': ticker, 'comments': aggregates.top(ticker, since, until, limit)}
+                       if ticker in aggregates else None)
+
+    @app.get('/days/{date}')
+    async def day_tickers(request: Request, date: str, min_comments: int = 1):
+        def build():
+            records = aggregates.tickers_on(date, min_comments)
+            return {'date': date, 'tickers': records} if records else None
+
+        return respond(request, ('days', aggregates.version, date), build)
+
+    return app
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(description='Serve cached per-ticker / per-day sentiment over HTTP')
+    parser.add_argument('--results-dir', default='results', help='Folder watched for *_summarized results (default: results)')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on (default: 8000)')
+    parser.add_argument('--poll-interval', type=float, default=5.0,
+                        help='Seconds between checks for new or changed results, 0 to disable (default: 5)')
+    parser.add_argument('--cache-size', type=int, default=1024, help='Responses kept in the LRU cache (default: 1024)')
+    parser.add_argument('--top-comments', type=int, default=10,
+                        help='Highest scored comments kept per ticker and day (default: 10)')
+    parser.add_argument('--workers', type=int, default=None, help='Processes used to load files (default: CPU count)')
+    parser.add_argument('--tickers-file', help='JSON ticker dictionary merged over the built-in one')
+    parser.add_argument('--metrics-out', help='Write startup metrics to this file (*.prom: Prometheus text format, otherwise JSON)')
+    return parser
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    import uvicorn
+
+    metrics = RunMetrics('sentiment_api')
+    tickers = load_ticker_dictionary(args.tickers_file) if args.tickers_file else None
+    aggregates = SentimentAggregates(args.results_dir, tickers, args.top_comments, args.workers)
+    started = time.perf_counter()
+    with metrics.stage('load'):
+        loaded, _ = aggregates.refresh()
+    metrics.set('files', loaded)
+    metrics.set('tickers', aggregates.ticker_count)
+    print(f"📂 {loaded} result file(s), {aggregates.ticker_count} tickers loaded in {time.perf_counter() - started:.1f}s")
+    if args.metrics_out:
+        print(f"📊 Metrics written to {metrics.write(args.metrics_out)}")
+
+    app = create_app(aggregates, ResponseCache(args.cache_size), args.poll_interval)
+    uvicorn.run(app, host=args.host, port=args.port, access_log=False)
+
+
+if __name__ == "__main__":
+    main()
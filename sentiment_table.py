@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Columnar loading and vectorized aggregation of classified Reddit results.
+Loads many *_summarized.json files in parallel into pandas tables and
+computes counts, upvote-weighted sentiment and buy/hold/sell shares with
+group-bys instead of per-comment Python loops.
+"""
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from columnar_store import COLUMNAR_SUFFIX, POST_ROW_COLUMN, ColumnarResult, is_columnar
+from result_stream import load_result
+from ticker_extraction import TickerExtractor, default_extractor
+
+SENTIMENTS = ['positive', 'neutral', 'negative']
+ACTIONS = ['buy', 'hold', 'sell', 'na']
+TOTAL_COLUMNS = ([f"is_{s}" for s in SENTIMENTS] + [f"is_{a}" for a in ACTIONS] + [f"w_{s}" for s in SENTIMENTS]
+                 + ['weight'])
+GROUP_COLUMNS = {'day': 'date', 'post': 'post_id', 'search_term': 'search_term', 'file': 'file', 'ticker': 'ticker',
+                 'subreddit': 'subreddit'}
+
+
+def find_summarized_files(results_dir="results", patterns=("*_summarized.json", "*_summarized" + COLUMNAR_SUFFIX)):
+    """
+    Return every result under `results_dir` matching one of `patterns`, sorted by path.
+    When a result exists in several formats the one matching the later pattern is used.
+    """
+    found = {}
+    for pattern in patterns:
+        for path in glob.glob(os.path.join(results_dir, "**", pattern), recursive=True):
+            found[os.path.splitext(path)[0]] = path
+    return sorted(found.values())
+
+
+def _result_date(path, data):
+    # Crawl folders are named MM-DD-YYYY; fall back to when the search ran
+    folder = os.path.basename(os.path.dirname(path))
+    try:
+        return datetime.strptime(folder, "%m-%d-%Y").strftime("%Y-%m-%d")
+    except ValueError:
+        executed_at = data.get('metadata', {}).get('search_executed_at', '')
+        return executed_at[:10] or None
+
+
+def load_file_columns(path, tickers=None):
+    """Read one result file into (post_columns, comment_columns), see result_columns."""
+    return load_document_columns(path, TickerExtractor(tickers) if tickers else None)[1]
+
+
+def load_document_columns(path, extractor=None):
+    """
+    Read one result into its top-level document and (post_columns, comment_columns).
+
+    Columnar results only read the columns the report needs; their document
+    holds metadata and search parameters but no posts.
+    """
+    if is_columnar(path):
+        store = ColumnarResult(path)
+        return store.document, columnar_columns(store, extractor)
+    data = load_result(path)
+    return data, result_columns(path, data, extractor)
+
+
+def result_columns(path, data, extractor=None):
+    """
+    Flatten one loaded result document into plain column lists.
+
+    Every post and comment is tagged with the tickers it mentions; comments
+    that mention none are attributed to the tickers of their post. Comments
+    outside a near-duplicate cluster are their own cluster.
+
+    Returns:
+        (post_columns, comment_columns) dictionaries of equal-length lists;
+        only comments carrying both a sentiment and a stock_action are kept
+    """
+    extractor = extractor or default_extractor()
+    date = _result_date(path, data)
+    search_term = data.get('search_parameters', {}).get('search_term', 'Unknown')
+    posts = {key: [] for key in ('file', 'date', 'search_term', 'subreddit', 'post_id', 'title', 'selftext', 'tickers')}
+    comments = {key: [] for key in ('file', 'date', 'search_term', 'subreddit', 'post_id', 'post_title', 'comment_id',
+                                    'body', 'score', 'sentiment', 'stock_action', 'summary', 'tickers', 'cluster_id',
+                                    'parent_id', 'created_utc')}
+
+    for post in data.get('posts', []):
+        post_tickers = extractor.extract(post.get('title', '') + '\n' + (post.get('selftext') or ''))
+        posts['file'].append(path)
+        posts['date'].append(date)
+        posts['search_term'].append(search_term)
+        posts['subreddit'].append(post.get('subreddit', 'Unknown'))
+        posts['post_id'].append(post.get('id'))
+        posts['title'].append(post.get('title', ''))
+        posts['selftext'].append(post.get('selftext', ''))
+        posts['tickers'].append(post_tickers)
+        for comment in post.get('comments', []):
+            if not (comment.get('sentiment') and comment.get('stock_action')):
+                continue
+            comments['file'].append(path)
+            comments['date'].append(date)
+            comments['search_term'].append(search_term)
+            comments['subreddit'].append(post.get('subreddit', 'Unknown'))
+            comments['post_id'].append(post.get('id'))
+            comments['post_title'].append(post.get('title', ''))
+            comments['comment_id'].append(comment.get('id'))
+            comments['body'].append(comment.get('body', ''))
+            comments['score'].append(comment.get('score', 0))
+            comments['sentiment'].append(comment.get('sentiment'))
+            comments['stock_action'].append(comment.get('stock_action'))
+            comments['summary'].append(comment.get('summary', ''))
+            comments['cluster_id'].append(comment.get('cluster_id') or comment.get('id'))
+            comments['parent_id'].append(comment.get('parent_id'))
+            comments['created_utc'].append(comment.get('created_utc'))
+            comments['tickers'].append(extractor.extract(comment.get('body', '')) or post_tickers)
+    return posts, comments
+
+
+def columnar_columns(store, extractor=None):
+    """Same columns as result_columns, read column by column from a ColumnarResult."""
+    extractor = extractor or default_extractor()
+    path = store.path
+    date = _result_date(path, store.document)
+    search_term = store.document.get('search_parameters', {}).get('search_term', 'Unknown')
+
+    post_count = store.rows('posts')
+    post_ids = store.values('posts', 'id') if post_count else []
+    titles = store.values('posts', 'title') if store.has_column('posts', 'title') else [''] * post_count
+    selftexts = store.values('posts', 'selftext') if store.has_column('posts', 'selftext') else [''] * post_count
+    subreddits = store.values('posts', 'subreddit') if store.has_column('posts', 'subreddit') else ['Unknown'] * post_count
+    post_tickers = [extractor.extract((title or '') + '\n' + (selftext or '')) for title, selftext in zip(titles, selftexts)]
+    posts = {
+        'file': [path] * post_count, 'date': [date] * post_count, 'search_term': [search_term] * post_count,
+        'subreddit': subreddits, 'post_id': post_ids, 'title': titles, 'selftext': selftexts, 'tickers': post_tickers
+    }
+
+    comments = {key: [] for key in ('file', 'date', 'search_term', 'subreddit', 'post_id', 'post_title', 'comment_id',
+                                    'body', 'score', 'sentiment', 'stock_action', 'summary', 'tickers', 'cluster_id',
+                                    'parent_id', 'created_utc')}
+    if not (store.has_column('comments', 'sentiment') and store.has_column('comments', 'stock_action')):
+        return posts, comments
+
+    sentiments = store.values('comments', 'sentiment')
+    actions = store.values('comments', 'stock_action')
+    keep = [row for row, (sentiment, action) in enumerate(zip(sentiments, actions)) if sentiment and action]
+    post_rows = np.asarray(store.column('comments', POST_ROW_COLUMN))[keep]
+
+    def kept(name, default):
+        if not store.has_column('comments', name):
+            return [default] * len(keep)
+        values = store.values('comments', name)
+        return [values[row] if values[row] is not None else default for row in keep]
+
+    bodies = kept('body', '')
+    comments['file'] = [path] * len(keep)
+    comments['date'] = [date] * len(keep)
+    comments['search_term'] = [search_term] * len(keep)
+    comments['subreddit'] = [subreddits[row] for row in post_rows.tolist()]
+    comments['post_id'] = [post_ids[row] for row in post_rows.tolist()]
+    comments['post_title'] = [titles[row] for row in post_rows.tolist()]
+    comments['comment_id'] = kept('id', None)
+    comments['body'] = bodies
+    comments['score'] = kept('score', 0)
+    comments['sentiment'] = [sentiments[row] for row in keep]
+    comments['stock_action'] = [actions[row] for row in keep]
+    comments['summary'] = kept('summary', '')
+    comments['cluster_id'] = [cluster or comment_id for cluster, comment_id in zip(kept('cluster_id', None),
+                                                                                    comments['comment_id'])]
+    comments['parent_id'] = kept('parent_id', None)
+    comments['created_utc'] = kept('created_utc', None)
+    comments['tickers'] = [extractor.extract(body) or post_tickers[row] for body, row in zip(bodies, post_rows.tolist())]
+    return posts, comments
+
+
+def load_tables(paths, workers=None, tickers=None):
+    """
+    Load result files in parallel into (posts, comments) DataFrames.
+
+    Args:
+        paths: Result files (.json or .jsonl)
+        workers: Worker processes (default: one per CPU; 1 loads in-process)
+        tickers: Ticker dictionary used for tagging (default: the built-in one)
+
+    Returns:
+        Tuple of posts and comments DataFrames
+    """
+    load = partial(load_file_columns, tickers=tickers)
+    if workers == 1 or len(paths) <= 1:
+        loaded = [load(path) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            loaded = list(executor.map(load, paths, chunksize=4))
+    return build_tables(loaded)
+
+
+def build_tables(loaded):
+    """Concatenate (post_columns, comment_columns) pairs into posts and comments DataFrames."""
+    posts = pd.concat([pd.DataFrame(p) for p, _ in loaded], ignore_index=True) if loaded else pd.DataFrame()
+    comments = pd.concat([pd.DataFrame(c) for _, c in loaded], ignore_index=True) if loaded else pd.DataFrame()
+    if not comments.empty:
+        comments['score'] = pd.to_numeric(comments['score'], errors='coerce').fillna(0).astype(np.int64)
+        for column in ('file', 'date', 'search_term', 'subreddit', 'post_id', 'sentiment', 'stock_action'):
+            comments[column] = comments[column].astype('category')
+    return posts, comments
+
+
+def explode_tickers(comments):
+    """One row per (comment, mentioned ticker) with a `ticker` column; untagged comments are dropped."""
+    exploded = comments.explode('tickers').rename(columns={'tickers': 'ticker'})
+    return exploded[exploded['ticker'].notna()].reset_index(drop=True)
+
+
+def ticker_counts(comments):
+    """Number of comments attributed to each ticker, most mentioned first."""
+    if comments.empty:
+        return pd.Series(dtype=np.int64)
+    return explode_tickers(comments)['ticker'].value_counts(sort=False).sort_values(ascending=False, kind='stable')
+
+
+def sentiment_indicators(comments):
+    """`comments` plus the per-comment columns summed into totals (TOTAL_COLUMNS): upvote weight and 0/1 indicators."""
+    frame = comments.assign(
+        weight=comments['score'].clip(lower=1),
+        **{f"is_{s}": (comments['sentiment'] == s).astype(np.int64) for s in SENTIMENTS},
+        **{f"is_{a}": (comments['stock_action'] == a).astype(np.int64) for a in ACTIONS}
+    )
+    for sentiment in SENTIMENTS:
+        frame[f"w_{sentiment}"] = frame['weight'] * frame[f"is_{sentiment}"]
+    return frame
+
+
+def aggregate_sentiment(comments, by=('day',)):
+    """
+    Vectorized sentiment aggregation.
+
+    Args:
+        comments: Comments DataFrame from load_tables
+        by: Group keys, any of 'day', 'post', 'search_term', 'file', 'subreddit', 'ticker' (empty for
+            one overall row); grouping by ticker counts a comment once per ticker it mentions
+
+    Returns:
+        DataFrame with comment and unique-opinion (near-duplicate cluster) counts,
+        sentiment counts and shares, upvote-weighted sentiment shares and
+        buy/hold/sell shares per group
+    """
+    columns = [GROUP_COLUMNS[key] for key in by]
+    if 'ticker' in by:
+        comments = explode_tickers(comments)
+    frame = sentiment_indicators(comments)
+    if columns:
+        grouped = frame.groupby(columns, observed=True)
+        totals = grouped[TOTAL_COLUMNS].sum()
+        totals['comments'] = grouped.size()
+        totals['unique_opinions'] = grouped['cluster_id'].nunique()
+    else:
+        totals = frame[TOTAL_COLUMNS].sum().to_frame().T
+        totals['comments'] = len(frame)
+        totals['unique_opinions'] = frame['cluster_id'].nunique()
+    result = sentiment_shares(totals)
+    return result.reset_index() if columns else result.reset_index(drop=True)
+
+
+def sentiment_shares(totals):
+    """
+    Turn per-group totals into the aggregate_sentiment columns.
+
+    Args:
+        totals: DataFrame with comments, unique_opinions, is_<sentiment>, is_<action>,
+            w_<sentiment> (upvote-weighted counts) and weight columns
+
+    Returns:
+        DataFrame on the same index with counts and percentage shares
+    """
+    result = pd.DataFrame(index=totals.index)
+    result['comments'] = totals['comments']
+    result['unique_opinions'] = totals['unique_opinions']
+    for sentiment in SENTIMENTS:
+        result[sentiment] = totals[f"is_{sentiment}"]
+        result[f"{sentiment}_pct"] = 100.0 * totals[f"is_{sentiment}"] / totals['comments']
+        result[f"weighted_{sentiment}_pct"] = 100.0 * totals[f"w_{sentiment}"] / totals['weight']
+    for action in ACTIONS:
+        result[f"{action}_pct"] = 100.0 * totals[f"is_{action}"] / totals['comments']
+    return result
+
+
+def summary_records(aggregated):
+    """Convert an aggregate DataFrame into JSON-serializable records with rounded shares."""
+    return [
+        {key: (round(value, 2) if isinstance(value, float) else value) for key, value in record.items()}
+        for record in aggregated.astype(object).where(aggregated.notna(), None).to_dict('records')
+    ]
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Re-record the HTTP fixtures the tests replay.
+Crawls a synthetic thread from bench_standins with both comment engines
+through a RecordingStandIn and saves every response, so the tests run
+against fixed payloads without a live stand-in or network access.
+
+    python tests/record_fixtures.py
+"""
+import contextlib
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_standins import RecordingStandIn, RedditStandIn, SyntheticThread, serve  # noqa: E402
+from benchmark import reddit_client  # noqa: E402
+from reddit_search import search_reddit_posts  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+REDDIT_THREAD_FIXTURE = os.path.join(FIXTURES_DIR, 'reddit_thread.json.gz')
+SEARCH_TERM = "Daily Discussion Thread"
+
+
+def record_reddit_thread(path=REDDIT_THREAD_FIXTURE):
+    # Small fan-out and render depth so the crawl needs morechildren batches and "continue this thread" links
+    thread = SyntheticThread("fixture1", num_comments=700, max_depth=7, duplicate_ratio=0.1,
+                             title="Daily Discussion Thread for June 13, 2025", seed=7)
+    recorder = RecordingStandIn(RedditStandIn([thread], more_fanout=40, render_depth=4))
+    server = serve(recorder)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        for engine in ("praw", "raw"):
+            with contextlib.redirect_stdout(io.StringIO()):
+                posts = search_reddit_posts(reddit_client(url), SEARCH_TERM, limit=1, time_filter="all", sort="new",
+                                            engine=engine)
+            print(f"{engine}: {len(posts[0]['comments'])} comments")
+    finally:
+        server.shutdown()
+    recorder.save(path)
+    print(f"Saved {len(recorder.responses)} responses to {path}")
+
+
+if __name__ == "__main__":
+    record_reddit_thread()
@@ -0,0 +1,123 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import bar_signals, comment_times, lagged_correlations, threshold_grid
+
+# Hourly bars from 13:00 to 20:00 UTC
+HOURS = pd.date_range('2025-06-13 13:00', periods=8, freq='h')
+
+
+def hourly_prices():
+    return pd.DataFrame({'close': np.linspace(100, 107, len(HOURS))}, index=HOURS)
+
+
+def comments_frame(rows):
+    return pd.DataFrame(rows, columns=['created_utc', 'date', 'score', 'sentiment', 'stock_action'])
+
+
+@pytest.fixture
+def new_york_clock(monkeypatch):
+    """Run with the machine's local zone set to America/New_York."""
+    monkeypatch.setenv('TZ', 'America/New_York')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_comment_times_reads_crawler_local_time(new_york_clock):
+    # Posted at 19:00 UTC and written by datetime.fromtimestamp on a New York machine
+    written = pd.Timestamp('2025-06-13 19:00', tz='UTC').tz_convert('America/New_York').tz_localize(None).isoformat()
+    assert written == '2025-06-13T15:00:00'
+    comments = comments_frame([(written, '2025-06-13', 1, 'positive', 'buy'), (None, '2025-06-12', 1, 'neutral', 'hold')])
+
+    times = comment_times(comments)
+
+    assert times.tolist() == [pd.Timestamp('2025-06-13 19:00'), pd.Timestamp('2025-06-12')]
+    assert comment_times(comments, 'Europe/Berlin').iloc[0] == pd.Timestamp('2025-06-13 13:00')
+
+
+def test_bar_signals_places_comments_on_their_hourly_bar(new_york_clock):
+    comments = comments_frame([
+        ('2025-06-13T15:00:00', '2025-06-13', 10, 'positive', 'buy'),    # 19:00 UTC
+        ('2025-06-13T15:59:00', '2025-06-13', 1, 'negative', 'hold'),    # 19:59 UTC
+        ('2025-06-13T09:30:00', '2025-06-13', 1, 'negative', 'sell'),    # 13:30 UTC
+        ('2025-06-13T08:00:00', '2025-06-13', 1, 'positive', 'buy')      # 12:00 UTC, before the first bar
+    ])
+
+    signals = bar_signals(comments, hourly_prices())
+
+    assert signals['comments'].tolist() == [1, 0, 0, 0, 0, 0, 2, 0]
+    assert signals.loc['2025-06-13 19:00', 'net_sentiment'] == 0
+    assert signals.loc['2025-06-13 19:00', 'weighted_sentiment'] == pytest.approx(9 / 11)
+    assert signals.loc['2025-06-13 19:00', 'net_action'] == 0.5
+    assert signals.loc['2025-06-13 13:00', 'net_action'] == -1
+    assert signals['net_sentiment'].isna().sum() == 6
+
+
+# Closes and a signal on six bars; bar 1 and 5 have no comments
+CLOSES = np.array([100.0, 110.0, 99.0, 120.0, 108.0, 120.0])
+SIGNAL = np.array([0.5, np.nan, -0.5, 0.8, -0.1, np.nan])
+COUNTS = np.array([2, 0, 1, 3, 4, 0])
+
+
+def grid_row(grid, long_threshold, short_threshold, min_comments, hold):
+    short = grid['short_threshold'].isna() if short_threshold is None else grid['short_threshold'] == short_threshold
+    rows = grid[(grid['long_threshold'] == long_threshold) & short & (grid['min_comments'] == min_comments)
+                & (grid['hold'] == hold)]
+    assert len(rows) == 1
+    return rows.iloc[0]
+
+
+def test_threshold_grid_long_only_enters_at_the_next_close():
+    grid = threshold_grid(SIGNAL, COUNTS, np.log(CLOSES), [0.0], [-np.inf], [1, 2], [1], delay=1)
+
+    # Longs on bars 0 and 3: 110 -> 99 and 108 -> 120; bar 4's signal is below the threshold
+    row = grid_row(grid, 0.0, None, 1, 1)
+    returns = [99 / 110 - 1, 120 / 108 - 1]
+    assert row['trades'] == 2
+    assert row['hit_rate'] == 0.5
+    assert row['sum_return'] == pytest.approx(sum(returns))
+    assert row['mean_return'] == pytest.approx(np.mean(returns))
+    assert row['sharpe'] == pytest.approx(np.mean(returns) / np.std(returns, ddof=1) * np.sqrt(252))
+    # Held two bars, bar 3's trade would close past the data
+    row = grid_row(grid, 0.0, None, 1, 2)
+    assert row['trades'] == 1
+    assert row['sum_return'] == pytest.approx(120 / 110 - 1)
+    assert np.isnan(row['sharpe'])
+
+
+def test_threshold_grid_long_short_with_delay_and_min_comments():
+    grid = threshold_grid(SIGNAL, COUNTS, np.log(CLOSES), [0.0], [-0.2, -np.inf], [1], [1, 2], delay=2,
+                          bars_per_year=100)
+
+    # Long on bar 0 enters at bar 2's close, short on bar 2 at bar 4's; bar 3's entry would be bar 5 with no exit
+    row = grid_row(grid, 0.0, -0.2, 1, 1)
+    returns = [120 / 99 - 1, -(120 / 108 - 1)]
+    assert row['trades'] == 2
+    assert row['hit_rate'] == 0.5
+    assert row['sum_return'] == pytest.approx(sum(returns))
+    assert row['sharpe'] == pytest.approx(np.mean(returns) / np.std(returns, ddof=1) * np.sqrt(100))
+    # Bar 2 has a single comment, so only the long remains
+    row = grid_row(grid, 0.0, -0.2, 2, 1)
+    assert row['trades'] == 1
+    assert row['sum_return'] == pytest.approx(120 / 99 - 1)
+    assert grid_row(grid, 0.0, None, 1, 1)['trades'] == 1
+
+
+def test_lagged_correlations_finds_a_known_lead():
+    rng = np.random.default_rng(3)
+    log_close = np.cumsum(rng.normal(0, 0.01, 200))
+    returns = np.diff(log_close, prepend=np.nan)
+    # The signal announces the return two bars ahead
+    signal = np.append(returns[2:], [np.nan, np.nan])
+
+    correlations = lagged_correlations(signal, log_close, [-1, 0, 2]).set_index('lag')
+
+    assert correlations.loc[2, 'correlation'] == pytest.approx(1.0)
+    assert correlations.loc[2, 'observations'] == 198
+    assert abs(correlations.loc[0, 'correlation']) < 0.3
+    assert abs(correlations.loc[-1, 'correlation']) < 0.3
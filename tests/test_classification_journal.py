@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from classification_journal import ClassificationJournal
+
+
+def write_journal(path, records, tail=''):
+    path.write_text(''.join(json.dumps(record) + '\n' for record in records) + tail, encoding='utf-8')
+
+
+def test_existing_journal_is_not_wiped_without_overwrite(tmp_path):
+    path = tmp_path / 'run.journal'
+    write_journal(path, [{'post': 'p1', 'post_summary': 'summary'}])
+    with pytest.raises(FileExistsError):
+        ClassificationJournal(str(path))
+    assert path.read_text(encoding='utf-8')
+
+    ClassificationJournal(str(path), overwrite=True).close()
+    assert path.read_text(encoding='utf-8') == ''
+
+
+def test_resume_drops_partial_last_line_before_appending(tmp_path):
+    path = tmp_path / 'run.journal'
+    write_journal(path, [{'comment': 'c1', 'result': {'sentiment': 'positive'}}], tail='{"comment": "c2", "res')
+    journal = ClassificationJournal(str(path), resume=True)
+    assert set(journal.results) == {'c1'}
+    journal.record_result('c3', {'sentiment': 'negative'})
+    journal.close()
+
+    resumed = ClassificationJournal(str(path), resume=True)
+    assert set(resumed.results) == {'c1', 'c3'}
+    resumed.close()
+
+
+def test_resume_keeps_complete_record_missing_its_newline(tmp_path):
+    path = tmp_path / 'run.journal'
+    path.write_text(json.dumps({'comment': 'c1', 'result': {'sentiment': 'positive'}}), encoding='utf-8')
+    journal = ClassificationJournal(str(path), resume=True)
+    journal.record_result('c2', {'sentiment': 'neutral'})
+    journal.close()
+
+    resumed = ClassificationJournal(str(path), resume=True)
+    assert set(resumed.results) == {'c1', 'c2'}
+    resumed.close()
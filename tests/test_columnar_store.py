@@ -0,0 +1,72 @@
+import json
+
+import pandas as pd
+
+from columnar_store import ColumnarResult, is_columnar, load_columnar_result, write_columnar
+from result_stream import load_result
+
+
+def document():
+    comments = [
+        {'id': 'c1', 'author': 'alice', 'body': 'TSLA to the moon 🚀', 'score': 12, 'edited': False,
+         'distinguished': None, 'is_submitter': True, 'sentiment': 'positive', 'stock_action': 'buy'},
+        {'id': 'c2', 'author': None, 'body': 'Ünïcödé and "quotes"\nnew line', 'score': -3, 'edited': 1749820000.5,
+         'distinguished': 'moderator', 'is_submitter': False, 'sentiment': None, 'stock_action': 'na'},
+        {'id': 'c3', 'author': 'alice', 'body': '', 'score': 0, 'edited': False, 'distinguished': None,
+         'is_submitter': False, 'sentiment': 'negative', 'stock_action': 'sell', 'triage': 'no_text'},
+        {'id': 'c4', 'author': 'bob', 'body': None, 'score': None, 'edited': 1749830000.0, 'distinguished': 'admin',
+         'is_submitter': False, 'sentiment': 'positive', 'stock_action': 'hold', 'error': {'code': 429}}
+    ]
+    return {
+        'metadata': {'search_executed_at': '2025-06-13T12:00:00', 'execution_seconds': 1.25},
+        'search_parameters': {'search_term': 'Daily Discussion Thread', 'subreddits': ['wallstreetbets', 'stocks']},
+        'results_summary': {'posts_found': 3, 'total_comments_extracted': 4},
+        'posts': [
+            {'id': 'p1', 'title': 'Daily Discussion Thread 📈', 'score': 100, 'upvote_ratio': 0.93,
+             'comments': comments[:3], 'comments_count': 3},
+            {'id': 'p2', 'title': 'Empty', 'score': 1, 'upvote_ratio': 1.0, 'comments': [], 'comments_count': 0},
+            {'id': 'p3', 'title': 'Weekend', 'score': 5, 'upvote_ratio': 0.5, 'comments': comments[3:],
+             'comments_count': 1, 'post_summary': 'Weekend plans'}
+        ]
+    }
+
+
+def test_round_trip_keeps_nulls_unicode_and_mixed_values(tmp_path):
+    path = write_columnar(str(tmp_path / 'result.cols') + '/', document(), block_rows=2)
+
+    assert is_columnar(path)
+    assert load_result(path) == document()
+    # Key order survives as well, so the JSON dump is identical
+    assert json.dumps(load_columnar_result(path)) == json.dumps(document())
+
+
+def test_columns_are_read_on_their_own(tmp_path):
+    path = write_columnar(str(tmp_path / 'result.cols'), document(), block_rows=2)
+    store = ColumnarResult(path)
+
+    assert store.rows('posts') == 3
+    assert store.rows('comments') == 4
+    assert store.document['search_parameters']['subreddits'] == ['wallstreetbets', 'stocks']
+    sentiment = store.column('comments', 'sentiment')
+    assert isinstance(sentiment, pd.Categorical)
+    assert store.values('comments', 'sentiment') == ['positive', None, 'negative', 'positive']
+    assert store.values('comments', 'distinguished') == [None, 'moderator', None, 'admin']
+    assert store.column('comments', 'is_submitter').tolist() == [True, False, False, False]
+    assert store.values('comments', 'edited') == [False, 1749820000.5, False, 1749830000.0]
+    assert store.values('comments', 'score') == [12, -3, 0, None]
+    assert store.values('comments', 'triage') == [None, None, 'no_text', None]
+    assert store.column('comments', '_post').tolist() == [0, 0, 0, 2]
+    assert not store.has_column('comments', 'replies')
+    frame = store.frame('posts', ['id', 'score'])
+    assert frame['score'].tolist() == [100, 1, 5]
+
+
+def test_rewrite_replaces_the_previous_directory(tmp_path):
+    path = str(tmp_path / 'result.cols')
+    write_columnar(path, document())
+    smaller = dict(document(), posts=document()['posts'][1:2])
+
+    write_columnar(path, smaller)
+
+    assert load_columnar_result(path) == smaller
+    assert ColumnarResult(path).rows('comments') == 0
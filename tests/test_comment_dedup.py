@@ -0,0 +1,54 @@
+import numpy as np
+
+import comment_dedup
+from comment_dedup import MinHasher, cluster_near_duplicates, cluster_summary
+
+SPAM = "GME to the moon 🚀🚀🚀🚀 diamond hands, apes together strong, not selling a single share"
+COMMENTS = [
+    SPAM,
+    "Bought more puts on SPY this morning, CPI is going to be ugly and the Fed will not cut",
+    SPAM.upper().replace('🚀🚀🚀🚀', '🚀🚀🚀🚀🚀🚀🚀') + " https://i.redd.it/abc.png",
+    "NVDA earnings next week, I am holding my calls through the report no matter what",
+    "Bought more puts on SPY this morning, CPI is going to be ugly and the Fed will not cut!",
+    "GME is a dead company and everyone holding it is going to lose money",
+    "",
+    SPAM,
+    "   ",
+]
+
+
+def test_near_identical_comments_share_the_first_members_label():
+    labels = cluster_near_duplicates(COMMENTS)
+
+    # Re-cased, longer rocket run and a trailing link: still the spam cluster
+    assert labels[0] == labels[2] == labels[7] == 0
+    assert labels[1] == labels[4] == 1
+    # Comments without tokens are duplicates of each other
+    assert labels[6] == labels[8] == 6
+    assert cluster_summary(labels) == {'comments': 9, 'clusters': 5, 'duplicates': 4, 'largest_cluster': 3}
+
+
+def test_distinct_comments_stay_apart():
+    labels = cluster_near_duplicates(COMMENTS)
+
+    # Same ticker and vocabulary, different comment
+    assert labels[5] == 5
+    assert labels[3] == 3
+    # Half of the comment changed is well below the 0.8 threshold
+    edited = SPAM.split()
+    edited[len(edited) // 2:] = "but I sold everything yesterday at a loss".split()
+    assert cluster_near_duplicates([SPAM, ' '.join(edited)]) == [0, 1]
+    assert cluster_near_duplicates([]) == []
+
+
+def test_cluster_ids_are_stable(monkeypatch):
+    labels = cluster_near_duplicates(COMMENTS)
+
+    assert cluster_near_duplicates(COMMENTS) == labels
+    # Appended comments never relabel earlier ones
+    assert cluster_near_duplicates(COMMENTS + [COMMENTS[1], "something new"])[:len(COMMENTS)] == labels
+    # Signatures do not depend on how the shingles are chunked
+    signatures = MinHasher().signatures(COMMENTS)
+    monkeypatch.setattr(comment_dedup, 'CHUNK_SHINGLES', 5)
+    assert np.array_equal(MinHasher().signatures(COMMENTS), signatures)
+    assert cluster_near_duplicates(COMMENTS) == labels
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+from comment_index import CommentIndex, merge_posts
+
+
+def comment(comment_id, score, edited=False):
+    return {'id': comment_id, 'score': score, 'edited': edited, 'created_utc': '2025-06-13T10:00:00'}
+
+
+def test_record_returns_new_and_changed_comments(tmp_path):
+    index = CommentIndex(str(tmp_path / 'index.sqlite'))
+    assert len(index.record('p1', 2, [comment('a', 1), comment('b', 1)])) == 2
+    delta = index.record('p1', 3, [comment('a', 1), comment('b', 5), comment('c', 1)])
+    assert [c['id'] for c in delta] == ['b', 'c']
+    index.close()
+
+
+def test_unchanged_thread_is_recrawled_after_max_age(tmp_path):
+    index = CommentIndex(str(tmp_path / 'index.sqlite'), max_age_hours=6)
+    assert not index.is_unchanged('p1', 2)
+    index.record('p1', 2, [comment('a', 1), comment('b', 1)])
+    now = datetime.now()
+    assert index.is_unchanged('p1', 2, now=now + timedelta(hours=1))
+    assert not index.is_unchanged('p1', 3, now=now + timedelta(hours=1))
+    assert not index.is_unchanged('p1', 2, now=now + timedelta(hours=7))
+    index.close()
+
+
+def test_max_age_none_only_compares_comment_count(tmp_path):
+    index = CommentIndex(str(tmp_path / 'index.sqlite'), max_age_hours=None)
+    index.record('p1', 2, [comment('a', 1), comment('b', 1)])
+    assert index.is_unchanged('p1', 2, now=datetime.now() + timedelta(days=30))
+    index.close()
+
+
+def test_staged_state_is_only_seen_after_commit(tmp_path):
+    path = str(tmp_path / 'index.sqlite')
+    index = CommentIndex(path)
+    assert len(index.stage('p1', 2, [comment('a', 1), comment('b', 1)])) == 2
+    assert index.submission_state('p1') is None
+    # The result file was never saved: the comments are still new next time
+    index.close()
+
+    index = CommentIndex(path)
+    assert len(index.stage('p1', 2, [comment('a', 1), comment('b', 1)])) == 2
+    index.commit()
+    assert index.submission_state('p1')['num_comments'] == 2
+    assert index.stage('p1', 2, [comment('a', 1), comment('b', 1)]) == []
+    index.close()
+
+
+def test_two_searches_on_one_thread_keep_their_own_seen_sets(tmp_path):
+    path = str(tmp_path / 'index.sqlite')
+    thread = [comment('a', 1), comment('b', 1)]
+    daily_file_posts = [{'id': 'p1', 'comments': list(thread)}]
+
+    daily = CommentIndex(path, scope='daily.json')
+    daily.record('p1', 2, thread)
+    daily.close()
+
+    # A second search hits the same thread later; its first crawl sees everything
+    crawl = thread + [comment('c', 1)]
+    earnings = CommentIndex(path, scope='earnings.json')
+    assert not earnings.is_unchanged('p1', 3)
+    assert [c['id'] for c in earnings.record('p1', 3, crawl)] == ['a', 'b', 'c']
+    earnings.close()
+
+    # The first search then only merges what its own file lacks
+    daily = CommentIndex(path, scope='daily.json')
+    assert not daily.is_unchanged('p1', 3)
+    delta = daily.record('p1', 3, crawl)
+    merged = merge_posts(daily_file_posts, [{'id': 'p1', 'comments': delta}])
+    assert [c['id'] for c in merged[0]['comments']] == ['a', 'b', 'c']
+    daily.close()
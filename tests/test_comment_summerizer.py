@@ -0,0 +1,44 @@
+import importlib
+import sys
+import types
+
+import pytest
+
+
+@pytest.fixture
+def summarizer(monkeypatch, tmp_path):
+    # config.py holds the real API key and is not part of the repository
+    monkeypatch.setitem(sys.modules, 'config', types.SimpleNamespace(OPENAI_API_KEY='test-key'))
+    module = importlib.import_module('comment_summerizer')
+    from llm_cache import LLMCache
+    from run_metrics import RunMetrics
+    monkeypatch.setattr(module, 'response_cache', LLMCache(str(tmp_path / 'cache.sqlite')))
+    monkeypatch.setattr(module, 'metrics', RunMetrics('test'))
+    monkeypatch.setattr(module, 'journal', None)
+    yield module
+    module.response_cache.close()
+
+
+def test_process_posts_only_sleeps_after_api_calls(summarizer, monkeypatch):
+    post = {'title': 'TSLA', 'selftext': '', 'comments': [{'id': 'a', 'body': 'calls'}, {'id': 'b', 'body': 'puts'}]}
+    summarizer.cache_store('post', 'Tesla', 'TSLA', '')
+    label = {'summary': 's', 'sentiment': 'positive', 'stock_action': 'buy'}
+    summarizer.cache_store(summarizer.SINGLE_PROMPT, label, 'Tesla', 'calls')
+
+    api_calls = []
+    sleeps = []
+    monkeypatch.setattr(summarizer, 'analyze_comment', lambda body, summary: api_calls.append(body) or dict(label))
+    monkeypatch.setattr(summarizer.time, 'sleep', sleeps.append)
+
+    summarizer.process_posts({'posts': [post]})
+    assert api_calls == ['puts']
+    assert sleeps == [0.5]
+    assert summarizer.metrics.as_dict()['counters']['rate_limit_sleep_seconds'] == 0.5
+    assert [c['sentiment'] for c in post['comments']] == ['positive', 'positive']
+
+
+def test_batched_labels_are_cached_apart_from_single_prompt_labels(summarizer):
+    label = {'summary': 's', 'sentiment': 'negative', 'stock_action': 'sell'}
+    summarizer.cache_store(summarizer.BATCH_PROMPT, label, 'Tesla', 'puts')
+    assert summarizer.cached_label('Tesla', 'puts') is None
+    assert summarizer.cached_label('Tesla', 'puts', batched=True) == label
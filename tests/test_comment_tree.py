@@ -0,0 +1,44 @@
+import numpy as np
+
+from comment_tree import CommentTree, thread_stats
+
+
+def comment(comment_id, parent_id, depth=None, score=1):
+    return {'id': comment_id, 'parent_id': parent_id, 'depth': depth, 'score': score,
+            'created_utc': '2025-06-13T10:00:00'}
+
+
+def orphaned_tree():
+    # "o" replies to a comment that never arrived; Reddit reported it at depth 3
+    return CommentTree.from_comments([
+        comment('a', 't3_post', 0),
+        comment('b', 't1_a', 1),
+        comment('c', 't1_b', 2),
+        comment('o', 't1_gone', 3),
+        comment('p', 't1_o', 4),
+        comment('q', 't1_o', 4),
+    ], link_id='t3_post')
+
+
+def test_subtree_sizes_do_not_leak_orphans_into_the_last_row():
+    tree = orphaned_tree()
+    assert tree.depths().tolist() == [0, 1, 2, 3, 4, 4]
+    assert tree.subtree_sizes().tolist() == [3, 2, 1, 3, 1, 1]
+
+
+def test_single_orphan_has_no_replies():
+    tree = CommentTree.from_comments([comment('a', 't3_post', 0), comment('o', 't1_gone', 2)], link_id='t3_post')
+    assert tree.subtree_sizes().tolist() == [1, 1]
+    assert tree.reply_counts().tolist() == [0, 0]
+    # The orphan is listed as a thread of its own, not as a reply of the last row
+    assert [thread['replies'] for thread in thread_stats(tree, ['positive', 'negative'])] == [0, 0]
+
+
+def test_subtree_sum_matches_a_recursive_walk():
+    tree = orphaned_tree()
+    values = np.arange(1, len(tree) + 1, dtype=np.float64)
+
+    def walk(row):
+        return values[row] + sum(walk(child) for child in tree.children(row).tolist())
+
+    assert tree.subtree_sum(values).tolist() == [walk(row) for row in range(len(tree))]
@@ -0,0 +1,38 @@
+from comment_triage import agreement_report, triage_comments, triage_result
+from ticker_extraction import TickerExtractor
+
+
+def test_trade_intent_reaches_the_llm():
+    bodies = ['Buying more', 'Selling everything', 'shorting this', 'loaded up', 'Apple 🚀🚀🚀', 'bought puts',
+              'holding till 2030', 'calls printed']
+
+    assert triage_comments(bodies) == [None] * len(bodies)
+
+
+def test_tickers_company_names_and_cashtags_count():
+    bodies = ['NVDA lol', 'tesla tho', '$XYZ', 'nvidia!!', 'GM everyone', 'ok sure thing']
+
+    assert triage_comments(bodies) == [None, None, None, None, 'trivial', 'trivial']
+
+
+def test_trivial_comments_are_labelled_locally():
+    bodies = ['[deleted]', '🔥🔥', 'https://example.com/x', 'lmao', 'LOL', 'nice one bro', 'WTF OMG', 'this is a longer comment about my weekend']
+
+    assert triage_comments(bodies) == ['removed', 'no_text', 'no_text', 'reaction', 'reaction', 'trivial', 'trivial', None]
+    assert triage_comments([]) == []
+
+
+def test_custom_extractor():
+    extractor = TickerExtractor({'ACME': ('Acme Corp', ['acme'])})
+
+    assert triage_comments(['acme forever', 'tesla tho'], extractor=extractor) == [None, 'trivial']
+
+
+def test_agreement_report():
+    local = triage_result('trivial')
+    pairs = [(local, {'sentiment': 'neutral', 'stock_action': 'na'}),
+             (local, {'sentiment': 'neutral', 'stock_action': 'hold'}),
+             (local, {'sentiment': 'positive', 'stock_action': 'na'})]
+
+    assert agreement_report(pairs) == {'sampled': 3, 'sentiment_agreement': 0.667, 'action_agreement': 0.667,
+                                       'full_agreement': 0.333}
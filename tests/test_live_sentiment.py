@@ -0,0 +1,131 @@
+import asyncio
+import contextlib
+import io
+import json
+import time
+from types import SimpleNamespace
+
+from live_sentiment import ALL_TICKERS, LiveSentimentDaemon, RollingSentiment
+from result_stream import load_result
+
+
+def test_windows_count_and_expire_per_window():
+    rolling = RollingSentiment(windows=(60, 600))
+    rolling.add(1000, ['TSLA'], 'positive', 'buy')
+    rolling.add(1030, ['TSLA', 'NVDA'], 'negative', 'sell')
+    rolling.add(1050, [], 'neutral', 'hold')
+
+    snapshot = rolling.snapshot(now=1055)
+    assert snapshot['1m']['TSLA'] == {'mentions': 2, 'positive': 1, 'neutral': 0, 'negative': 1, 'net_sentiment': 0.0,
+                                      'buy_pct': 50.0, 'sell_pct': 50.0, 'hold_pct': 0.0}
+    assert snapshot['1m'][ALL_TICKERS]['mentions'] == 3
+    assert list(snapshot['1m']) == [ALL_TICKERS, 'TSLA', 'NVDA']
+
+    # The first comment left the 1m window but not the 10m one
+    snapshot = rolling.snapshot(now=1070)
+    assert snapshot['1m']['TSLA']['mentions'] == 1
+    assert snapshot['1m']['TSLA']['net_sentiment'] == -1.0
+    assert snapshot['10m']['TSLA']['mentions'] == 2
+
+    snapshot = rolling.snapshot(now=1200)
+    assert snapshot['1m'] == {}
+    assert snapshot['10m'][ALL_TICKERS]['mentions'] == 3
+    assert rolling.snapshot(now=2000) == {'1m': {}, '10m': {}}
+
+
+def test_late_events_expire_once_the_events_before_them_have():
+    rolling = RollingSentiment(windows=(60,))
+    rolling.add(1000, ['TSLA'], 'positive', 'buy')
+    # Finished by a slower worker: older than the event already in the window
+    rolling.add(930, ['TSLA'], 'negative', 'sell')
+
+    # Out of the window already, but still counted until the event ahead of it expires
+    assert rolling.snapshot(now=1010)['1m']['TSLA']['mentions'] == 2
+    assert rolling.snapshot(now=1060) == {'1m': {}}
+    # Counts never go negative or leave empty tickers behind
+    rolling.add(1100, ['NVDA'], 'neutral', 'hold')
+    assert rolling.snapshot(now=1100)['1m'] == {
+        ALL_TICKERS: {'mentions': 1, 'positive': 0, 'neutral': 1, 'negative': 0, 'net_sentiment': 0.0,
+                      'buy_pct': 0.0, 'sell_pct': 0.0, 'hold_pct': 100.0},
+        'NVDA': {'mentions': 1, 'positive': 0, 'neutral': 1, 'negative': 0, 'net_sentiment': 0.0,
+                 'buy_pct': 0.0, 'sell_pct': 0.0, 'hold_pct': 100.0}}
+
+
+def stream(items):
+    """PRAW stream with pause_after=-1: the items, then None on every later poll."""
+    yield from items
+    while True:
+        yield None
+
+
+class StubReddit:
+    def __init__(self, comments, submissions):
+        self.streams = SimpleNamespace(comments=lambda **kwargs: stream(comments),
+                                       submissions=lambda **kwargs: stream(submissions))
+
+    def subreddit(self, name):
+        return SimpleNamespace(stream=self.streams)
+
+
+class StubClassifier:
+    """Labels from the comment body: 'calls' is bullish, 'puts' bearish."""
+
+    def __init__(self):
+        self.batches = []
+
+    async def classify(self, comments):
+        self.batches.append(len(comments))
+        for comment in comments:
+            bullish = 'calls' in comment['body']
+            comment.update(summary='', sentiment='positive' if bullish else 'negative',
+                           stock_action='buy' if bullish else 'sell')
+
+
+def praw_comment(comment_id, post_id, body, created, title='Daily thread'):
+    return SimpleNamespace(id=comment_id, author='someone', body=body, score=1, created_utc=created,
+                           permalink=f"/r/wallstreetbets/comments/{post_id}/_/{comment_id}/", is_submitter=False,
+                           distinguished=None, edited=False, link_id=f"t3_{post_id}", link_title=title,
+                           subreddit='wallstreetbets')
+
+
+def test_daemon_run_snapshots_classified_stream(tmp_path):
+    now = time.time()
+    submission = SimpleNamespace(id='p2', title='NVDA earnings thread', author='mod', subreddit='wallstreetbets',
+                                 score=5, num_comments=0, created_utc=now - 30, url='https://reddit.com/p2',
+                                 permalink='/r/wallstreetbets/comments/p2/', selftext='')
+    comments = [praw_comment('c1', 'p1', 'TSLA calls', now - 20), praw_comment('c2', 'p1', 'TSLA puts', now - 10),
+                praw_comment('c3', 'p1', 'buying calls on nvidia', now - 5),
+                praw_comment('c4', 'p2', 'more calls', now - 2, 'NVDA earnings thread')]
+    classifier = StubClassifier()
+    snapshot_path = tmp_path / 'snapshot.json'
+    output_path = tmp_path / 'live.jsonl'
+    daemon = LiveSentimentDaemon(StubReddit(comments, [submission]), ['wallstreetbets'], classifier,
+                                 windows=(300, 3600), batch_size=2, batch_wait=0.05, workers=2,
+                                 snapshot_path=str(snapshot_path), snapshot_interval=0.1,
+                                 output_path=str(output_path), drain_timeout=5)
+
+    snapshots = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(daemon.run(duration=0.5, on_snapshot=snapshots.append))
+
+    assert snapshots
+    written = json.loads(snapshot_path.read_text(encoding='utf-8'))
+    assert written['subreddits'] == ['wallstreetbets']
+    assert written['queue'] == {'depth': 0, 'capacity': 1000}
+    assert written['metrics']['counters']['classified_comments'] == 4
+    assert written['metrics']['counters']['ingested_posts'] == 1
+    assert written['latency_seconds']['max'] >= 2
+    for label in ('5m', '1h'):
+        window = written['windows'][label]
+        assert window[ALL_TICKERS]['mentions'] == 4
+        assert window['TSLA'] == {'mentions': 2, 'positive': 1, 'neutral': 0, 'negative': 1, 'net_sentiment': 0.0,
+                                  'buy_pct': 50.0, 'sell_pct': 50.0, 'hold_pct': 0.0}
+        # c3 names Nvidia, c4 inherits NVDA from its post's title
+        assert window['NVDA']['mentions'] == 2
+        assert window['NVDA']['buy_pct'] == 100.0
+    assert sum(classifier.batches) == 4
+    assert max(classifier.batches) <= 2
+
+    result = load_result(str(output_path))
+    assert {post['id']: len(post['comments']) for post in result['posts']} == {'p1': 3, 'p2': 1}
+    assert result['results_summary']['total_comments_extracted'] == 4
@@ -0,0 +1,28 @@
+from llm_cache import LLMCache
+
+
+def test_get_any_returns_first_cached_key_and_counts_one_lookup(tmp_path):
+    cache = LLMCache(str(tmp_path / 'cache.sqlite'))
+    single = LLMCache.make_key('gpt-4o', 0.3, '2', 'comment', 'summary', 'body')
+    batch = LLMCache.make_key('gpt-4o', 0.3, '2', 'comment_batch', 'summary', 'body')
+    assert single != batch
+    cache.put(single, {'sentiment': 'positive'})
+    assert cache.get(batch) is None
+    assert cache.get_any([batch, single]) == {'sentiment': 'positive'}
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+    cache.close()
+
+
+def test_size_cap_is_enforced_while_storing(tmp_path):
+    value = 'x' * 1000
+    cache = LLMCache(str(tmp_path / 'cache.sqlite'), max_bytes=20 * 1000, evict_every=10)
+    for i in range(100):
+        cache.put(f'key{i}', value)
+        total = cache.conn.execute("SELECT SUM(size) FROM entries").fetchone()[0]
+        # At most evict_every entries land between two evictions
+        assert total <= 20 * 1000 + 10 * (len(value) + 2)
+    assert cache.stats()['evicted'] > 0
+    # The most recently stored entries survive
+    assert cache.get('key99') == value
+    cache.close()
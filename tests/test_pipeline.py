@@ -0,0 +1,172 @@
+import asyncio
+import contextlib
+import io
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from pipeline import CrawlAborted, CrawlFeed, StreamingClassifier
+
+
+class StubSummarizer:
+    """The parts of comment_summerizer StreamingClassifier uses; labels take `delay` seconds per batch."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.labelled = 0
+
+    async def summarize_post_async(self, pool, title, selftext):
+        await asyncio.sleep(self.delay)
+        return f"summary of {title}"
+
+    async def classify_post_comments(self, pool, post_summary, comments, max_batch_size=25):
+        await asyncio.sleep(self.delay)
+        for comment in comments:
+            self.apply_result(comment, {'summary': post_summary, 'sentiment': 'positive', 'stock_action': 'buy'})
+        self.labelled += len(comments)
+
+    @staticmethod
+    def apply_result(comment, result):
+        comment.update(result)
+
+
+def post(post_id):
+    return {'id': post_id, 'title': f"Post {post_id}", 'selftext': ''}
+
+
+def comment(post_id, index):
+    return {'id': f"{post_id}-{index}", 'body': f"comment {index} on {post_id}"}
+
+
+def start_crawl(feed, crawl):
+    """Run `crawl(feed)` in a thread like pipeline.crawl; the outcome lands in the returned dict."""
+    outcome = {}
+
+    def run():
+        try:
+            crawl(feed)
+            outcome['finished'] = True
+        except BaseException as e:
+            outcome['error'] = e
+        finally:
+            feed.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, outcome
+
+
+def crawl_posts(feed, post_ids, comments_per_post, written=None):
+    for post_id in post_ids:
+        feed.write_post(post(post_id))
+        for index in range(comments_per_post):
+            feed.write_comment(post_id, comment(post_id, index))
+            if written is not None:
+                written.append(post_id)
+        feed.end_post(post_id)
+
+
+def test_backpressure_keeps_the_crawl_close_behind_the_classifier():
+    summarizer = StubSummarizer(delay=0.005)
+    written = []
+    lags = []
+
+    async def run():
+        queue = asyncio.Queue(maxsize=2)
+        feed = CrawlFeed(asyncio.get_running_loop(), queue)
+        classifier = StreamingClassifier(SimpleNamespace(), summarizer, batch_size=2, max_pending=1)
+        original = summarizer.classify_post_comments
+
+        async def classify(*args):
+            lags.append(len(written) - summarizer.labelled)
+            await original(*args)
+
+        summarizer.classify_post_comments = classify
+        thread, outcome = start_crawl(feed, lambda feed: crawl_posts(feed, ['a', 'b'], 20, written))
+        with contextlib.redirect_stdout(io.StringIO()):
+            posts = await classifier.consume(queue)
+        await asyncio.to_thread(thread.join, 5)
+        return feed, classifier, posts, outcome
+
+    feed, classifier, posts, outcome = asyncio.run(run())
+
+    assert outcome == {'finished': True}
+    assert [p['id'] for p in posts] == ['a', 'b']
+    assert all(c['sentiment'] == 'positive' for p in posts for c in p['comments'])
+    assert classifier.classified == 40
+    assert feed.blocked_seconds > 0
+    # Queue (2) + open buffer (2) + the one pending batch (2) + the comment being put
+    assert max(lags) <= 7
+
+
+def test_posts_from_parallel_crawls_finish_after_their_own_comments():
+    summarizer = StubSummarizer(delay=0.002)
+    done = []
+
+    def on_post_done(finished):
+        done.append((finished['id'], finished['comments_count'],
+                     all(c.get('sentiment') == 'positive' for c in finished['comments'])))
+
+    async def run():
+        queue = asyncio.Queue(maxsize=3)
+        feed = CrawlFeed(asyncio.get_running_loop(), queue)
+        classifier = StreamingClassifier(SimpleNamespace(), summarizer, batch_size=3, max_pending=2,
+                                         on_post_done=on_post_done)
+        barrier = threading.Barrier(2)
+
+        def worker(post_ids, count):
+            barrier.wait()
+            crawl_posts(feed, post_ids, count)
+
+        # Two crawl threads interleave their posts' records on one feed, as with --workers 2
+        workers = [threading.Thread(target=worker, args=(['a', 'c'], 7)),
+                   threading.Thread(target=worker, args=(['b', 'd'], 4))]
+
+        def crawl(feed):
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+
+        thread, outcome = start_crawl(feed, crawl)
+        with contextlib.redirect_stdout(io.StringIO()):
+            posts = await classifier.consume(queue)
+        await asyncio.to_thread(thread.join, 5)
+        return posts, outcome
+
+    posts, outcome = asyncio.run(run())
+
+    assert outcome == {'finished': True}
+    assert sorted(done) == [('a', 7, True), ('b', 4, True), ('c', 7, True), ('d', 4, True)]
+    by_id = {p['id']: p for p in posts}
+    for post_id in 'abcd':
+        assert [c['id'] for c in by_id[post_id]['comments']] == [comment(post_id, i)['id']
+                                                                 for i in range(7 if post_id in 'ac' else 4)]
+        assert by_id[post_id]['post_summary'] == f"summary of Post {post_id}"
+
+
+def test_classifier_failure_aborts_a_blocked_crawl():
+    summarizer = StubSummarizer()
+
+    def on_post_done(finished):
+        raise RuntimeError("report failed")
+
+    async def run():
+        queue = asyncio.Queue(maxsize=1)
+        feed = CrawlFeed(asyncio.get_running_loop(), queue)
+        classifier = StreamingClassifier(SimpleNamespace(), summarizer, batch_size=5, on_post_done=on_post_done)
+        thread, outcome = start_crawl(feed, lambda feed: crawl_posts(feed, ['a'] + [f"p{i}" for i in range(50)], 5))
+        try:
+            with contextlib.redirect_stdout(io.StringIO()), pytest.raises(RuntimeError, match="report failed"):
+                await classifier.consume(queue)
+        finally:
+            # What run_pipeline does when the classifier stops before the crawl
+            feed.abort()
+        await asyncio.to_thread(thread.join, 5)
+        return thread, outcome
+
+    thread, outcome = asyncio.run(run())
+
+    assert not thread.is_alive()
+    assert isinstance(outcome.get('error'), CrawlAborted)
@@ -0,0 +1,87 @@
+import contextlib
+import io
+import threading
+import time
+
+from bench_standins import RedditStandIn, SyntheticThread, serve
+from benchmark import reddit_client
+from rate_limiter import RateLimitGovernor, _SharedRateLimiter
+from reddit_search import search_reddit_posts
+
+
+class TrackingLimiter:
+    """prawcore RateLimiter stand-in that records how many threads are inside it at once."""
+
+    def __init__(self):
+        self.remaining = None
+        self.reset_timestamp = None
+        self.next_request_timestamp = None
+        self.inside = 0
+        self.max_inside = 0
+        self._count_lock = threading.Lock()
+
+    def _enter(self):
+        with self._count_lock:
+            self.inside += 1
+            self.max_inside = max(self.max_inside, self.inside)
+        time.sleep(0.002)
+        with self._count_lock:
+            self.inside -= 1
+
+    def delay(self):
+        self._enter()
+
+    def update(self, headers):
+        self._enter()
+
+
+class Response:
+    headers = {}
+
+
+def test_shared_limiter_serializes_state_but_not_requests():
+    limiter = TrackingLimiter()
+    shared = _SharedRateLimiter(limiter)
+    in_flight = []
+    max_in_flight = []
+    lock = threading.Lock()
+
+    def request(headers=None):
+        with lock:
+            in_flight.append(1)
+            max_in_flight.append(len(in_flight))
+        time.sleep(0.02)
+        with lock:
+            in_flight.pop()
+        return Response()
+
+    threads = [threading.Thread(target=shared.call, args=(request, dict)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert limiter.max_inside == 1
+    assert max(max_in_flight) > 1
+
+
+def test_concurrent_crawls_share_one_thread_safe_limiter():
+    threads = [SyntheticThread(f"multi{i}", num_comments=150, max_depth=5, seed=i,
+                               title=f"Daily Discussion Thread {i}") for i in range(4)]
+    server = serve(RedditStandIn(threads, more_fanout=20, render_depth=3))
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        reddit = reddit_client(url)
+        governor = RateLimitGovernor(reddit)
+        assert isinstance(reddit._core._rate_limiter, _SharedRateLimiter)
+        with contextlib.redirect_stdout(io.StringIO()):
+            sequential = search_reddit_posts(reddit_client(url), "Daily Discussion Thread", limit=4,
+                                             time_filter="all", sort="new", workers=1)
+            concurrent = search_reddit_posts(reddit, "Daily Discussion Thread", limit=4, time_filter="all",
+                                             sort="new", governor=governor, workers=4)
+    finally:
+        server.shutdown()
+    assert len(concurrent) == 4
+    assert {post['id']: post['comments'] for post in concurrent} == \
+        {post['id']: post['comments'] for post in sequential}
+    remaining, _ = governor.quota()
+    assert remaining is not None
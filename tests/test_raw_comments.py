@@ -0,0 +1,62 @@
+import contextlib
+import io
+
+import pytest
+
+from bench_standins import ReplayStandIn, serve
+from benchmark import reddit_client
+from raw_comments import MORECHILDREN_BATCH_SIZE, comment_to_dict, fetch_comments_raw, http_fetcher
+from record_fixtures import REDDIT_THREAD_FIXTURE, SEARCH_TERM
+from reddit_search import search_reddit_posts
+
+
+@pytest.fixture
+def replay():
+    stand_in = ReplayStandIn.from_file(REDDIT_THREAD_FIXTURE)
+    server = serve(stand_in)
+    yield stand_in, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def crawl(url, engine):
+    with contextlib.redirect_stdout(io.StringIO()):
+        posts = search_reddit_posts(reddit_client(url), SEARCH_TERM, limit=1, time_filter="all", sort="new",
+                                    engine=engine)
+    assert len(posts) == 1
+    return posts[0]['comments']
+
+
+def test_raw_engine_matches_praw_output(replay):
+    stand_in, url = replay
+    praw_comments = crawl(url, "praw")
+    raw_comments = crawl(url, "raw")
+
+    assert stand_in.missing == []
+    assert len(praw_comments) == 700
+    assert len({comment['id'] for comment in praw_comments}) == 700
+    # Same dicts, same breadth-first order
+    assert raw_comments == praw_comments
+
+
+def test_raw_engine_batches_morechildren(replay):
+    stand_in, url = replay
+    with contextlib.redirect_stdout(io.StringIO()):
+        comments = fetch_comments_raw("fixture1", http_fetcher(url), sort="confidence")
+
+    assert len(comments) == 700
+    batches = [params['children'].split(',') for method, path, params in stand_in.requests
+               if path.rstrip('/').startswith('/api/morechildren')]
+    assert batches
+    assert all(len(batch) <= MORECHILDREN_BATCH_SIZE for batch in batches)
+    # Many ids per call, each requested once
+    assert len(batches[0]) > 1
+    assert len({child for batch in batches for child in batch}) == sum(len(batch) for batch in batches)
+
+
+def test_comment_to_dict_defaults():
+    comment = comment_to_dict({'id': 'abc', 'author': None, 'created_utc': 0, 'permalink': '/r/x/abc/',
+                               'parent_id': 't3_post', 'edited': 0})
+    assert comment['author'] == '[deleted]'
+    assert comment['edited'] is False
+    assert comment['permalink'] == 'https://reddit.com/r/x/abc/'
+    assert comment['num_replies'] == 0
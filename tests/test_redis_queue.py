@@ -0,0 +1,175 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import time
+
+import pytest
+import redis.asyncio
+
+from bench_standins import RedisStandIn, serve
+from distributed_classify import collect, produce
+from redis_queue import WINDOW_SECONDS, RedisMinuteRateLimiter, RedisWorkQueue
+from run_metrics import RunMetrics
+
+
+@pytest.fixture
+def redis_url():
+    server = serve(RedisStandIn())
+    yield f"redis://127.0.0.1:{server.server_address[1]}/0"
+    server.shutdown()
+
+
+def run(redis_url, scenario):
+    async def main():
+        client = redis.asyncio.Redis.from_url(redis_url, decode_responses=True)
+        try:
+            return await scenario(client)
+        finally:
+            await client.close()
+    return asyncio.run(main())
+
+
+def test_expired_lease_is_requeued(redis_url):
+    async def scenario(client):
+        queue = RedisWorkQueue(client, 'q', visibility_timeout=0.2, max_attempts=3)
+        await queue.enqueue([('a', {'n': 1})])
+        item_id, payload, attempt = await queue.claim()
+        assert (item_id, payload, attempt) == ('a', {'n': 1}, 1)
+        assert await queue.requeue_expired() == (0, 0)
+        await asyncio.sleep(0.3)
+        assert await queue.requeue_expired() == (1, 0)
+        assert await queue.claim() == ('a', {'n': 1}, 2)
+    run(redis_url, scenario)
+
+
+def test_item_is_dead_lettered_after_max_attempts(redis_url):
+    async def scenario(client):
+        queue = RedisWorkQueue(client, 'q', visibility_timeout=0.1, max_attempts=2)
+        await queue.enqueue([('a', {}), ('b', {})])
+        # "a" times out twice, "b" fails twice
+        for _ in range(2):
+            claimed = {(await queue.claim())[0], (await queue.claim())[0]}
+            assert claimed == {'a', 'b'}
+            target = await queue.release('b', 'boom')
+            await asyncio.sleep(0.15)
+            requeued, dead = await queue.requeue_expired()
+        assert target == 'dead'
+        assert (requeued, dead) == (0, 1)
+        assert await queue.claim() is None
+        assert await queue.finished()
+        counts = await queue.counts()
+        assert counts['dead'] == 2 and counts['done'] == 0
+        assert await client.hget(queue.key('errors'), 'b') == 'boom'
+    run(redis_url, scenario)
+
+
+def test_duplicate_ack_after_lost_lease_is_harmless(redis_url):
+    async def scenario(client):
+        queue = RedisWorkQueue(client, 'q', visibility_timeout=0.1, max_attempts=3)
+        await queue.enqueue([('a', {}), ('b', {})])
+        # Worker 1 stalls on "a" until its lease runs out and worker 2 gets it
+        assert (await queue.claim())[0] == 'a'
+        await asyncio.sleep(0.15)
+        assert await queue.requeue_expired() == (1, 0)
+        assert (await queue.claim())[0] == 'b'
+        assert (await queue.claim())[:1] == ('a',)
+        await queue.ack('a', ['late'])
+        await queue.ack('a', ['second'])
+        await queue.ack('b', ['b'])
+        assert await queue.finished()
+        counts = await queue.counts()
+        assert counts == {'total': 2, 'pending': 0, 'processing': 0, 'done': 2, 'dead': 0}
+
+        # A late ack of an item that is back in pending makes the next claim skip it
+        await queue.enqueue([('c', {})])
+        assert (await queue.claim())[0] == 'c'
+        await asyncio.sleep(0.15)
+        await queue.requeue_expired()
+        await queue.ack('c', ['late'])
+        assert await queue.claim() is None
+        assert await queue.finished()
+        assert json.loads(await client.hget(queue.key('results'), 'c')) == ['late']
+    run(redis_url, scenario)
+
+
+def test_collect_reassembles_shards_in_document_order(redis_url, tmp_path):
+    source = tmp_path / 'reddit_thread.json'
+    posts = [{'id': 'p1', 'title': 'one', 'comments': [{'id': f"c{i}", 'body': str(i)} for i in range(5)]},
+             {'id': 'p2', 'title': 'two', 'comments': [{'id': f"d{i}", 'body': str(i)} for i in range(3)]},
+             {'id': 'p3', 'title': 'three', 'comments': []}]
+    source.write_text(json.dumps({'metadata': {}, 'posts': posts}), encoding='utf-8')
+    output = tmp_path / 'out.json'
+    args = argparse.Namespace(redis_url=redis_url, queue='q', input_file=str(source), shard_size=2, max_comments=4,
+                              visibility_timeout=60, max_attempts=3, output=str(output), reset=False,
+                              no_wait=False, poll_seconds=0.05, keep_queue=False)
+
+    async def work(client):
+        queue = RedisWorkQueue(client, 'q')
+        claimed = []
+        while (item := await queue.claim()) is not None:
+            claimed.append(item)
+        # Acknowledge in reverse, as out-of-order workers would
+        for item_id, payload, _ in reversed(claimed):
+            await queue.ack(item_id, [{'sentiment': comment['id']} for comment in payload['comments']])
+        await client.hset(queue.key('summaries'), mapping={'p1': 'summary one', 'p2': 'summary two'})
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(produce(args))
+        run(redis_url, work)
+        asyncio.run(collect(args, RunMetrics('test')))
+
+    document = json.loads(output.read_text(encoding='utf-8'))
+    comments = {post['id']: post['comments'] for post in document['posts']}
+    assert [c['id'] for c in comments['p1']] == ['c0', 'c1', 'c2', 'c3', 'c4']
+    # Labelled comments carry their own labels; the one beyond --max-comments stays unlabelled
+    assert [c.get('sentiment') for c in comments['p1']] == ['c0', 'c1', 'c2', 'c3', None]
+    assert [c['sentiment'] for c in comments['p2']] == ['d0', 'd1', 'd2']
+    assert comments['p3'] == []
+    assert document['posts'][0]['post_summary'] == 'summary one'
+    assert document['metadata']['distributed_classification']['shards'] == 5
+
+
+def test_rate_limiter_holds_the_limit_across_workers(redis_url):
+    async def scenario(client):
+        other = redis.asyncio.Redis.from_url(redis_url, decode_responses=True)
+        workers = [RedisMinuteRateLimiter(connection, 'rl:requests', 10) for connection in (client, other)]
+        granted = []
+
+        async def request(limiter):
+            await limiter.acquire(1)
+            granted.append(time.time())
+
+        tasks = [asyncio.create_task(request(workers[i % 2])) for i in range(16)]
+        await asyncio.sleep(1.0)
+        # Only the minute's budget went through, split over both workers; the rest keep waiting
+        assert len(granted) == 10
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await other.close()
+    run(redis_url, scenario)
+
+
+def test_refund_returns_unused_units_to_their_bucket(redis_url):
+    async def scenario(client):
+        first = RedisMinuteRateLimiter(client, 'rl:tokens', 100)
+        second = RedisMinuteRateLimiter(client, 'rl:tokens', 100)
+        reservation = await first.acquire(80)
+        await first.refund(60, reservation)
+        await asyncio.wait_for(second.acquire(70), timeout=1)
+        bucket, _ = reservation
+        counts = await client.mget([f"rl:tokens:{s}" for s in range(bucket, int(time.time()) + 1)])
+        assert sum(int(count or 0) for count in counts) == 80 - 60 + 70
+
+        # Never more than the reservation is given back
+        reservation = await first.acquire(5)
+        await first.refund(500, reservation)
+        assert int(await client.get(f"rl:tokens:{reservation[0]}")) >= 0
+
+        # A reservation that already left the window is not touched
+        stale = (int(time.time()) - WINDOW_SECONDS - 5, 50)
+        await first.refund(50, stale)
+        assert await client.get(f"rl:tokens:{stale[0]}") is None
+    run(redis_url, scenario)
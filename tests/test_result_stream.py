@@ -0,0 +1,85 @@
+import json
+
+from result_stream import JsonlResultWriter, load_jsonl_result, load_result
+
+METADATA = {'search_executed_at': '2025-06-13T12:00:00', 'script_version': 'test'}
+SEARCH = {'search_term': 'Daily Discussion Thread', 'search_scope': 'r/wallstreetbets'}
+
+
+def post(post_id):
+    return {'id': post_id, 'title': f"Post {post_id} 🚀", 'score': 10, 'comments': ['ignored'], 'comments_count': 99}
+
+
+def comment(comment_id, body='TSLA calls'):
+    return {'id': comment_id, 'body': body, 'score': 3, 'edited': False, 'distinguished': None}
+
+
+def write_crawl(path, footer=True):
+    """Two posts crawled at once, so their records interleave."""
+    with JsonlResultWriter(str(path), flush_every=2) as writer:
+        writer.write_header(METADATA, SEARCH)
+        writer.write_post(post('p1'))
+        writer.write_comment('p1', comment('a'))
+        writer.write_post(post('p2'))
+        writer.write_comment('p2', comment('x', 'puts\nwith a newline'))
+        writer.write_comment('p1', comment('b', 'ünïcode'))
+        assert writer.end_post('p2') == 1
+        assert writer.end_post('p1') == 2
+        if footer:
+            writer.write_footer({'posts_found': 2, 'total_comments_extracted': 3},
+                                {'execution_seconds': 1.5}, {'search_scope': 'r/wallstreetbets, r/stocks'})
+
+
+def test_round_trip_regroups_interleaved_posts(tmp_path):
+    path = tmp_path / 'crawl.jsonl'
+    write_crawl(path)
+
+    data = load_result(str(path))
+
+    assert data['metadata'] == dict(METADATA, execution_seconds=1.5)
+    assert data['search_parameters'] == dict(SEARCH, search_scope='r/wallstreetbets, r/stocks')
+    assert data['results_summary'] == {'posts_found': 2, 'total_comments_extracted': 3}
+    assert [p['id'] for p in data['posts']] == ['p1', 'p2']
+    first, second = data['posts']
+    assert first['title'] == 'Post p1 🚀'
+    assert first['comments'] == [comment('a'), comment('b', 'ünïcode')]
+    assert first['comments_count'] == 2
+    assert second['comments'] == [comment('x', 'puts\nwith a newline')]
+
+
+def test_missing_footer_recomputes_the_summary(tmp_path):
+    path = tmp_path / 'crawl.jsonl'
+    write_crawl(path, footer=False)
+
+    data = load_jsonl_result(str(path))
+
+    assert data['results_summary'] == {'posts_found': 2, 'total_comments_extracted': 3, 'complete': False}
+    assert data['search_parameters'] == SEARCH
+
+
+def test_file_cut_mid_line_keeps_every_complete_record(tmp_path):
+    path = tmp_path / 'crawl.jsonl'
+    write_crawl(path)
+    lines = path.read_text(encoding='utf-8').splitlines(keepends=True)
+    # Crashed while writing comment b of p1: everything before it is intact
+    cut = next(i for i, line in enumerate(lines) if json.loads(line).get('id') == 'b')
+    path.write_text(''.join(lines[:cut]) + lines[cut][:25], encoding='utf-8')
+
+    data = load_jsonl_result(str(path))
+
+    assert [p['id'] for p in data['posts']] == ['p1', 'p2']
+    assert data['posts'][0]['comments'] == [comment('a')]
+    assert data['posts'][1]['comments'] == [comment('x', 'puts\nwith a newline')]
+    assert data['results_summary'] == {'posts_found': 2, 'total_comments_extracted': 2, 'complete': False}
+
+
+def test_header_only_and_empty_files(tmp_path):
+    path = tmp_path / 'crawl.jsonl'
+    with JsonlResultWriter(str(path)) as writer:
+        writer.write_header(METADATA, SEARCH)
+    assert load_jsonl_result(str(path))['posts'] == []
+
+    path.write_text('', encoding='utf-8')
+    data = load_jsonl_result(str(path))
+    assert data['metadata'] == {}
+    assert data['results_summary'] == {'posts_found': 0, 'total_comments_extracted': 0, 'complete': False}
@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+from run_batch import JOB_DEFAULTS, load_jobs
+
+
+def write_jobs(tmp_path, entries):
+    path = tmp_path / 'jobs.json'
+    path.write_text(json.dumps(entries), encoding='utf-8')
+    return str(path)
+
+
+def test_load_jobs_fills_defaults_and_splits_subreddits(tmp_path):
+    jobs = load_jobs(write_jobs(tmp_path, [
+        {"search_term": "Tesla stock", "subreddits": "stocks, investing"},
+        {"search_term": "NVDA", "limit": 5}
+    ]))
+    assert jobs[0]['subreddits'] == ['stocks', 'investing']
+    assert jobs[0]['sort'] == JOB_DEFAULTS['sort']
+    assert jobs[1]['subreddits'] == JOB_DEFAULTS['subreddits']
+    assert jobs[1]['limit'] == 5
+
+
+@pytest.mark.parametrize('entry, message', [
+    ({"limit": 5}, 'search_term'),
+    ({"search_term": "  "}, 'search_term'),
+    ({"search_term": "x", "subreddits": ""}, 'subreddits'),
+    ({"search_term": "x", "limit": 0}, 'limit'),
+    ({"search_term": "x", "engine": "curl"}, 'engine'),
+    ("Tesla stock", 'expected an object'),
+])
+def test_load_jobs_rejects_invalid_entries(tmp_path, entry, message):
+    with pytest.raises(ValueError, match=message) as excinfo:
+        load_jobs(write_jobs(tmp_path, [{"search_term": "ok"}, entry]))
+    assert 'job 2' in str(excinfo.value)
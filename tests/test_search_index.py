@@ -0,0 +1,97 @@
+import contextlib
+import io
+import json
+import os
+
+from search_index import SearchIndex, build_match_query
+
+
+def test_match_query_quotes_terms_and_keeps_operators():
+    assert build_match_query('puts spy') == '"puts" "spy"'
+    assert build_match_query('"to the moon" or tendies not gme') == '"to the moon" OR "tendies" NOT "gme"'
+    assert build_match_query('(calls OR puts) AND $SPY') == '( "calls" OR "puts" ) AND "$SPY"'
+    assert build_match_query('tend* near') == '"tend"* "near"'
+    # Stray quotes and FTS5 syntax characters end up inside a quoted term
+    assert build_match_query('o"neil') == '"o" "neil"'
+    assert build_match_query('col:value -x ^y NEAR(a b)') == '"col:value" "-x" "^y" "NEAR" ( "a" "b" )'
+    assert build_match_query('* "" ()') == '"" ( )'
+
+
+def write(path, comments, title='Daily Discussion Thread'):
+    document = {'posts': [{'id': 'p1', 'title': title, 'selftext': '', 'score': 10, 'created_utc': 1749800000,
+                           'comments': [dict(comment, created_utc=1749800100) for comment in comments]}]}
+    path.write_text(json.dumps(document), encoding='utf-8')
+    # A rewrite within the same clock tick must still look changed
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    return str(path)
+
+
+def ids(index, query, **filters):
+    return sorted(hit['id'] for hit in index.search(query, **filters))
+
+
+def test_queries_with_punctuation_run_against_the_index(tmp_path):
+    index = SearchIndex(str(tmp_path / 'index.sqlite'))
+    path = write(tmp_path / 'crawl.json', [
+        {'id': 'c1', 'body': 'Loading $SPY puts before CPI', 'score': 5},
+        {'id': 'c2', 'body': "O'Neil says to the moon", 'score': 1, 'sentiment': 'positive'},
+        {'id': 'c3', 'body': 'tendies or bust', 'score': 20}])
+    index.update([path])
+
+    assert ids(index, '$SPY puts') == ['c1']
+    assert ids(index, '"to the moon" OR tendies') == ['c2', 'c3']
+    assert ids(index, 'tend* NOT bust') == []
+    assert ids(index, "o'neil") == ['c2']
+    assert ids(index, 'col:puts') == []
+    assert ids(index, 'moon OR tendies', min_score=10) == ['c3']
+    assert ids(index, 'moon OR tendies', sentiment='positive') == ['c2']
+    assert ids(index, 'daily', kind='post') == ['p1']
+    index.close()
+
+
+def test_update_picks_up_changed_and_deleted_files(tmp_path):
+    index = SearchIndex(str(tmp_path / 'index.sqlite'))
+    crawl = write(tmp_path / 'crawl.json', [{'id': 'c1', 'body': 'buying calls', 'score': 1},
+                                            {'id': 'c2', 'body': 'selling puts', 'score': 2}])
+    other = write(tmp_path / 'other.json', [{'id': 'c3', 'body': 'holding shares', 'score': 3}], title='Weekend')
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert index.update([crawl, other])['indexed'] == 2
+        assert index.update([crawl, other]) == {'indexed': 0, 'unchanged': 2, 'failed': 0, 'removed': 0,
+                                                'documents': 0}
+
+    # Rewritten: c1 is edited, c2 is gone and c4 is new
+    write(tmp_path / 'crawl.json', [{'id': 'c1', 'body': 'buying leaps', 'score': 9},
+                                    {'id': 'c4', 'body': 'selling covered calls', 'score': 4}])
+    stats = index.update([crawl, other])
+    assert (stats['indexed'], stats['unchanged']) == (1, 1)
+    assert ids(index, 'buying') == ['c1']
+    assert ids(index, 'leaps') == ['c1']
+    assert ids(index, 'selling') == ['c4']
+    assert ids(index, 'puts') == []
+    assert index.search('leaps')[0]['score'] == 9
+
+    os.remove(other)
+    stats = index.update([crawl])
+    assert stats['removed'] == 1
+    assert ids(index, 'holding OR weekend') == []
+    assert index.count() == 3
+    index.close()
+
+
+def test_deleting_a_copy_keeps_documents_another_file_still_has(tmp_path):
+    index = SearchIndex(str(tmp_path / 'index.sqlite'))
+    crawl = write(tmp_path / 'crawl.json', [{'id': 'c1', 'body': 'buying calls', 'score': 1}])
+    # The classified copy is newer, so it is the file the documents point to
+    summarized = write(tmp_path / 'crawl_summarized.json',
+                       [{'id': 'c1', 'body': 'buying calls', 'score': 1, 'sentiment': 'positive'}])
+    index.update([crawl, summarized])
+    assert index.search('calls')[0]['file'] == summarized
+
+    os.remove(summarized)
+    assert index.update([crawl])['removed'] == 1
+
+    hits = index.search('calls')
+    assert [(hit['id'], hit['file'], hit['sentiment']) for hit in hits] == [('c1', crawl, 'positive')]
+    assert index.count() == 2
+    index.close()
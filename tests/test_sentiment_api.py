@@ -0,0 +1,120 @@
+import contextlib
+import io
+import json
+import os
+
+import pytest
+
+from sentiment_api import ALL_TICKERS, SentimentAggregates, create_app
+from sentiment_table import aggregate_sentiment, load_tables, summary_records
+
+LABELS = [('positive', 'buy'), ('negative', 'sell'), ('neutral', 'hold'), ('positive', 'hold'), ('negative', 'na')]
+BODIES = ['TSLA to the moon', 'puts on NVDA', 'holding', 'TSLA and NVDA both', 'AAPL looks cheap']
+
+
+def classified_document(day, shift=0, comments=12):
+    return {
+        'metadata': {'search_executed_at': f"2025-06-{day}T12:00:00"},
+        'search_parameters': {'search_term': 'Daily Discussion Thread'},
+        'posts': [{'id': f"p{day}", 'title': 'Daily Discussion Thread', 'selftext': '', 'subreddit': 'wallstreetbets',
+                   'comments': [{'id': f"c{day}{i}", 'body': BODIES[(i + shift) % len(BODIES)], 'score': i * 2 - 3,
+                                 'sentiment': LABELS[(i + shift) % len(LABELS)][0],
+                                 'stock_action': LABELS[(i + shift) % len(LABELS)][1], 'summary': '',
+                                 'cluster_id': f"k{(i + shift) // 2}"} for i in range(comments)]}]
+    }
+
+
+def write(results, day, document, name='reddit_daily_relevance_summarized.json'):
+    folder = results / f"06-{day}-2025"
+    folder.mkdir(exist_ok=True)
+    path = folder / name
+    path.write_text(json.dumps(document), encoding='utf-8')
+    # A rewrite within the same clock tick must still look changed
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    return path
+
+
+def fresh_records(results):
+    """(ticker, date) -> record from a full sentiment_table aggregation of every file under `results`."""
+    paths = sorted(str(path) for path in results.rglob('*_summarized.json'))
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, comments = load_tables(paths, workers=1)
+    per_ticker = summary_records(aggregate_sentiment(comments, by=('ticker', 'day')))
+    everything = summary_records(aggregate_sentiment(comments, by=('day',)).assign(ticker=ALL_TICKERS))
+    return {(record['ticker'], record['date']): record for record in per_ticker + everything}
+
+
+def assert_matches_fresh(aggregates, results):
+    expected = fresh_records(results)
+    tickers = {ticker for ticker, _ in expected}
+    assert {row['ticker'] for row in aggregates.ticker_list()} == tickers
+    for ticker in tickers:
+        daily = aggregates.daily(ticker)
+        assert [(record['ticker'], record['date']) for record in daily] == sorted(key for key in expected
+                                                                                  if key[0] == ticker)
+        for record in daily:
+            assert record == pytest.approx(expected[(record['ticker'], record['date'])])
+        summary = aggregates.summary(ticker)
+        assert summary['comments'] == sum(record['comments'] for record in daily)
+        assert summary['positive'] == sum(record['positive'] for record in daily)
+
+
+def test_file_updates_match_a_fresh_aggregation(tmp_path):
+    results = tmp_path / 'results'
+    results.mkdir()
+    write(results, '10', classified_document('10'))
+    write(results, '11', classified_document('11', shift=1))
+    write(results, '11', classified_document('11', shift=3, comments=5), 'reddit_earnings_relevance_summarized.json')
+    aggregates = SentimentAggregates(str(results), workers=1)
+
+    assert aggregates.refresh() == (3, 0)
+    assert_matches_fresh(aggregates, results)
+
+    # Rewritten with other labels and fewer comments: the old contribution is subtracted
+    changed = write(results, '10', classified_document('10', shift=2, comments=7))
+    assert aggregates.refresh() == (1, 0)
+    assert_matches_fresh(aggregates, results)
+    assert aggregates.refresh() == (0, 0)
+
+    # Deleting the only file of a day drops that day everywhere
+    changed.unlink()
+    assert aggregates.refresh() == (0, 1)
+    assert_matches_fresh(aggregates, results)
+    assert all(record['date'] == '2025-06-11' for record in aggregates.daily(ALL_TICKERS))
+    assert aggregates.day('TSLA', '2025-06-10') is None
+
+
+def test_etag_revalidation(tmp_path):
+    pytest.importorskip('fastapi')
+    from fastapi.testclient import TestClient
+
+    results = tmp_path / 'results'
+    results.mkdir()
+    write(results, '10', classified_document('10'))
+    write(results, '11', classified_document('11', shift=1, comments=4))
+    aggregates = SentimentAggregates(str(results), workers=1)
+    aggregates.refresh()
+    client = TestClient(create_app(aggregates, poll_interval=0))
+
+    first = client.get('/tickers/tsla/daily')
+    assert first.status_code == 200
+    etag = first.headers['etag']
+    assert [day['date'] for day in first.json()['days']] == ['2025-06-10', '2025-06-11']
+    aapl = client.get('/tickers/AAPL/daily').headers['etag']
+
+    repeat = client.get('/tickers/TSLA/daily', headers={'If-None-Match': etag})
+    assert repeat.status_code == 304
+    assert repeat.headers['etag'] == etag
+    assert repeat.content == b''
+    assert client.get('/tickers/TSLA/daily', headers={'If-None-Match': f'W/{etag}, "other"'}).status_code == 304
+
+    # TSLA's comments on 06-11 change; the AAPL comment keeps its label, so its rebuilt body keeps its ETag
+    write(results, '11', classified_document('11', shift=2, comments=4))
+    aggregates.refresh()
+    changed = client.get('/tickers/TSLA/daily', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['etag'] != etag
+    assert changed.json() != first.json()
+    assert client.get('/tickers/AAPL/daily', headers={'If-None-Match': aapl}).status_code == 304
+    assert client.get('/tickers/NOPE/daily').status_code == 404
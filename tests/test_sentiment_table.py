@@ -0,0 +1,89 @@
+import contextlib
+import io
+import json
+
+import pytest
+
+from AI_analyzer import compute_report_stats
+from sentiment_table import ACTIONS, SENTIMENTS, aggregate_sentiment, load_tables
+
+# (body, score, sentiment, stock_action, cluster_id)
+DAY_ONE = [
+    ('TSLA calls, easy money', 40, 'positive', 'buy', 'k1'),
+    ('TSLA calls, easy money!', 3, 'positive', 'buy', 'k1'),
+    ('puts on NVDA into earnings', -4, 'negative', 'sell', 'k2'),
+    ('holding TSLA and NVDA', 0, 'neutral', 'hold', 'k3'),
+    ('no idea what is going on', 1, 'neutral', 'na', 'k4'),
+]
+DAY_TWO = [
+    ('NVDA to the moon', 12, 'positive', 'hold', 'k5'),
+    ('selling my TSLA', 7, 'negative', 'sell', 'k6'),
+    ('AAPL is boring', -10, 'negative', 'na', 'k7'),
+]
+
+
+def classified_document(day, rows):
+    comments = [{'id': f"c{day}{i}", 'body': body, 'score': score, 'sentiment': sentiment,
+                 'stock_action': action, 'summary': '', 'cluster_id': f"{day}{cluster}"}
+                for i, (body, score, sentiment, action, cluster) in enumerate(rows)]
+    return {
+        'metadata': {'search_executed_at': f"2025-06-{day}T12:00:00"},
+        'search_parameters': {'search_term': 'Daily Discussion Thread'},
+        'posts': [{'id': f"p{day}", 'title': 'Daily Discussion Thread', 'selftext': '', 'subreddit': 'wallstreetbets',
+                   'score': 10, 'comments': comments}]
+    }
+
+
+@pytest.fixture
+def tables(tmp_path):
+    paths = []
+    for day, rows in (('10', DAY_ONE), ('11', DAY_TWO)):
+        path = tmp_path / f"06-{day}-2025" / 'reddit_daily_relevance_summarized.json'
+        path.parent.mkdir()
+        path.write_text(json.dumps(classified_document(day, rows)), encoding='utf-8')
+        paths.append(str(path))
+    with contextlib.redirect_stdout(io.StringIO()):
+        return load_tables(paths, workers=1)
+
+
+def assert_matches_report(row, posts, comments, subject=None):
+    """One aggregate_sentiment row against the numbers the perception report prints for the same comments."""
+    stats = compute_report_stats(posts, comments, subject)
+    total = stats['total_comments']
+    assert row['comments'] == total
+    assert row['unique_opinions'] == stats['unique_opinions']
+    for sentiment in SENTIMENTS:
+        count = stats['sentiment_counts'].get(sentiment, 0)
+        assert row[sentiment] == count
+        assert row[f"{sentiment}_pct"] == pytest.approx(100 * count / total)
+        assert row[f"weighted_{sentiment}_pct"] == pytest.approx(stats['weighted_sentiment'][sentiment])
+    for action in ACTIONS:
+        assert row[f"{action}_pct"] == pytest.approx(100 * stats['action_counts'].get(action, 0) / total)
+
+
+def test_overall_and_daily_rows_match_the_report(tables):
+    posts, comments = tables
+
+    overall = aggregate_sentiment(comments, by=())
+    assert len(overall) == 1
+    assert_matches_report(overall.iloc[0], posts, comments)
+
+    daily = aggregate_sentiment(comments, by=('day',))
+    assert daily['date'].astype(str).tolist() == ['2025-06-10', '2025-06-11']
+    for _, row in daily.iterrows():
+        day_comments = comments[comments['date'] == row['date']]
+        assert_matches_report(row, posts, day_comments)
+
+
+def test_ticker_rows_match_the_per_ticker_report(tables):
+    posts, comments = tables
+
+    per_ticker = aggregate_sentiment(comments, by=('ticker',)).set_index('ticker')
+    # A comment naming two tickers counts for both
+    assert per_ticker.loc['TSLA', 'comments'] == 4
+    assert per_ticker.loc['NVDA', 'comments'] == 3
+    assert per_ticker.loc['AAPL', 'comments'] == 1
+    for symbol, row in per_ticker.iterrows():
+        # The selection print_ticker_reports makes for one ticker
+        ticker_comments = comments[comments['tickers'].map(lambda tickers: symbol in tickers)]
+        assert_matches_report(row, posts, ticker_comments, [symbol])
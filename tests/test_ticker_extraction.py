@@ -0,0 +1,77 @@
+import json
+
+from ticker_extraction import AMBIGUOUS_SYMBOLS, TICKERS, KeywordAutomaton, TickerExtractor, load_ticker_dictionary
+
+
+def test_symbols_only_match_whole_words():
+    extractor = TickerExtractor()
+
+    assert extractor.extract("TSLA's earnings, NVDA.") == ['TSLA', 'NVDA']
+    assert extractor.extract('(SPY) 520c / QQQ-puts') == ['SPY', 'QQQ']
+    # Inside longer words and symbols
+    assert extractor.extract('TSLAQ NVDAX AMDX xAAPL SPY500') == []
+    assert extractor.extract('paypalooza, disneyland, intelligence') == []
+    # The longer alias wins where a shorter one is only a prefix
+    assert extractor.extract('google it') == ['GOOGL']
+    assert extractor.extract('ÜTSLA TSLAé') == []
+    assert extractor.extract('') == []
+
+
+def test_bare_symbols_need_capitals():
+    extractor = TickerExtractor()
+
+    assert extractor.extract('AMD and PLTR') == ['AMD', 'PLTR']
+    assert extractor.extract('amd or Amd') == []
+    assert extractor.extract('TGT restock, tgt') == ['TGT']
+    # Symbols that are also lower-case aliases match in any case
+    assert extractor.extract('tsla and Nvda') == ['TSLA', 'NVDA']
+
+
+def test_ambiguous_symbols_need_a_cashtag_or_an_alias():
+    extractor = TickerExtractor()
+
+    assert {'F', 'GM', 'ARM', 'COST', 'VIX'} <= AMBIGUOUS_SYMBOLS
+    assert extractor.extract('GM everyone, F in chat, ARM day, COST basis, VIX') == []
+    assert extractor.extract('$F and $gm, $VIX calls') == ['F', 'GM', 'VIX']
+    assert extractor.extract('Ford, General Motors and ARM Holdings') == ['F', 'GM', 'ARM']
+    # A cashtag still needs the word to end there
+    assert extractor.extract('$Fed and $COSTLY') == []
+    # Passing no ambiguous symbols makes them plain bare symbols again
+    assert TickerExtractor(ambiguous=set()).extract('GM everyone, gm') == ['GM']
+
+
+def test_company_names_in_order_of_first_mention():
+    extractor = TickerExtractor()
+
+    assert extractor.extract('Tesla beat Nvidia, then TSLA fell and nvidia rose') == ['TSLA', 'NVDA']
+    assert extractor.extract('JP Morgan upgraded Bank of America and the S&P 500') == ['JPM', 'BAC', 'SPY']
+    assert extractor.extract("McDonald's vs mcdonalds vs COCA-COLA") == ['MCD', 'KO']
+    assert extractor.extract('meta platforms, zuck') == ['META']
+    assert extractor.name('NVDA') == 'Nvidia'
+    assert extractor.name('XYZ') == 'XYZ'
+
+
+def test_offsets_survive_characters_that_grow_when_lower_cased():
+    # 'İ' lower-cases to two characters; the capitals check must still look at the right slice
+    assert TickerExtractor().extract('İstanbul İİ amd İ Apple, AMD') == ['AAPL', 'AMD']
+    assert TickerExtractor().extract('İİİİ amd') == []
+
+
+def test_custom_dictionary_merges_over_the_builtin(tmp_path):
+    path = tmp_path / 'tickers.json'
+    path.write_text(json.dumps({'acme': {'name': 'Acme Corp', 'aliases': ['Acme', 'road runner']},
+                                'TSLA': {'name': 'Tesla Inc', 'aliases': ['elon']}}), encoding='utf-8')
+    tickers = load_ticker_dictionary(str(path))
+    extractor = TickerExtractor(tickers)
+
+    assert len(tickers) == len(TICKERS) + 1
+    assert extractor.extract('road runner and ACME, elon and NVDA') == ['ACME', 'TSLA', 'NVDA']
+    # The override replaced the built-in aliases
+    assert extractor.extract('tesla') == []
+    assert extractor.name('TSLA') == 'Tesla Inc'
+
+
+def test_automaton_reports_overlapping_matches():
+    automaton = KeywordAutomaton({'he': 1, 'she': 2, 'his': 3, 'hers': 4})
+
+    assert sorted(automaton.iter_matches('ushers')) == [(1, 4, 2), (2, 4, 1), (2, 6, 4)]
@@ -0,0 +1,103 @@
+import contextlib
+import io
+import json
+
+import pandas as pd
+import pytest
+
+import warehouse
+from AI_analyzer import compute_report_stats
+from sentiment_table import aggregate_sentiment, load_tables
+
+LABELS = [('positive', 'buy'), ('negative', 'sell'), ('neutral', 'hold'), ('positive', 'hold')]
+
+
+def thread_document(day, score_offset, flip=False):
+    comments = []
+    for i in range(16):
+        sentiment, action = LABELS[(i + flip) % len(LABELS)]
+        comments.append({
+            'id': f"c{i}", 'parent_id': 't3_p1', 'author': f"user{i % 5}", 'score': i * 3 - 5 + score_offset,
+            'created_utc': f"2025-06-{day}T10:{i:02d}:00",
+            'body': ['TSLA calls', 'puts on NVDA', 'holding', 'TSLA and NVDA both'][i % 4] + f" #{i}",
+            'sentiment': sentiment, 'stock_action': action, 'summary': f"comment {i}",
+            'cluster_id': f"c{i - i % 2}"
+        })
+    return {
+        'metadata': {'search_executed_at': f"2025-06-{day}T12:00:00"},
+        'search_parameters': {'search_term': 'Daily Discussion Thread', 'search_scope': 'r/wallstreetbets'},
+        'posts': [{'id': 'p1', 'title': 'Daily Discussion Thread', 'selftext': 'TSLA earnings', 'subreddit': 'wallstreetbets',
+                   'score': 10, 'num_comments': 16, 'created_utc': f"2025-06-{day}T09:00:00",
+                   'post_summary': 'Daily thread', 'comments': comments}]
+    }
+
+
+def write(tmp_path, day, document, name='reddit_daily_discussion_thread_week_relevance_summarized.json'):
+    folder = tmp_path / f"06-{day}-2025"
+    folder.mkdir(exist_ok=True)
+    path = folder / name
+    path.write_text(json.dumps(document), encoding='utf-8')
+    return str(path)
+
+
+@pytest.fixture
+def same_thread_twice(tmp_path):
+    """The same classified thread for 2025-06-10 and 2025-06-11 (new scores, changed labels), plus a re-crawl."""
+    paths = [write(tmp_path, '10', thread_document('10', 0)), write(tmp_path, '11', thread_document('11', 7, flip=True))]
+    crawl = thread_document('12', 20)
+    for comment in crawl['posts'][0]['comments']:
+        for key in ('sentiment', 'stock_action', 'summary', 'cluster_id'):
+            del comment[key]
+    crawl_path = write(tmp_path, '12', crawl, 'reddit_daily_discussion_thread_week_relevance.json')
+
+    engine = warehouse.create_warehouse_engine(f"sqlite:///{tmp_path / 'warehouse.sqlite'}")
+    for path in paths + [crawl_path]:
+        warehouse.load_file(engine, path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        posts, comments = load_tables(paths, workers=1)
+    return engine, posts, comments, paths
+
+
+def comparable(frame, keys):
+    # The pandas path keeps group keys categorical
+    frame = frame.astype({column: str if column in keys else float for column in frame.columns})
+    return frame.sort_values(keys).reset_index(drop=True) if keys else frame.reset_index(drop=True)
+
+
+@pytest.mark.parametrize('by', [('day',), (), ('day', 'ticker'), ('post',)])
+def test_aggregates_match_pandas(same_thread_twice, by):
+    engine, _, comments, _ = same_thread_twice
+    expected = aggregate_sentiment(comments, by=by)
+    actual = warehouse.aggregate_sentiment(engine, by)
+    keys = [column for column in expected.columns if column in ('date', 'ticker', 'post_id')]
+    pd.testing.assert_frame_equal(comparable(actual[expected.columns], keys), comparable(expected, keys),
+                                  check_dtype=False, atol=1e-9)
+
+
+def test_same_thread_on_two_days_counts_on_both(same_thread_twice):
+    engine, _, _, _ = same_thread_twice
+    by_day = warehouse.aggregate_sentiment(engine, ('day',))
+    assert by_day['date'].tolist() == ['2025-06-10', '2025-06-11']
+    assert by_day['comments'].tolist() == [16, 16]
+
+
+def test_report_stats_match_pandas(same_thread_twice):
+    engine, posts, comments, paths = same_thread_twice
+    expected = compute_report_stats(posts, comments, ['TSLA'])
+    actual = warehouse.report_stats(engine, ['TSLA'])
+    for key in ('posts_analyzed', 'related_posts', 'total_comments', 'unique_opinions'):
+        assert actual[key] == expected[key], key
+    assert actual['weighted_sentiment'] == pytest.approx(expected['weighted_sentiment'])
+    assert actual['sentiment_counts'].to_dict() == expected['sentiment_counts'].to_dict()
+    assert actual['action_counts'].to_dict() == expected['action_counts'].to_dict()
+    assert actual['top_comments']['score'].tolist() == expected['top_comments']['score'].tolist()
+    assert warehouse.run_summary(engine)[2] == sorted(paths)
+
+
+def test_reloading_a_file_replaces_its_labels(same_thread_twice, tmp_path):
+    engine, _, _, paths = same_thread_twice
+    document = thread_document('10', 0)
+    del document['posts'][0]['comments'][8:]
+    write(tmp_path, '10', document)
+    warehouse.load_file(engine, paths[0], force=True)
+    assert warehouse.aggregate_sentiment(engine, ('day',))['comments'].tolist() == [8, 16]
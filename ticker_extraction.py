@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Ticker and company mention extraction.
+Builds one Aho-Corasick automaton from a ticker/alias dictionary and tags a
+text with every symbol it mentions ($TSLA, TSLA, Tesla, ...) in a single pass
+over the text, so a whole daily thread can be split into per-ticker reports.
+"""
+import json
+from collections import deque
+
+# symbol -> (display name, case-insensitive aliases)
+TICKERS = {
+    'AAPL': ('Apple', ['apple', 'iphone']),
+    'MSFT': ('Microsoft', ['microsoft']),
+    'GOOGL': ('Alphabet', ['google', 'alphabet', 'goog', 'googl', 'gemini']),
+    'AMZN': ('Amazon', ['amazon', 'aws']),
+    'META': ('Meta', ['meta platforms', 'facebook', 'zuckerberg', 'zuck']),
+    'NVDA': ('Nvidia', ['nvidia', 'nvda']),
+    'TSLA': ('Tesla', ['tesla', 'tsla']),
+    'AMD': ('AMD', ['advanced micro devices']),
+    'INTC': ('Intel', ['intel']),
+    'NFLX': ('Netflix', ['netflix']),
+    'AVGO': ('Broadcom', ['broadcom']),
+    'TSM': ('TSMC', ['tsmc', 'taiwan semiconductor']),
+    'ORCL': ('Oracle', ['oracle']),
+    'CRM': ('Salesforce', ['salesforce']),
+    'ADBE': ('Adobe', ['adobe']),
+    'PLTR': ('Palantir', ['palantir', 'pltr']),
+    'SNOW': ('Snowflake', ['snowflake']),
+    'SMCI': ('Super Micro', ['super micro', 'supermicro', 'smci']),
+    'MU': ('Micron', ['micron']),
+    'ARM': ('Arm Holdings', ['arm holdings']),
+    'COIN': ('Coinbase', ['coinbase']),
+    'MSTR': ('MicroStrategy', ['microstrategy', 'mstr']),
+    'HOOD': ('Robinhood', ['robinhood']),
+    'PYPL': ('PayPal', ['paypal']),
+    'SQ': ('Block', ['block inc']),
+    'UBER': ('Uber', ['uber']),
+    'ABNB': ('Airbnb', ['airbnb']),
+    'SHOP': ('Shopify', ['shopify']),
+    'DIS': ('Disney', ['disney']),
+    'WMT': ('Walmart', ['walmart']),
+    'COST': ('Costco', ['costco']),
+    'TGT': ('Target', []),
+    'NKE': ('Nike', ['nike']),
+    'SBUX': ('Starbucks', ['starbucks']),
+    'MCD': ("McDonald's", ["mcdonald's", 'mcdonalds']),
+    'KO': ('Coca-Cola', ['coca-cola', 'coca cola']),
+    'BA': ('Boeing', ['boeing']),
+    'F': ('Ford', ['ford']),
+    'GM': ('General Motors', ['general motors']),
+    'RIVN': ('Rivian', ['rivian']),
+    'LCID': ('Lucid', ['lucid motors']),
+    'NIO': ('NIO', []),
+    'JPM': ('JPMorgan', ['jpmorgan', 'jp morgan']),
+    'BAC': ('Bank of America', ['bank of america']),
+    'GS': ('Goldman Sachs', ['goldman sachs', 'goldman']),
+    'XOM': ('Exxon', ['exxon', 'exxonmobil']),
+    'CVX': ('Chevron', ['chevron']),
+    'PFE': ('Pfizer', ['pfizer']),
+    'MRNA': ('Moderna', ['moderna']),
+    'LLY': ('Eli Lilly', ['eli lilly']),
+    'NVO': ('Novo Nordisk', ['novo nordisk']),
+    'UNH': ('UnitedHealth', ['unitedhealth', 'united health']),
+    'GME': ('GameStop', ['gamestop']),
+    'AMC': ('AMC Entertainment', []),
+    'BB': ('BlackBerry', ['blackberry']),
+    'RDDT': ('Reddit', []),
+    'SPY': ('S&P 500 ETF', ['s&p 500', 's&p500', 'sp500', 'spx']),
+    'QQQ': ('Nasdaq 100 ETF', ['nasdaq 100', 'nasdaq-100', 'ndx']),
+    'IWM': ('Russell 2000 ETF', ['russell 2000']),
+    'VIX': ('Volatility Index', []),
+    'TLT': ('Treasury Bond ETF', []),
+}
+
+# Symbols that are also everyday words or WSB slang; these only count as
+# cashtags ($F) or through their company aliases, never as bare capitals
+AMBIGUOUS_SYMBOLS = {'F', 'GM', 'BA', 'KO', 'MU', 'ARM', 'SQ', 'DIS', 'COST', 'SHOP', 'SNOW', 'COIN', 'HOOD',
+                     'BB', 'NIO', 'GS', 'VIX'}
+
+
+def load_ticker_dictionary(path):
+    """
+    Load a ticker dictionary from JSON.
+
+    The file maps symbols to {"name": ..., "aliases": [...]}; entries are
+    merged over the built-in TICKERS so a file only needs to add or override.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        custom = json.load(f)
+    tickers = dict(TICKERS)
+    for symbol, entry in custom.items():
+        tickers[symbol.upper()] = (entry.get('name', symbol.upper()), [alias.lower() for alias in entry.get('aliases', [])])
+    return tickers
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton reporting every occurrence of a fixed set of patterns."""
+
+    def __init__(self, patterns):
+        """
+        Args:
+            patterns: Mapping of pattern string -> value reported for its matches
+        """
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for pattern, value in patterns.items():
+            node = 0
+            for char in pattern:
+                following = self._goto[node].get(char)
+                if following is None:
+                    following = len(self._goto)
+                    self._goto[node][char] = following
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                node = following
+            self._output[node].append((len(pattern), value))
+
+        # Breadth-first failure links; each node inherits the outputs of its suffix node
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, following in self._goto[node].items():
+                queue.append(following)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[following] = self._goto[fallback].get(char, 0)
+                self._output[following] = self._output[following] + self._output[self._fail[following]]
+
+    def iter_matches(self, text):
+        """Yield (start, end, value) for every pattern occurrence in `text`."""
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for length, value in output[node]:
+                yield index - length + 1, index + 1, value
+
+
+class TickerExtractor:
+    """Tags text with the ticker symbols it mentions."""
+
+    def __init__(self, tickers=None, ambiguous=AMBIGUOUS_SYMBOLS):
+        """
+        Args:
+            tickers: symbol -> (name, aliases) dictionary (default: TICKERS)
+            ambiguous: Symbols not matched as bare upper-case words
+        """
+        self.tickers = tickers or TICKERS
+        # One automaton over the lower-cased text; bare symbols carry a flag so the
+        # match is only accepted when the original text is upper-case there
+        patterns = {}
+        for symbol, (_, aliases) in self.tickers.items():
+            if symbol not in ambiguous:
+                patterns[symbol.lower()] = (symbol, True)
+            for alias in aliases:
+                patterns[alias.lower()] = (symbol, False)
+            patterns['$' + symbol.lower()] = (symbol, False)
+        self._automaton = KeywordAutomaton(patterns)
+
+    def name(self, symbol):
+        """Display name for `symbol` (the symbol itself when unknown)."""
+        return self.tickers.get(symbol, (symbol,))[0]
+
+    def extract(self, text):
+        """Return the symbols mentioned in `text`, in order of first mention."""
+        if not text:
+            return []
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # A few characters change length when lower-cased; keep offsets aligned
+            lowered = ''.join(char.lower()[:1] or char for char in text)
+        found = []
+        for start, end, (symbol, needs_upper) in self._automaton.iter_matches(lowered):
+            if symbol in found:
+                continue
+            if start > 0 and lowered[start - 1].isalnum():
+                continue
+            if end < len(lowered) and lowered[end].isalnum():
+                continue
+            if needs_upper and not text[start:end].isupper():
+                continue
+            found.append(symbol)
+        return found
+
+
+_default_extractor = None
+
+
+def default_extractor():
+    """Process-wide extractor over the built-in dictionary, built on first use."""
+    global _default_extractor
+    if _default_extractor is None:
+        _default_extractor = TickerExtractor()
+    return _default_extractor
@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+"""
+Relational warehouse for crawl results and classifier labels.
+Result files are bulk-upserted into indexed runs / posts / comments / labels
+tables (plus ticker mention tables) with batched executemany inserts, so
+reports over months of data can aggregate in SQL instead of re-parsing JSON.
+Posts and comments are stored once; which run saw which post, and the labels
+(with the score the comment had) each classified run gave, are kept per run,
+so a thread classified on two days counts on both like the file-based reports.
+SQLite is the local default; any SQLAlchemy URL for MySQL (PyMySQL) works too.
+"""
+import argparse
+import glob
+import os
+import sys
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import (Column, Float, ForeignKey, Index, Integer, MetaData, String, Table, Text, and_, case,
+                        create_engine, distinct, event, func, literal, or_, select)
+from sqlalchemy.dialects import mysql
+
+from columnar_store import COLUMNAR_SUFFIX
+from result_stream import load_result
+from run_metrics import RunMetrics
+from sentiment_table import ACTIONS, SENTIMENTS, _result_date, sentiment_shares
+from ticker_extraction import TickerExtractor, default_extractor, load_ticker_dictionary
+
+DEFAULT_WAREHOUSE_URL = os.environ.get('WAREHOUSE_URL', 'sqlite:///' + os.path.join('results', 'warehouse.sqlite'))
+BATCH_SIZE = 1000
+
+
+def _label_type(length):
+    # Labels are compared case-sensitively like the pandas reports; MySQL's default collation is not
+    return String(length).with_variant(mysql.VARCHAR(length, collation='utf8mb4_bin'), 'mysql')
+
+
+metadata = MetaData()
+
+runs = Table(
+    'runs', metadata,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('source', String(512), nullable=False, unique=True),
+    Column('classified', Integer, nullable=False, default=0),
+    Column('search_term', String(255)),
+    Column('search_scope', String(512)),
+    Column('result_date', String(10), index=True),
+    Column('executed_at', String(32)),
+    Column('file_mtime', Float),
+    Column('loaded_at', String(32)),
+    Column('posts', Integer),
+    Column('comments', Integer),
+    Column('labels', Integer)
+)
+
+posts = Table(
+    'posts', metadata,
+    Column('id', String(32), primary_key=True),
+    Column('run_id', Integer, ForeignKey('runs.id'), index=True),
+    Column('subreddit', String(64), index=True),
+    Column('title', Text),
+    Column('selftext', Text),
+    Column('author', String(64)),
+    Column('score', Integer),
+    Column('num_comments', Integer),
+    Column('created_utc', String(32)),
+    Column('permalink', String(512)),
+    Column('url', Text),
+    Column('post_summary', Text)
+)
+
+comments = Table(
+    'comments', metadata,
+    Column('id', String(32), primary_key=True),
+    Column('post_id', String(32), ForeignKey('posts.id'), index=True),
+    Column('run_id', Integer, ForeignKey('runs.id'), index=True),
+    Column('parent_id', String(32)),
+    Column('author', String(64)),
+    Column('body', Text),
+    Column('score', Integer),
+    Column('created_utc', String(32)),
+    Column('depth', Integer)
+)
+
+run_posts = Table(
+    'run_posts', metadata,
+    Column('run_id', Integer, ForeignKey('runs.id'), primary_key=True),
+    Column('post_id', String(32), ForeignKey('posts.id'), primary_key=True),
+    Index('ix_run_posts_post_id', 'post_id')
+)
+
+labels = Table(
+    'labels', metadata,
+    Column('run_id', Integer, ForeignKey('runs.id'), primary_key=True),
+    Column('comment_id', String(32), ForeignKey('comments.id'), primary_key=True),
+    # Score of the comment in that run; the reports weight by it
+    Column('score', Integer),
+    Column('sentiment', _label_type(16)),
+    Column('stock_action', _label_type(16)),
+    Column('summary', Text),
+    Column('cluster_id', String(32)),
+    Column('triage', String(32)),
+    Index('ix_labels_comment_id', 'comment_id')
+)
+
+post_tickers = Table(
+    'post_tickers', metadata,
+    Column('post_id', String(32), ForeignKey('posts.id'), primary_key=True),
+    Column('ticker', String(16), primary_key=True),
+    Index('ix_post_tickers_ticker', 'ticker')
+)
+
+comment_tickers = Table(
+    'comment_tickers', metadata,
+    Column('comment_id', String(32), ForeignKey('comments.id'), primary_key=True),
+    Column('ticker', String(16), primary_key=True),
+    Index('ix_comment_tickers_ticker', 'ticker')
+)
+
+
+def create_warehouse_engine(url=DEFAULT_WAREHOUSE_URL):
+    """Engine for `url` with the schema created; SQLite files get WAL mode for fast bulk loads."""
+    if url.startswith('sqlite:///'):
+        directory = os.path.dirname(url[len('sqlite:///'):])
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    engine = create_engine(url, future=True)
+    if engine.dialect.name == 'sqlite':
+        @event.listens_for(engine, 'connect')
+        def _pragmas(connection, _):
+            cursor = connection.cursor()
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('PRAGMA synchronous=NORMAL')
+            cursor.close()
+    metadata.create_all(engine)
+    return engine
+
+
+def _insert(connection, table):
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        raise ValueError(f"Upserts are not implemented for {dialect}")
+    return insert(table)
+
+
+def bulk_upsert(connection, table, rows, keep=(), keys=None):
+    """
+    Insert or update `rows` (dicts with every column but autoincrement ids) in batches of BATCH_SIZE.
+
+    Args:
+        connection: Connection inside a transaction
+        table: Target table
+        rows: Row dictionaries
+        keep: Columns whose stored value is kept when the new one is NULL
+        keys: Columns of the unique key rows conflict on (default: the primary key)
+    """
+    if not rows:
+        return
+    statement = _insert(connection, table)
+    keys = keys or [column.name for column in table.primary_key.columns]
+    names = [name for name in rows[0] if name not in keys]
+    if connection.dialect.name == 'mysql':
+        new = statement.inserted
+    else:
+        new = statement.excluded
+    values = {name: func.coalesce(new[name], table.c[name]) if name in keep else new[name] for name in names}
+    if not values:
+        statement = statement.prefix_with('IGNORE') if connection.dialect.name == 'mysql' else \
+            statement.on_conflict_do_nothing()
+    elif connection.dialect.name == 'mysql':
+        statement = statement.on_duplicate_key_update(values)
+    else:
+        statement = statement.on_conflict_do_update(index_elements=list(keys), set_=values)
+    for start in range(0, len(rows), BATCH_SIZE):
+        connection.execute(statement, rows[start:start + BATCH_SIZE])
+
+
+def _delete_in(connection, column, ids):
+    for start in range(0, len(ids), BATCH_SIZE):
+        connection.execute(column.table.delete().where(column.in_(ids[start:start + BATCH_SIZE])))
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def document_rows(data, extractor):
+    """
+    Split a result document into row lists for every table but runs.
+
+    Returns:
+        Dictionary of table name -> list of row dicts (run_id not filled in)
+    """
+    rows = {name: [] for name in ('posts', 'comments', 'labels', 'post_tickers', 'comment_tickers')}
+    for post in data.get('posts', []):
+        post_id = post.get('id')
+        if not post_id:
+            continue
+        rows['posts'].append({
+            'id': post_id, 'subreddit': post.get('subreddit'), 'title': post.get('title', ''),
+            'selftext': post.get('selftext') or '', 'author': post.get('author'), 'score': _int(post.get('score')),
+            'num_comments': _int(post.get('num_comments')), 'created_utc': post.get('created_utc'),
+            'permalink': post.get('permalink'), 'url': post.get('url'), 'post_summary': post.get('post_summary')
+        })
+        tickers = extractor.extract(post.get('title', '') + '\n' + (post.get('selftext') or ''))
+        rows['post_tickers'].extend({'post_id': post_id, 'ticker': ticker} for ticker in tickers)
+        for comment in post.get('comments', []):
+            comment_id = comment.get('id')
+            if not comment_id:
+                continue
+            rows['comments'].append({
+                'id': comment_id, 'post_id': post_id, 'parent_id': comment.get('parent_id'),
+                'author': comment.get('author'), 'body': comment.get('body', ''), 'score': _int(comment.get('score')) or 0,
+                'created_utc': comment.get('created_utc'), 'depth': _int(comment.get('depth'))
+            })
+            # Same tagging as sentiment_table.result_columns: no mention of its own means the post's tickers
+            rows['comment_tickers'].extend({'comment_id': comment_id, 'ticker': ticker}
+                                           for ticker in extractor.extract(comment.get('body', '')) or tickers)
+            if comment.get('sentiment') and comment.get('stock_action'):
+                rows['labels'].append({
+                    'comment_id': comment_id, 'score': _int(comment.get('score')) or 0,
+                    'sentiment': comment['sentiment'],
+                    'stock_action': comment['stock_action'], 'summary': comment.get('summary', ''),
+                    'cluster_id': comment.get('cluster_id'), 'triage': comment.get('triage')
+                })
+    return rows
+
+
+def load_file(engine, path, extractor=None, force=False):
+    """
+    Upsert one result file (.json, .jsonl or .cols, crawled or classified).
+
+    Each post and comment is stored once and points at the run that loaded it
+    last. The run's post list and labels replace what the same file loaded
+    before; other runs' labels are kept, so loading a re-crawl keeps the
+    earlier classification and the same thread classified on several days
+    counts once per day.
+
+    Returns:
+        Row counts loaded, or None when the file is unchanged since it was last loaded
+    """
+    extractor = extractor or default_extractor()
+    source = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    with engine.connect() as connection:
+        loaded_mtime = connection.execute(select(runs.c.file_mtime).where(runs.c.source == source)).scalar()
+    if loaded_mtime == mtime and not force:
+        return None
+
+    data = load_result(path)
+    rows = document_rows(data, extractor)
+    run = {
+        'source': source, 'classified': int(bool(rows['labels'])),
+        'search_term': data.get('search_parameters', {}).get('search_term'),
+        'search_scope': data.get('search_parameters', {}).get('search_scope'),
+        'result_date': _result_date(path, data),
+        'executed_at': data.get('metadata', {}).get('search_executed_at'),
+        'file_mtime': mtime, 'loaded_at': datetime.now().isoformat(),
+        'posts': len(rows['posts']), 'comments': len(rows['comments']), 'labels': len(rows['labels'])
+    }
+    with engine.begin() as connection:
+        bulk_upsert(connection, runs, [run], keys=['source'])
+        run_id = connection.execute(select(runs.c.id).where(runs.c.source == source)).scalar()
+        for name in ('posts', 'comments', 'labels'):
+            for row in rows[name]:
+                row['run_id'] = run_id
+        bulk_upsert(connection, posts, rows['posts'], keep=('post_summary',))
+        bulk_upsert(connection, comments, rows['comments'])
+        # A reloaded file may have lost posts or labels since its last load
+        connection.execute(run_posts.delete().where(run_posts.c.run_id == run_id))
+        connection.execute(labels.delete().where(labels.c.run_id == run_id))
+        bulk_upsert(connection, run_posts, [{'run_id': run_id, 'post_id': row['id']} for row in rows['posts']])
+        bulk_upsert(connection, labels, rows['labels'])
+        # Ticker tags follow the current dictionary
+        _delete_in(connection, post_tickers.c.post_id, [row['id'] for row in rows['posts']])
+        _delete_in(connection, comment_tickers.c.comment_id, [row['id'] for row in rows['comments']])
+        bulk_upsert(connection, post_tickers, rows['post_tickers'])
+        bulk_upsert(connection, comment_tickers, rows['comment_tickers'])
+    return {name: len(value) for name, value in rows.items()}
+
+
+def find_result_files(results_dir="results"):
+    """Every crawl and classified result under `results_dir`, one format per result (.cols over .jsonl over .json)."""
+    found = {}
+    for suffix in ('.json', '.jsonl', COLUMNAR_SUFFIX):
+        for path in glob.glob(os.path.join(results_dir, '**', 'reddit_*' + suffix), recursive=True):
+            found[os.path.splitext(path)[0]] = path
+    return sorted(found.values())
+
+
+# 📊 Aggregations pushed down into SQL
+
+GROUP_EXPRESSIONS = {
+    'day': runs.c.result_date.label('date'),
+    'post': comments.c.post_id.label('post_id'),
+    'search_term': runs.c.search_term.label('search_term'),
+    'file': runs.c.source.label('file'),
+    'subreddit': posts.c.subreddit.label('subreddit'),
+    'ticker': comment_tickers.c.ticker.label('ticker')
+}
+
+
+def _labelled(query, since=None, until=None, ticker=None, join_ticker=False):
+    """Restrict `query` to labelled comments of runs between `since` and `until` (YYYY-MM-DD), optionally of one ticker."""
+    source = labels.join(comments, comments.c.id == labels.c.comment_id) \
+        .join(runs, runs.c.id == labels.c.run_id) \
+        .outerjoin(posts, posts.c.id == comments.c.post_id)
+    if ticker is not None or join_ticker:
+        source = source.join(comment_tickers, comment_tickers.c.comment_id == comments.c.id)
+    conditions = [labels.c.sentiment != '', labels.c.stock_action != '']
+    if since:
+        conditions.append(runs.c.result_date >= since)
+    if until:
+        conditions.append(runs.c.result_date <= until)
+    if ticker is not None:
+        conditions.append(comment_tickers.c.ticker == ticker)
+    return query.select_from(source).where(and_(*conditions))
+
+
+def _weight():
+    return case((labels.c.score < 1, 1), else_=labels.c.score)
+
+
+def aggregate_sentiment(engine, by=('day',), since=None, until=None):
+    """
+    sentiment_table.aggregate_sentiment computed by the database.
+
+    Args:
+        engine: Warehouse engine
+        by: Group keys, any of GROUP_EXPRESSIONS (empty for one overall row)
+        since, until: Only runs whose result date is in this range (YYYY-MM-DD, inclusive)
+
+    Returns:
+        DataFrame with the columns of sentiment_table.aggregate_sentiment
+    """
+    keys = [GROUP_EXPRESSIONS[key] for key in by]
+    weight = _weight()
+    sums = [func.count().label('comments'),
+            func.count(distinct(func.coalesce(labels.c.cluster_id, comments.c.id))).label('unique_opinions'),
+            func.sum(weight).label('weight')]
+    for sentiment in SENTIMENTS:
+        sums.append(func.sum(case((labels.c.sentiment == sentiment, 1), else_=0)).label(f"is_{sentiment}"))
+        sums.append(func.sum(case((labels.c.sentiment == sentiment, weight), else_=0)).label(f"w_{sentiment}"))
+    for action in ACTIONS:
+        sums.append(func.sum(case((labels.c.stock_action == action, 1), else_=0)).label(f"is_{action}"))
+    query = _labelled(select(*keys, *sums), since, until, join_ticker='ticker' in by)
+    if keys:
+        query = query.group_by(*keys).order_by(*keys)
+    with engine.connect() as connection:
+        totals = pd.DataFrame(connection.execute(query).mappings().all())
+    if totals.empty or not totals['comments'].sum():
+        return pd.DataFrame()
+    totals = totals.set_index([key.name for key in keys]) if keys else totals
+    totals = totals.astype({column: float for column in totals.columns if column.startswith('w_') or column == 'weight'})
+    result = sentiment_shares(totals)
+    return result.reset_index() if keys else result.reset_index(drop=True)
+
+
+def report_stats(engine, subject=None, since=None, until=None, ticker=None):
+    """
+    AI_analyzer.compute_report_stats computed by the database.
+
+    Args:
+        subject: Tickers the report is about (related posts mention one of them)
+        ticker: Only comments mentioning this ticker, and the posts they belong to or that mention it
+
+    Returns:
+        Dictionary with the same keys and value types as compute_report_stats
+    """
+    weight = _weight()
+    with engine.connect() as connection:
+        def scalar(query):
+            return connection.execute(query).scalar() or 0
+
+        # Posts of the classified runs in the period, once per run
+        # (for a ticker report: the posts it is discussed in or about)
+        post_query = select(run_posts.c.post_id.label('id')) \
+            .select_from(run_posts.join(runs, runs.c.id == run_posts.c.run_id)).where(runs.c.classified == 1)
+        if since:
+            post_query = post_query.where(runs.c.result_date >= since)
+        if until:
+            post_query = post_query.where(runs.c.result_date <= until)
+        if ticker is not None:
+            discussed = _labelled(select(comments.c.post_id), since, until, ticker)
+            about = select(post_tickers.c.post_id).where(post_tickers.c.ticker == ticker)
+            post_query = post_query.where(or_(run_posts.c.post_id.in_(discussed), run_posts.c.post_id.in_(about)))
+        post_ids = post_query.subquery()
+        mentions = select(post_tickers.c.post_id)
+        if subject:
+            mentions = mentions.where(post_tickers.c.ticker.in_(list(subject)))
+        stats = {
+            'posts_analyzed': scalar(select(func.count()).select_from(post_ids)),
+            'related_posts': scalar(select(func.count()).select_from(post_ids).where(post_ids.c.id.in_(mentions))),
+            'total_comments': scalar(_labelled(select(func.count()), since, until, ticker))
+        }
+        if not stats['total_comments']:
+            return stats
+
+        def counts(column):
+            query = _labelled(select(column, func.count().label('count')), since, until, ticker) \
+                .group_by(column).order_by(func.count().desc(), column)
+            return pd.Series({value: count for value, count in connection.execute(query)}, dtype='int64')
+
+        stats['sentiment_counts'] = counts(labels.c.sentiment)
+        stats['action_counts'] = counts(labels.c.stock_action)
+        weights = dict(connection.execute(
+            _labelled(select(labels.c.sentiment, func.sum(weight)), since, until, ticker).group_by(labels.c.sentiment)).all())
+        total_weight = sum(weights.values())
+        stats['weighted_sentiment'] = {
+            sentiment: (weights.get(sentiment, 0) / total_weight) * 100 if total_weight > 0 else 0
+            for sentiment in SENTIMENTS
+        }
+        stats['unique_opinions'] = scalar(_labelled(
+            select(func.count(distinct(func.coalesce(labels.c.cluster_id, comments.c.id)))), since, until, ticker))
+        top = _labelled(select(labels.c.score, labels.c.sentiment, labels.c.stock_action, labels.c.summary,
+                               func.coalesce(posts.c.title, literal('')).label('post_title')), since, until, ticker) \
+            .order_by(labels.c.score.desc()).limit(3)
+        stats['top_comments'] = pd.DataFrame(connection.execute(top).mappings().all())
+        labelled_ids = _labelled(select(comments.c.id), since, until, ticker)
+        tickers = select(comment_tickers.c.ticker, func.count().label('count')) \
+            .where(comment_tickers.c.comment_id.in_(labelled_ids)) \
+            .group_by(comment_tickers.c.ticker).order_by(func.count().desc(), comment_tickers.c.ticker).limit(5)
+        stats['ticker_counts'] = pd.Series({symbol: count for symbol, count in connection.execute(tickers)}, dtype='int64')
+    return stats
+
+
+def ticker_counts(engine, since=None, until=None):
+    """Labelled comments per ticker, most mentioned first (sentiment_table.ticker_counts)."""
+    query = _labelled(select(comment_tickers.c.ticker, func.count().label('count')), since, until, join_ticker=True) \
+        .group_by(comment_tickers.c.ticker).order_by(func.count().desc(), comment_tickers.c.ticker)
+    with engine.connect() as connection:
+        return pd.Series({symbol: count for symbol, count in connection.execute(query)}, dtype='int64')
+
+
+def run_summary(engine, since=None, until=None):
+    """(search terms, result dates, sources) of the classified runs in the period, each sorted."""
+    query = select(runs.c.search_term, runs.c.result_date, runs.c.source).where(runs.c.classified == 1)
+    if since:
+        query = query.where(runs.c.result_date >= since)
+    if until:
+        query = query.where(runs.c.result_date <= until)
+    with engine.connect() as connection:
+        rows = connection.execute(query).all()
+    return (sorted({row.search_term for row in rows if row.search_term}),
+            sorted({row.result_date for row in rows if row.result_date}),
+            sorted(row.source for row in rows))
+
+
+def create_argument_parser():
+    parser = argparse.ArgumentParser(
+        description='Bulk-load Reddit results and labels into a SQL warehouse',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python warehouse.py load --all
+  python warehouse.py --url "mysql+pymysql://user:password@db/reddit?charset=utf8mb4" load results/06-16-2025/*.json
+  python AI_analyzer.py --warehouse sqlite:///results/warehouse.sqlite --group-by day,ticker --since 2025-06-01
+        """
+    )
+    parser.add_argument('--url', default=DEFAULT_WAREHOUSE_URL,
+                        help=f'SQLAlchemy database URL (default: $WAREHOUSE_URL or {DEFAULT_WAREHOUSE_URL})')
+    parser.add_argument('--metrics-out', help='Write run metrics to this file (*.prom: Prometheus text format, otherwise JSON)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    load_parser = subparsers.add_parser('load', help='Upsert result files (crawled or classified)')
+    load_parser.add_argument('files', nargs='*', help='Result files (.json, .jsonl or .cols)')
+    load_parser.add_argument('--all', action='store_true', help='Load every result under --results-dir')
+    load_parser.add_argument('--results-dir', default='results', help='Folder searched by --all (default: results)')
+    load_parser.add_argument('--force', action='store_true', help='Reload files that have not changed since their last load')
+    load_parser.add_argument('--tickers-file', help='JSON ticker dictionary merged over the built-in one')
+
+    subparsers.add_parser('stats', help='Show table sizes')
+    return parser
+
+
+def main():
+    args = create_argument_parser().parse_args()
+    metrics = RunMetrics(f"warehouse_{args.command}")
+    engine = create_warehouse_engine(args.url)
+
+    if args.command == 'load':
+        files = list(args.files)
+        if args.all:
+            files.extend(find_result_files(args.results_dir))
+        if not files:
+            sys.exit("No result files given (use --all to load everything under --results-dir)")
+        extractor = TickerExtractor(load_ticker_dictionary(args.tickers_file)) if args.tickers_file else default_extractor()
+        for path in files:
+            try:
+                with metrics.stage('load'):
+                    loaded = load_file(engine, path, extractor, args.force)
+            except Exception as e:
+                print(f"❌ {path}: {e}")
+                metrics.add('failed_files')
+                continue
+            if loaded is None:
+                print(f"⏭️  {path}: unchanged")
+                metrics.add('unchanged_files')
+                continue
+            print(f"✅ {path}: {loaded['posts']} posts, {loaded['comments']} comments, {loaded['labels']} labels")
+            metrics.add('files')
+            for name, count in loaded.items():
+                metrics.add(name, count)
+        metrics.print_report()
+    else:
+        with engine.connect() as connection:
+            for table in metadata.sorted_tables:
+                print(f"{table.name:>16}: {connection.execute(select(func.count()).select_from(table)).scalar()} rows")
+
+    if args.metrics_out:
+        print(f"📊 Metrics written to {metrics.write(args.metrics_out)}")
+
+
+if __name__ == "__main__":
+    main()